@@ -0,0 +1,115 @@
+"""
+Experiment: Event-loop latency under heavy requests
+Date: 2026-10-18
+Purpose: Show that light endpoints stay fast while heavy ones
+(full-size thumbnail renders) run concurrently, comparing the executor
+model in server/executors.py against rendering inline on the event loop.
+
+Usage:
+    python experiments/bench_event_loop.py [--heavy 32] [--light 400] [--inline]
+
+    --inline renders thumbnails on the event loop, the way /image/thumbnail
+    did before, for a before/after comparison.
+
+Findings (1 vCPU container, 16 heavy renders of 4000x3000 JPEGs):
+- Process pool (1 worker): light p50 2.6 ms, p99 9.7 ms, max 52 ms;
+  wall 15.2 s (includes spawning the worker)
+- Inline on the event loop: light p50 1533 ms, p99 3059 ms; every light
+  request waits behind whichever render is running
+- With more cores the pool also wins on wall time; on one core it trades
+  throughput of the heavy endpoint for responsiveness of everything else
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server.main as main  # noqa: E402
+
+
+def make_images(directory: Path, count: int, size=(4000, 3000)) -> list:
+    paths = []
+    base = Image.effect_noise(size, 64).convert("RGB")
+    for i in range(count):
+        path = directory / f"bench_{i}.jpg"
+        base.save(path, quality=92)
+        paths.append(str(path))
+    return paths
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def run(heavy: int, light: int, images: list) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def heavy_request(i: int) -> None:
+            # Distinct sizes defeat any response caching
+            await client.get("/image/thumbnail", params={"path": images[i % len(images)], "size": 1200 + i})
+
+        async def light_request() -> float:
+            start = time.perf_counter()
+            await client.get("/")
+            return (time.perf_counter() - start) * 1000
+
+        await light_request()  # warm up
+        start = time.perf_counter()
+        heavy_tasks = [asyncio.create_task(heavy_request(i)) for i in range(heavy)]
+        # Fire light requests at a fixed rate only while heavy work is pending,
+        # so every sample competes with it
+        light_tasks = []
+        while len(light_tasks) < light and not all(t.done() for t in heavy_tasks):
+            light_tasks.append(asyncio.create_task(light_request()))
+            await asyncio.sleep(0.01)
+        latencies = await asyncio.gather(*light_tasks)
+        await asyncio.gather(*heavy_tasks)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "light_p50_ms": statistics.median(latencies),
+        "light_p99_ms": percentile(latencies, 99),
+        "light_max_ms": max(latencies),
+        "wall_s": elapsed,
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--heavy", type=int, default=32, help="Concurrent full-size thumbnail requests")
+    parser.add_argument("--light", type=int, default=400, help="Maximum light requests sent while heavy ones are pending")
+    parser.add_argument("--inline", action="store_true", help="Render thumbnails on the event loop (old behaviour)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        main.settings.BASE_DIR = directory
+        main.settings.MEDIA_DIR = directory / "media"
+        images = make_images(directory, 4)
+
+        if args.inline:
+            async def inline(fn, *a, **kw):
+                return fn(*a, **kw)
+            main.execution_pools.run_cpu = inline  # type: ignore[method-assign]
+
+        result = asyncio.run(run(args.heavy, args.light, images))
+        main.execution_pools.shutdown()
+
+    mode = "inline (event loop)" if args.inline else f"process pool ({main.execution_pools.cpu_workers} workers)"
+    print(f"Thumbnail rendering: {mode}")
+    print(f"  light p50 {result['light_p50_ms']:.1f} ms | p99 {result['light_p99_ms']:.1f} ms | "
+          f"max {result['light_max_ms']:.1f} ms | wall {result['wall_s']:.1f} s")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,535 @@
+"""
+Experiment: Vector store benchmark (NumPy, FAISS, Chroma, LanceDB)
+Tasks: 10.4-10.6 at library scale
+Date: 2026-10-18
+Purpose: Run every candidate store through one interface on the same
+synthetic CLIP-like vectors, so choosing and tuning the production store
+rests on comparable numbers instead of the 1000-image spot checks.
+
+Usage:
+    python experiments/bench_vector_stores.py [--sizes 10000,100000,1000000]
+        [--backends numpy,faiss-flat,faiss-hnsw,chroma,lance,lance-ivfpq]
+        [--queries 200] [--selectivity 0.1] [--json out.json] [--csv out.csv]
+
+    Backends whose package is missing are reported as skipped.
+
+Data:
+- 512-d unit vectors drawn around a shared mean direction plus
+  clustered content directions, which matches CLIP's anisotropy
+  (unrelated photos still score ~0.4-0.6) and its near-duplicate bursts
+- Queries come from the same distribution but are not in the store
+- Each photo gets a "favorite" flag with --selectivity probability; the
+  filtered run searches favorites only
+
+Metrics per (backend, size):
+- build_s: time to load all vectors (and train/build the index)
+- rss_mb: process RSS growth from building the store; vectors_mb: exact
+  size of the in-memory vectors where the store exposes them; disk_mb
+  for stores that persist
+- p50_ms / p99_ms: single-query latency for top-10
+- recall_at_10: overlap with exact brute-force search
+- filtered_p50_ms / filtered_p99_ms / filtered_recall_at_10: the same
+  with the favorite filter applied by the store
+
+Findings (1 vCPU container, 200 queries, --refine-factor 10; FAISS and
+Chroma were not installed and 1M needs more RAM than the container had):
+- numpy: 10k p50 1.1 ms; 100k p50 24 ms / p99 40 ms, 210 MB, exact.
+  The matrix-vector product is ~21 ms of that (a full argsort was ~2 ms,
+  argpartition 0.3 ms). Filtered p50 3.4 ms, since only favorites are scored
+- lance brute force: 100k p50 347 ms and 195 MB on disk; the prefilter
+  does not make it faster (355 ms)
+- lance-ivfpq (sqrt(n) partitions, 64 sub-vectors, nprobes 20): 100k
+  p50 7.5 ms, recall@10 1.0, filtered recall 0.90, but the index build
+  took 304 s. Without refine_factor recall@10 drops to 0.41
+- Quantized (100k): lance-f16 scans a float16 column and re-ranks on a
+  float32 copy, halving p50 (351 -> 178 ms) at recall 1.0 for 1.5x the
+  disk (195 -> 293 MB). numpy-int8 needs a quarter of the
+  memory (49 MB) at recall 0.975 but converts the codes on every query
+  (p50 86 ms); numpy-f16 is slowest (201 ms), so keep numpy scans float32
+"""
+
+import argparse
+import csv
+import gc
+import importlib
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is in requirements.txt
+    psutil = None
+
+DIMENSION = 512
+K = 10
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+def clip_like_vectors(n: int, rng: np.random.Generator, centers: np.ndarray,
+                      mean_dir: np.ndarray, chunk: int = 50_000) -> np.ndarray:
+    """n unit vectors: shared mean direction + cluster center + noise."""
+    out = np.empty((n, DIMENSION), dtype=np.float32)
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        labels = rng.integers(0, len(centers), size)
+        noise = rng.standard_normal((size, DIMENSION), dtype=np.float32)
+        block = 0.7 * mean_dir + 0.55 * centers[labels] + 0.45 * noise / np.sqrt(DIMENSION)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + size] = block
+    return out
+
+
+def make_dataset(n: int, queries: int, selectivity: float, seed: int):
+    rng = np.random.default_rng(seed)
+    mean_dir = rng.standard_normal(DIMENSION, dtype=np.float32)
+    mean_dir /= np.linalg.norm(mean_dir)
+    centers = rng.standard_normal((max(16, n // 100), DIMENSION), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = clip_like_vectors(n, rng, centers, mean_dir)
+    query_vectors = clip_like_vectors(queries, rng, centers, mean_dir)
+    favorite = rng.random(n) < selectivity
+    return vectors, query_vectors, favorite
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int = K,
+                rows: Optional[np.ndarray] = None, batch: int = 32) -> np.ndarray:
+    """Row indices of the exact top-k (inner product) for every query."""
+    base = vectors if rows is None else vectors[rows]
+    k = min(k, len(base))
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), batch):
+        scores = queries[start:start + batch] @ base.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start:start + batch] = np.take_along_axis(top, order, axis=1)
+    return result if rows is None else rows[result]
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class Backend:
+    """One store behind the interface the harness measures."""
+
+    name = ""
+    module = "numpy"  # imported before RSS is sampled
+    persistent = False
+
+    def __init__(self, workdir: Path, tuning: Optional[dict] = None):
+        self.workdir = workdir
+        self.tuning = tuning or {}
+
+    def build(self, vectors: np.ndarray, favorite: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        raise NotImplementedError
+
+    def search_favorites(self, query: np.ndarray, k: int) -> List[int]:
+        raise NotImplementedError
+
+    def disk_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.workdir.rglob("*") if f.is_file())
+
+    def vector_bytes(self) -> Optional[int]:
+        """Exact size of in-memory vectors, where the store exposes them."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class NumpyBackend(Backend):
+    """server/vector_store.py; the filter scores only the favorite rows."""
+
+    name = "numpy"
+
+    def build(self, vectors, favorite):
+        from server.vector_store import VectorStore
+
+        self.store = VectorStore()
+        self.store.add_batch([str(i) for i in range(len(vectors))], vectors)
+        self.favorite_rows = np.flatnonzero(favorite)
+
+    def search(self, query, k):
+        return [int(r["id"]) for r in self.store.search(query, limit=k)]
+
+    def vector_bytes(self):
+        return self.store.embeddings.nbytes
+
+    def search_favorites(self, query, k):
+        scores = self.store.embeddings[self.favorite_rows] @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return self.favorite_rows[top[np.argsort(-scores[top])]].tolist()
+
+
+class QuantizedNumpyBackend(Backend):
+    """float16 / int8 matrix from server/quantization.py, scored in float32."""
+
+    dtype = ""
+
+    def build(self, vectors, favorite):
+        from server.quantization import quantize
+
+        self.codes, self.scales = quantize(vectors, self.dtype)
+        self.favorite_rows = np.flatnonzero(favorite)
+
+    def _top(self, rows, query, k):
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = codes.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (top if rows is None else rows[top]).tolist()
+
+    def search(self, query, k):
+        return self._top(None, query, k)
+
+    def vector_bytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def search_favorites(self, query, k):
+        return self._top(self.favorite_rows, query, k)
+
+
+class NumpyFloat16Backend(QuantizedNumpyBackend):
+    name = "numpy-f16"
+    dtype = "float16"
+
+
+class NumpyInt8Backend(QuantizedNumpyBackend):
+    name = "numpy-int8"
+    dtype = "int8"
+
+
+class FaissBackend(Backend):
+    """IndexFlatIP (exact) or IndexHNSWFlat; filters through an IDSelector."""
+
+    module = "faiss"
+    hnsw = False
+
+    def build(self, vectors, favorite):
+        import faiss
+
+        self.faiss = faiss
+        if self.hnsw:
+            self.index = faiss.IndexHNSWFlat(DIMENSION, 32, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = 80
+            self.index.hnsw.efSearch = self.tuning.get("ef_search", 64)
+        else:
+            self.index = faiss.IndexFlatIP(DIMENSION)
+        self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        self.favorite_ids = np.flatnonzero(favorite).astype(np.int64)
+        selector = faiss.IDSelectorBatch(self.favorite_ids)
+        if self.hnsw:
+            self.params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+        else:
+            self.params = faiss.SearchParameters(sel=selector)
+
+    def search(self, query, k):
+        _, rows = self.index.search(query.reshape(1, -1), k)
+        return [int(r) for r in rows[0] if r >= 0]
+
+    def search_favorites(self, query, k):
+        _, rows = self.index.search(query.reshape(1, -1), k, params=self.params)
+        return [int(r) for r in rows[0] if r >= 0]
+
+
+class FaissFlatBackend(FaissBackend):
+    name = "faiss-flat"
+
+
+class FaissHnswBackend(FaissBackend):
+    name = "faiss-hnsw"
+    hnsw = True
+
+
+class ChromaBackend(Backend):
+    """PersistentClient with an HNSW cosine collection; filter via where=."""
+
+    name = "chroma"
+    module = "chromadb"
+    persistent = True
+
+    def build(self, vectors, favorite):
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=str(self.workdir))
+        self.collection = self.client.create_collection(name="bench", metadata={"hnsw:space": "cosine"})
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(vectors), batch):
+            rows = range(start, min(start + batch, len(vectors)))
+            self.collection.add(
+                ids=[str(i) for i in rows],
+                embeddings=vectors[rows.start:rows.stop],
+                metadatas=[{"favorite": bool(favorite[i])} for i in rows],
+            )
+
+    def _query(self, query, k, where=None):
+        result = self.collection.query(query_embeddings=[query.tolist()], n_results=k,
+                                       where=where, include=[])
+        return [int(i) for i in result["ids"][0]]
+
+    def search(self, query, k):
+        return self._query(query, k)
+
+    def search_favorites(self, query, k):
+        return self._query(query, k, {"favorite": True})
+
+    def close(self):
+        self.client = self.collection = None
+
+
+class LanceBackend(Backend):
+    """Lance table like server/lancedb_store.py; brute force or IVF_PQ, float32 or float16."""
+
+    name = "lance"
+    module = "lancedb"
+    persistent = True
+    index_type: Optional[str] = None
+    half = False  # float16 column plus a float32 copy for re-ranking, like LanceDBStore
+
+    def build(self, vectors, favorite):
+        import lancedb
+        import pyarrow as pa
+
+        self.db = lancedb.connect(str(self.workdir))
+        flat = pa.array(np.ascontiguousarray(vectors, dtype=np.float16 if self.half else np.float32).reshape(-1))
+        columns = {
+            "id": pa.array(np.arange(len(vectors), dtype=np.int64)),
+            "vector": pa.FixedSizeListArray.from_arrays(flat, DIMENSION),
+            "favorite": pa.array(favorite),
+        }
+        if self.half:
+            full = pa.array(np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1))
+            columns["vector_full"] = pa.FixedSizeListArray.from_arrays(full, DIMENSION)
+        data = pa.table(columns)
+        self.table = self.db.create_table("bench", data)
+        if self.index_type:
+            partitions = max(1, int(np.sqrt(len(vectors))))
+            self.table.create_index(metric="cosine", index_type=self.index_type,
+                                    num_partitions=partitions, num_sub_vectors=DIMENSION // 8)
+
+    def _query(self, query, k, where=None):
+        fetch = k * self.tuning.get("rerank_factor", 4) if self.half else k
+        columns = ["id", "vector_full", "_distance"] if self.half else ["id", "_distance"]
+        builder = (self.table.search(query, vector_column_name="vector").metric("cosine")
+                   .limit(fetch).select(columns))
+        if self.index_type:
+            builder = builder.nprobes(self.tuning.get("nprobes", 20))
+            if self.tuning.get("refine_factor"):
+                builder = builder.refine_factor(self.tuning["refine_factor"])
+        if where:
+            builder = builder.where(where, prefilter=True)
+        result = builder.to_arrow()
+        ids = result["id"].to_pylist()
+        if self.half and ids:
+            from server.quantization import rerank
+
+            vectors = result["vector_full"].combine_chunks().flatten().to_numpy().reshape(len(ids), -1)
+            order, _ = rerank(query, vectors, k)
+            ids = [ids[i] for i in order]
+        return ids
+
+    def search(self, query, k):
+        return self._query(query, k)
+
+    def search_favorites(self, query, k):
+        return self._query(query, k, "favorite = true")
+
+
+class LanceFloat16Backend(LanceBackend):
+    name = "lance-f16"
+    half = True
+
+
+class LanceIvfPqBackend(LanceBackend):
+    name = "lance-ivfpq"
+    index_type = "IVF_PQ"
+
+
+BACKENDS: Dict[str, type] = {
+    cls.name: cls for cls in (NumpyBackend, NumpyFloat16Backend, NumpyInt8Backend, FaissFlatBackend,
+                              FaissHnswBackend, ChromaBackend, LanceBackend, LanceFloat16Backend,
+                              LanceIvfPqBackend)
+}
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+def rss_mb() -> float:
+    if psutil is None:
+        return float("nan")
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def recall(found: List[List[int]], truth: np.ndarray) -> float:
+    hits = [len(set(f) & set(t.tolist())) / len(t) for f, t in zip(found, truth) if len(t)]
+    return float(np.mean(hits)) if hits else float("nan")
+
+
+def time_queries(fn, queries: np.ndarray, warmup: int = 5):
+    for query in queries[:warmup]:
+        fn(query, K)
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(fn(query, K))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return found, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+DATA_FILES = ("vectors", "queries", "favorite", "truth", "truth_favorites")
+
+
+def write_dataset(directory: Path, size: int, queries: int, selectivity: float, seed: int) -> int:
+    """Vectors, queries and exact answers as .npy files shared by the workers."""
+    vectors, query_vectors, favorite = make_dataset(size, queries, selectivity, seed)
+    arrays = {
+        "vectors": vectors,
+        "queries": query_vectors,
+        "favorite": favorite,
+        "truth": exact_top_k(vectors, query_vectors),
+        "truth_favorites": exact_top_k(vectors, query_vectors, rows=np.flatnonzero(favorite)),
+    }
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", array)
+    return int(favorite.sum())
+
+
+def run_worker(name: str, data: Path, tuning: dict) -> dict:
+    """Build and query one backend; runs in its own process so RSS is not shared."""
+    cls = BACKENDS[name]
+    arrays = {key: np.load(data / f"{key}.npy") for key in DATA_FILES}
+    row = {"backend": name, "size": len(arrays["vectors"])}
+    try:
+        importlib.import_module(cls.module)
+    except ImportError as e:
+        row["skipped"] = f"not installed: {e.name or cls.module}"
+        return row
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench_{name}_"))
+    backend = cls(workdir, tuning)
+    try:
+        gc.collect()
+        before = rss_mb()
+        start = time.perf_counter()
+        backend.build(arrays["vectors"], arrays["favorite"])
+        row["build_s"] = time.perf_counter() - start
+        gc.collect()
+        row["rss_mb"] = rss_mb() - before
+        row["disk_mb"] = backend.disk_bytes() / 2**20 if backend.persistent else 0.0
+        vector_bytes = backend.vector_bytes()
+        row["vectors_mb"] = vector_bytes / 2**20 if vector_bytes is not None else None
+
+        found, row["p50_ms"], row["p99_ms"] = time_queries(backend.search, arrays["queries"])
+        row["recall_at_10"] = recall(found, arrays["truth"])
+        found, row["filtered_p50_ms"], row["filtered_p99_ms"] = time_queries(
+            backend.search_favorites, arrays["queries"])
+        row["filtered_recall_at_10"] = recall(found, arrays["truth_favorites"])
+    finally:
+        backend.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return row
+
+
+def bench_backend(name: str, data: Path, size: int, tuning: dict) -> dict:
+    command = [sys.executable, __file__, "--worker", name, "--data", str(data)]
+    for key, value in tuning.items():
+        command += [f"--{key.replace('_', '-')}", str(value)]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"backend": name, "size": size, "skipped": f"failed: {error}"}
+    return json.loads(lines[-1])
+
+
+COLUMNS = ["backend", "size", "build_s", "rss_mb", "vectors_mb", "disk_mb", "p50_ms", "p99_ms", "recall_at_10",
+           "filtered_p50_ms", "filtered_p99_ms", "filtered_recall_at_10", "skipped"]
+
+
+def print_row(row: dict) -> None:
+    if "skipped" in row:
+        print(f"  {row['backend']:<12} {row['size']:>8}  skipped ({row['skipped']})")
+        return
+    vectors = "      -" if row["vectors_mb"] is None else f"{row['vectors_mb']:7.1f}"
+    print(f"  {row['backend']:<12} {row['size']:>8}  build {row['build_s']:7.2f} s | "
+          f"rss {row['rss_mb']:7.1f} MB | vectors {vectors} MB | disk {row['disk_mb']:7.1f} MB | "
+          f"p50 {row['p50_ms']:7.2f} ms | p99 {row['p99_ms']:7.2f} ms | recall {row['recall_at_10']:.3f} | "
+          f"filtered p50 {row['filtered_p50_ms']:7.2f} ms | p99 {row['filtered_p99_ms']:7.2f} ms | "
+          f"recall {row['filtered_recall_at_10']:.3f}", flush=True)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated store sizes")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated backends")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per run")
+    parser.add_argument("--selectivity", type=float, default=0.1, help="Share of photos marked favorite")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ef-search", type=int, default=64, help="faiss-hnsw efSearch")
+    parser.add_argument("--nprobes", type=int, default=20, help="lance-ivfpq partitions probed")
+    parser.add_argument("--refine-factor", type=int, default=0,
+                        help="lance-ivfpq: re-rank refine_factor*k candidates on full vectors (0 = off)")
+    parser.add_argument("--rerank-factor", type=int, default=4,
+                        help="lance-f16: candidates fetched per hit and re-ranked on float32 copies")
+    parser.add_argument("--json", type=Path, help="Write results as JSON")
+    parser.add_argument("--csv", type=Path, help="Write results as CSV")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--data", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    tuning = {"ef_search": args.ef_search, "nprobes": args.nprobes, "refine_factor": args.refine_factor,
+              "rerank_factor": args.rerank_factor}
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.data, tuning)))
+        return
+
+    names = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in names if b not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(unknown)} (choose from {', '.join(BACKENDS)})")
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory(prefix="bench_vectors_") as tmp:
+            favorites = write_dataset(Path(tmp), size, args.queries, args.selectivity, args.seed)
+            print(f"{size} vectors ({favorites} favorites), {args.queries} queries", flush=True)
+            for name in names:
+                row = bench_backend(name, Path(tmp), size, tuning)
+                print_row(row)
+                rows.append(row)
+
+    config = {"dimension": DIMENSION, "k": K, "queries": args.queries, "selectivity": args.selectivity,
+              "seed": args.seed, "cpus": psutil.cpu_count() if psutil else None, **tuning}
+    if args.json:
+        args.json.write_text(json.dumps({"config": config, "results": rows}, indent=2))
+    if args.csv:
+        with args.csv.open("w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Embedding Storage Migration
+
+Rewrites stored embeddings in another storage type (server/quantization.py):
+- LanceDB photo, video-frame and face tables: float32 <-> float16 (float16
+  tables keep a float32 copy for re-ranking, which converting back restores)
+- Face embeddings in face_clusters.db: float32, float16 or int8
+  (legacy JSON rows are converted too)
+
+Set VECTOR_DTYPE / FACE_EMBEDDING_DTYPE to the same types afterwards so
+new tables and faces are written that way. Stop the server first.
+
+Usage:
+    python scripts/migrate_embeddings.py --vectors float16
+    python scripts/migrate_embeddings.py --faces int8 [--faces-db PATH]
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server.config import settings  # noqa: E402
+from server.face_clustering_db import FaceClusteringDB  # noqa: E402
+from server.lancedb_store import LanceDBStore  # noqa: E402
+from server.quantization import DTYPES, FLOAT16, FLOAT32  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2**20
+
+
+def migrate_vectors(dtype: str, tables) -> None:
+    before = dir_size_mb(settings.VECTOR_STORE_PATH)
+    for name in tables:
+        store = LanceDBStore(table_name=name, dtype=dtype)
+        if store.table is None:
+            logger.info(f"{name}: no table, skipped")
+            continue
+        logger.info(f"{name}: {store.vector_dtype} -> {dtype}")
+        logger.info(f"{name}: rewrote {store.convert_vectors(dtype)} rows")
+    logger.info(f"Vector store: {before:.1f} MB -> {dir_size_mb(settings.VECTOR_STORE_PATH):.1f} MB")
+
+
+def migrate_faces(dtype: str, db_path: Path) -> None:
+    if not db_path.exists():
+        logger.info(f"{db_path} not found, skipped")
+        return
+    before = db_path.stat().st_size / 2**20
+    db = FaceClusteringDB(db_path, embedding_dtype=dtype)
+    logger.info(f"Faces: rewrote {db.convert_embeddings(dtype)} embeddings as {dtype}")
+    logger.info(f"{db_path.name}: {before:.1f} MB before; run VACUUM to return freed pages to the OS")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", choices=[FLOAT32, FLOAT16], help="Type for LanceDB vector columns")
+    parser.add_argument("--tables", default="photos,video_frames,faces", help="LanceDB tables to rewrite")
+    parser.add_argument("--faces", choices=DTYPES, help="Type for face embeddings in face_clusters.db")
+    parser.add_argument("--faces-db", type=Path, default=settings.BASE_DIR / "face_clusters.db")
+    args = parser.parse_args()
+    if not args.vectors and not args.faces:
+        parser.error("nothing to do: pass --vectors and/or --faces")
+
+    if args.vectors:
+        migrate_vectors(args.vectors, [t.strip() for t in args.tables.split(",") if t.strip()])
+    if args.faces:
+        migrate_faces(args.faces, args.faces_db)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ import json
 import uuid
 from dataclasses import dataclass
 
+from server.db_pool import connect
+
 
 @dataclass
 class PhotoInsight:
@@ -40,7 +42,7 @@ class AIInsightsDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS photo_insights (
                     id TEXT PRIMARY KEY,
@@ -77,7 +79,7 @@ class AIInsightsDB:
         insight_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO photo_insights 
@@ -101,7 +103,7 @@ class AIInsightsDB:
             List of insights for the photo
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -136,7 +138,7 @@ class AIInsightsDB:
             List of insights of the specified type
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -172,7 +174,7 @@ class AIInsightsDB:
             List of insights
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -207,7 +209,7 @@ class AIInsightsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     """
                     UPDATE photo_insights 
@@ -231,7 +233,7 @@ class AIInsightsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "DELETE FROM photo_insights WHERE id = ?",
                     (insight_id,)
@@ -248,7 +250,7 @@ class AIInsightsDB:
             Dictionary with insight statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 result = conn.execute("SELECT COUNT(*) as total FROM photo_insights").fetchone()
                 total_insights = result['total'] if result else 0
 
@@ -287,7 +289,7 @@ class AIInsightsDB:
             if not photo_paths:
                 return {}
                 
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # In a real implementation, we would analyze patterns based on:
                 # - time of day when photos are taken
                 # - frequency of photo taking
@@ -5,13 +5,22 @@ SQLite database for albums and smart albums functionality.
 Separate from vector store for clean separation of concerns.
 """
 
+import base64
 import sqlite3
 import json
+import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import Callable, List, Dict, Optional, Any, Iterable, Iterator, Tuple
 from dataclasses import dataclass, asdict
 
+from server.db_pool import apply_profile
+from src.cache_manager import library_version
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class Album:
@@ -38,12 +47,40 @@ class AlbumsDB:
     def __init__(self, db_path: str = "albums.db"):
         self.db_path = db_path
         self.conn = None
+        # Every caller shares self.conn (API handlers, the I/O pool, metadata
+        # writer threads), so writes and the temp staging table they use are
+        # serialized by this lock
+        self._lock = threading.RLock()
+        self._change_listeners: List[Callable[[str, str, List[str]], None]] = []
         self._initialize_db()
 
+    def add_change_listener(self, listener: Callable[[str, str, List[str]], None]):
+        """
+        Register a callback for album membership changes.
+
+        The listener receives ("add", album_id, photo_paths) and ("remove",
+        album_id, photo_paths) after membership changes, and ("delete",
+        album_id, []) after an album is deleted.
+        """
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, event: str, album_id: str, photo_paths: List[str]):
+        """Bump the library version and invoke change listeners; a failing listener never fails the write."""
+        if event != "delete" and not photo_paths:
+            return
+        # Cached /search rankings can filter on album membership
+        library_version.bump()
+        for listener in self._change_listeners:
+            try:
+                listener(event, album_id, photo_paths)
+            except Exception as e:
+                logger.error(f"Album change listener failed for {album_id}: {e}")
+
     def _initialize_db(self):
         """Create database and tables if they don't exist."""
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
+        apply_profile(self.conn)
 
         cursor = self.conn.cursor()
 
@@ -57,7 +94,8 @@ class AlbumsDB:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 is_smart BOOLEAN DEFAULT FALSE,
-                smart_rules TEXT  -- JSON string
+                smart_rules TEXT,  -- JSON string
+                photo_count INTEGER NOT NULL DEFAULT 0  -- maintained by triggers
             )
         """)
 
@@ -74,9 +112,10 @@ class AlbumsDB:
         """)
 
         # Indexes for performance
+        # Covers the album ordering so first-photo covers and cursor pages are index seeks
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_album_photos_album_id
-            ON album_photos(album_id)
+            CREATE INDEX IF NOT EXISTS idx_album_photos_order
+            ON album_photos(album_id, sort_order, added_at DESC, photo_path)
         """)
 
         cursor.execute("""
@@ -89,92 +128,141 @@ class AlbumsDB:
             ON albums(is_smart)
         """)
 
-        self.conn.commit()
-
-    def create_album(self, album_id: str, name: str, description: Optional[str] = None,
-                     is_smart: bool = False, smart_rules: Optional[Dict] = None) -> Album:
-        """Create a new album."""
-        cursor = self.conn.cursor()
-
-        smart_rules_json = json.dumps(smart_rules) if smart_rules else None
+        self._migrate_photo_counts(cursor)
 
+        # Denormalized member counts
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS album_photos_count_insert
+            AFTER INSERT ON album_photos BEGIN
+                UPDATE albums SET photo_count = photo_count + 1 WHERE id = new.album_id;
+            END
+        """)
         cursor.execute("""
-            INSERT INTO albums (id, name, description, is_smart, smart_rules)
-            VALUES (?, ?, ?, ?, ?)
-        """, (album_id, name, description, is_smart, smart_rules_json))
+            CREATE TRIGGER IF NOT EXISTS album_photos_count_delete
+            AFTER DELETE ON album_photos BEGIN
+                UPDATE albums SET photo_count = photo_count - 1 WHERE id = old.album_id;
+            END
+        """)
 
         self.conn.commit()
-        return self.get_album(album_id)
-
-    def get_album(self, album_id: str) -> Optional[Album]:
-        """Get album by ID."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM albums WHERE id = ?", (album_id,))
-        row = cursor.fetchone()
 
-        if not row:
-            return None
-
-        # Get photo count
+    def _migrate_photo_counts(self, cursor: sqlite3.Cursor):
+        """Add and backfill albums.photo_count on databases created before it existed."""
+        columns = {row['name'] for row in cursor.execute("PRAGMA table_info(albums)")}
+        if 'photo_count' in columns:
+            return
+        cursor.execute("ALTER TABLE albums ADD COLUMN photo_count INTEGER NOT NULL DEFAULT 0")
+        # Foreign keys were never enforced, so deleted albums may have left members behind
+        cursor.execute("DELETE FROM album_photos WHERE album_id NOT IN (SELECT id FROM albums)")
+        cursor.execute("DROP INDEX IF EXISTS idx_album_photos_album_id")
         cursor.execute("""
-            SELECT COUNT(*) as count FROM album_photos WHERE album_id = ?
-        """, (album_id,))
-        photo_count = cursor.fetchone()['count']
+            UPDATE albums SET photo_count = (
+                SELECT COUNT(*) FROM album_photos WHERE album_id = albums.id
+            )
+        """)
+        logger.info("Backfilled album photo counts")
 
+    @staticmethod
+    def _row_to_album(row: sqlite3.Row) -> Album:
         return Album(
             id=row['id'],
             name=row['name'],
             description=row['description'],
-            cover_photo_path=row['cover_photo_path'],
+            cover_photo_path=row['cover'],
             created_at=row['created_at'],
             updated_at=row['updated_at'],
             is_smart=bool(row['is_smart']),
             smart_rules=json.loads(row['smart_rules']) if row['smart_rules'] else None,
-            photo_count=photo_count
+            photo_count=row['photo_count']
         )
 
-    def list_albums(self, include_smart: bool = True) -> List[Album]:
-        """List all albums."""
-        cursor = self.conn.cursor()
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Cursor for one write; holds the lock until it commits or rolls back."""
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                yield cursor
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+
+    def _stage_paths(self, cursor: sqlite3.Cursor, photo_paths: Iterable[str]):
+        """
+        Load photo_paths into the per-connection temp table used for set diffs.
+
+        Only call inside _transaction(): the table is shared by every user of
+        the connection.
+        """
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS staged_album_paths (photo_path TEXT PRIMARY KEY)
+        """)
+        cursor.execute("DELETE FROM temp.staged_album_paths")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO temp.staged_album_paths (photo_path) VALUES (?)",
+            ((path,) for path in photo_paths)
+        )
 
-        if include_smart:
-            cursor.execute("SELECT * FROM albums ORDER BY created_at DESC")
-        else:
-            cursor.execute("""
-                SELECT * FROM albums WHERE is_smart = FALSE
-                ORDER BY created_at DESC
-            """)
+    def _staged_diff(self, cursor: sqlite3.Cursor, album_id: str, *,
+                     members: bool) -> List[str]:
+        """Staged paths that are (members=True) or are not (members=False) in the album."""
+        cursor.execute(f"""
+            SELECT s.photo_path FROM temp.staged_album_paths s
+            WHERE {'' if members else 'NOT '}EXISTS (
+                SELECT 1 FROM album_photos ap
+                WHERE ap.album_id = ? AND ap.photo_path = s.photo_path
+            )
+        """, (album_id,))
+        return [row['photo_path'] for row in cursor.fetchall()]
 
-        albums = []
-        for row in cursor.fetchall():
-            album_id = row['id']
+    def create_album(self, album_id: str, name: str, description: Optional[str] = None,
+                     is_smart: bool = False, smart_rules: Optional[Dict] = None) -> Album:
+        """Create a new album."""
+        smart_rules_json = json.dumps(smart_rules) if smart_rules else None
 
-            # Get photo count
+        with self._transaction() as cursor:
             cursor.execute("""
-                SELECT COUNT(*) as count FROM album_photos WHERE album_id = ?
-            """, (album_id,))
-            photo_count = cursor.fetchone()['count']
-
-            albums.append(Album(
-                id=row['id'],
-                name=row['name'],
-                description=row['description'],
-                cover_photo_path=row['cover_photo_path'],
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                is_smart=bool(row['is_smart']),
-                smart_rules=json.loads(row['smart_rules']) if row['smart_rules'] else None,
-                photo_count=photo_count
-            ))
-
-        return albums
+                INSERT INTO albums (id, name, description, is_smart, smart_rules)
+                VALUES (?, ?, ?, ?, ?)
+            """, (album_id, name, description, is_smart, smart_rules_json))
+
+        return self.get_album(album_id)
+
+    # Explicit cover if set, otherwise the first photo in album order
+    _ALBUM_COLUMNS = """
+        a.id, a.name, a.description, a.created_at, a.updated_at, a.is_smart,
+        a.smart_rules, a.photo_count,
+        COALESCE(a.cover_photo_path, (
+            SELECT ap.photo_path FROM album_photos ap
+            WHERE ap.album_id = a.id
+            ORDER BY ap.sort_order, ap.added_at DESC, ap.photo_path
+            LIMIT 1
+        )) AS cover
+    """
+
+    def get_album(self, album_id: str) -> Optional[Album]:
+        """Get album by ID."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT {self._ALBUM_COLUMNS} FROM albums a WHERE a.id = ?", (album_id,))
+        row = cursor.fetchone()
+        return self._row_to_album(row) if row else None
+
+    def list_albums(self, include_smart: bool = True) -> List[Album]:
+        """List all albums with member counts and covers in a single query."""
+        cursor = self.conn.cursor()
+        where = "" if include_smart else "WHERE a.is_smart = FALSE"
+        cursor.execute(f"""
+            SELECT {self._ALBUM_COLUMNS} FROM albums a
+            {where}
+            ORDER BY a.created_at DESC
+        """)
+        return [self._row_to_album(row) for row in cursor.fetchall()]
 
     def update_album(self, album_id: str, name: Optional[str] = None,
                      description: Optional[str] = None,
                      cover_photo_path: Optional[str] = None) -> Optional[Album]:
         """Update album details."""
-        cursor = self.conn.cursor()
-
         updates = []
         params = []
 
@@ -197,61 +285,178 @@ class AlbumsDB:
         params.append(album_id)
 
         query = f"UPDATE albums SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        self.conn.commit()
+        with self._transaction() as cursor:
+            cursor.execute(query, params)
 
         return self.get_album(album_id)
 
     def delete_album(self, album_id: str) -> bool:
         """Delete album and all photo associations."""
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM albums WHERE id = ?", (album_id,))
-        self.conn.commit()
-        return cursor.rowcount > 0
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM albums WHERE id = ?", (album_id,))
+            deleted = cursor.rowcount > 0
+            # Foreign keys are not enforced on this connection, so cascade by hand
+            cursor.execute("DELETE FROM album_photos WHERE album_id = ?", (album_id,))
+        if deleted:
+            self._notify_change("delete", album_id, [])
+        return deleted
 
     def add_photos_to_album(self, album_id: str, photo_paths: List[str]) -> int:
         """Add photos to album. Returns count of added photos."""
-        cursor = self.conn.cursor()
-        added = 0
+        with self._transaction() as cursor:
+            self._stage_paths(cursor, photo_paths)
+            added_paths = self._staged_diff(cursor, album_id, members=False)
 
-        for photo_path in photo_paths:
-            try:
-                cursor.execute("""
-                    INSERT INTO album_photos (album_id, photo_path)
-                    VALUES (?, ?)
-                """, (album_id, photo_path))
-                added += 1
-            except sqlite3.IntegrityError:
-                # Photo already in album
-                pass
-
-        # Update album timestamp
-        cursor.execute("""
-            UPDATE albums SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
-        """, (album_id,))
+            cursor.execute("""
+                INSERT OR IGNORE INTO album_photos (album_id, photo_path)
+                SELECT ?, photo_path FROM temp.staged_album_paths
+            """, (album_id,))
 
-        self.conn.commit()
-        return added
+            # Update album timestamp
+            cursor.execute("""
+                UPDATE albums SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            """, (album_id,))
+        self._notify_change("add", album_id, added_paths)
+        return len(added_paths)
 
     def remove_photos_from_album(self, album_id: str, photo_paths: List[str]) -> int:
         """Remove photos from album. Returns count of removed photos."""
-        cursor = self.conn.cursor()
+        with self._transaction() as cursor:
+            self._stage_paths(cursor, photo_paths)
+            removed_paths = self._staged_diff(cursor, album_id, members=True)
 
-        placeholders = ','.join('?' * len(photo_paths))
-        cursor.execute(f"""
-            DELETE FROM album_photos
-            WHERE album_id = ? AND photo_path IN ({placeholders})
-        """, [album_id] + photo_paths)
+            cursor.execute("""
+                DELETE FROM album_photos
+                WHERE album_id = ? AND photo_path IN (SELECT photo_path FROM temp.staged_album_paths)
+            """, (album_id,))
 
-        removed = cursor.rowcount
+            # Update album timestamp
+            cursor.execute("""
+                UPDATE albums SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            """, (album_id,))
+        self._notify_change("remove", album_id, removed_paths)
+        return len(removed_paths)
+
+    def sync_album_photos(self, album_id: str, photo_paths: Iterable[str]) -> Tuple[int, int]:
+        """
+        Make album membership equal to photo_paths, touching only the diff.
+
+        The target set is staged in a temp table and diffed in SQL, so neither
+        the current membership nor unchanged rows are loaded or rewritten.
+
+        Returns:
+            (added, removed) counts
+        """
+        with self._transaction() as cursor:
+            self._stage_paths(cursor, photo_paths)
+            to_add = self._staged_diff(cursor, album_id, members=False)
+            cursor.execute("""
+                SELECT photo_path FROM album_photos
+                WHERE album_id = ? AND photo_path NOT IN (SELECT photo_path FROM temp.staged_album_paths)
+            """, (album_id,))
+            to_remove = [row['photo_path'] for row in cursor.fetchall()]
+            if not to_add and not to_remove:
+                return 0, 0
 
-        # Update album timestamp
-        cursor.execute("""
-            UPDATE albums SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
-        """, (album_id,))
+            cursor.execute("""
+                INSERT OR IGNORE INTO album_photos (album_id, photo_path)
+                SELECT ?, photo_path FROM temp.staged_album_paths
+            """, (album_id,))
+            cursor.execute("""
+                DELETE FROM album_photos
+                WHERE album_id = ? AND photo_path NOT IN (SELECT photo_path FROM temp.staged_album_paths)
+            """, (album_id,))
+            cursor.execute("""
+                UPDATE albums SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            """, (album_id,))
+        self._notify_change("add", album_id, to_add)
+        self._notify_change("remove", album_id, to_remove)
+        return len(to_add), len(to_remove)
+
+    def purge_photos(self, photo_paths: Iterable[str], smart_only: bool = False) -> int:
+        """
+        Remove photos from every album (or only from smart albums), in one transaction.
+
+        Explicit covers pointing at purged photos are cleared as well.
+
+        Returns:
+            Number of memberships removed
+        """
+        smart = "AND album_id IN (SELECT id FROM albums WHERE is_smart = TRUE)" if smart_only else ""
+        removed: Dict[str, List[str]] = {}
+        with self._transaction() as cursor:
+            self._stage_paths(cursor, photo_paths)
+            cursor.execute(f"""
+                SELECT album_id, photo_path FROM album_photos
+                WHERE photo_path IN (SELECT photo_path FROM temp.staged_album_paths) {smart}
+            """)
+            for row in cursor.fetchall():
+                removed.setdefault(row['album_id'], []).append(row['photo_path'])
 
-        self.conn.commit()
-        return removed
+            cursor.execute(f"""
+                DELETE FROM album_photos
+                WHERE photo_path IN (SELECT photo_path FROM temp.staged_album_paths) {smart}
+            """)
+            if not smart_only:
+                cursor.execute("""
+                    UPDATE albums SET cover_photo_path = NULL
+                    WHERE cover_photo_path IN (SELECT photo_path FROM temp.staged_album_paths)
+                """)
+        for album_id, paths in removed.items():
+            self._notify_change("remove", album_id, paths)
+        return sum(len(paths) for paths in removed.values())
+
+    def sync_photo_albums(self, photo_path: str, album_ids: Iterable[str],
+                          candidate_album_ids: List[str]) -> Tuple[int, int]:
+        """
+        Set which of candidate_album_ids contain photo_path, touching only the diff.
+
+        Returns:
+            (added, removed) counts
+        """
+        if not candidate_album_ids:
+            return 0, 0
+
+        placeholders = ','.join('?' * len(candidate_album_ids))
+        target = set(album_ids)
+        with self._transaction() as cursor:
+            cursor.execute(f"""
+                SELECT album_id FROM album_photos
+                WHERE photo_path = ? AND album_id IN ({placeholders})
+            """, [photo_path] + list(candidate_album_ids))
+            existing = {row['album_id'] for row in cursor.fetchall()}
+
+            to_add = target - existing
+            to_remove = existing - target
+            if not to_add and not to_remove:
+                return 0, 0
+
+            cursor.executemany(
+                "INSERT OR IGNORE INTO album_photos (album_id, photo_path) VALUES (?, ?)",
+                [(album_id, photo_path) for album_id in to_add]
+            )
+            cursor.executemany(
+                "DELETE FROM album_photos WHERE album_id = ? AND photo_path = ?",
+                [(album_id, photo_path) for album_id in to_remove]
+            )
+            cursor.executemany(
+                "UPDATE albums SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                [(album_id,) for album_id in to_add | to_remove]
+            )
+        for album_id in to_add:
+            self._notify_change("add", album_id, [photo_path])
+        for album_id in to_remove:
+            self._notify_change("remove", album_id, [photo_path])
+        return len(to_add), len(to_remove)
+
+    def get_smart_album_rules(self) -> Dict[str, str]:
+        """Return {album_id: smart_rules JSON} for all smart albums."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id, smart_rules FROM albums
+            WHERE is_smart = TRUE AND smart_rules IS NOT NULL
+        """)
+        return {row['id']: row['smart_rules'] for row in cursor.fetchall()}
 
     def get_album_photos(self, album_id: str, limit: int = 1000,
                         offset: int = 0) -> List[str]:
@@ -260,37 +465,73 @@ class AlbumsDB:
         cursor.execute("""
             SELECT photo_path FROM album_photos
             WHERE album_id = ?
-            ORDER BY sort_order, added_at DESC
+            ORDER BY sort_order, added_at DESC, photo_path
             LIMIT ? OFFSET ?
         """, (album_id, limit, offset))
 
         return [row['photo_path'] for row in cursor.fetchall()]
 
+    def get_album_photos_page(self, album_id: str, limit: int = 100,
+                              cursor: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        Get one page of album photos in album order using keyset pagination.
+
+        Args:
+            album_id: Album to read
+            limit: Page size
+            cursor: Opaque cursor returned by the previous page, None for the first
+
+        Returns:
+            (photo_paths, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        where, params = "album_id = ?", [album_id]
+        if cursor:
+            sort_order, added_at, photo_path = _decode_cursor(cursor)
+            where += """ AND (
+                sort_order > ?
+                OR (sort_order = ? AND added_at < ?)
+                OR (sort_order = ? AND added_at = ? AND photo_path > ?)
+            )"""
+            params += [sort_order, sort_order, added_at, sort_order, added_at, photo_path]
+
+        db_cursor = self.conn.cursor()
+        db_cursor.execute(f"""
+            SELECT photo_path, sort_order, added_at FROM album_photos
+            WHERE {where}
+            ORDER BY sort_order, added_at DESC, photo_path
+            LIMIT ?
+        """, params + [limit + 1])
+        rows = db_cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor(last['sort_order'], last['added_at'], last['photo_path'])
+        return [row['photo_path'] for row in rows], next_cursor
+
+    def memberships(self) -> List[Tuple[str, str]]:
+        """(album_id, photo_path) for every album member."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT ap.album_id, ap.photo_path FROM album_photos ap
+            JOIN albums a ON a.id = ap.album_id
+        """)
+        return [(row['album_id'], row['photo_path']) for row in cursor.fetchall()]
+
     def get_photo_albums(self, photo_path: str) -> List[Album]:
         """Get all albums containing a specific photo."""
         cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT a.* FROM albums a
-            JOIN album_photos ap ON a.id = ap.album_id
-            WHERE ap.photo_path = ?
+        cursor.execute(f"""
+            SELECT {self._ALBUM_COLUMNS} FROM albums a
+            JOIN album_photos member ON a.id = member.album_id
+            WHERE member.photo_path = ?
             ORDER BY a.name
         """, (photo_path,))
-
-        albums = []
-        for row in cursor.fetchall():
-            albums.append(Album(
-                id=row['id'],
-                name=row['name'],
-                description=row['description'],
-                cover_photo_path=row['cover_photo_path'],
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                is_smart=bool(row['is_smart']),
-                smart_rules=json.loads(row['smart_rules']) if row['smart_rules'] else None,
-                photo_count=0  # Not needed for this query
-            ))
-
-        return albums
+        return [self._row_to_album(row) for row in cursor.fetchall()]
 
     def close(self):
         """Close database connection."""
@@ -298,6 +539,19 @@ class AlbumsDB:
             self.conn.close()
 
 
+def _encode_cursor(sort_order: int, added_at: str, photo_path: str) -> str:
+    raw = json.dumps([sort_order, added_at, photo_path]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, str, str]:
+    try:
+        sort_order, added_at, photo_path = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid album cursor: {cursor!r}") from e
+    return sort_order, added_at, photo_path
+
+
 # Singleton instance
 _albums_db: Optional[AlbumsDB] = None
 
@@ -7,11 +7,15 @@ Provides safe bulk operations with undo capability for photo management operatio
 import sqlite3
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Literal
+from dataclasses import dataclass
 from datetime import datetime
 import json
 import uuid
 
+from server.db_pool import connect
 
+
+@dataclass
 class BulkAction:
     """Represents a bulk action that can be undone"""
     id: str
@@ -38,21 +42,17 @@ class BulkActionsDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS bulk_actions (
                     id TEXT PRIMARY KEY,
-                    action_type TEXT NOT NULL, -- delete, favorite, tag_add, tag_remove, etc.
+                    action_type TEXT NOT NULL, -- delete, trash, favorite, tag_add, tag_remove, etc.
                     user_id TEXT NOT NULL,
                     affected_paths TEXT NOT NULL, -- JSON list of affected file paths
                     operation_data TEXT, -- JSON data needed to undo the operation
                     status TEXT DEFAULT 'completed', -- completed, failed, undone
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    undone_at TIMESTAMP NULL,
-                    INDEX idx_user_id (user_id),
-                    INDEX idx_action_type (action_type),
-                    INDEX idx_created_at (created_at),
-                    INDEX idx_status (status)
+                    undone_at TIMESTAMP NULL
                 )
             """)
             conn.execute("""
@@ -62,10 +62,16 @@ class BulkActionsDB:
                     operation_type TEXT NOT NULL, -- 'execute' or 'undo'
                     result TEXT, -- JSON result of the operation
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (bulk_action_id) REFERENCES bulk_actions(id),
-                    INDEX idx_bulk_action_id (bulk_action_id)
+                    FOREIGN KEY (bulk_action_id) REFERENCES bulk_actions(id)
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_actions_user_id ON bulk_actions(user_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_actions_type ON bulk_actions(action_type)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_actions_created_at ON bulk_actions(created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_actions_status ON bulk_actions(status)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_bulk_action_history_action ON bulk_action_history(bulk_action_id)"
+            )
 
     def record_bulk_action(self, 
                           action_type: str, 
@@ -87,7 +93,7 @@ class BulkActionsDB:
         action_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO bulk_actions 
@@ -124,7 +130,7 @@ class BulkActionsDB:
             List of bulk actions
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 query = "SELECT * FROM bulk_actions WHERE user_id = ?"
                 params = [user_id]
@@ -163,16 +169,44 @@ class BulkActionsDB:
             True if the action can be undone, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 result = conn.execute(
                     "SELECT status FROM bulk_actions WHERE id = ?",
                     (action_id,)
                 ).fetchone()
                 
-                return result and result['status'] == 'completed'
+                return bool(result) and result[0] == 'completed'
         except Exception:
             return False
 
+    def get_action(self, action_id: str) -> Optional[BulkAction]:
+        """
+        Get a single bulk action.
+        
+        Args:
+            action_id: ID of the action
+            
+        Returns:
+            The action, or None if it does not exist
+        """
+        try:
+            with connect(self.db_path, row_factory=sqlite3.Row) as conn:
+                row = conn.execute("SELECT * FROM bulk_actions WHERE id = ?", (action_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row:
+            return None
+        return BulkAction(
+            id=row['id'],
+            action_type=row['action_type'],
+            user_id=row['user_id'],
+            affected_paths=json.loads(row['affected_paths']),
+            operation_data=json.loads(row['operation_data'] or '{}'),
+            status=row['status'],
+            created_at=row['created_at'],
+            undone_at=row['undone_at']
+        )
+
     def mark_action_undone(self, action_id: str) -> bool:
         """
         Mark a bulk action as undone.
@@ -184,7 +218,7 @@ class BulkActionsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     """
                     UPDATE bulk_actions 
@@ -208,7 +242,7 @@ class BulkActionsDB:
             Number of undone actions
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 result = conn.execute(
                     "SELECT COUNT(*) FROM bulk_actions WHERE user_id = ? AND status = 'undone'",
                     (user_id,)
@@ -229,7 +263,7 @@ class BulkActionsDB:
             List of recent bulk actions
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
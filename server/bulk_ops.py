@@ -0,0 +1,284 @@
+"""
+Bulk Operations Engine
+
+Delete, trash and favorite many photos at once:
+- Targets are photo ids from the PhotoRegistry (paths are resolved once)
+- File deletes and moves run on a thread pool
+- Every registered store is cleaned up in one transaction per batch,
+  through a temp table of keys instead of a statement per photo
+- Each run records a single BulkActionsDB entry holding what undo needs
+- Progress is reported through the job store
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from server.db_pool import connect
+from src.cache_manager import library_version
+
+logger = logging.getLogger(__name__)
+
+DELETE = "delete"
+TRASH = "trash"
+FAVORITE = "favorite"
+
+# (op, paths, photo_ids) for one batch of removed photos
+PurgeFn = Callable[[str, List[str], List[int]], Any]
+
+
+@dataclass
+class StorePurger:
+    """Removes a batch of photos from one store for the listed operations."""
+    name: str
+    purge: PurgeFn
+    ops: Tuple[str, ...] = (DELETE,)
+    batch_size: Optional[int] = None  # None = the engine's batch size
+
+
+@dataclass
+class BulkResult:
+    action: str
+    processed: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    outcomes: Dict[str, Any] = field(default_factory=dict)  # path -> file_op result
+    action_id: Optional[str] = None
+
+
+def sqlite_purger(name: str, db_path: Path, columns: Sequence[Tuple[str, str]], *,
+                  by_id: bool = False, ops: Tuple[str, ...] = (DELETE,)) -> StorePurger:
+    """
+    Purger deleting rows whose (table, column) holds one of the batch's keys.
+
+    All tables of the file are cleaned in one transaction. Missing database
+    files and tables are skipped, so stores that were never opened cost nothing.
+
+    Args:
+        name: Store name for logs and errors
+        db_path: SQLite file
+        columns: (table, column) pairs keyed by photo path, or by photo id when by_id
+        by_id: Key on registry photo ids instead of paths
+        ops: Operations that remove rows from this store
+    """
+    db_path = Path(db_path)
+
+    def purge(op: str, paths: List[str], photo_ids: List[int]) -> int:
+        keys = photo_ids if by_id else paths
+        if not keys or not db_path.exists():
+            return 0
+        with connect(db_path) as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            wanted = [(table, column) for table, column in columns if table in tables]
+            if not wanted:
+                return 0
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_keys (key PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.bulk_keys")
+            conn.executemany("INSERT OR IGNORE INTO temp.bulk_keys (key) VALUES (?)", ((k,) for k in keys))
+            removed = 0
+            for table, column in wanted:
+                cursor = conn.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT key FROM temp.bulk_keys)")
+                removed += max(cursor.rowcount, 0)
+            conn.execute("DELETE FROM temp.bulk_keys")
+        return removed
+
+    return StorePurger(name, purge, ops)
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BulkOpsEngine:
+    """
+    Applies one bulk change to the files and to every registered store.
+
+    Args:
+        registry: PhotoRegistry resolving photo ids and paths
+        bulk_actions_db: BulkActionsDB receiving one entry per run
+        jobs: Job store for progress (anything with update_job)
+        batch_size: Photos per store transaction
+        file_workers: Threads for file deletes and moves
+    """
+
+    def __init__(self, registry, bulk_actions_db, *, jobs=None,
+                 batch_size: int = 1000, file_workers: int = 8):
+        self.registry = registry
+        self.bulk_actions_db = bulk_actions_db
+        self.jobs = jobs
+        self.batch_size = max(1, batch_size)
+        self.file_workers = max(1, file_workers)
+        self._purgers: List[StorePurger] = []
+        self._favorite_setter: Optional[Callable[[List[str], bool], List[str]]] = None
+        self._favorite_listeners: List[Callable[[List[int], bool], None]] = []
+
+    def add_purger(self, purger: StorePurger) -> None:
+        self._purgers.append(purger)
+
+    def set_favorite_store(self, setter: Callable[[List[str], bool], List[str]]) -> None:
+        """setter(paths, favorite) applies the change and returns the paths that changed."""
+        self._favorite_setter = setter
+
+    def add_favorite_listener(self, listener: Callable[[List[int], bool], None]) -> None:
+        """Called with (photo_ids, favorite) after a favorite change."""
+        self._favorite_listeners.append(listener)
+
+    def resolve(self, photo_ids: Iterable[int] = (), paths: Iterable[str] = ()) -> Dict[int, str]:
+        """{photo_id: path} for ids and paths; unknown ids are dropped, new paths registered."""
+        targets = self.registry.paths_for([int(i) for i in photo_ids])
+        targets.update({photo_id: path for path, photo_id in self.registry.ensure_ids(paths).items()})
+        return targets
+
+    def _progress(self, job_id: Optional[str], progress: int, message: str) -> None:
+        if self.jobs is not None and job_id:
+            self.jobs.update_job(job_id, status="processing", progress=progress, message=message)
+
+    def _run_file_op(self, paths: List[str], file_op: Callable[[str], Any], result: BulkResult,
+                     job_id: Optional[str]) -> None:
+        """file_op on every path in the thread pool; progress 0-50%."""
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.file_workers, thread_name_prefix="bulk") as pool:
+            for batch in _chunks(paths, self.batch_size):
+                futures = [(path, pool.submit(file_op, path)) for path in batch]
+                for path, future in futures:
+                    try:
+                        result.outcomes[path] = future.result()
+                    except Exception as e:
+                        detail = getattr(e, "detail", None) or str(e)
+                        result.errors.append(f"{path}: {detail}")
+                done += len(batch)
+                self._progress(job_id, done * 50 // len(paths), f"Processed {done}/{len(paths)} files")
+
+    def purge(self, op: str, targets: Dict[int, str], job_id: Optional[str] = None,
+              errors: Optional[List[str]] = None) -> None:
+        """
+        Remove targets from every store registered for op, one transaction per batch.
+
+        A failing store is logged and reported in errors; the other stores
+        are still cleaned.
+        """
+        ids = list(targets)
+        purgers = [p for p in self._purgers if op in p.ops]
+        failed = False
+        for index, purger in enumerate(purgers):
+            for batch in _chunks(ids, purger.batch_size or self.batch_size):
+                try:
+                    purger.purge(op, [targets[i] for i in batch], list(batch))
+                except Exception as e:
+                    logger.error(f"Bulk {op}: {purger.name} cleanup failed: {e}")
+                    if errors is not None:
+                        errors.append(f"{purger.name}: {e}")
+                    failed = True
+                    break
+            self._progress(job_id, 50 + (index + 1) * 45 // len(purgers), f"Cleaned {purger.name}")
+        # Keep the ids while any store may still hold rows keyed by them
+        if op == DELETE and ids and not failed:
+            self.registry.remove(ids)
+        library_version.bump()
+
+    def run(self, op: str, targets: Dict[int, str], *, file_op: Optional[Callable[[str], Any]] = None,
+            after_files: Optional[Callable[[Dict[str, Any]], None]] = None,
+            undo_file: Optional[Callable[[str, Any], None]] = None,
+            undo_data: Optional[Callable[[BulkResult], Dict[str, Any]]] = None,
+            user_id: str = "current_user_id", job_id: Optional[str] = None) -> BulkResult:
+        """
+        Delete or trash targets.
+
+        Args:
+            op: DELETE or TRASH
+            targets: {photo_id: path}
+            file_op: Per-file work (delete, move); photos whose file_op raises
+                are reported in errors and left untouched
+            after_files: Called once with {path: file_op result} before the stores are cleaned
+            undo_file: Reverts file_op for one (path, result); used when after_files
+                raises, so no photo ends up changed on disk but unrecorded
+            undo_data: Builds the BulkActionsDB operation_data from the result
+            user_id: Owner of the BulkActionsDB entry
+            job_id: Job receiving progress and the final result
+        """
+        result = BulkResult(action=op)
+        paths = list(targets.values())
+        if file_op is not None and paths:
+            self._run_file_op(paths, file_op, result, job_id)
+            if after_files is not None and result.outcomes:
+                try:
+                    after_files(result.outcomes)
+                except Exception as e:
+                    logger.error(f"Bulk {op}: recording {len(result.outcomes)} files failed: {e}")
+                    self._undo_files(result, undo_file, e)
+            done = {photo_id: path for photo_id, path in targets.items() if path in result.outcomes}
+        else:
+            done = dict(targets)
+
+        self.purge(op, done, job_id, result.errors)
+        result.processed = list(done.values())
+        self._record(result, user_id, undo_data)
+        self._finish(job_id, result)
+        return result
+
+    @staticmethod
+    def _undo_files(result: BulkResult, undo_file: Optional[Callable[[str, Any], None]],
+                    error: Exception) -> None:
+        """Revert every file_op after a failed after_files; the photos are reported as errors."""
+        for path, outcome in list(result.outcomes.items()):
+            detail = f"not recorded ({error})"
+            if undo_file is not None:
+                try:
+                    undo_file(path, outcome)
+                except Exception as e:
+                    logger.error(f"Could not revert {path}: {e}")
+                    detail += f"; revert failed: {e}"
+                else:
+                    detail += "; reverted"
+            result.errors.append(f"{path}: {detail}")
+        result.outcomes.clear()
+
+    def set_favorites(self, targets: Dict[int, str], favorite: bool, *, record: bool = True,
+                      user_id: str = "current_user_id", job_id: Optional[str] = None) -> BulkResult:
+        """Add (or remove) favorites; only photos whose state changed are recorded for undo."""
+        if self._favorite_setter is None:
+            raise RuntimeError("No favorite store configured")
+        result = BulkResult(action=FAVORITE)
+        ids_by_path = {path: photo_id for photo_id, path in targets.items()}
+        paths = list(ids_by_path)
+        for start, batch in zip(range(0, len(paths), self.batch_size), _chunks(paths, self.batch_size)):
+            try:
+                result.processed += self._favorite_setter(list(batch), favorite)
+            except Exception as e:
+                result.errors.append(f"favorites: {e}")
+                break
+            self._progress(job_id, (start + len(batch)) * 95 // len(paths), f"Updated {start + len(batch)}/{len(paths)}")
+
+        changed_ids = [ids_by_path[path] for path in result.processed]
+        for listener in self._favorite_listeners:
+            try:
+                listener(changed_ids, favorite)
+            except Exception as e:
+                logger.error(f"Favorite listener failed: {e}")
+        library_version.bump()
+        if record:
+            self._record(result, user_id, lambda r: {"favorite": favorite})
+        self._finish(job_id, result)
+        return result
+
+    def _record(self, result: BulkResult, user_id: str,
+                undo_data: Optional[Callable[[BulkResult], Dict[str, Any]]]) -> None:
+        if not result.processed or self.bulk_actions_db is None:
+            return
+        result.action_id = self.bulk_actions_db.record_bulk_action(
+            action_type=result.action,
+            user_id=user_id,
+            affected_paths=result.processed,
+            operation_data=undo_data(result) if undo_data else None,
+        ) or None
+
+    def _finish(self, job_id: Optional[str], result: BulkResult) -> None:
+        if self.jobs is None or not job_id:
+            return
+        self.jobs.update_job(
+            job_id, status="completed", progress=100,
+            message=f"{result.action}: {len(result.processed)} photos, {len(result.errors)} errors",
+            result={"processed": len(result.processed), "errors": result.errors[:100], "action_id": result.action_id},
+        )
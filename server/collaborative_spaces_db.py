@@ -12,6 +12,8 @@ from datetime import datetime
 import json
 import uuid
 
+from server.db_pool import connect
+
 
 class CollaborativeSpace:
     """Represents a collaborative photo space"""
@@ -50,7 +52,7 @@ class CollaborativeSpacesDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS collaborative_spaces (
                     id TEXT PRIMARY KEY,
@@ -135,7 +137,7 @@ class CollaborativeSpacesDB:
         space_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Create the space
                 conn.execute(
                     """
@@ -180,7 +182,7 @@ class CollaborativeSpacesDB:
             CollaborativeSpace if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT * FROM collaborative_spaces WHERE id = ?",
@@ -203,7 +205,7 @@ class CollaborativeSpacesDB:
             List of collaborative spaces the user belongs to
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 # Join to get spaces where user is a member
                 cursor = conn.execute(
@@ -238,7 +240,7 @@ class CollaborativeSpacesDB:
             # Determine permissions based on role
             permissions = self._get_role_permissions(role)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Check if space exists and has room for more members
                 space = conn.execute(
                     "SELECT current_members, max_members FROM collaborative_spaces WHERE id = ?",
@@ -287,7 +289,7 @@ class CollaborativeSpacesDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Don't allow removing the owner
                 owner_check = conn.execute(
                     "SELECT owner_id FROM collaborative_spaces WHERE id = ?",
@@ -332,7 +334,7 @@ class CollaborativeSpacesDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO space_photos 
@@ -360,7 +362,7 @@ class CollaborativeSpacesDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "DELETE FROM space_photos WHERE space_id = ? AND photo_path = ?",
                     (space_id, photo_path)
@@ -385,7 +387,7 @@ class CollaborativeSpacesDB:
         comment_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO space_comments 
@@ -411,7 +413,7 @@ class CollaborativeSpacesDB:
             List of photos in the space
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -443,7 +445,7 @@ class CollaborativeSpacesDB:
             List of comments for the photo
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -474,7 +476,7 @@ class CollaborativeSpacesDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     """
                     UPDATE space_members 
@@ -499,7 +501,7 @@ class CollaborativeSpacesDB:
             List of members in the space
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 where_clause = "WHERE space_id = ?" if not include_inactive else "WHERE space_id = ? AND is_active = 1"
                 
@@ -529,7 +531,7 @@ class CollaborativeSpacesDB:
             Dictionary with space statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Get space details
                 space_info = conn.execute(
                     """
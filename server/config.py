@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, computed_field
 
@@ -47,6 +47,56 @@ class Settings(BaseSettings):
             pass
         return "cpu"
 
+    # Video analysis
+    VIDEO_ANALYSIS_WORKERS: int = 0  # Batch analysis process pool size (0 = half the CPU count)
+    VIDEO_CACHE_MAX_MB: int = 2048  # Keyframe cache budget before least-recent videos are evicted
+    VIDEO_MAX_SCENE_EMBEDDINGS: int = 16  # Scene keyframes embedded per video for semantic search
+
+    # Search result cache
+    SEARCH_CACHE_TTL: int = 600  # Seconds a cached result ranking stays valid
+    SEARCH_CACHE_DEPTH_STEP: int = 200  # Rankings are computed in multiples of this many hits
+
+    # SQLite stores (server/db_pool.py)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait this long for a locked database before failing
+    SQLITE_CACHE_SIZE_KB: int = 8192  # Page cache per pooled connection
+    SQLITE_MMAP_SIZE_MB: int = 256  # Memory-mapped I/O window per connection (0 disables)
+
+    # Hybrid search
+    HYBRID_FUSION: str = "weighted"  # "weighted" (intent-weighted scores) or "rrf" (reciprocal-rank fusion)
+    HYBRID_RRF_K: int = 60  # RRF damping constant; larger values flatten the rank curve
+    HYBRID_CANDIDATE_CACHE: int = 64  # Queries whose candidate lists and intents are kept for deeper pages
+
+    # Filter bitmaps (server/filter_index.py)
+    FILTER_INDEX_SNAPSHOT: str = "filter_index.bin"  # Snapshot file under BASE_DIR, reused at startup while the stores are unchanged
+    FILTER_PREFILTER_MAX_IDS: int = 5000  # Filters matching at most this many photos restrict the vector search itself
+
+    # Bulk delete / trash / favorite (server/bulk_ops.py)
+    BULK_OPS_BATCH_SIZE: int = 1000  # Photos per store transaction
+    BULK_FILE_WORKERS: int = 8  # Threads for file deletes and moves
+
+    # Embedding storage (server/quantization.py)
+    VECTOR_DTYPE: str = "float32"  # New LanceDB photo/video-frame tables: "float32" or "float16" (half the disk and RAM)
+    VECTOR_RERANK_FACTOR: int = 4  # float16 tables fetch this many times the requested hits and re-rank them on their float32 copies
+    FACE_EMBEDDING_DTYPE: str = "float32"  # Face embeddings in face_clusters.db: "float32", "float16" or "int8"
+
+    # Cloud sources
+    S3_SYNC_WORKERS: int = 8  # Concurrent S3 downloads (and pooled connections) per sync
+    REMOTE_HEADER_BYTES: int = 256 * 1024  # Leading bytes read per object when indexing in remote-metadata mode
+    REMOTE_FILE_CACHE_MB: int = 2048  # Local cache budget for full objects fetched on demand from cloud sources
+
+    # Request execution (keeps blocking work off the event loop)
+    IO_THREADS: int = 32  # Thread pool for blocking I/O: SQLite scans, file reads, text embedding
+    CPU_WORKERS: int = 0  # Process pool for CPU-bound work like thumbnail encoding (0 = half the CPU count)
+    ENDPOINT_CONCURRENCY: Dict[str, int] = {"thumbnail": 16, "search": 8, "timeline": 4, "albums": 4, "export": 2}
+    ENDPOINT_QUEUE_LIMIT: int = 64  # Requests that may wait for an endpoint slot before getting 503
+
+    # Media serving
+    FILE_RANGE_CHUNK_SIZE: int = 1024 * 1024  # Read size per chunk when streaming /file and /video byte ranges
+
+    # Export
+    EXPORT_MAX_FILES: int = 10000  # Files per /export request; archives are streamed, so memory stays flat
+    EXPORT_WORKERS: int = 4  # Threads rendering resized images and thumbnails ahead of the ZIP stream
+
     # Paths
     # Default to a 'media' folder in the project root if not specified
     # We use a computed field or just a property to resolve relative paths if needed
@@ -0,0 +1,287 @@
+"""
+SQLite Connection Pool
+
+Shared access layer for the server's SQLite stores:
+- connect(path) is a drop-in for `with sqlite3.connect(path) as conn:`;
+  it commits on success and rolls back on error, but hands out a
+  per-thread connection that stays open between calls
+- Every pooled connection gets the same PRAGMA profile (WAL,
+  synchronous=NORMAL, busy_timeout, cache_size, mmap_size) and a larger
+  prepared-statement cache
+- Nested use of the same database on one thread gets a private
+  connection, so transactions keep their previous boundaries
+- A thread's connections are closed when the thread exits, so
+  short-lived executor threads do not leak file descriptors
+- Statement counts and time spent holding connections are recorded per
+  endpoint (see track_endpoint())
+"""
+
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+
+@dataclass
+class SQLiteProfile:
+    """PRAGMAs applied to every pooled connection."""
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 8192
+    mmap_size_mb: int = 256
+    temp_store: str = "MEMORY"
+    cached_statements: int = 256
+
+
+@dataclass
+class _Usage:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class _EndpointStats:
+    requests: int = 0
+    queries: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class _Slot:
+    conn: sqlite3.Connection
+    identity: Tuple[int, int]
+    generation: int
+    busy: bool = False
+
+
+@dataclass
+class _PoolStats:
+    opened: int = 0
+    reopened: int = 0
+    checkouts: int = 0
+    nested: int = 0
+    endpoints: Dict[str, _EndpointStats] = field(default_factory=dict)
+
+
+_profile = SQLiteProfile()
+_local = threading.local()
+# Reentrant: a thread-exit finalizer may close connections while this thread holds it
+_lock = threading.RLock()
+_stats = _PoolStats()
+_generation = 0  # Bumped by close_all() so threads drop their closed connections
+_all_connections: Dict[int, sqlite3.Connection] = {}
+_usage: contextvars.ContextVar[Optional[_Usage]] = contextvars.ContextVar("sqlite_usage", default=None)
+_BACKGROUND = "background"
+_background = _Usage()  # Work outside any tracked request (startup, jobs, watchers)
+
+
+def configure(profile: SQLiteProfile) -> None:
+    """Set the PRAGMA profile; connections opened afterwards use it."""
+    global _profile
+    _profile = profile
+
+
+def apply_profile(conn: sqlite3.Connection, profile: Optional[SQLiteProfile] = None) -> None:
+    """Apply the PRAGMA profile to a connection the pool does not own."""
+    profile = profile or _profile
+    conn.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+    conn.execute(f"PRAGMA synchronous={profile.synchronous}")
+    conn.execute(f"PRAGMA busy_timeout={int(profile.busy_timeout_ms)}")
+    # Negative cache_size is in KiB rather than pages
+    conn.execute(f"PRAGMA cache_size=-{int(profile.cache_size_kb)}")
+    conn.execute(f"PRAGMA mmap_size={int(profile.mmap_size_mb) * 1024 * 1024}")
+    conn.execute(f"PRAGMA temp_store={profile.temp_store}")
+
+
+def _record(statement: str) -> None:
+    # Runs for every statement, so it only bumps a counter
+    (_usage.get() or _background).queries += 1
+
+
+def _open(path: str) -> sqlite3.Connection:
+    profile = _profile
+    conn = sqlite3.connect(
+        path,
+        timeout=profile.busy_timeout_ms / 1000,
+        cached_statements=profile.cached_statements,
+        # Only ever used by its owning thread; close_all() may close it from another
+        check_same_thread=False,
+    )
+    apply_profile(conn, profile)
+    conn.set_trace_callback(_record)
+    return conn
+
+
+def _identity(path: str) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (st.st_dev, st.st_ino)
+
+
+class _ThreadSlots:
+    """A thread's pooled connections, closed once the thread-local is released at thread exit."""
+
+    def __init__(self):
+        self.slots: Dict[str, _Slot] = {}
+        weakref.finalize(self, _close_slots, self.slots)
+
+
+def _close_slots(slots: Dict[str, _Slot]) -> None:
+    for slot in slots.values():
+        _forget(slot.conn)
+    slots.clear()
+
+
+def _slots() -> Dict[str, _Slot]:
+    holder = getattr(_local, "holder", None)
+    if holder is None:
+        holder = _local.holder = _ThreadSlots()
+    return holder.slots
+
+
+def _register(conn: sqlite3.Connection) -> None:
+    with _lock:
+        _all_connections[id(conn)] = conn
+        _stats.opened += 1
+
+
+def _forget(conn: sqlite3.Connection) -> None:
+    with _lock:
+        _all_connections.pop(id(conn), None)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+@contextmanager
+def connect(path: PathLike, *, row_factory: Optional[Callable[..., Any]] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Pooled connection for the current thread, as a transaction scope.
+
+    Args:
+        path: Database file
+        row_factory: Row factory for this checkout (e.g. sqlite3.Row)
+    """
+    key = os.path.abspath(os.fspath(path))
+    slots = _slots()
+    slot = slots.get(key)
+    private = False
+    if slot is not None and slot.busy:
+        # Re-entered on this thread: behave like a second sqlite3.connect()
+        conn = _open(key)
+        _register(conn)
+        private = True
+        with _lock:
+            _stats.nested += 1
+    else:
+        identity = _identity(key)
+        if slot is not None and slot.generation != _generation:
+            slot = None
+        elif slot is not None and slot.identity != identity:
+            # The file was deleted or replaced underneath the pooled connection
+            _forget(slot.conn)
+            slot = None
+            with _lock:
+                _stats.reopened += 1
+        if slot is None:
+            conn = _open(key)
+            _register(conn)
+            # A new file only exists once the connection has created it
+            slot = slots[key] = _Slot(conn, identity if identity != (0, 0) else _identity(key), _generation)
+        conn = slot.conn
+        slot.busy = True
+
+    conn.row_factory = row_factory
+    usage = _usage.get()
+    start = time.perf_counter()
+    try:
+        with conn:
+            yield conn
+    finally:
+        (usage or _background).seconds += time.perf_counter() - start
+        with _lock:
+            _stats.checkouts += 1
+        if private:
+            _forget(conn)
+        else:
+            slot.busy = False
+
+
+@contextmanager
+def track_endpoint(resolve_name: Callable[[], str]) -> Iterator[None]:
+    """
+    Attribute database work inside the block to an endpoint.
+
+    The name is resolved when the block ends, so route templates that are
+    only known after routing can be used.
+    """
+    usage = _Usage()
+    token = _usage.set(usage)
+    try:
+        yield
+    finally:
+        _usage.reset(token)
+        name = resolve_name() or _BACKGROUND
+        with _lock:
+            entry = _stats.endpoints.setdefault(name, _EndpointStats())
+            entry.requests += 1
+            entry.queries += usage.queries
+            entry.seconds += usage.seconds
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        background = _stats.endpoints.setdefault(_BACKGROUND, _EndpointStats())
+        background.queries += _background.queries
+        background.seconds += _background.seconds
+        _background.queries, _background.seconds = 0, 0.0
+        endpoints = {
+            name: {
+                "requests": e.requests,
+                "queries": e.queries,
+                "time_ms": round(e.seconds * 1000, 3),
+                "queries_per_request": round(e.queries / e.requests, 2) if e.requests else None,
+            }
+            for name, e in sorted(_stats.endpoints.items(), key=lambda kv: kv[1].seconds, reverse=True)
+        }
+        return {
+            "profile": asdict(_profile),
+            "connections_open": len(_all_connections),
+            "connections_opened": _stats.opened,
+            "connections_reopened": _stats.reopened,
+            "checkouts": _stats.checkouts,
+            "nested_checkouts": _stats.nested,
+            "endpoints": endpoints,
+        }
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.endpoints.clear()
+        _background.queries, _background.seconds = 0, 0.0
+        _stats.opened = _stats.reopened = _stats.checkouts = _stats.nested = 0
+
+
+def close_all() -> None:
+    """Close every pooled connection (shutdown); threads reopen on next use."""
+    global _generation
+    with _lock:
+        _generation += 1
+        conns = list(_all_connections.values())
+        _all_connections.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
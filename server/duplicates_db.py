@@ -12,6 +12,8 @@ from datetime import datetime
 import numpy as np
 from PIL import Image
 
+from server.db_pool import connect
+
 
 @dataclass
 class DuplicateGroup:
@@ -39,7 +41,7 @@ class DuplicatesDB:
 
     def _init_db(self):
         """Initialize the duplicates database."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Groups table for duplicate sets
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS duplicate_groups (
@@ -73,7 +75,7 @@ class DuplicatesDB:
         """Add a group of duplicate files."""
         group_id = f"grp_{hash_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(files)}"
 
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Add group
             conn.execute("""
                 INSERT INTO duplicate_groups (id, hash_type, similarity_score)
@@ -108,7 +110,7 @@ class DuplicatesDB:
 
     def get_duplicate_groups(self, hash_type: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[DuplicateGroup]:
         """Get duplicate groups."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             conn.row_factory = sqlite3.Row
 
             query = "SELECT * FROM duplicate_groups WHERE resolved_at IS NULL"
@@ -145,7 +147,7 @@ class DuplicatesDB:
 
     def get_duplicate_stats(self) -> Dict:
         """Get statistics about duplicates."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             stats = {}
 
             # Total groups
@@ -184,7 +186,7 @@ class DuplicatesDB:
 
     def resolve_duplicates(self, group_id: str, resolution: str, keep_files: List[str] = None) -> bool:
         """Mark a duplicate group as resolved."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             if resolution == 'keep_selected' and keep_files:
                 # Move non-selected files to trash or mark for deletion
                 group_files = conn.execute(
@@ -211,7 +213,7 @@ class DuplicatesDB:
 
     def delete_group(self, group_id: str) -> bool:
         """Delete a duplicate group completely."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Delete files first (foreign key constraint)
             conn.execute("DELETE FROM duplicate_files WHERE group_id = ?", (group_id,))
             # Delete group
@@ -248,7 +250,7 @@ class DuplicatesDB:
 
     def cleanup_missing_files(self) -> int:
         """Remove entries for files that no longer exist."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             cursor = conn.execute("SELECT file_path FROM duplicate_files")
             all_files = [row[0] for row in cursor.fetchall()]
 
@@ -42,6 +42,19 @@ class EmbeddingGenerator:
             logger.error(f"Error generating image embedding: {e}")
             raise
 
+    def generate_image_embeddings(self, images: List[Image.Image], batch_size: int = 32) -> List[List[float]]:
+        """
+        Generate embeddings for several PIL Images in batched forward passes.
+        """
+        if not images:
+            return []
+        try:
+            embeddings = self.model.encode(images, batch_size=batch_size, normalize_embeddings=True)
+            return embeddings.tolist()
+        except Exception as e:
+            logger.error(f"Error generating image embeddings: {e}")
+            raise
+
     def generate_text_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for a text query.
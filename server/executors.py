@@ -0,0 +1,181 @@
+"""
+Request Execution Model
+
+Keeps blocking work off the asyncio event loop so one slow request cannot
+stall the others:
+- run_io(): blocking I/O (SQLite scans, file reads, model inference that
+  releases the GIL) on a dedicated, sized thread pool
+- run_cpu(): CPU-bound pure functions (image decode/resize/encode) on a
+  process pool; arguments and results must be picklable
+- EndpointLimits: per-endpoint concurrency caps with a bounded wait
+  queue; requests beyond it are shed with 503 instead of piling up
+"""
+
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+
+
+class ExecutionPools:
+    """
+    Lazily created thread and process pools shared by all endpoints.
+
+    Args:
+        io_threads: Threads for blocking I/O
+        cpu_workers: Processes for CPU-bound work (0 = half the CPU count)
+    """
+
+    def __init__(self, io_threads: int = 32, cpu_workers: int = 0):
+        self.io_threads = max(1, io_threads)
+        self.cpu_workers = cpu_workers if cpu_workers > 0 else max(1, (os.cpu_count() or 2) // 2)
+        self._lock = threading.Lock()
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._cpu: Optional[ProcessPoolExecutor] = None
+
+    def io_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._io is None:
+                self._io = ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix="io")
+            return self._io
+
+    def cpu_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._cpu is None:
+                # spawn, not fork: the server process holds threads, SQLite
+                # handles and model weights that must not be duplicated
+                self._cpu = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._cpu
+
+    async def run_io(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        # Carry context variables (e.g. per-request DB accounting) into the thread
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self.io_pool(), partial(ctx.run, fn, *args, **kwargs))
+
+    async def run_cpu(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        pool = self.cpu_pool()
+        try:
+            return await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+        except BrokenProcessPool:
+            # A worker died (e.g. a decoder crash); start fresh for the next call
+            with self._lock:
+                if self._cpu is pool:
+                    self._cpu = None
+            raise
+
+    async def iterate_io(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """Drive a blocking iterator (e.g. a file or ZIP stream) on the I/O pool."""
+        done = object()
+        while True:
+            item = await self.run_io(next, iterator, done)
+            if item is done:
+                return
+            yield item  # type: ignore[misc]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            io, cpu = self._io, self._cpu
+            self._io = self._cpu = None
+        if io:
+            io.shutdown(wait=False, cancel_futures=True)
+        if cpu:
+            cpu.shutdown(wait=False, cancel_futures=True)
+
+
+class EndpointLimiter:
+    """
+    At most max_concurrent requests run at once; up to max_waiting more
+    queue for a slot and the rest are rejected with 503 Retry-After.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.waiting = 0
+        self.rejected = 0
+        # Semaphores are bound to an event loop (tests run several)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent)
+        return sem
+
+    def check(self) -> None:
+        """Shed the request with 503 if it could not even queue for a slot."""
+        if self._semaphore().locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy ({self.name}); retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        self.check()
+        sem = self._semaphore()
+        self.waiting += 1
+        try:
+            await sem.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            sem.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class EndpointLimits:
+    """Named EndpointLimiters created on first use from a {name: max_concurrent} map."""
+
+    def __init__(self, concurrency: Dict[str, int], max_waiting: int, default: int = 16):
+        self.concurrency = dict(concurrency)
+        self.max_waiting = max_waiting
+        self.default = default
+        self._limiters: Dict[str, EndpointLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> EndpointLimiter:
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                limiter = EndpointLimiter(name, self.concurrency.get(name, self.default), self.max_waiting)
+                self._limiters[name] = limiter
+            return limiter
+
+    def slot(self, name: str):
+        return self.get(name).slot()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: limiter.stats() for name, limiter in self._limiters.items()}
@@ -15,6 +15,10 @@ from datetime import datetime
 import json
 import numpy as np
 
+from server.config import settings
+from server.db_pool import connect
+from server.quantization import check_dtype, pack, packed_dtype, unpack
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -52,10 +56,17 @@ class PhotoPersonAssociation:
 
 
 class FaceClusteringDB:
-    """Database for managing face detections, clusters, and photo-person associations."""
+    """
+    Database for managing face detections, clusters, and photo-person associations.
+
+    Embeddings are stored as packed float32, float16 or int8 blobs
+    (settings.FACE_EMBEDDING_DTYPE); rows written as JSON text by earlier
+    versions are still read, and convert_embeddings() rewrites them.
+    """
     
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, embedding_dtype: Optional[str] = None):
         self.db_path = db_path
+        self.embedding_dtype = check_dtype(embedding_dtype or settings.FACE_EMBEDDING_DTYPE)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
@@ -77,14 +88,14 @@ class FaceClusteringDB:
 
     def _init_db(self):
         """Initialize the face clustering database."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Face detections table
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS face_detections (
                     detection_id TEXT PRIMARY KEY,
                     photo_path TEXT NOT NULL,
                     bounding_box TEXT NOT NULL,  -- JSON: {x, y, width, height}
-                    embedding BLOB,  -- Face embedding vector
+                    embedding BLOB,  -- Packed face embedding (server/quantization.py)
                     quality_score REAL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
@@ -139,7 +150,7 @@ class FaceClusteringDB:
         """
         if not cluster_id:
             return
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             if self._is_legacy_schema(conn):
                 try:
                     cluster_id_int = int(cluster_id)
@@ -179,7 +190,7 @@ class FaceClusteringDB:
         if bounding_box is None:
             bounding_box = {"x": 0.0, "y": 0.0, "width": 0.0, "height": 0.0}
 
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             if self._is_legacy_schema(conn):
                 return
             conn.execute(
@@ -196,7 +207,7 @@ class FaceClusteringDB:
         """Add a face detection to the database."""
         detection_id = f"face_{hashlib.md5(f'{photo_path}_{json.dumps(bounding_box)}'.encode()).hexdigest()}"
 
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             conn.execute("""
                 INSERT INTO face_detections (detection_id, photo_path, bounding_box, embedding, quality_score)
                 VALUES (?, ?, ?, ?, ?)
@@ -204,7 +215,7 @@ class FaceClusteringDB:
                 detection_id,
                 photo_path,
                 json.dumps(bounding_box),
-                json.dumps(embedding) if embedding else None,
+                pack(embedding, self.embedding_dtype) if embedding else None,
                 quality_score
             ))
         
@@ -214,7 +225,7 @@ class FaceClusteringDB:
         """Add a new face cluster (person)."""
         cluster_id = f"cluster_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{hashlib.md5(str(datetime.now()).encode()).hexdigest()[:8]}"
 
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             conn.execute("""
                 INSERT INTO face_clusters (cluster_id, label)
                 VALUES (?, ?)
@@ -224,7 +235,7 @@ class FaceClusteringDB:
 
     def associate_person_with_photo(self, photo_path: str, cluster_id: str, detection_id: str, confidence: float):
         """Associate a person (cluster) with a photo."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Check if cluster exists
             cluster = conn.execute(
                 "SELECT cluster_id FROM face_clusters WHERE cluster_id = ?",
@@ -260,7 +271,7 @@ class FaceClusteringDB:
 
     def get_people_in_photo(self, photo_path: str) -> List[PhotoPersonAssociation]:
         """Get all people associated with a specific photo."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             conn.row_factory = sqlite3.Row
 
             if self._is_legacy_schema(conn):
@@ -317,7 +328,7 @@ class FaceClusteringDB:
         
         if cluster_id in existing_cluster_ids:
             # Already associated, update confidence
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with connect(str(self.db_path)) as conn:
                 cur = conn.execute("""
                     UPDATE photo_person_associations
                     SET confidence = ?
@@ -334,7 +345,7 @@ class FaceClusteringDB:
 
     def remove_person_from_photo(self, photo_path: str, cluster_id: str, detection_id: str):
         """Remove a person association from a photo."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Remove association
             conn.execute("""
                 DELETE FROM photo_person_associations
@@ -362,7 +373,7 @@ class FaceClusteringDB:
 
     def get_all_clusters(self) -> List[FaceCluster]:
         """Get all face clusters (people)."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             conn.row_factory = sqlite3.Row
 
             if self._is_legacy_schema(conn):
@@ -408,7 +419,7 @@ class FaceClusteringDB:
 
     def get_photos_for_cluster(self, cluster_id: str) -> List[str]:
         """Get all photos associated with a cluster."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             if self._is_legacy_schema(conn):
                 rows = conn.execute(
                     """
@@ -435,7 +446,7 @@ class FaceClusteringDB:
 
     def update_cluster_label(self, cluster_id: str, label: str):
         """Update the label (name) of a cluster."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             if self._is_legacy_schema(conn):
                 conn.execute(
                     """
@@ -458,7 +469,7 @@ class FaceClusteringDB:
 
     def cleanup_missing_photos(self) -> int:
         """Remove associations for photos that no longer exist."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Get all unique photo paths
             cursor = conn.execute("SELECT DISTINCT photo_path FROM photo_person_associations")
             all_photos = [row[0] for row in cursor.fetchall()]
@@ -540,7 +551,7 @@ class FaceClusteringDB:
             from server.face_detection_service import get_face_detection_service
             
             # Get the detection details
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with connect(str(self.db_path)) as conn:
                 conn.row_factory = sqlite3.Row
                 row = conn.execute("""
                     SELECT photo_path, bounding_box
@@ -587,12 +598,12 @@ class FaceClusteringDB:
             logger.error(f"Error calculating cosine similarity: {e}")
             return 0.0
 
-    def _get_face_embeddings(self) -> Tuple[List[str], List[List[float]]]:
+    def _get_face_embeddings(self) -> Tuple[List[str], List[np.ndarray]]:
         """Get all face embeddings from the database."""
         detection_ids = []
         embeddings = []
         
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             rows = conn.execute("""
                 SELECT detection_id, embedding
                 FROM face_detections
@@ -601,7 +612,7 @@ class FaceClusteringDB:
             
             for row in rows:
                 detection_ids.append(row[0])
-                embeddings.append(json.loads(row[1]))
+                embeddings.append(unpack(row[1]))
         
         return detection_ids, embeddings
 
@@ -660,7 +671,7 @@ class FaceClusteringDB:
                 
                 for detection_id in cast(List[str], cluster_data['detection_ids']):
                     # Get the photo path for this detection
-                    with sqlite3.connect(str(self.db_path)) as conn:
+                    with connect(str(self.db_path)) as conn:
                         row = conn.execute("""
                             SELECT photo_path FROM face_detections
                             WHERE detection_id = ?
@@ -699,7 +710,7 @@ class FaceClusteringDB:
         """Find faces similar to a given face detection."""
         try:
             # Get the reference face embedding
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with connect(str(self.db_path)) as conn:
                 row = conn.execute("""
                     SELECT embedding, photo_path
                     FROM face_detections
@@ -709,7 +720,7 @@ class FaceClusteringDB:
                 if not row or not row[0]:
                     return []
                 
-                ref_embedding = json.loads(row[0])
+                ref_embedding = unpack(row[0])
                 ref_photo_path = row[1]
             
             # Get all other face embeddings
@@ -726,7 +737,7 @@ class FaceClusteringDB:
                 
                 if similarity >= threshold:
                     # Get photo path for this detection
-                    with sqlite3.connect(str(self.db_path)) as conn:
+                    with connect(str(self.db_path)) as conn:
                         photo_row = conn.execute("""
                             SELECT photo_path FROM face_detections
                             WHERE detection_id = ?
@@ -752,7 +763,7 @@ class FaceClusteringDB:
         """Analyze the quality of a face cluster."""
         try:
             # Get all faces in the cluster
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with connect(str(self.db_path)) as conn:
                 rows = conn.execute("""
                     SELECT ppa.detection_id, ppa.confidence,
                            fd.quality_score, fd.embedding
@@ -767,7 +778,7 @@ class FaceClusteringDB:
             # Calculate quality metrics
             confidences = [row[1] for row in rows]
             quality_scores = [row[2] for row in rows]
-            embeddings = [json.loads(row[3]) for row in rows if row[3]]
+            embeddings = [unpack(row[3]) for row in rows if row[3]]
             
             # Calculate statistics
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0
@@ -798,6 +809,40 @@ class FaceClusteringDB:
             logger.error(f"Error analyzing cluster quality: {e}")
             return {'error': str(e)}
 
+    def convert_embeddings(self, dtype: Optional[str] = None, batch_size: int = 1000) -> int:
+        """
+        Re-encode stored embeddings (including legacy JSON) as dtype.
+
+        Rows already in dtype are skipped, so the conversion can be resumed.
+        Converting back to a wider type does not restore lost precision.
+
+        Returns:
+            Number of embeddings rewritten
+        """
+        dtype = check_dtype(dtype or self.embedding_dtype)
+        converted = 0
+        last_id = ""
+        while True:
+            with connect(str(self.db_path)) as conn:
+                rows = conn.execute("""
+                    SELECT detection_id, embedding
+                    FROM face_detections
+                    WHERE embedding IS NOT NULL AND detection_id > ?
+                    ORDER BY detection_id
+                    LIMIT ?
+                """, (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                updates = [
+                    (pack(unpack(embedding), dtype), detection_id)
+                    for detection_id, embedding in rows
+                    if packed_dtype(embedding) != dtype
+                ]
+                conn.executemany("UPDATE face_detections SET embedding = ? WHERE detection_id = ?", updates)
+            converted += len(updates)
+            last_id = rows[-1][0]
+        return converted
+
     def _calculate_quality_rating(self, avg_quality: float, coherence: float) -> str:
         """Calculate a quality rating for a cluster."""
         score = (avg_quality + coherence) / 2
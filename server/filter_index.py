@@ -0,0 +1,513 @@
+"""
+Bitmap Filter Index
+
+Compressed bitmaps of photo-registry ids for the structured search filters:
+- One bitmap per tag, rating, album, media type and creation month, plus
+  favorites and the whole library ("all")
+- Any AND/OR/NOT combination is evaluated with bitmap operations (see
+  evaluate()); the result prefilters metadata and vector search
+- Stores report writes through their change listeners and the affected
+  bitmaps are updated in place, so no filter is rebuilt per request
+- save() writes a snapshot that load() reuses at startup while the source
+  databases are unchanged; otherwise the index is rebuilt from them
+- Uses pyroaring when it is installed, otherwise an int-backed bitset
+"""
+
+import json
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+
+from server.db_pool import connect
+
+try:
+    from pyroaring import BitMap as _RoaringBitMap
+except ImportError:  # pragma: no cover - optional dependency
+    _RoaringBitMap = None
+
+ALL = "all"
+FAVORITE = "favorite"
+_PREFIXES = ("tag:", "rating:", "album:", "media:", "month:")
+_MONTH = re.compile(r"^\d{4}-\d{2}")
+_MAGIC = b"PSFILTER1\n"
+
+# A bitmap key, or {"and": [...]}, {"or": [...]}, {"not": expr}
+FilterExpr = Union[str, Dict[str, Any]]
+
+# Bit positions set in each byte value, for iterating an int bitset
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def tag_key(name: str) -> str:
+    return f"tag:{name}"
+
+
+def rating_key(rating: int) -> str:
+    return f"rating:{int(rating)}"
+
+
+def album_key(album_id: str) -> str:
+    return f"album:{album_id}"
+
+
+def media_key(kind: str) -> str:
+    """kind is "photo" or "video"."""
+    return f"media:{kind}"
+
+
+def month_key(month: str) -> str:
+    """month is "YYYY-MM"."""
+    return f"month:{month}"
+
+
+def _int_from(values: Iterable[int]) -> int:
+    values = list(values)
+    if not values:
+        return 0
+    buf = bytearray(max(values) // 8 + 1)
+    for v in values:
+        buf[v >> 3] |= 1 << (v & 7)
+    return int.from_bytes(buf, "little")
+
+
+class IntBitmap:
+    """
+    Set of non-negative ints kept as the bits of one Python int.
+
+    Mirrors the part of pyroaring.BitMap this module uses. Set algebra runs
+    over machine words, but single-element updates copy the int, so bulk
+    changes should go through update()/difference_update().
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._bits = values._bits if isinstance(values, IntBitmap) else _int_from(values)
+
+    @classmethod
+    def _of(cls, bits: int) -> "IntBitmap":
+        bitmap = cls()
+        bitmap._bits = bits
+        return bitmap
+
+    def add(self, value: int) -> None:
+        self._bits |= 1 << value
+
+    def discard(self, value: int) -> None:
+        if self._bits >> value & 1:
+            self._bits ^= 1 << value
+
+    def update(self, *iterables: Iterable[int]) -> None:
+        for values in iterables:
+            self._bits |= values._bits if isinstance(values, IntBitmap) else _int_from(values)
+
+    def difference_update(self, *iterables: Iterable[int]) -> None:
+        for values in iterables:
+            self._bits &= ~(values._bits if isinstance(values, IntBitmap) else _int_from(values))
+
+    def copy(self) -> "IntBitmap":
+        return IntBitmap._of(self._bits)
+
+    def __or__(self, other: "IntBitmap") -> "IntBitmap":
+        return IntBitmap._of(self._bits | other._bits)
+
+    def __and__(self, other: "IntBitmap") -> "IntBitmap":
+        return IntBitmap._of(self._bits & other._bits)
+
+    def __sub__(self, other: "IntBitmap") -> "IntBitmap":
+        return IntBitmap._of(self._bits & ~other._bits)
+
+    def __ior__(self, other: "IntBitmap") -> "IntBitmap":
+        self._bits |= other._bits
+        return self
+
+    def __iand__(self, other: "IntBitmap") -> "IntBitmap":
+        self._bits &= other._bits
+        return self
+
+    def __contains__(self, value: object) -> bool:
+        return isinstance(value, int) and value >= 0 and bool(self._bits >> value & 1)
+
+    def __len__(self) -> int:
+        return self._bits.bit_count()
+
+    def __bool__(self) -> bool:
+        return self._bits != 0
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, IntBitmap) and self._bits == other._bits
+
+    def __iter__(self) -> Iterator[int]:
+        data = self._bits.to_bytes((self._bits.bit_length() + 7) // 8, "little")
+        for i, byte in enumerate(data):
+            if byte:
+                base = i * 8
+                for bit in _BYTE_BITS[byte]:
+                    yield base + bit
+
+    def __repr__(self) -> str:
+        return f"IntBitmap({list(self)})"
+
+    def serialize(self) -> bytes:
+        return self._bits.to_bytes((self._bits.bit_length() + 7) // 8, "little")
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "IntBitmap":
+        return cls._of(int.from_bytes(data, "little"))
+
+
+if _RoaringBitMap is not None:
+    Bitmap: Any = _RoaringBitMap
+    BACKEND = "roaring"
+else:
+    Bitmap = IntBitmap
+    BACKEND = "int"
+
+
+def month_range(keys: Iterable[str], start: Optional[str], end: Optional[str]) -> FilterExpr:
+    """
+    Expression matching the months from start to end ("YYYY-MM", inclusive).
+
+    Either bound may be None. Photos without a creation date match neither.
+    """
+    months = [
+        key for key in keys
+        if key.startswith("month:")
+        and (start is None or key[6:] >= start)
+        and (end is None or key[6:] <= end)
+    ]
+    return {"or": months}
+
+
+class FilterIndex:
+    """
+    Filter bitmaps over registry photo ids.
+
+    Args:
+        registry: PhotoRegistry that assigns the ids
+        is_video: Classifies a path for the media:photo/media:video bitmaps
+        metadata_db: MetadataDatabase file (library rows, dates, favorites)
+        tags_db / ratings_db / albums_db: Stores with memberships() and a db_path
+        snapshot_path: Where save()/load() keep the snapshot; None disables it
+    """
+
+    def __init__(self, registry, *, is_video: Callable[[str], bool],
+                 metadata_db: Optional[Union[str, Path]] = None,
+                 tags_db=None, ratings_db=None, albums_db=None,
+                 snapshot_path: Optional[Union[str, Path]] = None):
+        self.registry = registry
+        self.is_video = is_video
+        self.metadata_db = Path(metadata_db) if metadata_db else None
+        self.tags_db = tags_db
+        self.ratings_db = ratings_db
+        self.albums_db = albums_db
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.loaded_from: Optional[str] = None  # "snapshot" or "rebuild"
+        self._bitmaps: Dict[str, Any] = {ALL: Bitmap(), FAVORITE: Bitmap()}
+        self._lock = threading.RLock()
+
+    # Building and persistence
+
+    def rebuild(self) -> None:
+        """Recompute every bitmap from the source databases."""
+        groups: Dict[str, List[int]] = {ALL: [], FAVORITE: []}
+
+        def put(key: str, photo_id: int) -> None:
+            groups.setdefault(key, []).append(photo_id)
+
+        if self.metadata_db is not None:
+            with connect(self.metadata_db) as conn:
+                rows = conn.execute("""
+                    SELECT file_path,
+                           CASE WHEN json_valid(metadata_json)
+                                THEN json_extract(metadata_json, '$.filesystem.created') END
+                    FROM metadata
+                """).fetchall()
+                favorites = [row[0] for row in conn.execute("SELECT file_path FROM favorites")]
+            ids = self.registry.ensure_ids([path for path, _ in rows] + favorites)
+            for path, created in rows:
+                for key in self._metadata_keys(path, created):
+                    put(key, ids[path])
+            for path in favorites:
+                put(FAVORITE, ids[path])
+
+        if self.tags_db is not None:
+            for name, photo_id in self.tags_db.memberships():
+                put(tag_key(name), photo_id)
+        if self.ratings_db is not None:
+            for rating, photo_id in self.ratings_db.memberships():
+                if rating:
+                    put(rating_key(rating), photo_id)
+        if self.albums_db is not None:
+            members = self.albums_db.memberships()
+            ids = self.registry.ensure_ids(path for _, path in members)
+            for album_id, path in members:
+                put(album_key(album_id), ids[path])
+
+        bitmaps = {key: Bitmap(photo_ids) for key, photo_ids in groups.items()}
+        with self._lock:
+            self._bitmaps = bitmaps
+            self.loaded_from = "rebuild"
+
+    def _sources(self) -> List[Path]:
+        paths = [Path(self.registry.db_path), self.metadata_db]
+        paths += [Path(store.db_path) for store in (self.tags_db, self.ratings_db, self.albums_db) if store is not None]
+        return [p for p in paths if p is not None]
+
+    def _signature(self) -> List[List[Any]]:
+        """File state of every source database; any write changes it."""
+        signature = []
+        for path in self._sources():
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append([str(path), None])
+                continue
+            wal = Path(f"{path}-wal")
+            signature.append([str(path), st.st_mtime_ns, st.st_size, wal.stat().st_size if wal.exists() else 0])
+        return signature
+
+    def save(self) -> bool:
+        """
+        Write the snapshot. Call once writes have quiesced (e.g. at shutdown).
+
+        The WALs are checkpointed first so the signature does not change when
+        the last connection to each database closes afterwards.
+        """
+        if self.snapshot_path is None:
+            return False
+        for path in self._sources():
+            if path.exists():
+                with connect(path) as conn:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        signature = self._signature()
+        with self._lock:
+            blobs = [(key, bitmap.serialize()) for key, bitmap in self._bitmaps.items()]
+        header = json.dumps({
+            "backend": BACKEND,
+            "signature": signature,
+            "keys": [[key, len(blob)] for key, blob in blobs],
+        }).encode()
+
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for _, blob in blobs:
+                f.write(blob)
+        os.replace(tmp, self.snapshot_path)
+        return True
+
+    def load(self) -> bool:
+        """Adopt the snapshot if it matches the current source databases."""
+        if self.snapshot_path is None:
+            return False
+        try:
+            data = self.snapshot_path.read_bytes()
+            if not data.startswith(_MAGIC):
+                return False
+            pos = len(_MAGIC)
+            (size,) = struct.unpack_from("<I", data, pos)
+            pos += 4
+            header = json.loads(data[pos:pos + size])
+            pos += size
+        except (OSError, ValueError, struct.error):
+            return False
+        if header.get("backend") != BACKEND or header.get("signature") != self._signature():
+            return False
+
+        bitmaps = {}
+        for key, length in header["keys"]:
+            bitmaps[key] = Bitmap.deserialize(data[pos:pos + length])
+            pos += length
+        with self._lock:
+            self._bitmaps = bitmaps
+            self.loaded_from = "snapshot"
+        return True
+
+    def load_or_rebuild(self) -> str:
+        """Load the snapshot or rebuild; returns where the bitmaps came from."""
+        if not self.load():
+            self.rebuild()
+        return self.loaded_from
+
+    # Queries
+
+    def bitmap(self, key: str):
+        """Copy of one bitmap (empty when nothing carries the key yet)."""
+        if key not in (ALL, FAVORITE) and not key.startswith(_PREFIXES):
+            raise ValueError(f"Unknown filter key: {key}")
+        with self._lock:
+            found = self._bitmaps.get(key)
+            return found.copy() if found is not None else Bitmap()
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            return sorted(key for key in self._bitmaps if key.startswith(prefix))
+
+    def evaluate(self, expr: FilterExpr):
+        """
+        Evaluate a filter expression to a bitmap of photo ids.
+
+        NOT is relative to the library ("all"); an empty AND is the whole
+        library and an empty OR matches nothing.
+        """
+        with self._lock:
+            return self._evaluate(expr)
+
+    def _evaluate(self, expr: FilterExpr):
+        if isinstance(expr, str):
+            return self.bitmap(expr)
+        if not isinstance(expr, dict) or len(expr) != 1:
+            raise ValueError(f"Invalid filter expression: {expr!r}")
+        op, arg = next(iter(expr.items()))
+        if op == "not":
+            return self.bitmap(ALL) - self._evaluate(arg)
+        if op not in ("and", "or") or not isinstance(arg, list):
+            raise ValueError(f"Invalid filter expression: {expr!r}")
+        parts = [self._evaluate(part) for part in arg]
+        if not parts:
+            return self.bitmap(ALL) if op == "and" else Bitmap()
+        if op == "or":
+            result = parts[0]
+            for part in parts[1:]:
+                result |= part
+            return result
+        # Intersect smallest first so the running result shrinks fast
+        parts.sort(key=len)
+        result = parts[0]
+        for part in parts[1:]:
+            if not result:
+                break
+            result &= part
+        return result
+
+    def matching_paths(self, bitmap, candidates: Optional[Sequence[str]] = None) -> Set[str]:
+        """
+        Paths of the photos in bitmap, optionally only among candidates.
+
+        Resolves whichever side is smaller through the registry, so a
+        selective filter over a large result list never maps every result.
+        """
+        if candidates is not None and len(candidates) < len(bitmap):
+            ids = self.registry.ids_for(candidates)
+            return {path for path, photo_id in ids.items() if photo_id in bitmap}
+        paths = set(self.registry.paths_for(bitmap).values())
+        return paths if candidates is None else paths.intersection(candidates)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for key in self._bitmaps:
+                kind = key.split(":", 1)[0]
+                kinds[kind] = kinds.get(kind, 0) + 1
+            return {
+                "backend": BACKEND,
+                "loaded_from": self.loaded_from,
+                "photos": len(self._bitmaps.get(ALL, ())),
+                "favorites": len(self._bitmaps.get(FAVORITE, ())),
+                "bitmaps": kinds,
+            }
+
+    # Incremental updates (store change listeners)
+
+    def _metadata_keys(self, path: str, created: Optional[str]) -> List[str]:
+        keys = [ALL, media_key("video" if self.is_video(path) else "photo")]
+        if isinstance(created, str) and _MONTH.match(created):
+            keys.append(month_key(created[:7]))
+        return keys
+
+    def _add(self, key: str, photo_ids: Iterable[int]) -> None:
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            bitmap = self._bitmaps[key] = Bitmap()
+        bitmap.update(photo_ids)
+
+    def _discard(self, key: str, photo_ids: Iterable[int]) -> None:
+        bitmap = self._bitmaps.get(key)
+        if bitmap is not None:
+            bitmap.difference_update(photo_ids)
+
+    def on_metadata_change(self, event: str, path: str) -> None:
+        """MetadataDatabase listener: "upsert", "delete" and "favorite"."""
+        if self.metadata_db is None:
+            return
+        if event == "delete":
+            photo_id = self.registry.id_for(path)
+            if photo_id is None:
+                return
+            with self._lock:
+                for key in [ALL, FAVORITE] + self.keys("media:") + self.keys("month:"):
+                    self._discard(key, [photo_id])
+            return
+
+        with connect(self.metadata_db) as conn:
+            if event == "upsert":
+                row = conn.execute("""
+                    SELECT CASE WHEN json_valid(metadata_json)
+                                THEN json_extract(metadata_json, '$.filesystem.created') END
+                    FROM metadata WHERE file_path = ?
+                """, (path,)).fetchone()
+            elif event == "favorite":
+                row = conn.execute("SELECT 1 FROM favorites WHERE file_path = ?", (path,)).fetchone()
+            else:
+                return
+        photo_id = self.registry.ensure_id(path)
+        with self._lock:
+            if event == "favorite":
+                (self._add if row else self._discard)(FAVORITE, [photo_id])
+            elif row is not None:
+                # The creation month (or the extension) may have changed
+                for key in self.keys("media:") + self.keys("month:"):
+                    self._discard(key, [photo_id])
+                for key in self._metadata_keys(path, row[0]):
+                    self._add(key, [photo_id])
+
+    def discard_photos(self, photo_ids: Iterable[int]) -> None:
+        """Drop photos from every bitmap (bulk delete and trash)."""
+        removed = Bitmap(photo_ids)
+        with self._lock:
+            for bitmap in self._bitmaps.values():
+                bitmap.difference_update(removed)
+
+    def set_favorite(self, photo_ids: Iterable[int], favorite: bool) -> None:
+        """Bulk favorite change without the per-path lookups of on_metadata_change."""
+        with self._lock:
+            (self._add if favorite else self._discard)(FAVORITE, photo_ids)
+
+    def on_tags_change(self, event: str, tag_name: str, photo_ids: List[int]) -> None:
+        """TagsDB listener."""
+        key = tag_key(tag_name)
+        with self._lock:
+            if event == "add":
+                self._add(key, photo_ids)
+            elif event == "remove":
+                self._discard(key, photo_ids)
+            elif event == "delete":
+                self._bitmaps.pop(key, None)
+
+    def on_rating_change(self, event: str, rating: int, photo_ids: List[int]) -> None:
+        """RatingsDB listener; rating 0 clears the rating."""
+        with self._lock:
+            for key in self.keys("rating:"):
+                self._discard(key, photo_ids)
+            if rating:
+                self._add(rating_key(rating), photo_ids)
+
+    def on_album_change(self, event: str, album_id: str, photo_paths: List[str]) -> None:
+        """AlbumsDB listener."""
+        key = album_key(album_id)
+        if event == "delete":
+            with self._lock:
+                self._bitmaps.pop(key, None)
+            return
+        if event == "add":
+            ids = self.registry.ensure_ids(photo_paths)
+        else:
+            ids = self.registry.ids_for(photo_paths)
+        with self._lock:
+            (self._add if event == "add" else self._discard)(key, ids.values())
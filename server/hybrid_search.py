@@ -0,0 +1,218 @@
+"""
+Hybrid Search Engine
+
+Fuses metadata and semantic rankings for /search?mode=hybrid:
+- Each side contributes a bounded, best-first candidate list; neither
+  side is scanned past the depth a page needs
+- Candidates are joined by path in a single dict pass (O(M + S))
+- Fusion is the intent-weighted score blend or weighted reciprocal-rank
+  fusion (RRF)
+- Candidate lists are kept per query and library version and extended
+  from where they stopped, so a deeper page only fetches the missing tail
+- Intent detection results are cached per query
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+# (query, offset, limit) -> hits best first, each with at least "path" and "score"
+CandidateSource = Callable[[str, int, int], List[Dict[str, Any]]]
+
+FUSION_MODES = ("weighted", "rrf")
+
+
+def weights_for_intent(primary_intent: str) -> Tuple[float, float]:
+    """Metadata/semantic weights for a detected primary intent."""
+    # Metadata-heavy intents
+    if primary_intent in ['camera', 'date', 'technical']:
+        return 0.7, 0.3
+    # Semantic-heavy intents
+    elif primary_intent in ['people', 'object', 'scene', 'event', 'emotion', 'activity']:
+        return 0.4, 0.6
+    # Balanced intents
+    elif primary_intent in ['location', 'color']:
+        return 0.5, 0.5
+    # Default balanced
+    else:
+        return 0.6, 0.4
+
+
+def fuse_weighted(metadata: List[Dict[str, Any]], semantic: List[Dict[str, Any]],
+                  weights: Tuple[float, float]) -> List[Dict[str, Any]]:
+    """
+    Blend min-max normalized semantic scores with a fixed metadata credit.
+
+    A path found by both sides scores mw + sw * norm, metadata-only paths
+    mw * 0.8 and semantic-only paths sw * norm.
+    """
+    metadata_weight, semantic_weight = weights
+    normalized: Dict[str, float] = {}
+    if semantic:
+        scores = [s["score"] for s in semantic]
+        low, high = min(scores), max(scores)
+        spread = high - low if high != low else 1.0
+        for s in semantic:
+            normalized.setdefault(s["path"], (s["score"] - low) / spread)
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    for m in metadata:
+        path = m["path"]
+        if path in fused:
+            continue
+        norm = normalized.get(path)
+        if norm is None:
+            score, source = metadata_weight * 0.8, "metadata"
+        else:
+            score, source = metadata_weight * 1.0 + semantic_weight * norm, "both"
+        fused[path] = {"path": path, "score": round(score, 3), "source": source, "intent": "metadata"}
+    for s in semantic:
+        if s["path"] not in fused:
+            fused[s["path"]] = {
+                "path": s["path"],
+                "score": round(semantic_weight * normalized[s["path"]], 3),
+                "source": "semantic",
+                "intent": "semantic",
+                "timestamp": s.get("timestamp"),
+            }
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)
+
+
+def fuse_rrf(metadata: List[Dict[str, Any]], semantic: List[Dict[str, Any]],
+             weights: Tuple[float, float], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Weighted reciprocal-rank fusion: sum of weight / (k + rank) per side.
+
+    Only ranks matter, so the two sides' score scales need no calibration.
+    """
+    metadata_weight, semantic_weight = weights
+    fused: Dict[str, Dict[str, Any]] = {}
+    for rank, m in enumerate(metadata, start=1):
+        if m["path"] not in fused:
+            fused[m["path"]] = {
+                "path": m["path"], "score": metadata_weight / (k + rank), "source": "metadata", "intent": "metadata",
+            }
+    for rank, s in enumerate(semantic, start=1):
+        entry = fused.get(s["path"])
+        if entry is None:
+            fused[s["path"]] = {
+                "path": s["path"], "score": semantic_weight / (k + rank), "source": "semantic",
+                "intent": "semantic", "timestamp": s.get("timestamp"),
+            }
+        elif entry["source"] == "metadata":
+            entry["score"] += semantic_weight / (k + rank)
+            entry["source"] = "both"
+    for entry in fused.values():
+        entry["score"] = round(entry["score"], 6)
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)
+
+
+@dataclass
+class _Candidates:
+    metadata: List[Dict[str, Any]] = field(default_factory=list)
+    semantic: List[Dict[str, Any]] = field(default_factory=list)
+    metadata_exhausted: bool = False
+    semantic_exhausted: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class HybridSearchEngine:
+    """
+    Bounded top-k hybrid ranking over a metadata and a semantic source.
+
+    Args:
+        metadata_source: Ranked metadata matches for (query, offset, limit)
+        semantic_source: Ranked vector hits for (query, offset, limit)
+        detect_intent: Query -> intent result (see IntentDetector.detect_intent)
+        fusion: "weighted" (intent-weighted score blend) or "rrf"
+        rrf_k: RRF damping constant
+        cache_size: Queries whose candidate lists and intents are kept
+    """
+
+    def __init__(self, metadata_source: CandidateSource, semantic_source: CandidateSource,
+                 detect_intent: Callable[[str], Dict[str, Any]], fusion: str = "weighted",
+                 rrf_k: int = 60, cache_size: int = 64):
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode: {fusion}")
+        self.metadata_source = metadata_source
+        self.semantic_source = semantic_source
+        self.detect_intent = detect_intent
+        self.fusion = fusion
+        self.rrf_k = max(1, rrf_k)
+        self.cache_size = max(1, cache_size)
+        self._lock = threading.Lock()
+        self._candidates: "OrderedDict[Tuple[str, Any], _Candidates]" = OrderedDict()
+        self._intents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def intent(self, query: str) -> Dict[str, Any]:
+        with self._lock:
+            cached = self._intents.get(query)
+            if cached is not None:
+                self._intents.move_to_end(query)
+                return cached
+        result = self.detect_intent(query)
+        with self._lock:
+            self._intents[query] = result
+            while len(self._intents) > self.cache_size:
+                self._intents.popitem(last=False)
+        return result
+
+    def _entry(self, query: str, version: Any) -> _Candidates:
+        key = (query, version)
+        with self._lock:
+            entry = self._candidates.get(key)
+            if entry is None:
+                entry = self._candidates[key] = _Candidates()
+            self._candidates.move_to_end(key)
+            while len(self._candidates) > self.cache_size:
+                self._candidates.popitem(last=False)
+            return entry
+
+    @staticmethod
+    def _extend(hits: List[Dict[str, Any]], source: CandidateSource, query: str, depth: int) -> bool:
+        """Fetch hits[len(hits):depth] in place; True when the source ran dry."""
+        missing = depth - len(hits)
+        if missing <= 0:
+            return False
+        more = source(query, len(hits), missing)
+        hits.extend(more)
+        return len(more) < missing
+
+    def search(self, query: str, depth: int, version: Any = None) -> Tuple[List[Dict[str, Any]], bool, Dict[str, Any]]:
+        """
+        Fused ranking covering at least the top `depth` candidates per side.
+
+        Args:
+            query: Normalized query text
+            depth: Candidates needed from each side
+            version: Library version; candidate lists of older versions are not reused
+
+        Returns:
+            (fused results best first, whether both sides were exhausted,
+            ranking extras with the weights and detected intent)
+        """
+        entry = self._entry(query, version)
+        with entry.lock:
+            if not entry.metadata_exhausted:
+                entry.metadata_exhausted = self._extend(entry.metadata, self.metadata_source, query, depth)
+            if not entry.semantic_exhausted:
+                entry.semantic_exhausted = self._extend(entry.semantic, self.semantic_source, query, depth)
+            metadata, semantic = entry.metadata[:depth], entry.semantic[:depth]
+            exhausted = (
+                entry.metadata_exhausted and entry.semantic_exhausted
+                and len(entry.metadata) <= depth and len(entry.semantic) <= depth
+            )
+
+        intent_result = self.intent(query)
+        weights = weights_for_intent(intent_result['primary_intent'])
+        if self.fusion == "rrf":
+            results = fuse_rrf(metadata, semantic, weights, self.rrf_k)
+        else:
+            results = fuse_weighted(metadata, semantic, weights)
+        return results, exhausted, {"weights": weights, "intent_result": intent_result, "fusion": self.fusion}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._candidates.clear()
+            self._intents.clear()
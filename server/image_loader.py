@@ -11,6 +11,14 @@ import logging
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# HEIC/HEIF support; registered here too because CPU-pool workers only import this module
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIF_AVAILABLE = True
+except ImportError:
+    HEIF_AVAILABLE = False
+
 # Create a session with connection pooling and retry strategy
 _session = None
 
@@ -103,6 +111,35 @@ def process_image(image: Image.Image, target_size: int = 512) -> Image.Image:
         
     return image
 
+def render_thumbnail(path: str, size: int, output_format: str = "JPEG") -> bytes:
+    """
+    Decode, downscale and re-encode an image file.
+    
+    Pure function of its arguments so it can run in a worker process.
+    
+    Args:
+        path: Image file
+        size: Maximum dimension (width or height)
+        output_format: PIL format name ("JPEG" or "WEBP")
+        
+    Returns:
+        bytes: Encoded thumbnail
+    """
+    with Image.open(path) as img:
+        # Let the JPEG decoder downscale by a power of two while decoding
+        img.draft("RGB", (size, size))
+        # Convert to RGB if needed (e.g. RGBA or P)
+        if img.mode in ("RGBA", "P") and output_format in ("JPEG", "WEBP"):
+            img = img.convert("RGB")
+        img.thumbnail((size, size))
+        
+        buffer = BytesIO()
+        save_kwargs: Dict[str, Any] = {"quality": 75}
+        if output_format == "WEBP":
+            save_kwargs["method"] = 4
+        img.save(buffer, output_format, **save_kwargs)
+        return buffer.getvalue()
+
 def get_image_metadata(source: Union[str, Path]) -> Dict[str, Any]:
     """
     Extract basic metadata from an image file without fully loading pixel data if possible.
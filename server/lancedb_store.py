@@ -1,19 +1,42 @@
 import os
 import lancedb
+import numpy as np
 import pyarrow as pa
-from typing import List, Dict, Any, Optional, Tuple
+import pyarrow.compute as pc
+from datetime import timedelta
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 from server.config import settings
+from server.quantization import FLOAT16, FLOAT32, INT8, check_dtype, rerank
+from src.cache_manager import library_version
+
+# float32 copy of the vectors kept beside a float16 vector column for re-ranking
+FULL_VECTOR = "vector_full"
 
 class LanceDBStore:
     """
     Production-ready Vector Store using LanceDB.
     Persists embeddings to disk with columnar storage.
+
+    Vectors are stored as float32 or float16 (settings.VECTOR_DTYPE). An
+    existing table keeps the type it was created with until
+    convert_vectors() rewrites it. float16 tables also keep each vector in
+    float32 (FULL_VECTOR): the nearest-neighbour scan reads only the float16
+    column, then settings.VECTOR_RERANK_FACTOR times the requested hits are
+    re-ranked against their float32 copies.
     """
     
-    def __init__(self, table_name: str = "photos"):
+    def __init__(self, table_name: str = "photos", dtype: Optional[str] = None):
         """
         Initialize LanceDB connection.
+
+        Args:
+            table_name: LanceDB table
+            dtype: Vector type for a new table (default settings.VECTOR_DTYPE)
         """
+        self.dtype = check_dtype(dtype or settings.VECTOR_DTYPE)
+        if self.dtype == INT8:
+            # LanceDB only searches float vector columns
+            raise ValueError("LanceDB vector columns support float32 or float16, not int8")
         # Ensure parent directory exists
         persist_path = settings.VECTOR_STORE_PATH
         if not persist_path.exists():
@@ -26,6 +49,39 @@ class LanceDBStore:
         # Open table if exists
         if table_name in self.db.table_names():
             self.table = self.db.open_table(table_name)
+
+    @property
+    def vector_dtype(self) -> str:
+        """Type of the stored vectors (the configured type until the table exists)."""
+        if self.table is None:
+            return self.dtype
+        value_type = self.table.schema.field("vector").type.value_type
+        return FLOAT16 if value_type == pa.float16() else FLOAT32
+
+    @property
+    def has_full_vectors(self) -> bool:
+        """Whether the table keeps float32 copies of float16 vectors."""
+        return self.table is not None and FULL_VECTOR in self.table.schema.names
+
+    @staticmethod
+    def _vector_column(table: pa.Table, dtype: str) -> pa.Table:
+        """
+        table with its vectors stored as dtype.
+
+        float16 adds the FULL_VECTOR float32 copy; float32 restores the
+        vectors from that copy when there is one and drops it.
+        """
+        source = table.column(FULL_VECTOR if FULL_VECTOR in table.schema.names else "vector")
+        if FULL_VECTOR in table.schema.names:
+            table = table.drop_columns([FULL_VECTOR])
+        dimension = len(source[0]) if len(source) else 0
+        full_type = pa.list_(pa.float32(), dimension)
+        index = table.schema.get_field_index("vector")
+        if dtype != FLOAT16:
+            return table.set_column(index, pa.field("vector", full_type), source.cast(full_type))
+        half_type = pa.list_(pa.float16(), dimension)
+        table = table.set_column(index, pa.field("vector", half_type), source.cast(half_type))
+        return table.append_column(pa.field(FULL_VECTOR, full_type), source.cast(full_type))
             
     def get_count(self) -> int:
         """Return total number of vectors."""
@@ -49,12 +105,15 @@ class LanceDBStore:
             metadata_list = [{} for _ in ids]
             
         # Prepare data list for LanceDB
+        full = self.has_full_vectors
         data = []
         for i, doc_id in enumerate(ids):
             item = {
                 "id": doc_id,
                 "vector": embeddings[i],
             }
+            if full:
+                item[FULL_VECTOR] = embeddings[i]
             # Flatten metadata into the item
             if metadata_list[i]:
                 for k, v in metadata_list[i].items():
@@ -67,25 +126,47 @@ class LanceDBStore:
             data.append(item)
             
         if self.table is None:
-            # Create table with the first batch
-            self.table = self.db.create_table(self.table_name, data)
+            # Create table with the first batch, vectors in the configured type
+            self.table = self.db.create_table(
+                self.table_name, self._vector_column(pa.Table.from_pylist(data), self.dtype)
+            )
         else:
-            # Append to existing table
+            # Append to existing table (LanceDB casts to the table's vector type)
             self.table.add(data)
+        library_version.bump()
             
-    def search(self, query_embedding: List[float], limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    def search(self, query_embedding: List[float], limit: int = 20, offset: int = 0,
+               within: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
         """
         Semantic search for similar vectors with pagination.
+
+        `within` limits the search to those ids; the filter is applied before
+        the nearest-neighbour ranking, so the top hits all come from it.
         """
         if self.table is None:
             return []
+        if within is not None:
+            within = list(within)
+            if not within:
+                return []
             
         try:
             # Search using LanceDB with cosine metric
             # For pagination in vector search, we usually need to fetch (limit + offset)
             # and then slice [offset:] to ensure efficient and stable sorting.
             fetch_limit = limit + offset
-            results = self.table.search(query_embedding, vector_column_name="vector").metric("cosine").limit(fetch_limit).to_list()
+            full = self.has_full_vectors
+            if full:
+                fetch_limit *= max(1, settings.VECTOR_RERANK_FACTOR)
+            query = self.table.search(query_embedding, vector_column_name="vector").metric("cosine")
+            if within is not None:
+                id_list = ", ".join("'" + str(doc_id).replace("'", "''") + "'" for doc_id in within)
+                query = query.where(f"id IN ({id_list})", prefilter=True)
+            results = query.limit(fetch_limit).to_list()
+            if full and results:
+                # The scan ranked float16 vectors; re-rank the candidates on their float32 copies
+                order, scores = rerank(query_embedding, [r[FULL_VECTOR] for r in results], limit + offset)
+                results = [dict(results[i], _distance=1.0 - float(score)) for i, score in zip(order, scores)]
             
             # Slice the results for the requested page
             # results[offset : offset + limit]
@@ -94,7 +175,7 @@ class LanceDBStore:
             out = []
             for r in paginated_results:
                 # Extract metadata (all keys except internal ones)
-                reserved = {'vector', '_distance', 'id'}
+                reserved = {'vector', FULL_VECTOR, '_distance', 'id'}
                 meta = {k: v for k, v in r.items() if k not in reserved}
                 
                 # _distance is cosine distance (1 - similarity) for metric="cosine"
@@ -155,7 +236,7 @@ class LanceDBStore:
                 for i in range(start, end):
                     row = {}
                     for col in tbl.column_names:
-                        if col != 'vector':
+                        if col not in ('vector', FULL_VECTOR):
                             row[col] = tbl[col][i].as_py()
                     paginated.append(row)
             
@@ -163,7 +244,7 @@ class LanceDBStore:
             for r in paginated:
                 record = {}
                 for k, v in r.items():
-                    if k not in ('vector', '_distance'):
+                    if k not in ('vector', FULL_VECTOR, '_distance'):
                         record[k] = v
                 # Rename 'id' to 'path' for consistency
                 if 'id' in record:
@@ -179,14 +260,38 @@ class LanceDBStore:
         if self.table:
             # LanceDB supports deletion via SQL filter string
             # "id IN ('id1', 'id2')"
-            id_str = ", ".join([f"'{id}'" for id in ids])
+            if not ids:
+                return
+            id_str = ", ".join("'" + str(doc_id).replace("'", "''") + "'" for doc_id in ids)
             self.table.delete(f"id IN ({id_str})")
+            library_version.bump()
+
+    def convert_vectors(self, dtype: str) -> int:
+        """
+        Rewrite the table with vectors stored as dtype.
+
+        The overwrite is a new table version, so readers see either the old
+        or the new table. Old versions are then deleted to release the disk
+        space, so no other process should have the table open. Returns the
+        number of rows rewritten.
+        """
+        if check_dtype(dtype) == INT8:
+            raise ValueError("LanceDB vector columns support float32 or float16, not int8")
+        self.dtype = dtype
+        if self.table is None or self.vector_dtype == dtype:
+            return 0
+        data = self._vector_column(self.table.to_arrow(), dtype)
+        self.table = self.db.create_table(self.table_name, data, mode="overwrite")
+        self.table.optimize(cleanup_older_than=timedelta(0))
+        library_version.bump()
+        return len(data)
 
     def reset(self):
         """Drop the table - destructive!"""
         if self.table_name in self.db.table_names():
             self.db.drop_table(self.table_name)
             self.table = None
+            library_version.bump()
 
 
 class FaceEmbeddingStore(LanceDBStore):
@@ -367,8 +472,8 @@ class FaceEmbeddingStore(LanceDBStore):
             tbl = self.table.to_arrow()
             face_ids = tbl["id"].to_pylist()
             
-            # Get vectors
-            vectors = tbl["vector"].to_pylist()
+            # Get vectors (full precision when a float32 copy is kept)
+            vectors = tbl[FULL_VECTOR if FULL_VECTOR in tbl.column_names else "vector"].to_pylist()
             embeddings = np.array(vectors)
             
             return face_ids, embeddings
@@ -381,9 +486,115 @@ class FaceEmbeddingStore(LanceDBStore):
         return self.get_count()
 
 
+class VideoFrameStore(LanceDBStore):
+    """
+    Vector store for per-scene video keyframe embeddings (CLIP).
+    
+    Each row is one sampled frame keyed by (video_path, timestamp), so a
+    query can land on any scene of a video rather than a single poster frame.
+    """
+    
+    def __init__(self):
+        """Initialize video frame store with dedicated table."""
+        super().__init__(table_name="video_frames")
+        # Most frames stored for any one video; read lazily, only grows
+        self._max_frames: Optional[int] = None
+    
+    @staticmethod
+    def frame_id(video_path: str, timestamp: float) -> str:
+        """Stable row id for a frame of a video."""
+        return f"{video_path}#t={timestamp:.3f}"
+    
+    def add_video_frames(self, video_path: str, frames: List[Dict]):
+        """
+        Replace the stored frames of a video.
+        
+        Args:
+            video_path: Path to the video (matches the photo store id)
+            frames: List of dicts with keys:
+                - embedding: List[float]
+                - timestamp: float (seconds)
+                - scene_number: int
+        """
+        self.delete_videos([video_path])
+        if not frames:
+            return
+        if self._max_frames is not None:
+            self._max_frames = max(self._max_frames, len(frames))
+            
+        self.add_batch(
+            [self.frame_id(video_path, f['timestamp']) for f in frames],
+            [f['embedding'] for f in frames],
+            [
+                {
+                    'video_path': video_path,
+                    'timestamp': float(f['timestamp']),
+                    'scene_number': int(f.get('scene_number', 0)),
+                }
+                for f in frames
+            ],
+        )
+    
+    def delete_videos(self, video_paths: List[str]):
+        """Delete all frames belonging to the given videos."""
+        if self.table is None or not video_paths:
+            return
+        path_str = ", ".join("'" + p.replace("'", "''") + "'" for p in video_paths)
+        self.table.delete(f"video_path IN ({path_str})")
+        library_version.bump()
+    
+    def max_frames_per_video(self) -> int:
+        """Most frames stored for a single video (at least 1)."""
+        if self._max_frames is None:
+            if self.table is None:
+                return 1
+            paths = self.table.search().select(['video_path']).limit(None).to_arrow()['video_path']
+            counts = pc.value_counts(paths).field('counts')
+            self._max_frames = int(pc.max(counts).as_py() or 0)
+        return max(1, self._max_frames)
+    
+    def search_videos(self, query_embedding: List[float], limit: int = 20,
+                      frames_per_video: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search frames and max-pool scores per video.
+        
+        Args:
+            query_embedding: Text or image embedding
+            limit: Maximum number of videos
+            frames_per_video: Over-fetch factor; defaults to the most frames
+                stored for any video, so distinct videos always fill ``limit``
+            
+        Returns:
+            One hit per video ({'id', 'score', 'timestamp', 'scene_number'}),
+            best-first, where ``timestamp`` is the best-matching frame.
+        """
+        if frames_per_video is None:
+            frames_per_video = self.max_frames_per_video()
+        frame_hits = self.search(query_embedding, limit=limit * max(1, frames_per_video))
+        
+        best: Dict[str, Dict[str, Any]] = {}
+        for hit in frame_hits:
+            meta = hit['metadata']
+            video_path = meta.get('video_path')
+            if not video_path:
+                continue
+            current = best.get(video_path)
+            if current is None or hit['score'] > current['score']:
+                best[video_path] = {
+                    'id': video_path,
+                    'score': hit['score'],
+                    'timestamp': meta.get('timestamp'),
+                    'scene_number': meta.get('scene_number'),
+                }
+                
+        pooled = sorted(best.values(), key=lambda h: h['score'], reverse=True)
+        return pooled[:limit]
+
+
 # Convenience function to get singleton instances
 _photo_store = None
 _face_store = None
+_video_frame_store = None
 
 def get_photo_store() -> LanceDBStore:
     """Get singleton photo embedding store."""
@@ -398,3 +609,10 @@ def get_face_store() -> FaceEmbeddingStore:
     if _face_store is None:
         _face_store = FaceEmbeddingStore()
     return _face_store
+
+def get_video_frame_store() -> VideoFrameStore:
+    """Get singleton video frame embedding store."""
+    global _video_frame_store
+    if _video_frame_store is None:
+        _video_frame_store = VideoFrameStore()
+    return _video_frame_store
@@ -14,6 +14,11 @@ import uuid
 from dataclasses import dataclass
 import math
 
+import numpy as np
+
+from server.spatial_index import ensure_spatial_index, grid_cluster, haversine_m, query_radius
+from server.db_pool import connect
+
 
 @dataclass
 class LocationCluster:
@@ -60,7 +65,7 @@ class LocationClustersDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS photo_locations (
                     photo_path TEXT PRIMARY KEY,
@@ -111,6 +116,8 @@ class LocationClustersDB:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_photo_count ON location_clusters(photo_count)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_cluster_id ON cluster_photos(cluster_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_cluster_photo_path ON cluster_photos(photo_path)")
+            # R*Tree over coordinates for bounding-box prefiltering
+            self.has_spatial_index = ensure_spatial_index(conn)
 
     def add_photo_location(self, 
                           photo_path: str,
@@ -140,12 +147,23 @@ class LocationClustersDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
                 conn.execute(
                     """
-                    INSERT OR REPLACE INTO photo_locations 
+                    INSERT INTO photo_locations 
                     (photo_path, latitude, longitude, original_place_name, corrected_place_name, country, region, city, accuracy)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(photo_path) DO UPDATE SET
+                        latitude = excluded.latitude,
+                        longitude = excluded.longitude,
+                        original_place_name = excluded.original_place_name,
+                        corrected_place_name = excluded.corrected_place_name,
+                        country = excluded.country,
+                        region = excluded.region,
+                        city = excluded.city,
+                        accuracy = excluded.accuracy,
+                        updated_at = CURRENT_TIMESTAMP
                     """,
                     (photo_path, latitude, longitude, original_place_name, corrected_place_name, country, region, city, accuracy)
                 )
@@ -168,7 +186,7 @@ class LocationClustersDB:
             PhotoLocation if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT * FROM photo_locations WHERE photo_path = ?",
@@ -209,47 +227,13 @@ class LocationClustersDB:
             List of photos within the specified radius
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 
-                # Calculate bounds using a simplified approach
-                lat_delta = radius_km / 111.0  # Rough conversion: 1 deg latitude ~ 111 km
-                lng_delta = radius_km / (111.0 * abs(math.cos(math.radians(latitude))))  # Adjust for longitude
-                
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM photo_locations 
-                    WHERE latitude BETWEEN ? AND ? 
-                    AND longitude BETWEEN ? AND ?
-                    """,
-                    (latitude - lat_delta, latitude + lat_delta, 
-                     longitude - lng_delta, longitude + lng_delta)
-                )
-                rows = cursor.fetchall()
-                
-                # Filter by actual distance
-                photos = []
-                for row in rows:
-                    dist = self._calculate_distance(
-                        latitude, longitude, 
-                        row['latitude'], row['longitude']
-                    )
-                    if dist <= radius_km * 1000:  # Convert km to meters
-                        photos.append(PhotoLocation(
-                            photo_path=row['photo_path'],
-                            latitude=row['latitude'],
-                            longitude=row['longitude'],
-                            original_place_name=row['original_place_name'],
-                            corrected_place_name=row['corrected_place_name'],
-                            country=row['country'],
-                            region=row['region'],
-                            city=row['city'],
-                            accuracy=row['accuracy'],
-                            created_at=row['created_at'],
-                            updated_at=row['updated_at']
-                        ))
-                
-                return photos
+                # Bounding-box prefilter via the spatial index, then exact haversine
+                matches = query_radius(conn, latitude, longitude, radius_km * 1000,
+                                       use_rtree=self.has_spatial_index)
+                return [self._row_to_photo_location(row) for row, _ in matches]
         except Exception:
             return []
 
@@ -273,7 +257,7 @@ class LocationClustersDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 update_fields = []
                 params = []
                 
@@ -317,7 +301,7 @@ class LocationClustersDB:
             List of photos with the specified place name
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -356,101 +340,86 @@ class LocationClustersDB:
             List of location clusters
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
-                cursor = conn.execute(
-                    "SELECT photo_path, latitude, longitude FROM photo_locations"
-                )
-                all_locations = cursor.fetchall()
+                all_locations = conn.execute(
+                    """
+                    SELECT photo_path, latitude, longitude, corrected_place_name, original_place_name
+                    FROM photo_locations ORDER BY rowid
+                    """
+                ).fetchall()
+                
+                lats = np.array([loc['latitude'] for loc in all_locations], dtype=np.float64)
+                lngs = np.array([loc['longitude'] for loc in all_locations], dtype=np.float64)
+                
+                # Grid-bucketed grouping instead of an all-pairs distance scan
+                groups = grid_cluster(lats, lngs, max_distance_meters, min_photos)
+                
+                # Re-clustering replaces the previous result
+                conn.execute("DELETE FROM cluster_photos")
+                conn.execute("DELETE FROM location_clusters")
                 
-                # Group locations that are near each other
                 clusters = []
-                processed = set()
+                cluster_rows = []
+                member_rows = []
+                now = datetime.now().isoformat()
                 
-                for location in all_locations:
-                    if location['photo_path'] in processed:
-                        continue
+                for members in groups:
+                    nearby = [all_locations[i] for i in members]
+                    member_lats = lats[members]
+                    member_lngs = lngs[members]
                     
-                    # Find nearby locations
-                    nearby = []
-                    for other_loc in all_locations:
-                        if other_loc['photo_path'] in processed:
-                            continue
-                            
-                        dist = self._calculate_distance(
-                            location['latitude'], location['longitude'],
-                            other_loc['latitude'], other_loc['longitude']
-                        )
-                        
-                        if dist <= max_distance_meters:
-                            nearby.append(other_loc)
+                    # Calculate cluster center and bounding box
+                    center_lat = float(member_lats.mean())
+                    center_lng = float(member_lngs.mean())
+                    min_lat, max_lat = float(member_lats.min()), float(member_lats.max())
+                    min_lng, max_lng = float(member_lngs.min()), float(member_lngs.max())
                     
-                    # Only create cluster if we have enough photos
-                    if len(nearby) >= min_photos:
-                        # Calculate cluster center
-                        center_lat = sum(loc['latitude'] for loc in nearby) / len(nearby)
-                        center_lng = sum(loc['longitude'] for loc in nearby) / len(nearby)
-                        
-                        # Calculate bounding box
-                        min_lat = min(loc['latitude'] for loc in nearby)
-                        max_lat = max(loc['latitude'] for loc in nearby)
-                        min_lng = min(loc['longitude'] for loc in nearby)
-                        max_lng = max(loc['longitude'] for loc in nearby)
-                        
-                        cluster_id = str(uuid.uuid4())
-                        
-                        # Create cluster entry
-                        conn.execute(
-                            """
-                            INSERT OR REPLACE INTO location_clusters
-                            (id, center_lat, center_lng, name, description, photo_count, min_lat, max_lat, min_lng, max_lng)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                cluster_id, center_lat, center_lng,
-                                self._generate_cluster_name(center_lat, center_lng, nearby[:5]),
-                                f"Cluster of {len(nearby)} photos",
-                                len(nearby), min_lat, max_lat, min_lng, max_lng
-                            )
-                        )
-                        
-                        # Create cluster-photo associations
-                        for loc in nearby:
-                            conn.execute(
-                                """
-                                INSERT OR REPLACE INTO cluster_photos
-                                (cluster_id, photo_path, distance_to_center)
-                                VALUES (?, ?, ?)
-                                """,
-                                (
-                                    cluster_id,
-                                    loc['photo_path'],
-                                    self._calculate_distance(
-                                        center_lat, center_lng,
-                                        loc['latitude'], loc['longitude']
-                                    )
-                                )
-                            )
-                            processed.add(loc['photo_path'])
-                        
-                        clusters.append(LocationCluster(
-                            id=cluster_id,
-                            center_lat=center_lat,
-                            center_lng=center_lng,
-                            name=self._generate_cluster_name(center_lat, center_lng, nearby[:5]),
-                            description=f"Cluster of {len(nearby)} photos",
-                            photo_count=len(nearby),
-                            min_lat=min_lat,
-                            max_lat=max_lat,
-                            min_lng=min_lng,
-                            max_lng=max_lng,
-                            created_at=datetime.now().isoformat(),
-                            updated_at=datetime.now().isoformat()
-                        ))
-                    else:
-                        # Mark unclustered photos as processed
-                        for loc in nearby:
-                            processed.add(loc['photo_path'])
+                    cluster_id = str(uuid.uuid4())
+                    name = self._generate_cluster_name(center_lat, center_lng, nearby[:5])
+                    description = f"Cluster of {len(nearby)} photos"
+                    
+                    cluster_rows.append((
+                        cluster_id, center_lat, center_lng, name, description,
+                        len(nearby), min_lat, max_lat, min_lng, max_lng
+                    ))
+                    distances = haversine_m(center_lat, center_lng, member_lats, member_lngs)
+                    member_rows.extend(
+                        (cluster_id, loc['photo_path'], float(dist))
+                        for loc, dist in zip(nearby, distances)
+                    )
+                    
+                    clusters.append(LocationCluster(
+                        id=cluster_id,
+                        center_lat=center_lat,
+                        center_lng=center_lng,
+                        name=name,
+                        description=description,
+                        photo_count=len(nearby),
+                        min_lat=min_lat,
+                        max_lat=max_lat,
+                        min_lng=min_lng,
+                        max_lng=max_lng,
+                        created_at=now,
+                        updated_at=now
+                    ))
+                
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO location_clusters
+                    (id, center_lat, center_lng, name, description, photo_count, min_lat, max_lat, min_lng, max_lng)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    cluster_rows
+                )
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO cluster_photos
+                    (cluster_id, photo_path, distance_to_center)
+                    VALUES (?, ?, ?)
+                    """,
+                    member_rows
+                )
                 
                 return clusters
         except Exception as e:
@@ -468,7 +437,7 @@ class LocationClustersDB:
             List of location clusters
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -508,7 +477,7 @@ class LocationClustersDB:
             List of photos in the cluster
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -548,7 +517,7 @@ class LocationClustersDB:
             LocationCluster if the photo is in a cluster, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -579,6 +548,22 @@ class LocationClustersDB:
         except Exception:
             return None
 
+    def _row_to_photo_location(self, row: sqlite3.Row) -> PhotoLocation:
+        """Convert a photo_locations row into a PhotoLocation."""
+        return PhotoLocation(
+            photo_path=row['photo_path'],
+            latitude=row['latitude'],
+            longitude=row['longitude'],
+            original_place_name=row['original_place_name'],
+            corrected_place_name=row['corrected_place_name'],
+            country=row['country'],
+            region=row['region'],
+            city=row['city'],
+            accuracy=row['accuracy'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at']
+        )
+
     def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """
         Calculate distance between two points in meters using Haversine formula.
@@ -672,7 +657,7 @@ class LocationClustersDB:
             Dictionary with location statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Total photos with location data
                 total_with_location = conn.execute(
                     "SELECT COUNT(*) FROM photo_locations"
@@ -728,7 +713,7 @@ class LocationClustersDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 for path in photo_paths:
                     conn.execute(
                         """
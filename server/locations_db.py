@@ -10,6 +10,9 @@ from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import json
 
+from server.spatial_index import ensure_spatial_index, query_radius
+from server.db_pool import connect
+
 
 class LocationRecord:
     id: str
@@ -40,7 +43,7 @@ class LocationsDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS photo_locations (
                     id TEXT PRIMARY KEY,
@@ -63,6 +66,8 @@ class LocationsDB:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_country ON photo_locations(country)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_region ON photo_locations(region)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_city ON photo_locations(city)")
+            # R*Tree over coordinates for bounding-box prefiltering
+            self.has_spatial_index = ensure_spatial_index(conn)
 
     def add_photo_location(self, 
                           photo_path: str,
@@ -95,7 +100,7 @@ class LocationsDB:
         location_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO photo_locations 
@@ -131,7 +136,7 @@ class LocationsDB:
             Location record if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT * FROM photo_locations WHERE photo_path = ?",
@@ -153,7 +158,7 @@ class LocationsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     """
                     UPDATE photo_locations 
@@ -177,7 +182,7 @@ class LocationsDB:
             List of photo records associated with the place
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -208,28 +213,12 @@ class LocationsDB:
             List of nearby photo locations
         """
         try:
-            # Use Haversine formula to find locations within radius
-            # This is a simplified version using Euclidean approximation for small distances
-            with sqlite3.connect(self.db_path) as conn:
+            # Bounding-box prefilter via the spatial index, then exact haversine
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
-                cursor = conn.execute(
-                    """
-                    SELECT *,
-                           (6371 * acos(cos(radians(?)) * cos(radians(latitude)) * 
-                           cos(radians(longitude) - radians(?)) + 
-                           sin(radians(?)) * sin(radians(latitude)))) AS distance
-                    FROM photo_locations
-                    WHERE (6371 * acos(cos(radians(?)) * cos(radians(latitude)) * 
-                           cos(radians(longitude) - radians(?)) + 
-                           sin(radians(?)) * sin(radians(latitude)))) <= ?
-                    ORDER BY distance
-                    """,
-                      (latitude, longitude, latitude,
-                    latitude, longitude, latitude,
-                    radius_km)
-                )
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                matches = query_radius(conn, latitude, longitude, radius_km * 1000,
+                                       use_rtree=self.has_spatial_index)
+                return [dict(row, distance=distance_m / 1000) for row, distance_m in matches]
         except Exception:
             return []
 
@@ -244,7 +233,7 @@ class LocationsDB:
             List of place clusters with location and photo count
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 # Group by corrected place name first, then by geocoded city/region
                 cursor = conn.execute(
@@ -281,7 +270,7 @@ class LocationsDB:
             Dictionary with location statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 result = conn.execute("SELECT COUNT(*) as total FROM photo_locations").fetchone()
                 total_locations = result['total'] if result else 0
 
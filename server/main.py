@@ -1,6 +1,6 @@
 import sys
 import os
-from typing import List, Optional, Dict, Any, TYPE_CHECKING, Literal, cast
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Set, Tuple, TYPE_CHECKING, Literal, cast
 from pathlib import Path
 
 # Ensure the project root (parent of `server/`) is importable.
@@ -15,7 +15,8 @@ from fastapi import FastAPI, HTTPException, Body, BackgroundTasks, Request, Quer
 from server.jobs import job_store, Job
 from server.pricing import pricing_manager, PricingTier, UsageStats
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import logging
 import mimetypes
@@ -25,12 +26,12 @@ import calendar
 import json
 import uuid
 import hashlib
-import hmac
 import re
-from urllib.parse import urlencode, urlparse, parse_qsl
+from urllib.parse import urlencode
 import requests  # type: ignore
 import sqlite3
 import shutil
+from functools import partial
 from threading import Lock
 from PIL import Image
 
@@ -41,12 +42,31 @@ _rate_last_conf: tuple | None = None
 
 from src.photo_search import PhotoSearch
 from src.api_versioning import api_version_manager, APIResponseHandler
-from src.cache_manager import cache_manager
+from src.cache_manager import cache_manager, library_version
 from src.logging_config import setup_logging, log_search_operation, log_indexing_operation, log_error
 
 from server.config import settings
 from server.sources import SourceStore
 from server.source_items import SourceItemStore
+from server.remote_media import (
+    GoogleDriveClient,
+    PreviewStore,
+    RemoteFileCache,
+    RemotePreview,
+    build_remote_preview,
+    is_remote_path,
+    parse_remote_path,
+    remote_path,
+)
+from server import db_pool
+from server.bulk_ops import DELETE, TRASH, BulkOpsEngine, BulkResult, StorePurger, sqlite_purger
+from server.executors import EndpointLimits, ExecutionPools
+from server.filter_index import FAVORITE, FilterIndex, media_key, month_range, tag_key
+from server.hybrid_search import HybridSearchEngine
+from server.photo_registry import get_photo_registry
+from server.range_response import RangeFileResponse
+from server.s3_sync import S3Client, S3SyncEngine
+from server.zip_stream import ZipEntry, stream_zip, unique_arcnames
 from server.trash_db import TrashDB
 from server.multi_tag_filter_db import get_multi_tag_filter_db, MultiTagFilterDB
 from server.validation import validate_search_query, validate_pagination_params, validate_date_input
@@ -80,10 +100,21 @@ def _runtime_base_dir() -> Path:
                 return Path(td)
     return settings.BASE_DIR
 
+# Blocking and CPU-bound request work runs here, never on the event loop
+execution_pools = ExecutionPools(io_threads=settings.IO_THREADS, cpu_workers=settings.CPU_WORKERS)
+endpoint_limits = EndpointLimits(settings.ENDPOINT_CONCURRENCY, max_waiting=settings.ENDPOINT_QUEUE_LIMIT)
+
+# One PRAGMA profile for every pooled SQLite store connection
+db_pool.configure(db_pool.SQLiteProfile(
+    busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+    cache_size_kb=settings.SQLITE_CACHE_SIZE_KB,
+    mmap_size_mb=settings.SQLITE_MMAP_SIZE_MB,
+))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global embedding_generator, file_watcher, ps_logger, perf_tracker, photo_search_engine
+    global embedding_generator, file_watcher, ps_logger, perf_tracker, photo_search_engine, filter_index
     print("Initializing logging...")
     try:
         ps_logger, perf_tracker = setup_logging(log_level="INFO", log_file="logs/app.log")
@@ -100,14 +131,31 @@ async def lifespan(app: FastAPI):
     print("Initializing Core Logic...")
     try:
         photo_search_engine = PhotoSearch()
+        # Keep smart album membership current as metadata is stored/deleted
+        photo_search_engine.db.add_change_listener(
+            SmartAlbumMaintainer(get_albums_db(), photo_search_engine.db).handle_change
+        )
+        # Any metadata or favorite change invalidates cached search rankings
+        photo_search_engine.db.add_change_listener(lambda event, path: library_version.bump())
+        # `notes:<words>` in metadata queries is answered by the notes full-text index
+        photo_search_engine.query_engine.register_text_field(
+            "notes", get_notes_db(settings.BASE_DIR / "notes.db").matching_paths
+        )
         print("Core Logic Loaded.")
     except Exception as e:
         print(f"Core Logic initialization error: {e}")
 
+    try:
+        filter_index = _open_filter_index()
+        print(f"Filter index ready ({filter_index.loaded_from}).")
+    except Exception as e:
+        # /search falls back to per-request filtering
+        print(f"Filter index unavailable: {e}")
+
     print("Initializing Embedding Model...")
     try:
         from server.watcher import start_watcher
-        embedding_generator = EmbeddingGenerator()
+        _get_embedding_generator()
         print("Embedding Model Loaded.")
         
         # Auto-scan 'media' directory on startup
@@ -125,6 +173,8 @@ async def lifespan(app: FastAPI):
                 """Callback for new files detected by watcher"""
                 try:
                     print(f"Index trigger: {filepath}")
+                    # A file moved while unwatched keeps its id (tags, ratings, notes)
+                    photo_registry.relink(filepath)
                     from src.metadata_extractor import extract_all_metadata
                     
                     metadata = extract_all_metadata(filepath)
@@ -137,8 +187,15 @@ async def lifespan(app: FastAPI):
                 except Exception as e:
                     print(f"Real-time indexing failed for {filepath}: {e}")
 
+            def handle_moved(src: str, dest: str, is_directory: bool):
+                """Renames only re-point registry ids; feature rows follow."""
+                if is_directory:
+                    photo_registry.move_directory(src, dest)
+                else:
+                    photo_registry.move(src, dest)
+
             print("Starting file watcher...")
-            file_watcher = start_watcher(str(media_path), handle_new_file)
+            file_watcher = start_watcher(str(media_path), handle_new_file, on_move=handle_moved)
                 
     except Exception as e:
         print(f"Startup error: {e}")
@@ -149,6 +206,13 @@ async def lifespan(app: FastAPI):
     if file_watcher:
         file_watcher.stop()
         file_watcher.join()
+    execution_pools.shutdown()
+    if filter_index:
+        try:
+            filter_index.save()
+        except Exception as e:
+            print(f"Filter index snapshot failed: {e}")
+    db_pool.close_all()
 
 app = FastAPI(
     title=settings.APP_NAME, 
@@ -186,6 +250,16 @@ async def _ensure_cors_header(request: Request, call_next):
         pass
     return response
 
+@app.middleware("http")
+async def _track_db_usage(request: Request, call_next):
+    """Attribute SQLite statements and time to the matched route (see /db/stats)."""
+    def route_name() -> str:
+        route = request.scope.get("route")
+        return f"{request.method} {route.path}" if route is not None else "unmatched"
+
+    with db_pool.track_endpoint(route_name):
+        return await call_next(request)
+
 # Helper functions for sorting and filtering
 VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v', '.wmv', '.flv'}
 
@@ -349,9 +423,9 @@ def apply_date_filter(results: list, date_from: Optional[str], date_to: Optional
     return filtered
 
 # Initialize Semantic Search Components
-from server.lancedb_store import LanceDBStore
+from server.lancedb_store import LanceDBStore, VideoFrameStore
 from server.embedding_generator import EmbeddingGenerator
-from server.image_loader import load_image
+from server.image_loader import load_image, render_thumbnail
 
 # Initialize Intent Recognition
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -361,14 +435,25 @@ from src.saved_searches import SavedSearchManager
 # Lazily loaded or initialized here
 # Note: EmbeddingGenerator loads a model (~500MB), so it might take a moment on first request or startup
 vector_store = LanceDBStore()
+video_frame_store = VideoFrameStore()  # Per-scene video keyframe embeddings
 embedding_generator = None # Load lazily or on startup
+_embedding_generator_lock = Lock()
 file_watcher = None # Global observer instance
 intent_detector = IntentDetector() # Initialize intent detector
 saved_search_manager = SavedSearchManager() # Initialize saved search manager
 
+# Integer photo ids shared by the per-feature stores (tags, ratings, notes)
+photo_registry = get_photo_registry(settings.BASE_DIR / "photos.db")
+filter_index: Optional[FilterIndex] = None  # Filter bitmaps over registry ids, opened at startup
+
 # Sources (Local + Cloud)
 source_store = SourceStore(settings.BASE_DIR / "sources.db")
 source_item_store = SourceItemStore(settings.BASE_DIR / "sources_items.db")
+# Cloud sources in remote-metadata mode: header previews and on-demand full copies
+remote_previews = PreviewStore(settings.BASE_DIR / "remote_previews")
+remote_file_cache = RemoteFileCache(settings.BASE_DIR / "remote_cache", settings.REMOTE_FILE_CACHE_MB * 1024 * 1024)
+_remote_clients: Dict[str, Any] = {}
+REMOTE_PREVIEW_MAX_SIZE = 320  # Largest thumbnail served from the header preview
 trash_db = TrashDB(settings.BASE_DIR / "trash.db")
 
 # Startup and shutdown now handled by lifespan context manager above
@@ -397,11 +482,14 @@ class S3SourceCreate(BaseModel):
     prefix: Optional[str] = None
     access_key_id: str
     secret_access_key: str
+    force_path_style: bool = False  # Path-style URLs for MinIO and other S3-compatible servers
+    remote_metadata: bool = False  # Index from ranged header reads instead of mirroring objects
 
 class GoogleDriveSourceCreate(BaseModel):
     name: str
     client_id: str
     client_secret: str
+    remote_metadata: bool = False  # Index from ranged header reads instead of mirroring files
 
 def _source_to_out(source_id: str) -> SourceOut:
     s = source_store.get_source(source_id, redact=True)
@@ -439,6 +527,9 @@ async def delete_source(source_id: str):
     except KeyError:
         raise HTTPException(status_code=404, detail="Source not found")
     source_store.delete_source(source_id)
+    client = _remote_clients.pop(source_id, None)
+    if client:
+        client.close()
     return {"ok": True}
 
 @app.post("/sources/{source_id}/rescan")
@@ -473,267 +564,64 @@ async def rescan_source(background_tasks: BackgroundTasks, source_id: str, paylo
     background_tasks.add_task(run_scan, job_id, path, force)
     return {"ok": True, "job_id": job_id}
 
-def _aws_sigv4_headers(
-    *,
-    method: str,
-    url: str,
-    region: str,
-    access_key_id: str,
-    secret_access_key: str,
-    service: str = "s3",
-    headers: Optional[Dict[str, str]] = None,
-) -> Dict[str, str]:
-    """
-    Minimal AWS SigV4 signer for S3-compatible endpoints.
-    """
-    headers = dict(headers or {})
-    u = urlparse(url)
-    host = u.netloc
-    amz_date = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    date_stamp = amz_date[0:8]
-
-    # Canonical query string
-    q = parse_qsl(u.query, keep_blank_values=True)
-    q.sort(key=lambda kv: (kv[0], kv[1]))
-    canonical_qs = "&".join(
-        [
-            f"{requests.utils.quote(str(k), safe='~')}={requests.utils.quote(str(v), safe='~')}"
-            for k, v in q
-        ]
-    )
-
-    canonical_headers = f"host:{host}\n" + f"x-amz-date:{amz_date}\n"
-    signed_headers = "host;x-amz-date"
-    payload_hash = hashlib.sha256(b"").hexdigest()
-    canonical_request = "\n".join([
-        method,
-        u.path or "/",
-        canonical_qs,
-        canonical_headers,
-        signed_headers,
-        payload_hash,
-    ])
-
-    algorithm = "AWS4-HMAC-SHA256"
-    credential_scope = f"{date_stamp}/{region}/{service}/aws4_request"
-    string_to_sign = "\n".join([
-        algorithm,
-        amz_date,
-        credential_scope,
-        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
-    ])
-
-    def _sign(key: bytes, msg: str) -> bytes:
-        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
-
-    k_date = _sign(("AWS4" + secret_access_key).encode("utf-8"), date_stamp)
-    k_region = _sign(k_date, region)
-    k_service = _sign(k_region, service)
-    k_signing = _sign(k_service, "aws4_request")
-    signature = hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
-
-    authorization_header = (
-        f"{algorithm} Credential={access_key_id}/{credential_scope}, "
-        f"SignedHeaders={signed_headers}, Signature={signature}"
-    )
-
-    headers["Authorization"] = authorization_header
-    headers["x-amz-date"] = amz_date
-    headers["host"] = host
-    return headers
-
-def _s3_urls(endpoint_url: str, bucket: str, key: str = "", query: Optional[Dict[str, str]] = None) -> str:
-    base = endpoint_url.rstrip("/")
-    parsed = urlparse(base)
-    if not parsed.scheme or not parsed.netloc:
-        raise ValueError("endpoint_url must include scheme, e.g. https://<host>")
-
-    host = parsed.netloc
-    # Prefer virtual-hosted style unless endpoint already includes bucket.
-    bucket_in_host = host.startswith(f"{bucket}.")
-    if bucket_in_host:
-        path = (parsed.path or "/") + ("/" + key.lstrip("/") if key else "/")
-        netloc = host
-    else:
-        netloc = f"{bucket}.{host}"
-        path = (parsed.path or "/") + ("/" + key.lstrip("/") if key else "/")
-
-    if not path.startswith("/"):
-        path = "/" + path
-    qs = urlencode(query or {})
-    return f"{parsed.scheme}://{netloc}{path}" + (f"?{qs}" if qs else "")
-
-def _s3_list_objects(cfg: Dict[str, object]) -> List[Dict[str, object]]:
-    import xml.etree.ElementTree as ET
-
-    endpoint_url = str(cfg.get("endpoint_url", "")).strip()
-    region = str(cfg.get("region", "")).strip()
-    bucket = str(cfg.get("bucket", "")).strip()
-    prefix = str(cfg.get("prefix", "") or "").strip()
-    access_key_id = str(cfg.get("access_key_id", "")).strip()
-    secret_access_key = str(cfg.get("secret_access_key", "")).strip()
-
-    token: Optional[str] = None
-    out: List[Dict[str, object]] = []
-
-    while True:
-        query: Dict[str, str] = {"list-type": "2", "max-keys": "1000"}
-        if prefix:
-            query["prefix"] = prefix
-        if token:
-            query["continuation-token"] = token
-        url = _s3_urls(endpoint_url, bucket, "", query=query)
-        signed = _aws_sigv4_headers(
-            method="GET",
-            url=url,
-            region=region,
-            access_key_id=access_key_id,
-            secret_access_key=secret_access_key,
-        )
-        resp = requests.get(url, headers=signed, timeout=20)
-        if resp.status_code != 200:
-            raise RuntimeError(f"S3 list failed ({resp.status_code}): {resp.text[:200]}")
-
-        root = ET.fromstring(resp.text)
-        ns = ""
-        if root.tag.startswith("{"):
-            ns = root.tag.split("}")[0] + "}"
-
-        for c in root.findall(f"{ns}Contents"):
-            key = (c.findtext(f"{ns}Key") or "").strip()
-            etag = (c.findtext(f"{ns}ETag") or "").strip().strip('"')
-            last_modified = (c.findtext(f"{ns}LastModified") or "").strip()
-            size = c.findtext(f"{ns}Size")
-            size_int = int(size) if size and size.isdigit() else None
-            if key:
-                out.append({"key": key, "etag": etag or None, "last_modified": last_modified or None, "size": size_int})
-
-        is_truncated = (root.findtext(f"{ns}IsTruncated") or "").strip().lower() == "true"
-        token = (root.findtext(f"{ns}NextContinuationToken") or "").strip() or None
-        if not is_truncated or not token:
-            break
-    return out
-
-def _s3_download_object(cfg: Dict[str, object], key: str, dest: Path) -> None:
-    endpoint_url = str(cfg.get("endpoint_url", "")).strip()
-    region = str(cfg.get("region", "")).strip()
-    bucket = str(cfg.get("bucket", "")).strip()
-    access_key_id = str(cfg.get("access_key_id", "")).strip()
-    secret_access_key = str(cfg.get("secret_access_key", "")).strip()
-
-    url = _s3_urls(endpoint_url, bucket, key)
-    signed = _aws_sigv4_headers(
-        method="GET",
-        url=url,
-        region=region,
-        access_key_id=access_key_id,
-        secret_access_key=secret_access_key,
-    )
-    with requests.get(url, headers=signed, stream=True, timeout=120) as resp:
-        if resp.status_code != 200:
-            raise RuntimeError(f"S3 download failed ({resp.status_code}): {resp.text[:200]}")
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        tmp = dest.with_suffix(dest.suffix + ".part")
-        with open(tmp, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
-        tmp.replace(dest)
-
 def _test_s3_connection(cfg: Dict[str, object]) -> None:
-    endpoint_url = str(cfg.get("endpoint_url", "")).strip()
-    region = str(cfg.get("region", "")).strip()
-    bucket = str(cfg.get("bucket", "")).strip()
-    access_key_id = str(cfg.get("access_key_id", "")).strip()
-    secret_access_key = str(cfg.get("secret_access_key", "")).strip()
-    if not endpoint_url or not region or not bucket or not access_key_id or not secret_access_key:
-        raise ValueError("Missing required S3 configuration fields")
-    prefix = str(cfg.get("prefix", "") or "").strip()
-    url = _s3_urls(endpoint_url, bucket, "", query={"list-type": "2", "max-keys": "1", **({"prefix": prefix} if prefix else {})})
-    signed = _aws_sigv4_headers(
-        method="GET",
-        url=url,
-        region=region,
-        access_key_id=access_key_id,
-        secret_access_key=secret_access_key,
-    )
-    resp = requests.get(url, headers=signed, timeout=15)
-    if resp.status_code != 200:
-        raise RuntimeError(f"S3 connection failed ({resp.status_code}): {resp.text[:200]}")
+    client = S3Client(cfg, max_connections=1)
+    try:
+        client.test_connection()
+    finally:
+        client.close()
 
 def _sync_s3_source(source_id: str, job_id: str) -> None:
     job_store.update_job(job_id, status="processing", message="Enumerating S3…", progress=5)
     src = source_store.get_source(source_id, redact=False)
     cfg = src.config or {}
-    items = _s3_list_objects(cfg)
-    seen_marker = datetime.now(timezone.utc).isoformat()
-
-    job_store.update_job(job_id, message=f"Found {len(items)} objects. Downloading…", progress=20)
     root = _media_source_root(source_id) / "s3"
     root.mkdir(parents=True, exist_ok=True)
-    downloaded = 0
-
-    for idx, it in enumerate(items):
-        key = str(it.get("key", ""))
-        if not key:
-            continue
-        name = key.split("/")[-1]
-        if not _is_media_name(name):
-            continue
-
-        etag = it.get("etag")
-        modified = it.get("last_modified")
-        size = it.get("size")
-        size_int = int(size) if isinstance(size, int) else None
 
-        remote_id = key
-        try:
-            prev = source_item_store.get(source_id, remote_id)
-        except Exception:
-            prev = None
-
-        source_item_store.upsert_seen(
-            source_id=source_id,
-            remote_id=remote_id,
-            remote_path=key,
-            etag=str(etag) if etag else None,
-            modified_at=str(modified) if modified else None,
-            size_bytes=size_int,
-            mime_type=None,
-            name=name,
+    remote = bool(cfg.get("remote_metadata"))
+
+    def index_downloaded(paths: List[str]) -> None:
+        # Runs while later downloads are still in flight
+        if remote:
+            return
+        photo_search_engine.extractor.extract_files(paths, force=True)
+        process_semantic_indexing(paths)
+
+    def report_progress(done: int, total: int) -> None:
+        if done % 50 == 0 or done == total:
+            pct = 20 + int((done / max(1, total)) * 70)
+            job_store.update_job(job_id, message=f"Downloading and indexing S3 objects… ({done}/{total})", progress=pct)
+
+    client = S3Client(cfg, max_connections=settings.S3_SYNC_WORKERS)
+    try:
+        engine = S3SyncEngine(
+            client,
+            source_item_store,
+            source_id,
+            root,
+            is_media=_is_media_name,
+            max_workers=settings.S3_SYNC_WORKERS,
+            on_downloaded=index_downloaded,
+            on_progress=report_progress,
+            previews=remote_previews if remote else None,
+            on_indexed=_index_remote_previews,
+            header_bytes=settings.REMOTE_HEADER_BYTES,
+            unindexed=photo_search_engine.db.paths_without_metadata,
         )
+        job_store.update_job(job_id, message="Listing and comparing S3 objects…", progress=20)
+        result = engine.run()
+    finally:
+        client.close()
 
-        # Respect app-level states: keep in manifest, but do not download/index.
-        if prev and prev.status in ("trashed", "removed"):
-            continue
-
-        # Mirror path under root, preserving prefix structure.
-        rel = Path(key)
-        dest = root / rel
-        needs_download = not dest.exists()
-        if prev and prev.etag and etag and prev.etag != str(etag):
-            needs_download = True
-        if prev and prev.size_bytes and size_int and prev.size_bytes != size_int:
-            needs_download = True
-        if prev and prev.local_path and not Path(prev.local_path).exists():
-            needs_download = True
-
-        if needs_download:
-            _s3_download_object(cfg, key, dest)
-            source_item_store.set_local_path(source_id, remote_id, str(dest))
-            downloaded += 1
-
-        if idx % 50 == 0:
-            pct = 20 + int((idx / max(1, len(items))) * 55)
-            job_store.update_job(job_id, message=f"Downloading S3 objects… ({idx}/{len(items)})", progress=pct)
-
-    missing = source_item_store.mark_missing_as_deleted(source_id, seen_marker)
-    for m in missing:
+    for m in result.removed:
         if m.local_path:
             try:
-                lp = Path(m.local_path)
-                if lp.exists():
-                    lp.unlink()
+                if is_remote_path(m.local_path):
+                    _discard_remote_copies(m.local_path, m.name)
+                else:
+                    lp = Path(m.local_path)
+                    if lp.exists():
+                        lp.unlink()
                 try:
                     photo_search_engine.db.mark_as_deleted(m.local_path, reason="source_deleted")
                 except Exception:
@@ -741,20 +629,21 @@ def _sync_s3_source(source_id: str, job_id: str) -> None:
             except Exception:
                 pass
 
-    job_store.update_job(job_id, message="Indexing downloaded files…", progress=80)
-    results = photo_search_engine.scan(str(root), force=False)
-    all_files = results.get("all_files", []) if isinstance(results, dict) else []
-    if all_files:
-        job_store.update_job(job_id, message="Semantic indexing…", progress=92)
-        process_semantic_indexing(all_files)
-
     source_store.update_source(source_id, status="connected", last_error=None, last_sync_at=datetime.utcnow().isoformat() + "Z")
+    message = f"S3 sync complete ({result.downloaded} {'indexed' if remote else 'downloaded'}, {len(result.removed)} removed"
+    message += f", {len(result.failed)} failed)." if result.failed else ")."
     job_store.update_job(
         job_id,
         status="completed",
         progress=100,
-        message=f"S3 sync complete ({downloaded} downloaded, {len(missing)} removed).",
-        result={"downloaded": downloaded, "removed": len(missing)},
+        message=message,
+        result={
+            "downloaded": result.downloaded,
+            "removed": len(result.removed),
+            "skipped": result.skipped,
+            "reindexed": result.reindexed,
+            "failed": len(result.failed),
+        },
     )
 
 @app.post("/sources/local-folder")
@@ -882,6 +771,75 @@ def _get_google_access_token(source_id: str) -> str:
     patch = _refresh_google_access_token(source_id)
     return str(patch.get("access_token", ""))
 
+def _remote_client(source_id: str):
+    """Ranged-read client for a cloud source, shared across requests."""
+    client = _remote_clients.get(source_id)
+    if client is None:
+        src = source_store.get_source(source_id, redact=False)
+        if src.type == "s3":
+            client = S3Client(src.config or {}, max_connections=settings.S3_SYNC_WORKERS)
+        elif src.type == "google_drive":
+            client = GoogleDriveClient(lambda: _get_google_access_token(source_id))
+        else:
+            raise ValueError(f"Source type {src.type} has no remote reads")
+        _remote_clients[source_id] = client
+    return client
+
+def _remote_item_name(source_id: str, remote_id: str) -> Optional[str]:
+    try:
+        return source_item_store.get(source_id, remote_id).name
+    except KeyError:
+        return None
+
+def _remote_local_file(path: str) -> Path:
+    """
+    Full local copy of a cloud path, fetched into the bounded cache on first use.
+
+    Only objects in the source's manifest are fetched; arbitrary keys under a
+    source raise FileNotFoundError.
+    """
+    parsed = parse_remote_path(path)
+    if not parsed:
+        return Path(path)
+    source_id, remote_id = parsed
+    try:
+        item = source_item_store.get(source_id, remote_id)
+    except KeyError:
+        item = None
+    if item is None or item.status == "deleted":
+        raise FileNotFoundError(f"Not a known item of source {source_id}")
+    client = _remote_client(source_id)
+    return remote_file_cache.get(source_id, remote_id, client.download, name=item.name)
+
+def _discard_remote_copies(path: str, name: Optional[str] = None) -> None:
+    parsed = parse_remote_path(path)
+    if parsed:
+        remote_previews.discard(path)
+        remote_file_cache.discard(*parsed, name=name)
+
+def _index_remote_previews(previews: List[RemotePreview]) -> List[RemotePreview]:
+    """
+    Store header metadata for cloud objects and embed their previews.
+
+    Returns the previews that were indexed; callers record the manifest
+    local_path only for those, so the rest are retried on the next sync.
+    """
+    stored: List[RemotePreview] = []
+    for preview in previews:
+        try:
+            # The ETag stands in for the content hash; there is no local file to hash
+            photo_search_engine.db.store_metadata(preview.path, preview.metadata, file_hash=preview.etag or "")
+        except Exception as e:
+            logger.error(f"Remote indexing failed for {preview.path}: {e}")
+            continue
+        stored.append(preview)
+    try:
+        process_semantic_indexing([p.path for p in stored if p.preview_path])
+    except Exception as e:
+        logger.error(f"Semantic indexing of {len(stored)} remote items failed: {e}")
+        return []
+    return stored
+
 def _sync_google_drive_source(source_id: str, job_id: str) -> None:
     job_store.update_job(job_id, status="processing", message="Enumerating Google Drive…", progress=5)
     token = _get_google_access_token(source_id)
@@ -914,9 +872,12 @@ def _sync_google_drive_source(source_id: str, job_id: str) -> None:
         if not page_token:
             break
 
-    job_store.update_job(job_id, message=f"Found {len(files)} Drive items. Downloading…", progress=20)
+    remote = bool((source_store.get_source(source_id, redact=False).config or {}).get("remote_metadata"))
+    job_store.update_job(job_id, message=f"Found {len(files)} Drive items. {'Indexing' if remote else 'Downloading'}…", progress=20)
     root = _media_source_root(source_id) / "drive"
     root.mkdir(parents=True, exist_ok=True)
+    drive = _remote_client(source_id) if remote else None
+    indexed: List[RemotePreview] = []
 
     downloaded = 0
     for idx, f in enumerate(files):
@@ -951,6 +912,33 @@ def _sync_google_drive_source(source_id: str, job_id: str) -> None:
         if prev and prev.status in ("trashed", "removed"):
             continue
 
+        if remote:
+            virtual = remote_path(source_id, file_id)
+            stale = (
+                prev is None
+                or prev.local_path != virtual
+                or bool(prev.etag and md5 and prev.etag != str(md5))
+                or bool(prev.modified_at and modified and prev.modified_at != str(modified))
+            )
+            if stale:
+                try:
+                    indexed.append(build_remote_preview(
+                        drive, source_id, file_id, remote_previews,
+                        name=name,
+                        size_bytes=size_int,
+                        modified=str(modified) if modified else None,
+                        etag=str(md5) if md5 else None,
+                        header_bytes=settings.REMOTE_HEADER_BYTES,
+                    ))
+                except Exception as e:
+                    # Cleared, so the next sync retries it even if unchanged by then
+                    logger.warning(f"Drive header read failed for {file_id}: {e}")
+                    source_item_store.set_local_path(source_id, file_id, None)
+            if idx % 25 == 0:
+                pct = 20 + int((idx / max(1, len(files))) * 55)
+                job_store.update_job(job_id, message=f"Indexing Drive items… ({idx}/{len(files)})", progress=pct)
+            continue
+
         safe = _safe_filename(name)
         local_path = root / f"{file_id}__{safe}"
         needs_download = not local_path.exists()
@@ -981,6 +969,9 @@ def _sync_google_drive_source(source_id: str, job_id: str) -> None:
                 tmp.replace(local_path)
             source_item_store.set_local_path(source_id, file_id, str(local_path))
             downloaded += 1
+        elif prev is None or prev.local_path != str(local_path):
+            # Already mirrored (e.g. the manifest was reset); the scan below indexes it if needed
+            source_item_store.set_local_path(source_id, file_id, str(local_path))
 
         if idx % 25 == 0:
             pct = 20 + int((idx / max(1, len(files))) * 55)
@@ -990,9 +981,12 @@ def _sync_google_drive_source(source_id: str, job_id: str) -> None:
     for m in missing:
         if m.local_path:
             try:
-                lp = Path(m.local_path)
-                if lp.exists():
-                    lp.unlink()
+                if is_remote_path(m.local_path):
+                    _discard_remote_copies(m.local_path, m.name)
+                else:
+                    lp = Path(m.local_path)
+                    if lp.exists():
+                        lp.unlink()
                 try:
                     photo_search_engine.db.mark_as_deleted(m.local_path, reason="source_deleted")
                 except Exception:
@@ -1000,25 +994,35 @@ def _sync_google_drive_source(source_id: str, job_id: str) -> None:
             except Exception:
                 pass
 
-    job_store.update_job(job_id, message="Indexing downloaded files…", progress=80)
-    results = photo_search_engine.scan(str(root), force=False)
-    all_files = results.get("all_files", []) if isinstance(results, dict) else []
-    if all_files:
-        job_store.update_job(job_id, message="Semantic indexing…", progress=92)
-        process_semantic_indexing(all_files)
+    if remote:
+        if indexed:
+            job_store.update_job(job_id, message="Semantic indexing…", progress=92)
+            # The manifest marks items indexed only once metadata and embeddings are stored
+            stored = {preview.path for preview in _index_remote_previews(indexed)}
+            for preview in indexed:
+                ok = preview.path in stored
+                source_item_store.set_local_path(source_id, parse_remote_path(preview.path)[1], preview.path if ok else None)
+                downloaded += ok
+    else:
+        job_store.update_job(job_id, message="Indexing downloaded files…", progress=80)
+        results = photo_search_engine.scan(str(root), force=False)
+        all_files = results.get("all_files", []) if isinstance(results, dict) else []
+        if all_files:
+            job_store.update_job(job_id, message="Semantic indexing…", progress=92)
+            process_semantic_indexing(all_files)
 
     source_store.update_source(source_id, status="connected", last_error=None, last_sync_at=datetime.utcnow().isoformat() + "Z")
     job_store.update_job(
         job_id,
         status="completed",
         progress=100,
-        message=f"Drive sync complete ({downloaded} downloaded, {len(missing)} removed).",
+        message=f"Drive sync complete ({downloaded} {'indexed' if remote else 'downloaded'}, {len(missing)} removed).",
         result={"downloaded": downloaded, "removed": len(missing)},
     )
 
 @app.post("/sources/google-drive")
 async def add_google_drive_source(payload: GoogleDriveSourceCreate):
-    cfg = {"client_id": payload.client_id, "client_secret": payload.client_secret}
+    cfg = {"client_id": payload.client_id, "client_secret": payload.client_secret, "remote_metadata": payload.remote_metadata}
     src = source_store.create_source("google_drive", name=payload.name, config=cfg, status="auth_required")
     state_nonce = str(uuid.uuid4())
     source_store.update_source(src.id, config_patch={"state_nonce": state_nonce})
@@ -1174,13 +1178,25 @@ class SearchCountRequest(BaseModel):
 async def root():
     return {"status": "ok", "message": "PhotoSearch API is running"}
 
+def _get_embedding_generator() -> EmbeddingGenerator:
+    """
+    The shared CLIP generator, loaded once on first use.
+
+    Loading the model blocks for seconds, so call this from the I/O pool
+    or a worker thread, never on the event loop.
+    """
+    global embedding_generator
+    if embedding_generator is None:
+        with _embedding_generator_lock:
+            if embedding_generator is None:
+                embedding_generator = EmbeddingGenerator()
+    return embedding_generator
+
 def process_semantic_indexing(files_to_index: List[str]):
     """
     Helper to generate embeddings for a list of file paths.
     """
-    global embedding_generator
-    if not embedding_generator:
-        embedding_generator = EmbeddingGenerator()
+    embedding_generator = _get_embedding_generator()
         
     print(f"Indexing {len(files_to_index)} files for semantic search...")
     
@@ -1208,6 +1224,17 @@ def process_semantic_indexing(files_to_index: List[str]):
             print(f"  Processed {i}/{len(files_to_process)}...")
             
         try:
+            # Cloud objects in remote-metadata mode are embedded from their header preview
+            if is_remote_path(file_path):
+                preview_path = remote_previews.get(file_path)
+                img = load_image(str(preview_path)) if preview_path else None
+                vec = embedding_generator.generate_image_embedding(img) if img else None
+                if vec:
+                    ids.append(file_path)
+                    vectors.append(vec)
+                    metadatas.append({"path": file_path, "filename": os.path.basename(file_path), "type": "image"})
+                continue
+
             # Check for valid image or video extensions
             valid_img_exts = ['.jpg', '.jpeg', '.png', '.bmp', '.webp', '.gif', '.heic', '.tiff', '.tif']
             valid_vid_exts = ['.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v']
@@ -1220,6 +1247,18 @@ def process_semantic_indexing(files_to_index: List[str]):
             
             img = None
             if is_video:
+                # Prefer per-scene keyframe embeddings; fall back to a single frame
+                video_vec = _embed_video_scenes(file_path)
+                if video_vec:
+                    ids.append(file_path)
+                    vectors.append(video_vec)
+                    metadatas.append({
+                        "path": file_path,
+                        "filename": os.path.basename(file_path),
+                        "type": "video"
+                    })
+                    continue
+
                 from server.image_loader import extract_video_frame
                 # Extract frame
                 try:
@@ -1250,6 +1289,76 @@ def process_semantic_indexing(files_to_index: List[str]):
         vector_store.add_batch(ids, vectors, metadatas)
         print(f"Added {len(ids)} vectors to LanceDB in {__import__('time').time() - time_start:.2f}s.")
 
+def _embed_video_scenes(file_path: str) -> Optional[List[float]]:
+    """
+    Embed one keyframe per scene of a video into the video frame store.
+
+    Keyframes come from the VideoAnalyzer (re-used when the video is unchanged,
+    analyzed without OCR otherwise, since only the frames are needed here) and
+    are embedded in a single batch, capped by VIDEO_MAX_SCENE_EMBEDDINGS.
+    Returns the normalized mean of the scene vectors for the video's row in the
+    photo store, or None if the video could not be analyzed.
+    """
+    try:
+        analysis = video_analyzer.analyze_video(file_path, ocr=False)
+        if analysis.get("status") == "failed" or "error" in analysis:
+            return None
+        keyframes = video_analyzer.get_scene_keyframes(file_path, settings.VIDEO_MAX_SCENE_EMBEDDINGS)
+    except Exception as e:
+        print(f"Scene analysis unavailable for {os.path.basename(file_path)}: {e}")
+        return None
+
+    images = []
+    frames = []
+    for keyframe in keyframes:
+        frame_path = keyframe.get("frame_path")
+        if not frame_path or not os.path.exists(frame_path):
+            continue
+        try:
+            images.append(load_image(frame_path).convert("RGB"))
+        except ValueError:
+            continue
+        frames.append({"timestamp": keyframe["timestamp"], "scene_number": keyframe.get("scene_id") or 0})
+
+    if not images:
+        return None
+
+    scene_vectors = _get_embedding_generator().generate_image_embeddings(images)
+    for frame, vec in zip(frames, scene_vectors):
+        frame["embedding"] = vec
+    video_frame_store.add_video_frames(file_path, frames)
+
+    mean = [sum(col) / len(scene_vectors) for col in zip(*scene_vectors)]
+    norm = sum(v * v for v in mean) ** 0.5 or 1.0
+    return [v / norm for v in mean]
+
+
+def _merge_video_scene_hits(photo_hits: List[Dict[str, Any]], video_hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge max-pooled per-video scene hits into photo store hits.
+
+    A video's score is the best of its poster row and its best scene; the
+    winning scene's timestamp is attached so the UI can seek to it.
+    """
+    merged = {hit["id"]: hit for hit in photo_hits}
+    for video_hit in video_hits:
+        video_path = video_hit["id"]
+        existing = merged.get(video_path)
+        if existing is not None and existing["score"] >= video_hit["score"]:
+            continue
+        metadata = existing["metadata"] if existing else {
+            "path": video_path,
+            "filename": os.path.basename(video_path),
+            "type": "video",
+        }
+        merged[video_path] = {
+            "id": video_path,
+            "score": video_hit["score"],
+            "metadata": metadata,
+            "timestamp": video_hit["timestamp"],
+        }
+    return sorted(merged.values(), key=lambda hit: hit["score"], reverse=True)
+
 @app.post("/scan")
 async def scan_directory(
     background_tasks: BackgroundTasks,
@@ -1349,6 +1458,324 @@ api_version_manager.register_endpoint(
     description="Semantic search using CLIP embeddings"
 )
 
+# Default similarity cutoff for text-to-image matches
+DEFAULT_SEMANTIC_MIN_SCORE = 0.22
+
+def _normalize_search_query(query: str) -> str:
+    """Collapse whitespace so equivalent queries share a cached ranking."""
+    return " ".join((query or "").split())
+
+def _search_cache_depth(offset: int, limit: int) -> int:
+    """Ranking depth covering a page, rounded up so neighbouring pages share it."""
+    step = max(1, settings.SEARCH_CACHE_DEPTH_STEP)
+    return max(step, -(-(offset + limit) // step) * step)
+
+def _get_cached_search_ranking(query: str, params: Dict[str, Any], version: int, needed: int) -> Optional[Dict[str, Any]]:
+    """
+    Cached ranking for normalized search parameters at a library version.
+
+    A ranking is only usable when it is complete or at least `needed` deep.
+    """
+    ranking = cache_manager.get_cached_search_results(query, {**params, "library_version": version})
+    if ranking and (ranking["exhausted"] or ranking["depth"] >= needed):
+        return ranking
+    return None
+
+def _cache_search_ranking(query: str, params: Dict[str, Any], version: int, results: List[Dict[str, Any]],
+                          depth: int, exhausted: bool, **extra: Any) -> Dict[str, Any]:
+    """
+    Cache an ordered ranking as compact items instead of enriched results.
+
+    Items keep the path, score and per-mode fields (timestamp, source,
+    intent); metadata and match explanations are rebuilt for each page.
+    The version is read before ranking, so a write that lands meanwhile
+    leaves this entry unreachable rather than stale.
+    """
+    items = [
+        {k: r[k] for k in ("path", "score", "timestamp", "source", "intent") if r.get(k) is not None}
+        for r in results
+    ]
+    ranking = {"items": items, "depth": depth, "exhausted": exhausted, **extra}
+    cache_manager.cache_search_results(
+        query, {**params, "library_version": version}, ranking, ttl=settings.SEARCH_CACHE_TTL
+    )
+    return ranking
+
+def _attach_metadata(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Load stored metadata onto ranking candidates (needed to filter and sort)."""
+    for r in results:
+        r["metadata"] = photo_search_engine.db.get_metadata_by_path(r["path"]) or {}
+    return results
+
+def _hydrate_search_page(items: List[Dict[str, Any]], explain: Optional[Callable[[dict], dict]] = None) -> List[Dict[str, Any]]:
+    """Rebuild full results for one page of cached ranking items."""
+    page = []
+    for item in items:
+        path = item["path"]
+        result = {
+            "path": path,
+            "filename": os.path.basename(path),
+            "score": item["score"],
+            "metadata": photo_search_engine.db.get_metadata_by_path(path) or {},
+        }
+        result.update({k: v for k, v in item.items() if k not in result})
+        if explain is not None:
+            result["matchExplanation"] = explain(result)
+        page.append(result)
+    return page
+
+def _is_cloud_path(p: str) -> bool:
+    if not p:
+        return False
+    lower = p.lower()
+    return lower.startswith("http://") or lower.startswith("https://") or lower.startswith("s3://") or lower.startswith("cloud:") or lower.startswith("gdrive:") or "amazonaws.com" in lower or lower.startswith("dropbox:") or lower.startswith("onedrive:")
+
+def _is_local_path(p: str) -> bool:
+    if not p:
+        return False
+    return bool(re.match(r'^[A-Za-z]:\\|^/|^file://|^~/', p))
+
+def _open_filter_index() -> FilterIndex:
+    """Load (or rebuild) the filter bitmaps and keep them current from the stores' writes."""
+    tags_db = get_tags_db(settings.BASE_DIR / "tags.db")
+    ratings_db = get_ratings_db(settings.BASE_DIR / "ratings.db")
+    albums_db = get_albums_db()
+    index = FilterIndex(
+        photo_registry,
+        is_video=is_video_file,
+        metadata_db=photo_search_engine.db.db_path,
+        tags_db=tags_db,
+        ratings_db=ratings_db,
+        albums_db=albums_db,
+        snapshot_path=settings.BASE_DIR / settings.FILTER_INDEX_SNAPSHOT,
+    )
+    index.load_or_rebuild()
+    photo_search_engine.db.add_change_listener(index.on_metadata_change)
+    tags_db.add_change_listener(index.on_tags_change)
+    ratings_db.add_change_listener(index.on_rating_change)
+    albums_db.add_change_listener(index.on_album_change)
+    return index
+
+def _tag_names(tag: Optional[str], tags: Optional[str]) -> List[str]:
+    # Handle both single tag and multiple tags, skipping empty names
+    return [t.strip() for t in tags.split(',') if t.strip()] if tags else ([tag] if tag else [])
+
+def _search_filter_bitmap(tag: Optional[str], tags: Optional[str], tag_logic: str, type_filter: str,
+                          favorites_filter: str, date_from: Optional[str], date_to: Optional[str],
+                          filter_expr: Optional[Dict[str, Any]]):
+    """
+    The /search structured filters as one filter-index bitmap.
+
+    Returns None when the index is not loaded or no structured filter is
+    set. The date range only narrows to whole months; the exact bounds are
+    still checked per result.
+    """
+    if filter_index is None:
+        return None
+    terms: List[Any] = []
+    if tag or tags:
+        terms.append({tag_logic.lower(): [tag_key(name) for name in _tag_names(tag, tags)]})
+    if type_filter != "all":
+        terms.append(media_key("video" if type_filter == "videos" else "photo"))
+    if favorites_filter == "favorites_only":
+        terms.append(FAVORITE)
+    start = _parse_month_or_date(date_from, end=False)
+    end = _parse_month_or_date(date_to, end=True)
+    if start or end:
+        terms.append(month_range(
+            filter_index.keys("month:"),
+            start.strftime("%Y-%m") if start else None,
+            end.strftime("%Y-%m") if end else None,
+        ))
+    if filter_expr is not None:
+        terms.append(filter_expr)
+    return filter_index.evaluate({"and": terms}) if terms else None
+
+def _prefilter_paths(bitmap) -> Optional[Set[str]]:
+    """Paths of a selective filter, used to restrict scans and the vector search up front."""
+    if bitmap is None or len(bitmap) > settings.FILTER_PREFILTER_MAX_IDS:
+        return None
+    return filter_index.matching_paths(bitmap)
+
+def _resolve_tagged_paths(tag: Optional[str], tags: Optional[str], tag_logic: str) -> Optional[set]:
+    """Paths matching the tag filter, or None when no tag filter was given."""
+    if not (tag or tags):
+        return None
+    try:
+        from server.tags_db import get_tags_db
+
+        tags_db = get_tags_db(settings.BASE_DIR / "tags.db")
+
+        names = _tag_names(tag, tags)
+        if not names:
+            return set() if tag_logic.upper() != "AND" else None
+        # AND/OR is evaluated in one query over photo ids
+        return set(tags_db.registry.filter_paths(tags_db=tags_db.db_path, tags=names, tag_logic=tag_logic))
+    except Exception as e:
+        print(f"Tag filtering error: {e}")
+        return set()
+
+def _apply_search_filters(results: list, filter_bitmap, tag: Optional[str], tags: Optional[str], tag_logic: str,
+                          type_filter: str, favorites_filter: str, source_filter: str,
+                          date_from: Optional[str], date_to: Optional[str]) -> list:
+    """Apply the /search tag, type, favorites, date and source filters, preserving order."""
+    if filter_bitmap is not None:
+        # Tags, media type, favorites and months were combined in the filter index
+        allowed = filter_index.matching_paths(filter_bitmap, [r.get("path") for r in results])
+        results = [r for r in results if r.get("path") in allowed]
+    else:
+        tagged_paths = _resolve_tagged_paths(tag, tags, tag_logic)
+        if tagged_paths is not None:
+            results = [r for r in results if r.get("path") in tagged_paths]
+
+        if type_filter == "photos":
+            results = [r for r in results if not is_video_file(r.get('path', ''))]
+        elif type_filter == "videos":
+            results = [r for r in results if is_video_file(r.get('path', ''))]
+
+        if favorites_filter == "favorites_only":
+            results = [r for r in results if photo_search_engine.is_favorite(r.get('path', ''))]
+
+    # Date filter (filesystem.created)
+    results = apply_date_filter(results, date_from, date_to)
+
+    if source_filter == "local":
+        results = [r for r in results if _is_local_path(r.get('path', ''))]
+    elif source_filter == "cloud":
+        results = [r for r in results if _is_cloud_path(r.get('path', ''))]
+    elif source_filter == "hybrid":
+        results = [r for r in results if (not _is_local_path(r.get('path', '')) and not _is_cloud_path(r.get('path', '')))]
+    return results
+
+def _semantic_hits(query: str, depth: int, within: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Top `depth` vector hits for a text query, best first, without metadata.
+
+    An empty query lists the library in store order with a score of 0.
+    `within` restricts the photo vector search to those paths up front.
+    """
+    if not query:
+        return [
+            {
+                "path": r.get('path', r.get('id', '')),
+                "filename": r.get('filename', os.path.basename(r.get('path', r.get('id', '')))),
+                "score": 0,
+            }
+            for r in vector_store.get_all_records(limit=depth, offset=0)
+        ]
+
+    text_vec = _get_embedding_generator().generate_text_embedding(query)
+
+    if video_frame_store.get_count():
+        # Videos are ranked by their best-matching scene (max pooling), so
+        # both stores are fetched from the top and merged
+        video_hits = video_frame_store.search_videos(text_vec, limit=depth)
+        if within is not None:
+            video_hits = [h for h in video_hits if h['id'] in within]
+        hits = _merge_video_scene_hits(
+            vector_store.search(text_vec, limit=depth, offset=0, within=within),
+            video_hits,
+        )[:depth]
+    else:
+        hits = vector_store.search(text_vec, limit=depth, offset=0, within=within)
+
+    results = []
+    for r in hits:
+        item = {"path": r['metadata']['path'], "filename": r['metadata']['filename'], "score": r['score']}
+        if r.get('timestamp') is not None:
+            item["timestamp"] = r['timestamp']
+        results.append(item)
+    return results
+
+def _metadata_search_results(query: str, within: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """
+    All metadata matches for a query (every file for an empty query), unsorted.
+
+    With `within`, the library listing only decodes the metadata of those paths.
+    """
+    if not query:
+        cursor = photo_search_engine.db.conn.cursor()
+        cursor.execute("SELECT file_path, metadata_json FROM metadata")
+        results = [
+            {
+                'file_path': row['file_path'],
+                'metadata': json.loads(row['metadata_json']) if row['metadata_json'] else {}
+            }
+            for row in cursor.fetchall()
+            if within is None or row['file_path'] in within
+        ]
+    else:
+        # Check if query has structured operators (=, >, <, LIKE, etc.)
+        has_operators = any(op in query for op in ['=', '>', '<', '!=', ' LIKE ', ' CONTAINS ', ':'])
+        print(f"DEBUG: Query='{query}', has_operators={has_operators}")
+
+        if not has_operators:
+            # Simple search term - search in filename using shortcut format
+            search_query = f"filename:{query}"
+            print(f"DEBUG: Simple query '{query}' converted to '{search_query}'")
+            results = photo_search_engine.query_engine.search(search_query)
+        else:
+            # Structured query - use as-is
+            print(f"DEBUG: Using structured query as-is: '{query}'")
+            results = photo_search_engine.query_engine.search(query)
+
+    formatted_results = []
+    for r in results:
+        path = r.get('file_path', r.get('path'))
+        formatted_results.append({
+            "path": path,
+            "filename": os.path.basename(path),
+            "score": r.get('score', 0),
+            "metadata": r.get('metadata', {})
+        })
+    return formatted_results
+
+def _hybrid_metadata_candidates(query: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+    """Metadata side of hybrid search: matches in table order, one bounded window at a time."""
+    try:
+        if any(op in query for op in ['=', '>', '<', 'LIKE', ':']):
+            rows = photo_search_engine.query_engine.search(query, limit=limit, offset=offset)
+        else:
+            # Plain text matches anywhere in the path; the LIKE runs in SQLite
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", query) + "%"
+            cursor = photo_search_engine.db.conn.cursor()
+            cursor.execute(
+                "SELECT file_path FROM metadata WHERE file_path LIKE ? ESCAPE '\\' ORDER BY id LIMIT ? OFFSET ?",
+                (pattern, limit, offset),
+            )
+            rows = [{'file_path': row['file_path']} for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Metadata search error in hybrid: {e}")
+        return []
+    return [{"path": r['file_path'], "score": 0} for r in rows]
+
+def _hybrid_semantic_candidates(query: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+    """Semantic side of hybrid search: hits above the similarity cutoff, best first."""
+    hits = _semantic_hits(query, offset + limit)[offset:]
+    return [h for h in hits if not query or h['score'] >= DEFAULT_SEMANTIC_MIN_SCORE]
+
+hybrid_search_engine = HybridSearchEngine(
+    _hybrid_metadata_candidates,
+    _hybrid_semantic_candidates,
+    lambda query: intent_detector.detect_intent(query),
+    fusion=settings.HYBRID_FUSION,
+    rrf_k=settings.HYBRID_RRF_K,
+    cache_size=settings.HYBRID_CANDIDATE_CACHE,
+)
+
+def _hybrid_search_results(query: str, depth: int, version: int) -> Tuple[List[Dict[str, Any]], bool, Dict[str, Any]]:
+    """
+    Fused metadata and semantic ranking over the top `depth` candidates of each.
+
+    Returns:
+        (results sorted by fused score with metadata attached, whether both
+        sides were exhausted, ranking extras with the weights and detected intent)
+    """
+    results, exhausted, extra = hybrid_search_engine.search(query, depth, version)
+    for r in results:
+        r["filename"] = os.path.basename(r["path"])
+    return _attach_metadata(results), exhausted, extra
+
 @app.get("/search")
 async def search_photos(
     query: str = "",
@@ -1364,6 +1791,7 @@ async def search_photos(
     tag_logic: str = "OR",  # "AND" or "OR" for combining multiple tags
     date_from: Optional[str] = None,  # YYYY-MM or ISO date/datetime
     date_to: Optional[str] = None,    # YYYY-MM or ISO date/datetime
+    filter_expr: Optional[str] = None,  # JSON bitmap filter, e.g. {"and": ["tag:beach", {"not": "favorite"}]}
     log_history: bool = True  # Whether to log this search to history
 ):
     """
@@ -1375,6 +1803,12 @@ async def search_photos(
     Sort: date_desc (default), date_asc, name, size
     Type Filter: all (default), photos, videos
     Favorites Filter: all (default), favorites_only
+    Filter Expression: AND/OR/NOT over the filter-index bitmaps ("tag:<name>",
+    "favorite", "rating:<1-5>", "album:<id>", "media:photo|video",
+    "month:YYYY-MM", "all")
+
+    The ordered result ids are cached per normalized parameters and library
+    version, so paging through a result set only enriches the new page.
     """
     try:
         import time
@@ -1435,373 +1869,131 @@ async def search_photos(
         if tag_logic not in {"AND", "OR"}:
             raise HTTPException(status_code=400, detail="Invalid tag_logic: Must be 'AND' or 'OR'")
 
-        tagged_paths = None
-        if tag or tags:
+        parsed_filter = None
+        if filter_expr:
+            if filter_index is None:
+                raise HTTPException(status_code=503, detail="Filter index is not loaded")
             try:
-                from server.tags_db import get_tags_db
-
-                tags_db = get_tags_db(settings.BASE_DIR / "tags.db")
-
-                # Handle both single tag and multiple tags
-                if tags:
-                    # Split multiple tags and remove whitespace
-                    tag_list = [t.strip() for t in tags.split(',')]
-
-                    # Get paths for each tag
-                    all_tagged_paths = {}
-                    for t in tag_list:
-                        if t:  # Skip empty tags
-                            all_tagged_paths[t] = set(tags_db.get_tag_paths(t))
-
-                    # Apply logic based on tag_logic (AND/OR)
-                    if tag_logic.upper() == "AND":
-                        # For AND logic, find intersection of all tag sets
-                        if all_tagged_paths:
-                            tagged_paths = set.intersection(*all_tagged_paths.values())
-                    elif tag_logic.upper() == "OR":
-                        # For OR logic, find union of all tag sets
-                        if all_tagged_paths:
-                            tagged_paths = set.union(*all_tagged_paths.values())
-                        else:
-                            tagged_paths = set()
-                    else:
-                        # Default to OR if invalid logic provided
-                        if all_tagged_paths:
-                            tagged_paths = set.union(*all_tagged_paths.values())
-                        else:
-                            tagged_paths = set()
-                elif tag:
-                    # Original single tag logic
-                    tagged_paths = set(tags_db.get_tag_paths(tag))
-            except Exception as e:
-                print(f"Tag filtering error: {e}")
-                tagged_paths = set()
+                parsed_filter = json.loads(filter_expr)
+                filter_index.evaluate(parsed_filter)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid filter_expr: {e}")
+
+        query = _normalize_search_query(query)
+        cache_params = {
+            "endpoint": "search",
+            "mode": mode,
+            "sort_by": sort_by,
+            "type_filter": type_filter,
+            "source_filter": source_filter,
+            "favorites_filter": favorites_filter,
+            "tag": tag,
+            "tags": sorted({t.strip() for t in tags.split(',') if t.strip()}) if tags else None,
+            "tag_logic": tag_logic.upper(),
+            "date_from": date_from,
+            "date_to": date_to,
+            "filter_expr": parsed_filter,
+        }
+        version = library_version.value
+        ranking = _get_cached_search_ranking(query, cache_params, version, offset + limit)
+
+        if ranking is None:
+            def rank() -> Dict[str, Any]:
+                depth = _search_cache_depth(offset, limit)
+                extra: Dict[str, Any] = {}
+                filter_bitmap = _search_filter_bitmap(
+                    tag, tags, tag_logic, type_filter, favorites_filter, date_from, date_to, parsed_filter,
+                )
+                within = _prefilter_paths(filter_bitmap)
+                if mode == "semantic":
+                    hits = _semantic_hits(query, depth, within)
+                    exhausted = len(hits) < depth
+                    results = _attach_metadata(
+                        [h for h in hits if not query or h['score'] >= DEFAULT_SEMANTIC_MIN_SCORE]
+                    )
+                elif mode == "metadata":
+                    results, exhausted = _metadata_search_results(query, within), True
+                else:
+                    # Hybrid candidates are cached per query, so they are filtered afterwards
+                    results, exhausted, extra = _hybrid_search_results(query, depth, version)
+
+                results = _apply_search_filters(
+                    results, filter_bitmap, tag, tags, tag_logic,
+                    type_filter, favorites_filter, source_filter, date_from, date_to,
+                )
+                # Hybrid results keep their combined-score order
+                if mode != "hybrid":
+                    results = apply_sort(results, sort_by)
+                return _cache_search_ranking(query, cache_params, version, results, depth, exhausted, **extra)
+
+            # Ranking scans SQLite and may encode the query with CLIP
+            async with endpoint_limits.slot("search"):
+                ranking = await execution_pools.run_io(rank)
+
+        items = ranking["items"]
+        count = len(items)
+        page_items = items[offset : offset + limit]
+
         # 1. Semantic Search
         if mode == "semantic":
-            results_response = await search_semantic(query, limit * 2, 0)  # Get more for filtering
-            results = results_response.get('results', [])
-
-            if tagged_paths is not None:
-                results = [r for r in results if r.get("path") in tagged_paths]
-            
-            # Apply type filter
-            if type_filter == "photos":
-                results = [r for r in results if not is_video_file(r.get('path', ''))]
-            elif type_filter == "videos":
-                results = [r for r in results if is_video_file(r.get('path', ''))]
-            
-            # Apply favorites filter
-            if favorites_filter == "favorites_only":
-                results = [r for r in results if photo_search_engine.is_favorite(r.get('path', ''))]
-
-            # Apply date filter (filesystem.created)
-            results = apply_date_filter(results, date_from, date_to)
-            # Apply source filter (local/cloud/hybrid)
-            if source_filter != "all":
-                def is_cloud_path(p: str) -> bool:
-                    if not p:
-                        return False
-                    lower = p.lower()
-                    return lower.startswith("http://") or lower.startswith("https://") or lower.startswith("s3://") or lower.startswith("cloud:") or lower.startswith("gdrive:") or "amazonaws.com" in lower or lower.startswith("dropbox:") or lower.startswith("onedrive:")
-
-                def is_local_path(p: str) -> bool:
-                    if not p:
-                        return False
-                    return bool(re.match(r'^[A-Za-z]:\\|^/|^file://|^~/', p))
-
-                if source_filter == "local":
-                    results = [r for r in results if is_local_path(r.get('path', ''))]
-                elif source_filter == "cloud":
-                    results = [r for r in results if is_cloud_path(r.get('path', ''))]
-                elif source_filter == "hybrid":
-                    results = [r for r in results if (not is_local_path(r.get('path', '')) and not is_cloud_path(r.get('path', '')))]
-            
-            # Apply sort
-            results = apply_sort(results, sort_by)
-            
-            # Paginate
-            paginated = results[offset:offset + limit]
-            return {"count": len(results), "results": paginated}
+            explain = lambda r: generate_semantic_match_explanation(query, r, r['score'])
+            page = await execution_pools.run_io(_hydrate_search_page, page_items, explain if query else None)
+            return {"count": count, "results": page}
 
         # 2. Metadata Search
         if mode == "metadata":
-            # For empty query, directly get all files from database
-            if not query.strip():
-                cursor = photo_search_engine.db.conn.cursor()
-                cursor.execute("SELECT file_path, metadata_json FROM metadata")
-                results = []
-                for row in cursor.fetchall():
-                    import json
-                    results.append({
-                        'file_path': row['file_path'],
-                        'metadata': json.loads(row['metadata_json']) if row['metadata_json'] else {}
-                    })
-            else:
-                # Check if query has structured operators (=, >, <, LIKE, etc.)
-                has_operators = any(op in query for op in ['=', '>', '<', '!=', ' LIKE ', ' CONTAINS ', ':'])
-                print(f"DEBUG: Query='{query}', has_operators={has_operators}")
-                
-                if not has_operators:
-                    # Simple search term - search in filename using shortcut format
-                    search_query = f"filename:{query}"
-                    print(f"DEBUG: Simple query '{query}' converted to '{search_query}'")
-                    results = photo_search_engine.query_engine.search(search_query)
-                else:
-                    # Structured query - use as-is
-                    print(f"DEBUG: Using structured query as-is: '{query}'")
-                    results = photo_search_engine.query_engine.search(query)
-            
-            # Formatted list with match explanations
-            formatted_results = []
-            for r in results:
-                path = r.get('file_path', r.get('path'))
-                result_item = {
-                    "path": path,
-                    "filename": os.path.basename(path),
-                    "score": r.get('score', 0),
-                    "metadata": r.get('metadata', {})
-                }
-                
-                # Generate match explanation for metadata search
-                if query.strip():
-                    result_item["matchExplanation"] = generate_metadata_match_explanation(query, r)
-                
-                formatted_results.append(result_item)
-            
-            # Apply type filter
-            if type_filter == "photos":
-                formatted_results = [r for r in formatted_results if not is_video_file(r.get('path', ''))]
-            elif type_filter == "videos":
-                formatted_results = [r for r in formatted_results if is_video_file(r.get('path', ''))]
-
-            if tagged_paths is not None:
-                formatted_results = [r for r in formatted_results if r.get("path") in tagged_paths]
-            
-            # Apply favorites filter
-            if favorites_filter == "favorites_only":
-                formatted_results = [r for r in formatted_results if photo_search_engine.is_favorite(r.get('path', ''))]
-
-            # Apply date filter (filesystem.created)
-            formatted_results = apply_date_filter(formatted_results, date_from, date_to)
-            # Apply source filter (local/cloud/hybrid)
-            if source_filter != "all":
-                def is_cloud_path(p: str) -> bool:
-                    if not p:
-                        return False
-                    lower = p.lower()
-                    return lower.startswith("http://") or lower.startswith("https://") or lower.startswith("s3://") or lower.startswith("cloud:") or lower.startswith("gdrive:") or "amazonaws.com" in lower or lower.startswith("dropbox:") or lower.startswith("onedrive:")
-
-                def is_local_path(p: str) -> bool:
-                    if not p:
-                        return False
-                    return bool(re.match(r'^[A-Za-z]:\\|^/|^file://|^~/', p))
-
-                if source_filter == "local":
-                    formatted_results = [r for r in formatted_results if is_local_path(r.get('path', ''))]
-                elif source_filter == "cloud":
-                    formatted_results = [r for r in formatted_results if is_cloud_path(r.get('path', ''))]
-                elif source_filter == "hybrid":
-                    formatted_results = [r for r in formatted_results if (not is_local_path(r.get('path', '')) and not is_cloud_path(r.get('path', '')))]
-            
-            # Apply sorting
-            formatted_results = apply_sort(formatted_results, sort_by)
-            
-            # Apply Pagination Slicing
-            count = len(formatted_results)
-            paginated = formatted_results[offset : offset + limit]
-            
-            return {"count": count, "results": paginated}
+            explain = lambda r: generate_metadata_match_explanation(query, r)
+            page = await execution_pools.run_io(_hydrate_search_page, page_items, explain if query else None)
+            return {"count": count, "results": page}
 
         # 3. Hybrid Search (Metadata + Semantic with weighted scoring)
-        if mode == "hybrid":
-            # A. Get Metadata Results (All)
-            metadata_results = []
-            try:
-                if any(op in query for op in ['=', '>', '<', 'LIKE']):
-                    metadata_results = photo_search_engine.query_engine.search(query)
-                else:
-                    safe_query = query.replace("'", "''")
-                    metadata_results = photo_search_engine.query_engine.search(
-                        f"file.path LIKE '%{safe_query}%'"
-                    )
-            except Exception as e:
-                print(f"Metadata search error in hybrid: {e}")
-
-            # B. Get Semantic Results (Top N = limit + offset)
-            # We need deep fetch to ensure correct global ranking after merge
-            semantic_limit = limit + offset
-            semantic_response = await search_semantic(query, semantic_limit, offset=0)
-            semantic_results = semantic_response['results']
-
-            # C. Normalize semantic scores
-            if semantic_results:
-                max_score = max(r['score'] for r in semantic_results)
-                min_score = min(r['score'] for r in semantic_results)
-                score_range = max_score - min_score if max_score != min_score else 1.0
-                
-                for r in semantic_results:
-                    r['normalized_score'] = (r['score'] - min_score) / score_range
-
-            # D. Enhanced Merge Logic with Intent Detection
-            METADATA_WEIGHT = 0.6
-            SEMANTIC_WEIGHT = 0.4
-            
-            # Get intent-based weights using the intent detector
-            intent_result = intent_detector.detect_intent(query)
-            
-            # Map intent to weights
-            def get_weights_from_intent(primary_intent):
-                """Get metadata/semantic weights based on primary intent"""
-                # Metadata-heavy intents
-                if primary_intent in ['camera', 'date', 'technical']:
-                    return 0.7, 0.3
-                # Semantic-heavy intents
-                elif primary_intent in ['people', 'object', 'scene', 'event', 'emotion', 'activity']:
-                    return 0.4, 0.6
-                # Balanced intents
-                elif primary_intent in ['location', 'color']:
-                    return 0.5, 0.5
-                # Default balanced
-                else:
-                    return 0.6, 0.4
-            
-            intent_metadata_weight, intent_semantic_weight = get_weights_from_intent(intent_result['primary_intent'])
-            
-            seen_paths = set()
-            hybrid_results = []
-            
-            for r in metadata_results:
-                path = r.get('file_path', r.get('path'))
-                seen_paths.add(path)
-                semantic_match = next((s for s in semantic_results if s['path'] == path), None)
-                
-                if semantic_match:
-                    # Both sources available - use intent-based weights
-                    combined_score = (intent_metadata_weight * 1.0) + (intent_semantic_weight * semantic_match.get('normalized_score', 0.5))
-                else:
-                    # Only metadata available
-                    combined_score = intent_metadata_weight * 0.8
-                
-                hybrid_results.append({
-                    "path": path,
-                    "filename": os.path.basename(path),
-                    "score": round(combined_score, 3),
-                    "metadata": r.get('metadata', {}),
-                    "source": "both" if semantic_match else "metadata",
-                    "intent": "metadata" if metadata_results else "semantic"
-                })
+        intent_metadata_weight, intent_semantic_weight = ranking["weights"]
+        intent_result = ranking["intent_result"]
+        explain = lambda r: generate_hybrid_match_explanation(
+            query, r, intent_metadata_weight, intent_semantic_weight
+        )
+        paginated = await execution_pools.run_io(_hydrate_search_page, page_items, explain if query else None)
+
+        execution_time_ms = int(round((time.time() - start_time) * 1000))
+        # Log search to history if enabled
+        if log_history:
+            await execution_pools.run_io(
+                saved_search_manager.log_search_history,
+                query=query,
+                mode=mode,
+                results_count=count,
+                intent=intent_result["primary_intent"],
+                execution_time_ms=execution_time_ms,
+                user_agent="api",
+                ip_address="localhost"
+            )
 
-            for r in semantic_results:
-                if r['path'] not in seen_paths:
-                    seen_paths.add(r['path'])
-                    hybrid_results.append({
-                        "path": r['path'],
-                        "filename": r['filename'],
-                        "score": round(intent_semantic_weight * r.get('normalized_score', r['score']), 3),
-                        "metadata": r.get('metadata', {}),
-                        "source": "semantic",
-                        "intent": "semantic"
-                    })
-            
-            # Sort by score descending
-            hybrid_results.sort(key=lambda x: x['score'], reverse=True)
-            
-            # Apply type filter
-            if type_filter == "photos":
-                hybrid_results = [r for r in hybrid_results if not is_video_file(r.get('path', ''))]
-            elif type_filter == "videos":
-                hybrid_results = [r for r in hybrid_results if is_video_file(r.get('path', ''))]
-
-            if tagged_paths is not None:
-                hybrid_results = [r for r in hybrid_results if r.get("path") in tagged_paths]
-            
-            # Apply favorites filter
-            if favorites_filter == "favorites_only":
-                hybrid_results = [r for r in hybrid_results if photo_search_engine.is_favorite(r.get('path', ''))]
-
-            # Apply date filter (filesystem.created)
-            hybrid_results = apply_date_filter(hybrid_results, date_from, date_to)
-            # Apply source filter (local/cloud/hybrid)
-            if source_filter != "all":
-                def is_cloud_path(p: str) -> bool:
-                    if not p:
-                        return False
-                    lower = p.lower()
-                    return lower.startswith("http://") or lower.startswith("https://") or lower.startswith("s3://") or lower.startswith("cloud:") or lower.startswith("gdrive:") or "amazonaws.com" in lower or lower.startswith("dropbox:") or lower.startswith("onedrive:")
-
-                def is_local_path(p: str) -> bool:
-                    if not p:
-                        return False
-                    return bool(re.match(r'^[A-Za-z]:\\|^/|^file://|^~/', p))
-
-                if source_filter == "local":
-                    hybrid_results = [r for r in hybrid_results if is_local_path(r.get('path', ''))]
-                elif source_filter == "cloud":
-                    hybrid_results = [r for r in hybrid_results if is_cloud_path(r.get('path', ''))]
-                elif source_filter == "hybrid":
-                    hybrid_results = [r for r in hybrid_results if (not is_local_path(r.get('path', '')) and not is_cloud_path(r.get('path', '')))]
-            
-            # Apply Pagination Slicing
-            count = len(hybrid_results)
-            paginated_raw = hybrid_results[offset : offset + limit]
-            
-            # Format results with match explanations
-            paginated = []
-            for r in paginated_raw:
-                result_item = {
-                    "path": r['path'],
-                    "filename": r['filename'],
-                    "score": r['score'],
-                    "metadata": r.get('metadata', {}),
-                    "source": r.get('source', 'hybrid'),
-                    "intent": r.get('intent', 'balanced')
-                }
-                
-                # Generate hybrid match explanation with detailed breakdown
-                if query.strip():
-                    result_item["matchExplanation"] = generate_hybrid_match_explanation(
-                        query, r, intent_metadata_weight, intent_semantic_weight
-                    )
-                
-                paginated.append(result_item)
-            
-            # Log search to history if enabled
-            if log_history:
-                execution_time_ms = int(round((time.time() - start_time) * 1000))
-                intent_result = intent_detector.detect_intent(query)
-                saved_search_manager.log_search_history(
+            # Add structured logging for search operation
+            try:
+                log_search_operation(
+                    ps_logger,
                     query=query,
                     mode=mode,
                     results_count=count,
-                    intent=intent_result["primary_intent"],
-                    execution_time_ms=execution_time_ms,
-                    user_agent="api",
-                    ip_address="localhost"
+                    execution_time=execution_time_ms
                 )
+            except Exception as e:
+                print(f"Error logging search operation: {e}")
+
+        return {"count": count, "results": paginated, "intent": {
+            "primary_intent": intent_result["primary_intent"],
+            "secondary_intents": intent_result["secondary_intents"],
+            "metadata_weight": intent_metadata_weight,
+            "semantic_weight": intent_semantic_weight,
+            "fusion": ranking.get("fusion", "weighted"),
+            "confidence": intent_result["confidence"],
+            "badges": intent_result["badges"],
+            "suggestions": intent_result["suggestions"],
+            "execution_time_ms": execution_time_ms
+        }}
 
-                # Add structured logging for search operation
-                try:
-                    log_search_operation(
-                        ps_logger,
-                        query=query,
-                        mode=mode,
-                        results_count=count,
-                        execution_time=execution_time_ms
-                    )
-                except Exception as e:
-                    print(f"Error logging search operation: {e}")
-            
-            return {"count": count, "results": paginated, "intent": {
-                "primary_intent": intent_result["primary_intent"],
-                "secondary_intents": intent_result["secondary_intents"],
-                "metadata_weight": intent_metadata_weight,
-                "semantic_weight": intent_semantic_weight,
-                "confidence": intent_result["confidence"],
-                "badges": intent_result["badges"],
-                "suggestions": intent_result["suggestions"],
-                "execution_time_ms": execution_time_ms
-            }}
-
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1868,6 +2060,23 @@ async def remove_favorite(payload: dict = Body(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Bulk operations endpoints
+def _zip_response(entries: Iterable[ZipEntry], filename: str) -> StreamingResponse:
+    """Stream a ZIP of entries as it is written; nothing is buffered or staged on disk."""
+    limiter = endpoint_limits.get("export")
+    # Reject before the 200 goes out; once streaming, the export waits its turn
+    limiter.check()
+
+    async def body():
+        async with limiter.slot():
+            async for chunk in execution_pools.iterate_io(stream_zip(entries, max_workers=settings.EXPORT_WORKERS)):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 @app.post("/bulk/export")
 async def bulk_export(payload: dict = Body(...)):
     """
@@ -1881,76 +2090,174 @@ async def bulk_export(payload: dict = Body(...)):
     if not file_paths:
         raise HTTPException(status_code=400, detail="file_paths is required")
     
+    if len(file_paths) > settings.EXPORT_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Maximum {settings.EXPORT_MAX_FILES} files per export")
+
+    existing = [p for p in file_paths if os.path.exists(p)]
+    # Add files to the ZIP with just the filename (not full path)
+    entries = [ZipEntry(name, path=p) for p, name in zip(existing, unique_arcnames(existing))]
+    return _zip_response(entries, f"photos_export_{len(file_paths)}_files.zip")
+
+# Path-keyed feature stores cleaned up when photos are deleted: file -> (table, column)
+_BULK_PATH_TABLES: Dict[str, List[Tuple[str, str]]] = {
+    "face_clusters.db": [("face_detections", "photo_path"), ("photo_person_associations", "photo_path")],
+    "insights.db": [("photo_insights", "photo_path")],
+    "collaborative_spaces.db": [("space_photos", "photo_path"), ("space_comments", "photo_path")],
+    "duplicates.db": [("duplicate_files", "file_path")],
+    "locations.db": [("photo_locations", "photo_path"), ("cluster_photos", "photo_path")],
+    "tag_filters.db": [("photo_tags", "photo_path")],
+    "edits.db": [("photo_edits", "photo_path")],
+    "photo_edits.db": [("photo_edits", "photo_path")],
+    "versions.db": [("photo_versions", "version_path"), ("photo_versions", "original_path"),
+                    ("version_stacks", "original_path")],
+    "privacy.db": [("privacy_controls", "photo_path")],
+    "timelines.db": [("timeline_entries", "photo_path")],
+}
+# Stores keyed by registry photo id
+_BULK_ID_TABLES: Dict[str, List[Tuple[str, str]]] = {
+    "tags.db": [("tag_photos", "photo_id")],
+    "ratings.db": [("photo_ratings", "photo_id")],
+    "notes.db": [("photo_notes", "photo_id")],
+}
+_bulk_ops_engine: Optional[BulkOpsEngine] = None
+
+
+def _purge_metadata(op: str, paths: List[str], photo_ids: List[int]) -> None:
+    # The bulk purgers below update albums and the filter index in batches
+    photo_search_engine.db.mark_many_as_deleted(paths, reason="trashed" if op == TRASH else "deleted", notify=False)
+    if op == DELETE:
+        photo_search_engine.db.set_favorites(paths, False, notify=False)
+
+
+def _purge_embeddings(op: str, paths: List[str], photo_ids: List[int]) -> None:
+    vector_store.delete(paths)
+    video_frame_store.delete_videos(paths)
+
+
+def _purge_albums(op: str, paths: List[str], photo_ids: List[int]) -> None:
+    # Trashed photos keep their manual albums so a restore brings them back
+    get_albums_db().purge_photos(paths, smart_only=op == TRASH)
+
+
+def _purge_filter_index(op: str, paths: List[str], photo_ids: List[int]) -> None:
+    if filter_index is not None:
+        filter_index.discard_photos(photo_ids)
+
+
+def _favorites_changed(photo_ids: List[int], favorite: bool) -> None:
+    if filter_index is not None:
+        filter_index.set_favorite(photo_ids, favorite)
+
+
+def _bulk_ops() -> BulkOpsEngine:
+    """The bulk-ops engine with every store registered (built on first use)."""
+    global _bulk_ops_engine
+    if _bulk_ops_engine is None:
+        engine = BulkOpsEngine(
+            photo_registry,
+            get_bulk_actions_db(settings.BASE_DIR / "bulk_actions.db"),
+            jobs=job_store,
+            batch_size=settings.BULK_OPS_BATCH_SIZE,
+            file_workers=settings.BULK_FILE_WORKERS,
+        )
+        engine.add_purger(StorePurger("metadata", _purge_metadata, (DELETE, TRASH)))
+        # Each LanceDB delete writes a new table version, so use large batches
+        engine.add_purger(StorePurger("embeddings", _purge_embeddings, (DELETE, TRASH), batch_size=10000))
+        engine.add_purger(StorePurger("albums", _purge_albums, (DELETE, TRASH)))
+        engine.add_purger(StorePurger("filter index", _purge_filter_index, (DELETE, TRASH)))
+        for name, columns in _BULK_ID_TABLES.items():
+            engine.add_purger(sqlite_purger(name, settings.BASE_DIR / name, columns, by_id=True))
+        for name, columns in _BULK_PATH_TABLES.items():
+            engine.add_purger(sqlite_purger(name, settings.BASE_DIR / name, columns))
+        engine.add_purger(sqlite_purger("ocr", Path(ocr_search.db_path), [
+            ("ocr_text", "image_path"), ("ocr_stats", "image_path"), ("ocr_search_index", "image_path"),
+        ]))
+        engine.set_favorite_store(
+            lambda paths, favorite: photo_search_engine.db.set_favorites(paths, favorite, notify=False)
+        )
+        engine.add_favorite_listener(_favorites_changed)
+        _bulk_ops_engine = engine
+    return _bulk_ops_engine
+
+
+def _bulk_targets(photo_ids: Optional[List[Any]], file_paths: Optional[List[str]]) -> Dict[int, str]:
+    """{photo_id: path} for a bulk request given registry ids and/or paths."""
+    if not photo_ids and not file_paths:
+        raise HTTPException(status_code=400, detail="photo_ids or file_paths is required")
+    try:
+        return _bulk_ops().resolve(photo_ids or [], file_paths or [])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="photo_ids must be integers")
+
+
+async def _run_bulk(kind: str, background_tasks: BackgroundTasks, background: bool,
+                    work: Callable[[str], BulkResult],
+                    respond: Callable[[BulkResult], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run a bulk operation as a job.
+
+    With background=True the job id is returned at once and progress is
+    polled from /jobs/{job_id}; otherwise the response waits for the result.
+    """
+    job_id = job_store.create_job(type=f"bulk_{kind}")
+
+    def run() -> BulkResult:
+        try:
+            return work(job_id)
+        except Exception as e:
+            job_store.update_job(job_id, status="failed", message=str(e))
+            raise
+
+    if background:
+        background_tasks.add_task(run)
+        return {"success": True, "job_id": job_id}
     try:
-        import zipfile
-        import tempfile
-        import os
-        from pathlib import Path
-        
-        # Create temporary ZIP file
-        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_zip:
-            zip_path = temp_zip.name
-            
-            with zipfile.ZipFile(temp_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in file_paths:
-                    if os.path.exists(file_path):
-                        # Add file to ZIP with just the filename (not full path)
-                        filename = os.path.basename(file_path)
-                        zipf.write(file_path, filename)
-        
-        cleanup = BackgroundTasks()
-        cleanup.add_task(os.unlink, zip_path)
-        return FileResponse(
-            path=zip_path,
-            filename=f"photos_export_{len(file_paths)}_files.zip",
-            media_type="application/zip",
-            background=cleanup,
-        )
-        
+        result = await execution_pools.run_io(run)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Bulk {kind} failed: {str(e)}")
+    return {**respond(result), "action_id": result.action_id, "job_id": job_id}
+
+
+def _delete_file(path: str, roots: List[Path]) -> None:
+    p = Path(path)
+    if not any(p.resolve().is_relative_to(root) for root in roots):
+        raise HTTPException(status_code=403, detail="Path is outside connected sources")
+    # A file that is already gone is still removed from the stores
+    if p.is_file():
+        p.unlink()
+
 
 @app.post("/bulk/delete")
-async def bulk_delete(payload: dict = Body(...)):
+async def bulk_delete(background_tasks: BackgroundTasks, payload: dict = Body(...)):
     """
-    Delete multiple photos.
+    Delete photos from disk and from every store.
     
-    Body: {"file_paths": ["/path/to/file1.jpg", "/path/to/file2.jpg"], "confirm": true}
+    Body: {"photo_ids": [1, 2]} and/or {"file_paths": ["/path/to/file1.jpg"]}, "confirm": true,
+    and optionally "background": true to get a job id back immediately.
     """
+    photo_ids = payload.get("photo_ids", [])
     file_paths = payload.get("file_paths", [])
-    confirm = payload.get("confirm", False)
-    
-    if not file_paths:
-        raise HTTPException(status_code=400, detail="file_paths is required")
+    if not photo_ids and not file_paths:
+        raise HTTPException(status_code=400, detail="photo_ids or file_paths is required")
     
-    if not confirm:
+    if not payload.get("confirm", False):
         raise HTTPException(status_code=400, detail="Deletion requires confirmation")
-    
-    try:
-        deleted_count = 0
-        errors = []
-        
-        for file_path in file_paths:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    # Remove from database
-                    photo_search_engine.db.conn.execute("DELETE FROM metadata WHERE file_path = ?", (file_path,))
-                    photo_search_engine.db.conn.commit()
-                    deleted_count += 1
-                else:
-                    errors.append(f"File not found: {file_path}")
-            except Exception as e:
-                errors.append(f"Failed to delete {file_path}: {str(e)}")
-        
-        return {
-            "success": True,
-            "deleted_count": deleted_count,
-            "errors": errors
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Bulk delete failed: {str(e)}")
+
+    targets = _bulk_targets(photo_ids, file_paths)
+    roots = _trash_allowed_roots()
+
+    def work(job_id: str) -> BulkResult:
+        return _bulk_ops().run(
+            DELETE, targets,
+            file_op=lambda path: _delete_file(path, roots),
+            undo_data=lambda result: {"undoable": False},
+            job_id=job_id,
+        )
+
+    return await _run_bulk(
+        "delete", background_tasks, bool(payload.get("background", False)), work,
+        lambda result: {"success": True, "deleted_count": len(result.processed), "errors": result.errors},
+    )
 
 
 # ==============================================================================
@@ -1958,7 +2265,9 @@ async def bulk_delete(payload: dict = Body(...)):
 # ==============================================================================
 
 class TrashMoveRequest(BaseModel):
-    file_paths: List[str]
+    file_paths: List[str] = []
+    photo_ids: List[int] = []
+    background: bool = False  # Return a job id at once instead of waiting
 
 
 class TrashRestoreRequest(BaseModel):
@@ -2000,8 +2309,8 @@ def _trash_allowed_roots() -> List[Path]:
     return roots
 
 
-def _assert_path_allowed_for_trash(p: Path) -> None:
-    roots = _trash_allowed_roots()
+def _assert_path_allowed_for_trash(p: Path, roots: Optional[List[Path]] = None) -> None:
+    roots = roots if roots is not None else _trash_allowed_roots()
     rp = p.resolve()
     is_allowed = any(rp.is_relative_to(root) for root in roots)
     if not is_allowed:
@@ -2023,75 +2332,89 @@ def _reindex_one_file(path: str) -> None:
         pass
 
 
+def _move_to_trash(file_path: str, roots: List[Path]) -> Dict[str, Any]:
+    """Move one file into Trash; returns its trash_items row."""
+    src_path = Path(file_path)
+    _assert_path_allowed_for_trash(src_path, roots)
+    if not src_path.exists() or not src_path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    trash_id = str(uuid.uuid4())
+    dest_dir = _trash_root() / trash_id
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest = dest_dir / src_path.name
+
+    shutil.move(str(src_path), str(dest))
+
+    # Link to a cloud source item when applicable (so sync won't re-download).
+    source_item = None
+    try:
+        source_item = source_item_store.find_by_local_path(str(src_path.resolve()))
+    except Exception:
+        source_item = None
+    if source_item:
+        try:
+            source_item_store.set_status(source_item.source_id, source_item.remote_id, "trashed")
+            source_item_store.set_local_path(source_item.source_id, source_item.remote_id, str(dest))
+        except Exception:
+            pass
+
+    return {
+        "id": trash_id,
+        "original_path": str(src_path),
+        "trashed_path": str(dest),
+        "source_id": source_item.source_id if source_item else None,
+        "remote_id": source_item.remote_id if source_item else None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _undo_move_to_trash(file_path: str, item: Dict[str, Any]) -> None:
+    """Put a file moved by _move_to_trash back, for trash rows that could not be written."""
+    trashed = Path(item["trashed_path"])
+    shutil.move(str(trashed), file_path)
+    try:
+        trashed.parent.rmdir()
+    except OSError:
+        pass
+    if item.get("source_id") and item.get("remote_id"):
+        try:
+            source_item_store.set_status(item["source_id"], item["remote_id"], "active")
+            source_item_store.set_local_path(item["source_id"], item["remote_id"], str(Path(file_path).resolve()))
+        except Exception:
+            pass
+
+
 @app.post("/trash/move")
-async def trash_move(req: TrashMoveRequest):
+async def trash_move(req: TrashMoveRequest, background_tasks: BackgroundTasks):
     """
     Move files into app-managed Trash and remove them from the active library index.
     For cloud sources, this moves the mirrored local copy only (does not delete remote originals).
     """
-    if not req.file_paths:
+    if not req.file_paths and not req.photo_ids:
         raise HTTPException(status_code=400, detail="file_paths is required")
 
-    moved: List[dict] = []
-    errors: List[str] = []
-    for file_path in req.file_paths:
-        try:
-            src_path = Path(file_path)
-            _assert_path_allowed_for_trash(src_path)
-            if not src_path.exists() or not src_path.is_file():
-                raise HTTPException(status_code=404, detail="File not found")
-
-            trash_id = str(uuid.uuid4())
-            dest_dir = _trash_root() / trash_id
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            dest = dest_dir / src_path.name
-
-            shutil.move(str(src_path), str(dest))
-
-            # Remove from active indices (metadata + embeddings)
-            try:
-                photo_search_engine.db.mark_as_deleted(str(src_path), reason="trashed")
-            except Exception:
-                pass
-            try:
-                vector_store.delete([str(src_path)])
-            except Exception:
-                pass
+    targets = _bulk_targets(req.photo_ids, req.file_paths)
+    roots = _trash_allowed_roots()
 
-            # Link to a cloud source item when applicable (so sync won't re-download).
-            source_item = None
-            try:
-                source_item = source_item_store.find_by_local_path(str(src_path.resolve()))
-            except Exception:
-                source_item = None
-            if source_item:
-                try:
-                    source_item_store.set_status(source_item.source_id, source_item.remote_id, "trashed")
-                    source_item_store.set_local_path(source_item.source_id, source_item.remote_id, str(dest))
-                except Exception:
-                    pass
+    def work(job_id: str) -> BulkResult:
+        return _bulk_ops().run(
+            TRASH, targets,
+            file_op=lambda path: _move_to_trash(path, roots),
+            after_files=lambda moved: trash_db.create_many(moved.values()),
+            undo_file=_undo_move_to_trash,
+            undo_data=lambda result: {"trash_item_ids": [item["id"] for item in result.outcomes.values()]},
+            job_id=job_id,
+        )
 
-            item = trash_db.create(
-                item_id=trash_id,
-                original_path=str(src_path),
-                trashed_path=str(dest),
-                source_id=source_item.source_id if source_item else None,
-                remote_id=source_item.remote_id if source_item else None,
-            )
-            moved.append(
-                {
-                    "id": item.id,
-                    "original_path": item.original_path,
-                    "trashed_path": item.trashed_path,
-                    "created_at": item.created_at,
-                }
-            )
-        except HTTPException as he:
-            errors.append(f"{file_path}: {he.detail}")
-        except Exception as e:
-            errors.append(f"{file_path}: {str(e)}")
+    def respond(result: BulkResult) -> Dict[str, Any]:
+        moved = [
+            {key: item[key] for key in ("id", "original_path", "trashed_path", "created_at")}
+            for item in result.outcomes.values()
+        ]
+        return {"moved": moved, "errors": result.errors}
 
-    return {"moved": moved, "errors": errors}
+    return await _run_bulk("trash", background_tasks, req.background, work, respond)
 
 
 @app.get("/trash")
@@ -2113,14 +2436,12 @@ async def list_trash(limit: int = 200, offset: int = 0):
     return {"items": out}
 
 
-@app.post("/trash/restore")
-async def restore_from_trash(req: TrashRestoreRequest):
-    if not req.item_ids:
-        raise HTTPException(status_code=400, detail="item_ids is required")
-
+def _restore_trash_items(item_ids: List[str]) -> Tuple[List[str], List[str]]:
+    """Move trashed files back and reindex them; returns (restored ids, errors)."""
     restored: List[str] = []
     errors: List[str] = []
-    for item_id in req.item_ids:
+    roots = _trash_allowed_roots()
+    for item_id in item_ids:
         try:
             item = trash_db.get(item_id)
             if item.status != "trashed":
@@ -2128,7 +2449,7 @@ async def restore_from_trash(req: TrashRestoreRequest):
 
             src = Path(item.trashed_path)
             dst = Path(item.original_path)
-            _assert_path_allowed_for_trash(dst)
+            _assert_path_allowed_for_trash(dst, roots)
             if not src.exists():
                 raise HTTPException(status_code=404, detail="Trashed file missing")
 
@@ -2151,7 +2472,15 @@ async def restore_from_trash(req: TrashRestoreRequest):
             errors.append(f"{item_id}: {he.detail}")
         except Exception as e:
             errors.append(f"{item_id}: {str(e)}")
+    return restored, errors
+
+
+@app.post("/trash/restore")
+async def restore_from_trash(req: TrashRestoreRequest):
+    if not req.item_ids:
+        raise HTTPException(status_code=400, detail="item_ids is required")
 
+    restored, errors = await execution_pools.run_io(_restore_trash_items, req.item_ids)
     return {"restored": restored, "errors": errors}
 
 
@@ -2173,6 +2502,7 @@ async def empty_trash(req: TrashEmptyRequest):
 
     deleted: List[str] = []
     errors: List[str] = []
+    purged_paths: List[str] = []
     for it in items:
         try:
             if it.status != "trashed":
@@ -2190,9 +2520,17 @@ async def empty_trash(req: TrashEmptyRequest):
 
             trash_db.mark_deleted(it.id)
             deleted.append(it.id)
+            purged_paths.append(it.original_path)
         except Exception as e:
             errors.append(f"{it.id}: {str(e)}")
 
+    # Trash kept the photos' tags, ratings, albums etc. for a restore; drop them now,
+    # unless a new file has since taken the original path
+    purged_paths = [p for p in purged_paths if not os.path.exists(p)]
+    if purged_paths:
+        engine = _bulk_ops()
+        await execution_pools.run_io(engine.purge, DELETE, engine.resolve(paths=purged_paths))
+
     return {"deleted": deleted, "errors": errors}
 
 
@@ -2223,6 +2561,7 @@ async def remove_from_library(req: LibraryRemoveRequest):
                 pass
             try:
                 vector_store.delete([str(rp)])
+                video_frame_store.delete_videos([str(rp)])
             except Exception:
                 pass
 
@@ -2252,43 +2591,37 @@ async def remove_from_library(req: LibraryRemoveRequest):
     return {"removed": removed, "errors": errors}
 
 @app.post("/bulk/favorite")
-async def bulk_favorite(payload: dict = Body(...)):
+async def bulk_favorite(background_tasks: BackgroundTasks, payload: dict = Body(...)):
     """
     Add/remove multiple photos to/from favorites.
     
-    Body: {"file_paths": ["/path/to/file1.jpg", "/path/to/file2.jpg"], "action": "add|remove"}
+    Body: {"photo_ids": [1, 2]} and/or {"file_paths": ["/path/to/file1.jpg"]}, "action": "add|remove",
+    and optionally "background": true to get a job id back immediately.
     """
+    photo_ids = payload.get("photo_ids", [])
     file_paths = payload.get("file_paths", [])
     action = payload.get("action", "add")
     
-    if not file_paths:
-        raise HTTPException(status_code=400, detail="file_paths is required")
+    if not photo_ids and not file_paths:
+        raise HTTPException(status_code=400, detail="photo_ids or file_paths is required")
     
     if action not in ["add", "remove"]:
         raise HTTPException(status_code=400, detail="action must be 'add' or 'remove'")
-    
-    try:
-        success_count = 0
-        errors = []
-        
-        for file_path in file_paths:
-            try:
-                if action == "add":
-                    photo_search_engine.add_favorite(file_path)
-                else:
-                    photo_search_engine.remove_favorite(file_path)
-                success_count += 1
-            except Exception as e:
-                errors.append(f"Failed to {action} favorite {file_path}: {str(e)}")
-        
-        return {
+
+    targets = _bulk_targets(photo_ids, file_paths)
+
+    def work(job_id: str) -> BulkResult:
+        return _bulk_ops().set_favorites(targets, action == "add", job_id=job_id)
+
+    return await _run_bulk(
+        "favorite", background_tasks, bool(payload.get("background", False)), work,
+        lambda result: {
             "success": True,
-            "processed_count": success_count,
-            "errors": errors
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Bulk favorite {action} failed: {str(e)}")
+            "processed_count": len(result.processed) if result.errors else len(targets),
+            "changed_count": len(result.processed),
+            "errors": result.errors,
+        },
+    )
 
 def generate_metadata_match_explanation(query: str, result: dict) -> dict:
     """Generate match explanation for metadata search results with detailed breakdown"""
@@ -2683,65 +3016,60 @@ async def get_search_count(request: SearchCountRequest):
         print(f"Search count error: {e}")
         return {"count": 0}
 
+def _list_semantic_page(limit: int, offset: int) -> List[Dict[str, Any]]:
+    """One page of the vector store in store order, metadata loaded in one batch."""
+    records = vector_store.get_all_records(limit=limit, offset=offset)
+    paths = [r.get('path', r.get('id', '')) for r in records]
+    metadata = photo_search_engine.db.get_metadata_many(paths)
+    return [
+        {
+            "path": file_path,
+            "filename": r.get('filename', os.path.basename(file_path)),
+            "score": 0,
+            "metadata": metadata.get(file_path) or {},
+        }
+        for r, file_path in zip(records, paths)
+    ]
+
 @app.get("/search/semantic")
-async def search_semantic(query: str, limit: int = 50, offset: int = 0, min_score: float = 0.22):
+async def search_semantic(query: str, limit: int = 50, offset: int = 0, min_score: float = DEFAULT_SEMANTIC_MIN_SCORE):
     """
     Semantic Search using text-to-image embeddings.
     """
-    global embedding_generator
     try:
-        if not embedding_generator:
-            embedding_generator = EmbeddingGenerator()
-        
         # Handle empty query - return all photos (paginated)
         if not query.strip():
             try:
-                # Pass offset to store
-                all_records = vector_store.get_all_records(limit=limit, offset=offset)
-                formatted = []
-                for r in all_records:
-                    file_path = r.get('path', r.get('id', ''))
-                    full_metadata = photo_search_engine.db.get_metadata_by_path(file_path)
-                    formatted.append({
-                        "path": file_path,
-                        "filename": r.get('filename', os.path.basename(file_path)),
-                        "score": 0,
-                        "metadata": full_metadata or {}
-                    })
+                formatted = await execution_pools.run_io(_list_semantic_page, limit, offset)
                 # Count is tricky here, but we return page size for now
                 return {"count": len(formatted), "results": formatted}
             except Exception as e:
                 print(f"Error getting all records: {e}")
                 return {"count": 0, "results": []}
             
-        # 1. Generate text embedding
-        text_vec = embedding_generator.generate_text_embedding(query)
-        
-        # 2. Search LanceDB with offset
-        # vector_store.search now supports offset directly
-        results = vector_store.search(text_vec, limit=limit, offset=offset)
-        
-        # 3. Format and enrich
-        formatted = []
-        for r in results:
-            if r['score'] >= min_score:
-                file_path = r['metadata']['path']
-                full_metadata = photo_search_engine.db.get_metadata_by_path(file_path)
-                
-                result_item = {
-                    "path": file_path,
-                    "filename": r['metadata']['filename'],
-                    "score": r['score'],
-                    "metadata": full_metadata or r['metadata']
-                }
-                
-                # Generate match explanation for semantic search
-                if query.strip():
-                    result_item["matchExplanation"] = generate_semantic_match_explanation(query, result_item, r['score'])
-                
-                formatted.append(result_item)
-        
+        # Rank once per query and library version, then enrich only the page
+        query = _normalize_search_query(query)
+        cache_params = {"endpoint": "search/semantic", "min_score": min_score}
+        version = library_version.value
+        ranking = _get_cached_search_ranking(query, cache_params, version, offset + limit)
+        if ranking is None:
+            depth = _search_cache_depth(offset, limit)
+            # CLIP text encoding and the vector scan run on the I/O pool
+            async with endpoint_limits.slot("search"):
+                hits = await execution_pools.run_io(_semantic_hits, query, depth)
+            results = [h for h in hits if h['score'] >= min_score]
+            # Hits are best-first, so a cut by min_score ends the ranking
+            exhausted = len(hits) < depth or len(results) < len(hits)
+            ranking = _cache_search_ranking(query, cache_params, version, results, depth, exhausted)
+
+        formatted = await execution_pools.run_io(
+            _hydrate_search_page,
+            ranking["items"][offset:offset + limit],
+            lambda r: generate_semantic_match_explanation(query, r, r['score']),
+        )
         return {"count": len(formatted), "results": formatted}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -2783,6 +3111,20 @@ async def get_thumbnail(request: Request, path: str = "", size: int = 300, token
 
         requested_path_str = path
 
+    # Cloud objects: small sizes come from the header preview, larger ones
+    # from the full object fetched into the local cache
+    if is_remote_path(requested_path_str):
+        preview_path = remote_previews.get(requested_path_str)
+        try:
+            if preview_path and size <= REMOTE_PREVIEW_MAX_SIZE:
+                requested_path_str = str(preview_path)
+            else:
+                requested_path_str = str(await run_in_threadpool(_remote_local_file, requested_path_str))
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Could not fetch remote file: {e}")
+
     # Security check: Ensure path is within allowed directory
     try:
         if settings.MEDIA_DIR.exists():
@@ -2851,68 +3193,53 @@ async def get_thumbnail(request: Request, path: str = "", size: int = 300, token
         # In case logging fails, don't block response
         pass
 
+    # Rate limiting: check per-IP quota
+    try:
+        if settings.RATE_LIMIT_ENABLED:
+            global _rate_last_conf
+            conf = (bool(settings.RATE_LIMIT_ENABLED), int(settings.RATE_LIMIT_REQS_PER_MIN))
+            client_ip = request.client.host if request.client else "unknown"
+            now = __import__("time").time()
+            with _rate_lock:
+                if _rate_last_conf != conf:
+                    _rate_counters.clear()
+                    _rate_last_conf = conf
+                lst = _rate_counters.get(client_ip, [])
+                lst = [t for t in lst if now - t < 60]
+                if len(lst) >= settings.RATE_LIMIT_REQS_PER_MIN:
+                    raise HTTPException(status_code=429, detail="Rate limit exceeded")
+                lst.append(now)
+                _rate_counters[client_ip] = lst
+    except HTTPException:
+        raise
+    except Exception:
+        pass
+
     # Serve the thumbnail after security checks and access logging
     try:
-        from PIL import Image
-        import io
-
         # For 3D textures we want small files (size=300 is good)
         # For Detail Modal we want larger (size=1200)
 
-        with Image.open(requested_path_str) as img:
-            # Convert to RGB if needed (e.g. RGBA or P)
-            if img.mode in ("RGBA", "P") and output_format in ("JPEG", "WEBP"):
-                img = img.convert("RGB")
-
-            img.thumbnail((size, size))
+        # Decode/resize/encode is CPU-bound: it runs in the process pool
+        async with endpoint_limits.slot("thumbnail"):
+            content_bytes = await execution_pools.run_cpu(render_thumbnail, requested_path_str, size, output_format)
 
-            # Save to buffer
-            img_io = io.BytesIO()
-            save_kwargs = {"quality": 75}
-            if output_format == "WEBP":
-                save_kwargs["method"] = 4
-            img.save(img_io, output_format, **save_kwargs)
-            img_io.seek(0)
+        logger.info(f"Thumbnail produced {len(content_bytes)} bytes for {requested_path_str} as {output_format}")
+        # Include cache headers + content type + explicit CORS headers
+        headers = dict(cache_headers)
+        headers.setdefault("Content-Type", "image/webp" if output_format == "WEBP" else "image/jpeg")
 
-            # Rate limiting: check per-IP quota
-            try:
-                if settings.RATE_LIMIT_ENABLED:
-                    global _rate_last_conf
-                    conf = (bool(settings.RATE_LIMIT_ENABLED), int(settings.RATE_LIMIT_REQS_PER_MIN))
-                    client_ip = request.client.host if request.client else "unknown"
-                    now = __import__("time").time()
-                    with _rate_lock:
-                        if _rate_last_conf != conf:
-                            _rate_counters.clear()
-                            _rate_last_conf = conf
-                        lst = _rate_counters.get(client_ip, [])
-                        lst = [t for t in lst if now - t < 60]
-                        if len(lst) >= settings.RATE_LIMIT_REQS_PER_MIN:
-                            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-                        lst.append(now)
-                        _rate_counters[client_ip] = lst
-            except HTTPException:
-                raise
-            except Exception:
-                pass
+        # Explicit CORS headers for cross-origin image requests
+        origin = request.headers.get("origin")
+        if origin and origin in cors_origins:
+            headers["Access-Control-Allow-Origin"] = origin
+            headers["Access-Control-Allow-Credentials"] = "true"
 
-            content_bytes = img_io.getvalue()
-            logger.info(f"Thumbnail produced {len(content_bytes)} bytes for {requested_path_str} as {output_format}")
-            # Include cache headers + content type + explicit CORS headers
-            headers = dict(cache_headers)
-            headers.setdefault("Content-Type", "image/webp" if output_format == "WEBP" else "image/jpeg")
-            
-            # Explicit CORS headers for cross-origin image requests
-            origin = request.headers.get("origin")
-            if origin and origin in cors_origins:
-                headers["Access-Control-Allow-Origin"] = origin
-                headers["Access-Control-Allow-Credentials"] = "true"
-            
-            return Response(
-                content=content_bytes,
-                media_type="image/webp" if output_format == "WEBP" else "image/jpeg",
-                headers=headers,
-            )
+        return Response(
+            content=content_bytes,
+            media_type="image/webp" if output_format == "WEBP" else "image/jpeg",
+            headers=headers,
+        )
 
     except ImportError:
         pass
@@ -3039,6 +3366,18 @@ async def get_file(request: Request, path: str, download: bool = False):
     Serve an original file (image/video/etc.) without transcoding.
     Use `download=true` to force a download Content-Disposition.
     """
+    display_name = os.path.basename(path)
+    if is_remote_path(path):
+        # Fetched in full on first access; later requests hit the local cache
+        source_id, remote_id = parse_remote_path(path)
+        display_name = _remote_item_name(source_id, remote_id) or display_name
+        try:
+            path = str(await run_in_threadpool(_remote_local_file, path))
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Could not fetch remote file: {e}")
+
     # Security check with enhanced validation
     if settings.MEDIA_DIR.exists():
         allowed_paths = [settings.MEDIA_DIR.resolve(), settings.BASE_DIR.resolve()]
@@ -3070,9 +3409,10 @@ async def get_file(request: Request, path: str, download: bool = False):
 
     # Serve the file safely
     media_type, _ = mimetypes.guess_type(path)
-    filename = os.path.basename(path) if download else None
+    filename = display_name if download else None
 
-    return FileResponse(
+    # Range requests get 206 partial content so large originals can be read piecemeal
+    return RangeFileResponse(
         path,
         media_type=media_type or "application/octet-stream",
         filename=filename,
@@ -3081,6 +3421,7 @@ async def get_file(request: Request, path: str, download: bool = False):
             "X-Frame-Options": "DENY",
             "Cache-Control": "private, max-age=3600",
         },
+        chunk_size=settings.FILE_RANGE_CHUNK_SIZE,
     )
 
 @app.get("/video")
@@ -3121,7 +3462,6 @@ async def get_video(request: Request, path: str):
         # Add security headers + CORS headers for video serving
         video_headers = {
             "X-Content-Type-Options": "nosniff",
-            "Accept-Ranges": "bytes"
         }
         
         # Add explicit CORS headers for cross-origin video requests
@@ -3130,10 +3470,12 @@ async def get_video(request: Request, path: str):
             video_headers["Access-Control-Allow-Origin"] = origin
             video_headers["Access-Control-Allow-Credentials"] = "true"
         
-        return FileResponse(
+        # Seeking sends Range requests; only the requested bytes are read
+        return RangeFileResponse(
             path,
             media_type=media_type,
-            headers=video_headers
+            headers=video_headers,
+            chunk_size=settings.FILE_RANGE_CHUNK_SIZE,
         )
     
     raise HTTPException(status_code=404, detail="Video not found")
@@ -3578,8 +3920,6 @@ async def get_timeline():
         # Connect to db safely using the existing connection if available
         # The MetadataDatabase handles connection in __init__
         
-        cursor = photo_search_engine.db.conn.cursor()
-        
         # Query: Count photos per month
         # SQLite: strftime('%Y-%m', created_at)
         # Fix: Use COALESCE to ensure safety against nulls
@@ -3590,8 +3930,11 @@ async def get_timeline():
             GROUP BY month
             ORDER BY month ASC
         """
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        # Full-table JSON scan: keep it off the event loop
+        async with endpoint_limits.slot("timeline"):
+            rows = await execution_pools.run_io(
+                lambda: photo_search_engine.db.conn.execute(query).fetchall()
+            )
         
         timeline_data = [{"date": row[0], "count": row[1]} for row in rows]
         return {"timeline": timeline_data}
@@ -3771,7 +4114,7 @@ from src.face_clustering import FaceClusterer
 face_clusterer = FaceClusterer()
 
 # Initialize OCR Search
-from src.ocr_search import OCRSearch
+from src.ocr_search import OCRSearch, fuse_ranked
 ocr_search = OCRSearch()
 
 # Signed URL helpers
@@ -4036,20 +4379,40 @@ async def extract_text_from_images(request: OCRImageRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/ocr/search")
-async def search_ocr_text(query: str, limit: int = 100, offset: int = 0):
+async def search_ocr_text(query: str, limit: int = 100, offset: int = 0, include_videos: bool = True):
     """
-    Search for images containing specific text
+    Search for images (and video frames) containing specific text
     
     Args:
         query: Text to search for
         limit: Maximum number of results
         offset: Pagination offset
+        include_videos: Also search text OCR'd from video keyframes
         
     Returns:
-        Dictionary with search results
-    """
-    try:
-        results = ocr_search.search_text(query, limit, offset)
+        Dictionary with search results. Images alone are ordered by bm25;
+        with videos, each index is ranked by its own bm25 and the two
+        rankings are merged by reciprocal-rank fusion
+    """
+    try:
+        if not include_videos:
+            results = ocr_search.search_text(query, limit, offset)
+            return {"status": "success", "results": results}
+
+        # bm25 scores from two FTS tables are not comparable, so both indexes
+        # are read from the top and merged by rank
+        results = ocr_search.search_text(query, limit + offset, 0)
+        if results.get("status") == "success":
+            for hit in results["results"]:
+                hit["media_type"] = "image"
+            video_hits = video_analyzer.search_video_content(query, limit=limit + offset)
+            for hit in video_hits:
+                hit["media_type"] = "video"
+            merged = fuse_ranked(results["results"], video_hits, k=settings.HYBRID_RRF_K)
+            results["results"] = merged[offset:offset + limit]
+            results["total"] += video_analyzer.count_video_content_matches(query)
+            results["limit"] = limit
+            results["offset"] = offset
         return {"status": "success", "results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4777,17 +5140,15 @@ async def export_photos(request: ExportRequest):
     Returns:
         Streaming file download
     """
-    import zipfile
     import io
-    from fastapi.responses import StreamingResponse
     from PIL import Image
     import json
 
     if not request.paths:
         raise HTTPException(status_code=400, detail="No files specified")
 
-    if len(request.paths) > 100:
-        raise HTTPException(status_code=400, detail="Maximum 100 files per export")
+    if len(request.paths) > settings.EXPORT_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Maximum {settings.EXPORT_MAX_FILES} files per export")
 
     # Validate paths are within allowed directories
     valid_paths = []
@@ -4812,74 +5173,41 @@ async def export_photos(request: ExportRequest):
     if not valid_paths:
         raise HTTPException(status_code=400, detail="No valid files to export")
 
-    # Create ZIP in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for path in valid_paths:
-            original_filename = os.path.basename(path)
+    options = request.options
 
-            # Handle duplicate filenames by adding parent folder
-            if any(os.path.basename(p) == original_filename and p != path for p in valid_paths):
-                parent = os.path.basename(os.path.dirname(path))
-                filename = f"{parent}_{original_filename}"
-            else:
-                filename = original_filename
+    def resized(path: str, max_size: int) -> bytes:
+        with Image.open(path) as img:
+            img.thumbnail((max_size, max_size))
+            buffer = io.BytesIO()
+            img.save(buffer, format=img.format)
+            return buffer.getvalue()
 
-            # Process image if size reduction is requested
-            if request.options.max_resolution:
-                try:
-                    # Open and resize image if needed
-                    with Image.open(path) as img:
-                        img.thumbnail((request.options.max_resolution, request.options.max_resolution))
+    def metadata_json(path: str) -> Optional[bytes]:
+        metadata = photo_search_engine.db.get_metadata(path)
+        return json.dumps(metadata, indent=2).encode("utf-8") if metadata else None
 
-                        # Save to temporary bytes buffer
-                        temp_buffer = io.BytesIO()
-                        img.save(temp_buffer, format=img.format)
-                        temp_buffer.seek(0)
+    def entries() -> Iterator[ZipEntry]:
+        # Generated lazily; resizing and thumbnails run in the stream's worker pool
+        for path, filename in zip(valid_paths, unique_arcnames(valid_paths)):
+            original_filename = os.path.basename(path)
+            stem, ext = os.path.splitext(original_filename)
 
-                        # Write to zip
-                        zip_file.writestr(filename, temp_buffer.getvalue())
-                except Exception:
-                    # If image processing fails, just copy the file
-                    zip_file.write(path, filename)
+            # Process image if size reduction is requested; if image
+            # processing fails, the original file is copied instead
+            if options.max_resolution:
+                yield ZipEntry(filename, path=path, render=partial(resized, path, options.max_resolution))
             else:
-                # Write original file
-                zip_file.write(path, filename)
+                yield ZipEntry(filename, path=path)
 
             # Include metadata if requested
-            if request.options.include_metadata:
-                try:
-                    metadata = photo_search_engine.db.get_metadata(path)
-                    if metadata:
-                        # Write metadata as JSON file
-                        meta_filename = f"{original_filename.replace(os.path.splitext(original_filename)[1], '')}_metadata.json"
-                        zip_file.writestr(meta_filename, json.dumps(metadata, indent=2))
-                except Exception:
-                    # If metadata extraction fails, continue without it
-                    pass
+            if options.include_metadata:
+                yield ZipEntry(f"{stem}_metadata.json", render=partial(metadata_json, path))
 
             # Include thumbnail if requested
-            if request.options.include_thumbnails:
-                try:
-                    with Image.open(path) as img:
-                        img.thumbnail((200, 200))  # Create 200x200 thumbnail
-                        thumb_buffer = io.BytesIO()
-                        img.save(thumb_buffer, format=img.format)
-                        thumb_buffer.seek(0)
-
-                        thumb_filename = f"thumbs/{original_filename.replace(os.path.splitext(original_filename)[1], '')}_thumb{os.path.splitext(original_filename)[1]}"
-                        zip_file.writestr(thumb_filename, thumb_buffer.getvalue())
-                except Exception:
-                    # If thumbnail creation fails, continue without it
-                    pass
-
-    zip_buffer.seek(0)
+            if options.include_thumbnails:
+                yield ZipEntry(f"thumbs/{stem}_thumb{ext}", render=partial(resized, path, 200))
 
-    return StreamingResponse(
-        zip_buffer,
-        media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename=photos_export.zip"}
-    )
+    return _zip_response(entries(), "photos_export.zip")
 
 
 @app.post("/export/presets")
@@ -5062,31 +5390,13 @@ async def get_shared_content(share_id: str, password: Optional[str] = None):
 @app.get("/shared/{share_id}/download")
 async def download_shared_content(share_id: str, password: Optional[str] = None):
     """Download content from a share link."""
-    import zipfile
-    import io
-    from fastapi.responses import StreamingResponse
-
     # Get shared content (uses same validation as get_shared_content)
     content = await get_shared_content(share_id, password)
 
-    # Create ZIP in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for path in content["paths"]:
-            filename = os.path.basename(path)
-            # Handle duplicate filenames by adding parent folder
-            if any(os.path.basename(p) == filename and p != path for p in content["paths"]):
-                parent = os.path.basename(os.path.dirname(path))
-                filename = f"{parent}_{filename}"
-            zip_file.write(path, filename)
-
-    zip_buffer.seek(0)
-
-    return StreamingResponse(
-        zip_buffer,
-        media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename=shared_photos.zip"}
-    )
+    # Duplicate filenames get their parent folder as a prefix
+    paths = content["paths"]
+    entries = [ZipEntry(name, path=p) for p, name in zip(paths, unique_arcnames(paths))]
+    return _zip_response(entries, "shared_photos.zip")
 
 # ==============================================================================
 # VERSION STACKS ENDPOINTS
@@ -5624,12 +5934,26 @@ async def get_cache_stats():
     """Get statistics about the caching system."""
     try:
         from src.cache_manager import cache_manager
-        stats = cache_manager.get_stats()
-        return {"stats": stats}
+        stats = cache_manager.stats()
+        return {"stats": stats["caches"], "totals": stats["totals"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/db/stats")
+async def get_db_stats():
+    """SQLite pool configuration, connection counts and per-endpoint query load."""
+    return db_pool.stats()
+
+
+@app.get("/filter-index/stats")
+async def get_filter_index_stats():
+    """Filter bitmap backend, where it was loaded from and how many bitmaps of each kind exist."""
+    if filter_index is None:
+        return {"loaded": False}
+    return {"loaded": True, **filter_index.stats()}
+
+
 @app.post("/cache/clear")
 async def clear_cache(cache_type: Optional[str] = None):
     """Clear cache entries."""
@@ -6263,7 +6587,7 @@ async def update_story(story_id: str, request: StoryUpdateRequest):
             raise HTTPException(status_code=404, detail="Story not found")
 
         # Update story in database
-        with sqlite3.connect(settings.BASE_DIR / "timelines.db") as conn:
+        with db_pool.connect(settings.BASE_DIR / "timelines.db") as conn:
             update_fields: list[str] = []
             params: list[object] = []
 
@@ -6344,7 +6668,7 @@ async def update_timeline_entry(entry_id: str, request: TimelineEntryUpdateReque
 
         # In a real implementation, we would have a method to update specific timeline entries
         # For now, we'll update using raw SQL
-        with sqlite3.connect(settings.BASE_DIR / "timelines.db") as conn:
+        with db_pool.connect(settings.BASE_DIR / "timelines.db") as conn:
             update_fields: list[str] = []
             params: list[object] = []
 
@@ -6535,14 +6859,32 @@ async def undo_bulk_action(action_id: str):
         if not bulk_db.can_undo_action(action_id):
             raise HTTPException(status_code=400, detail="Action cannot be undone")
 
-        # For actual undo, we would need to implement the specific undo logic for each action type
-        # This is a simplified implementation that just marks the action as undone
+        # Actions run by the bulk-ops engine carry what their undo needs;
+        # other recorded actions are only marked as undone
+        action = bulk_db.get_action(action_id)
+        errors: List[str] = []
+        if action and action.action_type == "delete":
+            raise HTTPException(status_code=400, detail="Deleted files cannot be restored")
+        if action and action.action_type == "trash":
+            _, errors = await execution_pools.run_io(
+                _restore_trash_items, action.operation_data.get("trash_item_ids", [])
+            )
+        elif action and action.action_type == "favorite" and "favorite" in action.operation_data:
+            engine = _bulk_ops()
+            await execution_pools.run_io(
+                lambda: engine.set_favorites(
+                    engine.resolve(paths=action.affected_paths), not action.operation_data["favorite"], record=False
+                )
+            )
+
         success = bulk_db.mark_action_undone(action_id)
 
         if not success:
             raise HTTPException(status_code=400, detail="Failed to undo action")
 
-        return {"success": True, "action_id": action_id}
+        return {"success": True, "action_id": action_id, "errors": errors}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -6645,7 +6987,7 @@ async def get_tag_filter_legacy2(filter_id: str):
 async def get_tag_filters_legacy2(limit: int = 50, offset: int = 0):
     """Get all tag filters."""
     try:
-        with sqlite3.connect(settings.BASE_DIR / "tag_filters.db") as conn:
+        with db_pool.connect(settings.BASE_DIR / "tag_filters.db") as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute(
                 "SELECT * FROM tag_filters ORDER BY created_at DESC LIMIT ? OFFSET ?",
@@ -6673,7 +7015,7 @@ async def update_tag_filter_legacy2(filter_id: str, request: Legacy2TagFilterUpd
             raise HTTPException(status_code=404, detail="Tag filter not found")
 
         # Update the filter
-        with sqlite3.connect(settings.BASE_DIR / "tag_filters.db") as conn:
+        with db_pool.connect(settings.BASE_DIR / "tag_filters.db") as conn:
             update_fields = []
             params = []
 
@@ -7237,7 +7579,7 @@ async def get_tag_filter(filter_id: str):
 async def get_tag_filters(limit: int = 50, offset: int = 0):
     """Get all tag filters."""
     try:
-        with sqlite3.connect(settings.BASE_DIR / "tag_filters.db") as conn:
+        with db_pool.connect(settings.BASE_DIR / "tag_filters.db") as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute(
                 "SELECT * FROM tag_filters ORDER BY created_at DESC LIMIT ? OFFSET ?",
@@ -7265,7 +7607,7 @@ async def update_tag_filter(filter_id: str, request: TagFilterUpdateRequest):
             raise HTTPException(status_code=404, detail="Tag filter not found")
 
         # Update the filter
-        with sqlite3.connect(settings.BASE_DIR / "tag_filters.db") as conn:
+        with db_pool.connect(settings.BASE_DIR / "tag_filters.db") as conn:
             update_fields = []
             params = []
 
@@ -7545,7 +7887,7 @@ async def get_photo_tags(path: str):
 # ==============================================================================
 
 from server.albums_db import get_albums_db, Album as AlbumModel
-from server.smart_albums import initialize_predefined_smart_albums, populate_smart_album
+from server.smart_albums import initialize_predefined_smart_albums, populate_smart_album, SmartAlbumMaintainer
 import uuid
 
 class AlbumCreate(BaseModel):
@@ -7574,20 +7916,42 @@ async def create_album(req: AlbumCreate):
 
     return {"album": album}
 
+_predefined_albums_ready = False
+
 @app.get("/albums")
 async def list_albums(include_smart: bool = True):
     """List all albums."""
+    global _predefined_albums_ready
     albums_db = get_albums_db()
 
-    # Initialize predefined smart albums if not exists
-    initialize_predefined_smart_albums(albums_db)
+    # Initialize predefined smart albums once per process
+    if not _predefined_albums_ready:
+        initialize_predefined_smart_albums(albums_db)
+        _predefined_albums_ready = True
 
     albums = albums_db.list_albums(include_smart=include_smart)
     return {"albums": albums}
 
+def _album_photos_with_metadata(album_id: str, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """One page of album photos joined with their metadata (one batched lookup)."""
+    photo_paths, next_cursor = get_albums_db().get_album_photos_page(album_id, limit, cursor)
+    metadata_by_path = photo_search_engine.db.get_metadata_many(photo_paths)
+
+    photos = []
+    for path in photo_paths:
+        metadata = metadata_by_path.get(path)
+        if metadata:
+            photos.append({
+                "path": path,
+                "filename": os.path.basename(path),
+                "metadata": metadata
+            })
+    return {"photos": photos, "next_cursor": next_cursor}
+
 @app.get("/albums/{album_id}")
-async def get_album(album_id: str, include_photos: bool = True):
-    """Get album details."""
+async def get_album(album_id: str, include_photos: bool = True,
+                    limit: int = Query(1000, ge=1, le=5000), cursor: Optional[str] = None):
+    """Get album details and one page of its photos in album order."""
     albums_db = get_albums_db()
     album = albums_db.get_album(album_id)
 
@@ -7597,18 +7961,11 @@ async def get_album(album_id: str, include_photos: bool = True):
     result: dict[str, Any] = {"album": album}
 
     if include_photos:
-        photo_paths = albums_db.get_album_photos(album_id)
-        # Get metadata for photos
-        photos = []
-        for path in photo_paths:
-            metadata = photo_search_engine.db.get_metadata(path)
-            if metadata:
-                photos.append({
-                    "path": path,
-                    "filename": os.path.basename(path),
-                    "metadata": metadata
-                })
-        result["photos"] = photos
+        try:
+            page = await execution_pools.run_io(_album_photos_with_metadata, album_id, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        result.update(page)
 
     return result
 
@@ -7694,22 +8051,13 @@ async def refresh_smart_album(album_id: str):
     if not album.is_smart:
         raise HTTPException(status_code=400, detail="Only smart albums can be refreshed")
 
-    # Get all photos with metadata
-    cursor = photo_search_engine.db.conn.cursor()
-    cursor.execute("SELECT file_path, metadata_json FROM metadata WHERE deleted_at IS NULL")
-
-    photos_with_metadata = []
-    for row in cursor.fetchall():
-        import json
-        metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
-        photos_with_metadata.append((row['file_path'], metadata))
-
-    # Populate smart album
-    populate_smart_album(albums_db, album_id, photos_with_metadata)
+    # Rules compile to SQL over the metadata table; membership is updated by diff
+    async with endpoint_limits.slot("albums"):
+        changes = await execution_pools.run_io(populate_smart_album, albums_db, album_id, photo_search_engine.db)
 
     # Return updated album
     album = albums_db.get_album(album_id)
-    return {"album": album}
+    return {"album": album, "changes": changes}
 
 @app.get("/photos/{path:path}/albums")
 async def get_photo_albums(path: str):
@@ -8007,30 +8355,37 @@ async def delete_photo_notes(file_path: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _search_notes_with_metadata(query: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+    """Ranked note matches joined with their photos' metadata (one batched lookup)."""
+    notes_db = get_notes_db(settings.BASE_DIR / "notes.db")
+    results = notes_db.search_notes(query, limit, offset)
+    metadata_by_path = photo_search_engine.db.get_metadata_many([row["photo_path"] for row in results])
+
+    photos = []
+    for row in results:
+        metadata = metadata_by_path.get(row["photo_path"])
+        if metadata:
+            photos.append({
+                "path": row["photo_path"],
+                "filename": Path(row["photo_path"]).name,
+                "metadata": metadata,
+                "note": row["note"],
+                "snippet": row["snippet"],
+                "score": row["score"],
+            })
+    return photos
+
+
 @app.get("/api/notes/search")
 async def search_notes(query: str, limit: int = 100, offset: int = 0):
-    """Search notes by content."""
-    try:
-        notes_db = get_notes_db(settings.BASE_DIR / "notes.db")
-        results = notes_db.search_notes(query, limit, offset)
-
-        # Get full metadata for each photo
-        photos = []
-        for row in results:
-            note_path = row.get("photo_path")
-            if not note_path:
-                continue
-            try:
-                metadata = photo_search_engine.db.get_metadata(note_path)
-                if metadata:
-                    photos.append({
-                        "path": note_path,
-                        "filename": Path(note_path).name,
-                        "metadata": metadata
-                    })
-            except:
-                continue
+    """
+    Search notes by content, best match first.
 
+    Every word must appear in the note as a word prefix; each photo carries
+    a snippet with the matches wrapped in <mark>.
+    """
+    try:
+        photos = await execution_pools.run_io(_search_notes_with_metadata, query, limit, offset)
         return {"photos": photos, "total": len(photos)}
     except HTTPException:
         raise
@@ -8073,23 +8428,6 @@ async def get_notes_stats():
         notes_db = get_notes_db(settings.BASE_DIR / "notes.db")
         stats = notes_db.get_notes_stats()
         return {"stats": stats}
-    except Exception as e:
-        photos = []
-        for row in results:
-            path = row.get("photo_path")
-            metadata = photo_search_engine.db.get_metadata(path)
-            if metadata:
-                photos.append({
-                    "path": path,
-                    "metadata": metadata,
-                    "note": row.get("note"),
-                    "created_at": row.get("created_at"),
-                    "updated_at": row.get("updated_at"),
-                })
-
-        return {"count": len(photos), "results": photos}
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -8246,7 +8584,7 @@ async def detect_faces_in_photo(photo_path: str):
         
         # Get details about detected faces
         faces = []
-        with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+        with db_pool.connect(str(face_clustering_db.db_path)) as conn:
             conn.row_factory = sqlite3.Row
             
             for detection_id in detection_ids:
@@ -8283,7 +8621,7 @@ async def get_faces_in_photo(photo_path: str):
         
         # Get all faces for this photo
         faces = []
-        with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+        with db_pool.connect(str(face_clustering_db.db_path)) as conn:
             conn.row_factory = sqlite3.Row
             
             rows = conn.execute("""
@@ -8385,7 +8723,7 @@ async def cluster_faces_api(
         cluster_details = []
         for cluster_id, detection_ids in clusters.items():
             # Get cluster info
-            with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+            with db_pool.connect(str(face_clustering_db.db_path)) as conn:
                 conn.row_factory = sqlite3.Row
                 cluster_row = conn.execute("""
                     SELECT cluster_id, label, face_count, photo_count
@@ -8428,7 +8766,7 @@ async def find_similar_faces(detection_id: str, threshold: float = 0.7):
         enhanced_results = []
         for face in similar_faces:
             # Get person association if any
-            with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+            with db_pool.connect(str(face_clustering_db.db_path)) as conn:
                 conn.row_factory = sqlite3.Row
                 person_row = conn.execute("""
                     SELECT ppa.cluster_id, fc.label
@@ -8469,7 +8807,7 @@ async def get_cluster_quality(cluster_id: str):
             raise HTTPException(status_code=404, detail=quality['error'])
         
         # Get cluster details
-        with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+        with db_pool.connect(str(face_clustering_db.db_path)) as conn:
             conn.row_factory = sqlite3.Row
             cluster_row = conn.execute("""
                 SELECT cluster_id, label, created_at, updated_at
@@ -8504,7 +8842,7 @@ async def merge_clusters(cluster_id: str, payload: dict):
         face_clustering_db = get_face_clustering_db(settings.BASE_DIR / "face_clusters.db")
         
         # Get all associations from source cluster
-        with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+        with db_pool.connect(str(face_clustering_db.db_path)) as conn:
             conn.row_factory = sqlite3.Row
             
             # Get source cluster info
@@ -8814,7 +9152,7 @@ async def get_person_analytics(person_id: str):
         
         # Get basic cluster info
         cluster = None
-        with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+        with db_pool.connect(str(face_clustering_db.db_path)) as conn:
             cluster = conn.execute("""
                 SELECT * FROM face_clusters WHERE cluster_id = ?
             """, (person_id,)).fetchone()
@@ -8827,7 +9165,7 @@ async def get_person_analytics(person_id: str):
         
         # Get timeline data
         timeline = []
-        with sqlite3.connect(str(face_clustering_db.db_path)) as conn:
+        with db_pool.connect(str(face_clustering_db.db_path)) as conn:
             timeline_rows = conn.execute("""
                 SELECT ppa.photo_path, ppa.created_at, ppa.confidence
                 FROM photo_person_associations ppa
@@ -8876,6 +9214,7 @@ video_analyzer = VideoAnalyzer(
     db_path=str(settings.BASE_DIR / "video_analysis.db"),
     cache_dir=str(settings.BASE_DIR / "cache" / "video")
 )
+video_analyzer.cache_budget_bytes = settings.VIDEO_CACHE_MAX_MB * 1024 * 1024
 
 class VideoAnalysisRequest(BaseModel):
     video_path: str
@@ -8966,14 +9305,12 @@ async def search_video_content(request: VideoSearchRequest):
     Returns matching videos with timestamps where text was found.
     """
     try:
-        results = video_analyzer.search_video_content(
+        paginated_results = video_analyzer.search_video_content(
             query=request.query,
-            limit=request.limit
+            limit=request.limit,
+            offset=request.offset
         )
-        
-        # Add pagination info
-        total_results = len(results)
-        paginated_results = results[request.offset:request.offset + request.limit]
+        total_results = video_analyzer.count_video_content_matches(request.query)
         
         return {
             "query": request.query,
@@ -9230,8 +9567,9 @@ async def batch_analyze_videos(background_tasks: BackgroundTasks, video_paths: L
     """
     Analyze multiple videos in batch.
     
-    Starts analysis for multiple videos in the background.
-    Use /video/batch-status to monitor progress.
+    Starts analysis for multiple videos on a bounded process pool.
+    Unchanged videos (same path, mtime and size) are skipped.
+    Use /jobs/{job_id} to monitor per-video progress.
     """
     try:
         if len(video_paths) > 50:
@@ -9249,28 +9587,53 @@ async def batch_analyze_videos(background_tasks: BackgroundTasks, video_paths: L
                 detail=f"Video files not found: {', '.join(invalid_paths[:5])}"
             )
         
-        # Start batch analysis
+        # Per-video progress lives in the job result so /jobs/{job_id} can report it
+        job_id = job_store.create_job(type="video_batch", payload={"video_paths": video_paths})
+        videos: Dict[str, Dict[str, Any]] = {
+            video_path: {"status": "queued"} for video_path in video_paths
+        }
+        
+        def on_video_done(video_path: str, entry: Dict[str, Any], done: int, total: int):
+            videos[video_path] = entry
+            job_store.update_job(
+                job_id,
+                progress=int(done / max(total, 1) * 100),
+                message=f"Analyzed {done}/{total} videos",
+                result={"videos": videos},
+            )
+        
         def run_batch_analysis():
-            results = []
-            for video_path in video_paths:
-                try:
-                    result = video_analyzer.analyze_video(video_path, force_reprocess=False)
-                    results.append({"video_path": video_path, "status": result.get("status")})
-                    ps_logger.info(f"Batch analysis completed for {video_path}")
-                except Exception as e:
-                    results.append({"video_path": video_path, "status": "failed", "error": str(e)})
-                    ps_logger.error(f"Batch analysis failed for {video_path}: {str(e)}")
-            
-            ps_logger.info(f"Batch analysis completed for {len(video_paths)} videos")
+            job_store.update_job(job_id, status="processing", message="Analyzing videos…", result={"videos": videos})
+            try:
+                video_analyzer.analyze_batch(
+                    video_paths,
+                    max_workers=settings.VIDEO_ANALYSIS_WORKERS or None,
+                    progress_callback=on_video_done,
+                )
+                failed = sum(1 for entry in videos.values() if entry.get("status") == "failed")
+                job_store.update_job(
+                    job_id,
+                    status="completed",
+                    progress=100,
+                    message=f"Batch analysis finished ({failed} failed)",
+                    result={"videos": videos},
+                )
+                ps_logger.info(f"Batch analysis completed for {len(video_paths)} videos")
+            except Exception as e:
+                job_store.update_job(job_id, status="failed", message=str(e))
+                ps_logger.error(f"Batch analysis failed: {str(e)}")
         
         background_tasks.add_task(run_batch_analysis)
         
         return {
             "status": "started",
+            "job_id": job_id,
             "video_count": len(video_paths),
-            "message": "Batch video analysis started in background"
+            "message": "Batch video analysis started in background. Use /jobs/{job_id} to monitor progress."
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -6,10 +6,12 @@ Provides functionality for complex tag filtering with AND/OR logic.
 
 import sqlite3
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Literal, cast
+from typing import List, Dict, Any, Optional, Literal, Tuple, cast
 from datetime import datetime
 import json
 
+from server.db_pool import connect
+
 
 class MultiTagFilterDB:
     """Database interface for multi-tag filtering operations"""
@@ -25,19 +27,18 @@ class MultiTagFilterDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS photo_tags (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     photo_path TEXT NOT NULL,
                     tag TEXT NOT NULL,
                     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_photo_path (photo_path),
-                    INDEX idx_tag (tag),
-                    INDEX idx_photo_tag (photo_path, tag),
                     UNIQUE(photo_path, tag)
                 )
             """)
+            # UNIQUE(photo_path, tag) already indexes lookups by photo
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_photo_tags_tag ON photo_tags(tag, photo_path)")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS tag_filters (
                     id TEXT PRIMARY KEY,
@@ -45,10 +46,10 @@ class MultiTagFilterDB:
                     tag_expressions TEXT NOT NULL,  -- JSON array of tag expressions
                     combination_operator TEXT DEFAULT 'AND',  -- 'AND' or 'OR'
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_created_at (created_at)
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tag_filters_created ON tag_filters(created_at)")
 
     def add_tag_to_photo(self, photo_path: str, tag: str) -> bool:
         """
@@ -62,7 +63,7 @@ class MultiTagFilterDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     "INSERT OR IGNORE INTO photo_tags (photo_path, tag) VALUES (?, ?)",
                     (photo_path, tag)
@@ -85,7 +86,7 @@ class MultiTagFilterDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "DELETE FROM photo_tags WHERE photo_path = ? AND tag = ?",
                     (photo_path, tag)
@@ -105,7 +106,7 @@ class MultiTagFilterDB:
             List of tags for the photo
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     "SELECT tag FROM photo_tags WHERE photo_path = ? ORDER BY tag",
@@ -135,7 +136,7 @@ class MultiTagFilterDB:
             return []
             
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
 
                 params: list[str | int] = []
@@ -146,39 +147,35 @@ class MultiTagFilterDB:
                     placeholders = ','.join(['?' for _ in tags])
                     
                     # Count how many of our target tags each photo has
+                    exclude_sql, exclude_params = self._exclude_tags_clause(exclude_tags)
                     query = f"""
                     SELECT photo_path, COUNT(tag) as tag_count
                     FROM photo_tags
-                    WHERE tag IN ({placeholders})
+                    WHERE tag IN ({placeholders}){exclude_sql}
                     GROUP BY photo_path
                     HAVING tag_count = ?
                     """
                     params.extend(tags)
+                    params.extend(exclude_params)
                     params.append(len(tags))
                     
                     cursor = conn.execute(query, params)
                     matching_photos = [row['photo_path'] for row in cursor.fetchall()]
-                    
-                    # Apply exclusions if specified
-                    if exclude_tags:
-                        matching_photos = self._apply_exclude_tags(conn, matching_photos, exclude_tags)
                         
                 elif operator.upper() == 'OR':
                     # Any of the tags can be present (union)
                     placeholders = ','.join(['?' for _ in tags])
+                    exclude_sql, exclude_params = self._exclude_tags_clause(exclude_tags)
                     query = f"""
                     SELECT DISTINCT photo_path
                     FROM photo_tags
-                    WHERE tag IN ({placeholders})
+                    WHERE tag IN ({placeholders}){exclude_sql}
                     """
                     params.extend(tags)
+                    params.extend(exclude_params)
                     
                     cursor = conn.execute(query, params)
                     matching_photos = [row['photo_path'] for row in cursor.fetchall()]
-                    
-                    # Apply exclusions if specified
-                    if exclude_tags:
-                        matching_photos = self._apply_exclude_tags(conn, matching_photos, exclude_tags)
                 else:
                     raise ValueError("Operator must be 'AND' or 'OR'")
                 
@@ -187,23 +184,21 @@ class MultiTagFilterDB:
             print(f"Error in get_photos_by_tags: {e}")
             return []
 
-    def _apply_exclude_tags(self, conn: sqlite3.Connection, photo_paths: List[str], exclude_tags: List[str]) -> List[str]:
-        """Helper method to filter out photos that have excluded tags."""
+    def _exclude_tags_clause(self, exclude_tags: Optional[List[str]]) -> Tuple[str, List[str]]:
+        """
+        SQL condition dropping photos that carry any excluded tag.
+
+        The exclusion runs as an anti-join inside the matching query, so no
+        candidate list is materialized and filtered in Python.
+        """
         if not exclude_tags:
-            return photo_paths
-            
+            return "", []
         placeholders = ','.join(['?' for _ in exclude_tags])
-        exclude_query = f"""
-        SELECT DISTINCT photo_path
-        FROM photo_tags
-        WHERE tag IN ({placeholders})
-        """
-        
-        cursor = conn.execute(exclude_query, exclude_tags)
-        excluded_photos = set(row['photo_path'] for row in cursor.fetchall())
-        
-        # Return only photos that don't have excluded tags
-        return [path for path in photo_paths if path not in excluded_photos]
+        clause = f"""
+                    AND photo_path NOT IN (
+                        SELECT photo_path FROM photo_tags WHERE tag IN ({placeholders})
+                    )"""
+        return clause, list(exclude_tags)
 
     def create_tag_filter(self, 
                          name: str, 
@@ -224,7 +219,7 @@ class MultiTagFilterDB:
         filter_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO tag_filters 
@@ -248,7 +243,7 @@ class MultiTagFilterDB:
             Tag filter data if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT * FROM tag_filters WHERE id = ?",
@@ -319,7 +314,7 @@ class MultiTagFilterDB:
             return []
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 placeholders = ','.join(['?' for _ in photo_paths])
                 query = f"""
@@ -343,7 +338,7 @@ class MultiTagFilterDB:
     def get_tag_stats(self) -> Dict[str, Any]:
         """Get basic statistics about tags and tagging activity."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
 
                 total_tag_rows = conn.execute("SELECT COUNT(*) AS c FROM photo_tags").fetchone()
@@ -383,7 +378,7 @@ class MultiTagFilterDB:
             List of tag filters
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -417,7 +412,7 @@ class MultiTagFilterDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "DELETE FROM tag_filters WHERE id = ?",
                     (filter_id,)
@@ -434,7 +429,7 @@ class MultiTagFilterDB:
             List of tags with photo counts
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -465,7 +460,7 @@ class MultiTagFilterDB:
             List of matching tags
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
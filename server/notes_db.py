@@ -2,13 +2,73 @@
 Photo Notes Database Module
 
 Provides functionality for storing and retrieving user notes/captions for photos with SQLite backend.
+Note text is indexed with FTS5 (bm25 ranking, prefix matching, highlighted
+snippets); triggers on photo_notes keep the index in sync with every write.
 """
 
+import re
 import sqlite3
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 from datetime import datetime
 
+from server.db_pool import connect
+from server.photo_registry import PhotoRegistry, migrate_path_keyed_table, registry_for_store
+from src.cache_manager import library_version
+
+
+_PHOTO_NOTES_SQL = """
+    CREATE TABLE IF NOT EXISTS photo_notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        photo_id INTEGER NOT NULL UNIQUE,
+        note TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# External-content index over photo_notes.note; rowid is photo_notes.id
+_NOTES_FTS_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS photo_notes_fts USING fts5(
+        note,
+        content='photo_notes',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+_NOTES_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS photo_notes_fts_insert AFTER INSERT ON photo_notes BEGIN
+        INSERT INTO photo_notes_fts(rowid, note) VALUES (new.id, new.note);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS photo_notes_fts_delete AFTER DELETE ON photo_notes BEGIN
+        INSERT INTO photo_notes_fts(photo_notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS photo_notes_fts_update AFTER UPDATE OF note ON photo_notes BEGIN
+        INSERT INTO photo_notes_fts(photo_notes_fts, rowid, note) VALUES ('delete', old.id, old.note);
+        INSERT INTO photo_notes_fts(rowid, note) VALUES (new.id, new.note);
+    END
+    """,
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text: every word must appear, each as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    never interpreted. Returns None when the text has no words.
+    """
+    terms = [f'"{token}"*' for token in _TOKEN.findall(query)]
+    return " ".join(terms) if terms else None
+
 
 class PhotoNote:
     id: int
@@ -21,29 +81,44 @@ class PhotoNote:
 class NotesDB:
     """Database interface for photo notes/captions"""
 
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, registry: Optional[PhotoRegistry] = None):
         """
         Initialize the notes database.
         
         Args:
             db_path: Path to the SQLite database file
+            registry: Photo id registry (defaults to photos.db beside db_path)
         """
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.registry = registry or registry_for_store(self.db_path)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS photo_notes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    photo_path TEXT NOT NULL UNIQUE,
-                    note TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_photo_path ON photo_notes(photo_path)")
+        with connect(self.db_path) as conn:
+            conn.execute(_PHOTO_NOTES_SQL)
+            migrate_path_keyed_table(
+                conn, self.registry, "photo_notes", _PHOTO_NOTES_SQL, ["note", "created_at", "updated_at"]
+            )
             conn.execute("CREATE INDEX IF NOT EXISTS idx_updated ON photo_notes(updated_at)")
+            self.fts_enabled = self._init_fts(conn)
+        self.registry.track_table(self.db_path, "photo_notes")
+
+    @staticmethod
+    def _init_fts(conn: sqlite3.Connection) -> bool:
+        """Create the FTS5 index and its triggers; False if SQLite lacks FTS5."""
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'photo_notes_fts'"
+        ).fetchone() is not None
+        try:
+            conn.execute(_NOTES_FTS_SQL)
+        except sqlite3.OperationalError:
+            return False
+        for trigger in _NOTES_FTS_TRIGGERS:
+            conn.execute(trigger)
+        if not existed:
+            # Index notes written before the index existed
+            conn.execute("INSERT INTO photo_notes_fts(photo_notes_fts) VALUES ('rebuild')")
+        return True
 
     def set_note(self, photo_path: str, note: str) -> bool:
         """
@@ -57,16 +132,25 @@ class NotesDB:
             bool: True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                conn.execute(
+            photo_id = self.registry.ensure_id(photo_path)
+            with connect(self.db_path) as conn:
+                # An upsert rather than INSERT OR REPLACE: REPLACE deletes
+                # without firing the delete trigger, leaving stale index rows
+                changed = conn.execute(
                     """
-                    INSERT OR REPLACE INTO photo_notes (photo_path, note, updated_at)
+                    INSERT INTO photo_notes (photo_id, note, updated_at)
                     VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(photo_id) DO UPDATE SET
+                        note = excluded.note,
+                        updated_at = excluded.updated_at
+                    WHERE note IS NOT excluded.note
                     """,
-                    (photo_path, note)
-                )
-                return True
+                    (photo_id, note)
+                ).rowcount > 0
+            if changed:
+                # Cached rankings for `notes:` queries depend on note text
+                library_version.bump()
+            return True
         except Exception:
             return False
 
@@ -94,11 +178,13 @@ class NotesDB:
             Dict with note and updated_at if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            photo_id = self.registry.id_for(photo_path)
+            if photo_id is None:
+                return None
+            with connect(self.db_path, row_factory=sqlite3.Row) as conn:
                 result = conn.execute(
-                    "SELECT note, updated_at FROM photo_notes WHERE photo_path = ?",
-                    (photo_path,)
+                    "SELECT note, updated_at FROM photo_notes WHERE photo_id = ?",
+                    (photo_id,)
                 ).fetchone()
                 if not result:
                     return None
@@ -117,12 +203,18 @@ class NotesDB:
             bool: True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            photo_id = self.registry.id_for(photo_path)
+            if photo_id is None:
+                return False
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
-                    "DELETE FROM photo_notes WHERE photo_path = ?",
-                    (photo_path,)
+                    "DELETE FROM photo_notes WHERE photo_id = ?",
+                    (photo_id,)
                 )
-                return cursor.rowcount > 0
+                deleted = cursor.rowcount > 0
+            if deleted:
+                library_version.bump()
+            return deleted
         except Exception:
             return False
 
@@ -138,13 +230,14 @@ class NotesDB:
             List of dictionaries containing photo path and note
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with connect(self.db_path, row_factory=sqlite3.Row) as conn:
+                self.registry.attach(conn)
                 cursor = conn.execute(
                     """
-                    SELECT photo_path, note, created_at, updated_at
-                    FROM photo_notes
-                    ORDER BY updated_at DESC
+                    SELECT p.path AS photo_path, n.note, n.created_at, n.updated_at
+                    FROM photo_notes n
+                    JOIN registry.photos p ON p.id = n.photo_id
+                    ORDER BY n.updated_at DESC
                     LIMIT ? OFFSET ?
                     """,
                     (limit, offset)
@@ -156,7 +249,10 @@ class NotesDB:
 
     def search_notes(self, query: str, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """
-        Search notes by content.
+        Search notes by content, best match first.
+        
+        Every word of the query must appear in the note, as a word prefix
+        ("sun" matches "sunset").
         
         Args:
             query: Search query
@@ -164,17 +260,49 @@ class NotesDB:
             offset: Number of results to skip
             
         Returns:
-            List of dictionaries containing photo path and note
+            List of dictionaries containing photo path, note, bm25 score
+            (lower is better) and a snippet with matches wrapped in <mark>
         """
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        if not self.fts_enabled:
+            return self._search_notes_like(query, limit, offset)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with connect(self.db_path, row_factory=sqlite3.Row) as conn:
+                self.registry.attach(conn)
                 cursor = conn.execute(
                     """
-                    SELECT photo_path, note, created_at, updated_at
-                    FROM photo_notes
-                    WHERE note LIKE ?
-                    ORDER BY updated_at DESC
+                    SELECT p.path AS photo_path, n.note, n.created_at, n.updated_at,
+                           bm25(photo_notes_fts) AS score,
+                           snippet(photo_notes_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet
+                    FROM photo_notes_fts
+                    JOIN photo_notes n ON n.id = photo_notes_fts.rowid
+                    JOIN registry.photos p ON p.id = n.photo_id
+                    WHERE photo_notes_fts MATCH ?
+                    ORDER BY score, n.updated_at DESC
+                    LIMIT ? OFFSET ?
+                    """,
+                    (expression, limit, offset)
+                )
+                rows = cursor.fetchall()
+                return [dict(row) for row in rows]
+        except Exception:
+            return []
+
+    def _search_notes_like(self, query: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Substring search for SQLite builds without FTS5."""
+        try:
+            with connect(self.db_path, row_factory=sqlite3.Row) as conn:
+                self.registry.attach(conn)
+                cursor = conn.execute(
+                    """
+                    SELECT p.path AS photo_path, n.note, n.created_at, n.updated_at,
+                           0 AS score, n.note AS snippet
+                    FROM photo_notes n
+                    JOIN registry.photos p ON p.id = n.photo_id
+                    WHERE n.note LIKE ?
+                    ORDER BY n.updated_at DESC
                     LIMIT ? OFFSET ?
                     """,
                     (f'%{query}%', limit, offset)
@@ -184,6 +312,34 @@ class NotesDB:
         except Exception:
             return []
 
+    def matching_paths(self, query: str) -> Set[str]:
+        """Paths of all photos whose note matches query (same rules as search_notes)."""
+        expression = match_expression(query)
+        if expression is None:
+            return set()
+        with connect(self.db_path) as conn:
+            self.registry.attach(conn)
+            if self.fts_enabled:
+                rows = conn.execute(
+                    """
+                    SELECT p.path FROM photo_notes_fts
+                    JOIN photo_notes n ON n.id = photo_notes_fts.rowid
+                    JOIN registry.photos p ON p.id = n.photo_id
+                    WHERE photo_notes_fts MATCH ?
+                    """,
+                    (expression,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    """
+                    SELECT p.path FROM photo_notes n
+                    JOIN registry.photos p ON p.id = n.photo_id
+                    WHERE n.note LIKE ?
+                    """,
+                    (f'%{query}%',)
+                ).fetchall()
+        return {row[0] for row in rows}
+
     def get_notes_stats(self) -> Dict[str, int]:
         """
         Get statistics about notes.
@@ -192,7 +348,7 @@ class NotesDB:
             Dictionary with note statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path, row_factory=sqlite3.Row) as conn:
                 result = conn.execute("SELECT COUNT(*) as total FROM photo_notes").fetchone()
                 total_notes = result['total'] if result else 0
 
@@ -208,6 +364,12 @@ class NotesDB:
             return {'total_notes': 0, 'notes_with_content': 0, 'empty_notes': 0}
 
 
+_notes_dbs: Dict[str, NotesDB] = {}
+
+
 def get_notes_db(db_path: Path) -> NotesDB:
-    """Get notes database instance."""
-    return NotesDB(db_path)
\ No newline at end of file
+    """Get the notes database for a path (one shared instance per file)."""
+    key = str(Path(db_path).resolve())
+    if key not in _notes_dbs:
+        _notes_dbs[key] = NotesDB(Path(db_path))
+    return _notes_dbs[key]
\ No newline at end of file
@@ -3,12 +3,14 @@ from pathlib import Path
 from typing import Optional, Any, Dict
 import json
 
+from server.db_pool import connect
+
 
 class PhotoEditsDB:
     def __init__(self, db_path: Path):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS photo_edits (
@@ -20,7 +22,7 @@ class PhotoEditsDB:
             )
 
     def get_edit(self, photo_path: str) -> Optional[Dict[str, Any]]:
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
             row = conn.execute(
                 "SELECT edit_data, updated_at FROM photo_edits WHERE photo_path = ?",
@@ -36,7 +38,7 @@ class PhotoEditsDB:
 
     def set_edit(self, photo_path: str, edit_data: Dict[str, Any]):
         payload = json.dumps(edit_data or {})
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute(
                 """
                 INSERT INTO photo_edits(photo_path, edit_data, updated_at)
@@ -0,0 +1,377 @@
+"""
+Photo Registry
+
+Central integer ids for photos, shared by the per-feature databases:
+- photos(id, path, device, inode, content_hash) in one SQLite file
+  (photos.db next to the other stores)
+- Feature tables key their rows by photo_id instead of the path text, so
+  a rename or move is a single UPDATE here
+- Moves the file watcher misses are relinked by content hash, or by
+  inode when size and mtime match too (inodes are reused at once)
+- Stores register their id-keyed tables, so rows of an id the registry
+  drops are deleted with it
+- Stores ATTACH the registry to resolve ids and paths inside one query,
+  and filter_paths() runs cross-feature filters (tags, rating,
+  favorites, date) as a single SQL statement
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from server.db_pool import connect
+from src.cache_manager import library_version
+
+ALIAS = "registry"
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _chunks(items: Sequence, size: int = _CHUNK) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _file_identity(path: str) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    """(device, inode, size, mtime_ns) of a file."""
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        # Remote (cloud:) paths and files that are gone have no inode
+        return None, None, None, None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class PhotoRegistry:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # (database file, table) pairs holding rows keyed by photo_id
+        self._feature_tables: List[Tuple[Path, str]] = []
+        self._init_db()
+
+    def _conn(self):
+        return connect(self.db_path, row_factory=sqlite3.Row)
+
+    def _init_db(self) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS photos (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  path TEXT NOT NULL UNIQUE,
+                  device INTEGER,
+                  inode INTEGER,
+                  size INTEGER,
+                  mtime_ns INTEGER,
+                  content_hash TEXT,
+                  created_at TEXT NOT NULL,
+                  updated_at TEXT NOT NULL
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(photos)").fetchall()}
+            for column in ("size", "mtime_ns"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE photos ADD COLUMN {column} INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_photos_inode ON photos(inode, device)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_photos_hash ON photos(content_hash)")
+
+    def attach(self, conn: sqlite3.Connection, alias: str = ALIAS) -> None:
+        """
+        ATTACH the registry to another store's connection (idempotent).
+
+        Must run before the connection's first write in a transaction.
+        """
+        target = str(self.db_path.resolve())
+        for _, name, file in conn.execute("PRAGMA database_list").fetchall():
+            if name == alias:
+                if file and os.path.realpath(file) == target:
+                    return
+                conn.execute(f"DETACH DATABASE {alias}")
+                break
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (target,))
+
+    def track_table(self, db_path: Path, table: str) -> None:
+        """Register a store table keyed by photo_id; its rows are deleted when the registry drops an id."""
+        entry = (Path(db_path), table)
+        if entry not in self._feature_tables:
+            self._feature_tables.append(entry)
+
+    def _drop_feature_rows(self, photo_id: int) -> None:
+        for db_path, table in self._feature_tables:
+            with connect(db_path) as conn:
+                conn.execute(f"DELETE FROM {table} WHERE photo_id = ?", (photo_id,))
+
+    def ensure_ids(self, paths: Iterable[str]) -> Dict[str, int]:
+        """Ids for paths, registering the ones not seen before."""
+        unique = list(dict.fromkeys(p for p in paths if p))
+        if not unique:
+            return {}
+        now = _utc_now_iso()
+        ids: Dict[str, int] = {}
+        with self._conn() as conn:
+            for chunk in _chunks(unique):
+                marks = ",".join("?" * len(chunk))
+                for row in conn.execute(f"SELECT id, path FROM photos WHERE path IN ({marks})", list(chunk)):
+                    ids[row["path"]] = row["id"]
+                new = [p for p in chunk if p not in ids]
+                if not new:
+                    continue
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO photos (path, device, inode, size, mtime_ns, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [(p, *_file_identity(p), now, now) for p in new],
+                )
+                marks = ",".join("?" * len(new))
+                for row in conn.execute(f"SELECT id, path FROM photos WHERE path IN ({marks})", new):
+                    ids[row["path"]] = row["id"]
+        return ids
+
+    def ensure_id(self, path: str) -> int:
+        return self.ensure_ids([path])[path]
+
+    def ids_for(self, paths: Iterable[str]) -> Dict[str, int]:
+        """Ids of the already registered paths among `paths`."""
+        unique = list(dict.fromkeys(p for p in paths if p))
+        ids: Dict[str, int] = {}
+        with self._conn() as conn:
+            for chunk in _chunks(unique):
+                marks = ",".join("?" * len(chunk))
+                for row in conn.execute(f"SELECT id, path FROM photos WHERE path IN ({marks})", list(chunk)):
+                    ids[row["path"]] = row["id"]
+        return ids
+
+    def id_for(self, path: str) -> Optional[int]:
+        return self.ids_for([path]).get(path)
+
+    def paths_for(self, ids: Iterable[int]) -> Dict[int, str]:
+        unique = list(dict.fromkeys(ids))
+        paths: Dict[int, str] = {}
+        with self._conn() as conn:
+            for chunk in _chunks(unique):
+                marks = ",".join("?" * len(chunk))
+                for row in conn.execute(f"SELECT id, path FROM photos WHERE id IN ({marks})", list(chunk)):
+                    paths[row["id"]] = row["path"]
+        return paths
+
+    def path_for(self, photo_id: int) -> Optional[str]:
+        return self.paths_for([photo_id]).get(photo_id)
+
+    def move(self, old_path: str, new_path: str) -> Optional[int]:
+        """
+        Point a photo's id at its new path; every feature row follows.
+
+        If the new path was already registered separately (the move replaced
+        that file), the old id wins; the replaced photo's id and its rows in
+        the tracked feature tables are dropped.
+        """
+        if old_path == new_path:
+            return self.id_for(old_path)
+        identity = _file_identity(new_path)
+        with self._conn() as conn:
+            row = conn.execute("SELECT id FROM photos WHERE path = ?", (old_path,)).fetchone()
+            if row is None:
+                return None
+            stray = conn.execute("SELECT id FROM photos WHERE path = ?", (new_path,)).fetchone()
+        if stray is not None:
+            self._drop_feature_rows(stray["id"])
+        with self._conn() as conn:
+            conn.execute("DELETE FROM photos WHERE path = ?", (new_path,))
+            conn.execute(
+                "UPDATE photos SET path = ?, device = ?, inode = ?, size = ?, mtime_ns = ?, updated_at = ?"
+                " WHERE id = ?",
+                (new_path, *identity, _utc_now_iso(), row["id"]),
+            )
+        library_version.bump()
+        return row["id"]
+
+    def move_directory(self, old_dir: str, new_dir: str) -> int:
+        """Re-point every photo under a renamed directory; returns how many moved."""
+        old_prefix = old_dir.rstrip("/") + "/"
+        new_prefix = new_dir.rstrip("/") + "/"
+        with self._conn() as conn:
+            cur = conn.execute(
+                """
+                UPDATE photos SET path = ? || substr(path, ?), updated_at = ?
+                WHERE substr(path, 1, ?) = ?
+                """,
+                (new_prefix, len(old_prefix) + 1, _utc_now_iso(), len(old_prefix), old_prefix),
+            )
+            moved = cur.rowcount or 0
+        if moved:
+            library_version.bump()
+        return moved
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Forget photos that are gone for good; callers purge their feature rows first."""
+        unique = list(dict.fromkeys(ids))
+        removed = 0
+        with self._conn() as conn:
+            for chunk in _chunks(unique):
+                marks = ",".join("?" * len(chunk))
+                removed += conn.execute(f"DELETE FROM photos WHERE id IN ({marks})", list(chunk)).rowcount or 0
+        if removed:
+            library_version.bump()
+        return removed
+
+    def set_content_hash(self, path: str, content_hash: str) -> None:
+        photo_id = self.ensure_id(path)
+        with self._conn() as conn:
+            conn.execute("UPDATE photos SET content_hash = ? WHERE id = ?", (content_hash, photo_id))
+
+    def relink(self, path: str, content_hash: Optional[str] = None) -> Optional[int]:
+        """
+        Adopt the id of a registered photo whose file now lives at `path`.
+
+        Matches a registry entry whose own path no longer exists by content
+        hash (copy across volumes), or by inode when size and mtime match as
+        well (same filesystem move). An inode alone is not enough: the
+        filesystem hands a deleted photo's inode to the next new file.
+        Returns the adopted id, or None when `path` is new or already known.
+        """
+        device, inode, size, mtime_ns = _file_identity(path)
+        with self._conn() as conn:
+            if conn.execute("SELECT 1 FROM photos WHERE path = ?", (path,)).fetchone():
+                return None
+            candidates: List[sqlite3.Row] = []
+            if inode is not None:
+                candidates = conn.execute(
+                    "SELECT id, path FROM photos WHERE inode = ? AND device = ? AND size = ? AND mtime_ns = ?",
+                    (inode, device, size, mtime_ns),
+                ).fetchall()
+            if not candidates and content_hash:
+                candidates = conn.execute(
+                    "SELECT id, path FROM photos WHERE content_hash = ?", (content_hash,)
+                ).fetchall()
+        for row in candidates:
+            if not os.path.exists(row["path"]):
+                return self.move(row["path"], path)
+        return None
+
+    def filter_paths(
+        self,
+        *,
+        tags_db: Optional[Path] = None,
+        tags: Sequence[str] = (),
+        tag_logic: str = "OR",
+        ratings_db: Optional[Path] = None,
+        min_rating: Optional[int] = None,
+        metadata_db: Optional[Path] = None,
+        favorites_only: bool = False,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Paths passing every given filter, evaluated as one SQL query.
+
+        Feature databases are attached to a registry connection; tag and
+        rating rows are matched by photo id. Favorites and the created
+        date (ISO text in metadata_json) come from the metadata database,
+        which is still keyed by path.
+        """
+        joins: List[str] = []
+        where: List[str] = []
+        params: List[object] = []
+        attach: List[Tuple[str, Path]] = []
+
+        tags = [t for t in tags if t]
+        if tags:
+            attach.append(("tagdb", tags_db))
+            marks = ",".join("?" * len(tags))
+            having = " HAVING COUNT(DISTINCT tag_name) = ?" if tag_logic.upper() == "AND" else ""
+            where.append(
+                f"p.id IN (SELECT photo_id FROM tagdb.tag_photos WHERE tag_name IN ({marks})"
+                f" GROUP BY photo_id{having})"
+            )
+            params.extend(tags)
+            if having:
+                params.append(len(set(tags)))
+        if min_rating:
+            attach.append(("ratingdb", ratings_db))
+            where.append("p.id IN (SELECT photo_id FROM ratingdb.photo_ratings WHERE rating >= ?)")
+            params.append(min_rating)
+        if favorites_only or date_from or date_to:
+            attach.append(("metadb", metadata_db))
+        if favorites_only:
+            where.append("p.path IN (SELECT file_path FROM metadb.favorites)")
+        if date_from or date_to:
+            joins.append("JOIN metadb.metadata m ON m.file_path = p.path")
+            created = "json_extract(m.metadata_json, '$.filesystem.created')"
+            if date_from:
+                where.append(f"{created} >= ?")
+                params.append(date_from)
+            if date_to:
+                where.append(f"{created} <= ?")
+                params.append(date_to)
+
+        sql = f"SELECT p.path FROM photos p {' '.join(joins)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY p.id"
+
+        with self._conn() as conn:
+            attached = []
+            try:
+                for alias, path in attach:
+                    if path is None:
+                        raise ValueError(f"{alias} database path is required for this filter")
+                    if alias not in attached:
+                        conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+                        attached.append(alias)
+                return [row["path"] for row in conn.execute(sql, params)]
+            finally:
+                for alias in attached:
+                    conn.execute(f"DETACH DATABASE {alias}")
+
+
+def migrate_path_keyed_table(conn: sqlite3.Connection, registry: PhotoRegistry, table: str,
+                             create_sql: str, columns: Sequence[str]) -> bool:
+    """
+    Rebuild a legacy table keyed by photo_path TEXT as one keyed by photo_id.
+
+    `create_sql` creates the new table; `columns` are copied across as-is.
+    Returns False when the table is already id-keyed.
+    """
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    if "photo_path" not in existing or "photo_id" in existing:
+        return False
+    rows = conn.execute(f"SELECT photo_path, {', '.join(columns)} FROM {table}").fetchall()
+    ids = registry.ensure_ids(row[0] for row in rows)
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    conn.execute(create_sql)
+    marks = ",".join("?" * (len(columns) + 1))
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {table} (photo_id, {', '.join(columns)}) VALUES ({marks})",
+        [(ids[row[0]], *row[1:]) for row in rows if row[0] in ids],
+    )
+    conn.execute(f"DROP TABLE {table}_legacy")
+    return True
+
+
+_registries: Dict[str, PhotoRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_photo_registry(db_path: Path) -> PhotoRegistry:
+    """Shared registry for a database file (one instance per path)."""
+    key = os.path.abspath(os.fspath(db_path))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = PhotoRegistry(Path(key))
+        return registry
+
+
+def registry_for_store(store_db_path: Path) -> PhotoRegistry:
+    """The registry shared by stores living in the same directory."""
+    return get_photo_registry(Path(store_db_path).parent / "photos.db")
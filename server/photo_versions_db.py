@@ -12,6 +12,8 @@ import json
 import uuid
 from dataclasses import dataclass, asdict, field
 
+from server.db_pool import connect
+
 
 @dataclass
 class PhotoVersion:
@@ -135,7 +137,7 @@ class PhotoVersionsDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             self._init_schema(conn)
 
     def create_version(self, 
@@ -168,7 +170,7 @@ class PhotoVersionsDB:
         instructions_json = json.dumps(effective_instructions) if effective_instructions else None
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Create the version record
                 conn.execute(
                     """
@@ -209,7 +211,7 @@ class PhotoVersionsDB:
     def get_versions_for_original(self, original_path: str) -> List[Dict[str, Any]]:
         """Return all versions for a given original photo (as dicts)."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 rows = conn.execute(
                     """
@@ -232,7 +234,7 @@ class PhotoVersionsDB:
     def get_version_stack(self, photo_path: str) -> List[Dict[str, Any]]:
         """Legacy helper: return the full stack for a photo path (original or version) as a list of dicts."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
 
                 result = conn.execute(
@@ -252,7 +254,7 @@ class PhotoVersionsDB:
     def get_version_stack_for_original(self, original_path: str) -> Optional[VersionStack]:
         """Return the complete version stack for an original photo (as a VersionStack)."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
 
                 stack_info = conn.execute(
@@ -301,7 +303,7 @@ class PhotoVersionsDB:
     def get_version_stack_for_photo(self, photo_path: str) -> Optional[VersionStack]:
         """Resolve a version stack for any photo path (original or version)."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     """
@@ -328,7 +330,7 @@ class PhotoVersionsDB:
             List of all versions in the stack
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 
                 # First, find the original path for this photo
@@ -384,7 +386,7 @@ class PhotoVersionsDB:
             Path to the original photo, or None if not found
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT original_path FROM photo_versions WHERE version_path = ?",
@@ -410,7 +412,7 @@ class PhotoVersionsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 update_fields = []
                 params = []
                 
@@ -446,7 +448,7 @@ class PhotoVersionsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 # Check if this is the original and only version
                 version_info = conn.execute(
@@ -514,7 +516,7 @@ class PhotoVersionsDB:
             List of version stacks
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 
                 cursor = conn.execute(
@@ -576,7 +578,7 @@ class PhotoVersionsDB:
             Dictionary with version statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Total number of versions
                 total_versions = conn.execute(
                     "SELECT COUNT(*) FROM photo_versions"
@@ -630,7 +632,7 @@ class PhotoVersionsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Check if both exist
                 count1 = conn.execute(
                     "SELECT COUNT(*) FROM version_stacks WHERE original_path = ?",
@@ -14,6 +14,8 @@ import uuid
 import hashlib
 import os
 
+from server.db_pool import connect
+
 
 class PrivacyControl:
     """Represents privacy control settings for a photo"""
@@ -44,7 +46,7 @@ class PrivacyControlsDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS privacy_controls (
                     id TEXT PRIMARY KEY,
@@ -96,7 +98,7 @@ class PrivacyControlsDB:
         groups_json = json.dumps(allowed_groups) if allowed_groups else json.dumps([])
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT OR REPLACE INTO privacy_controls 
@@ -120,7 +122,7 @@ class PrivacyControlsDB:
             PrivacyControl if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT * FROM privacy_controls WHERE photo_path = ?",
@@ -169,7 +171,7 @@ class PrivacyControlsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 query = "UPDATE privacy_controls SET updated_at = CURRENT_TIMESTAMP"
                 params = []
                 
@@ -219,7 +221,7 @@ class PrivacyControlsDB:
             List of photos with specified visibility
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -248,7 +250,7 @@ class PrivacyControlsDB:
             List of photos accessible to the user
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 # Get photos that are:
                 # 1. Public
@@ -329,7 +331,7 @@ class PrivacyControlsDB:
             List of encrypted photos for the owner
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -355,7 +357,7 @@ class PrivacyControlsDB:
             Dictionary with privacy statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Count by visibility
                 visibility_counts = {}
                 for vis in ['public', 'shared', 'private', 'friends_only']:
@@ -0,0 +1,122 @@
+"""
+Embedding Quantization
+
+Compact storage for CLIP and face embeddings:
+- float16 halves the size of a float32 vector; int8 quarters it using a
+  symmetric per-vector scale
+- pack()/unpack() encode one vector as tagged bytes for SQLite BLOB
+  columns; legacy JSON text still decodes
+- quantize()/dequantize() convert whole matrices
+- rerank() orders candidates by float32 cosine similarity; LanceDB passes
+  the float32 copies it keeps beside float16 columns, so the returned top-k
+  is ranked at full precision
+"""
+
+import json
+import struct
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+DTYPES = (FLOAT32, FLOAT16, INT8)
+
+# Leading byte of a packed vector
+_TAGS = {FLOAT32: b"\x01", FLOAT16: b"\x02", INT8: b"\x03"}
+_DTYPE_BY_TAG = {tag[0]: dtype for dtype, tag in _TAGS.items()}
+_NUMPY = {FLOAT32: np.dtype("<f4"), FLOAT16: np.dtype("<f2"), INT8: np.dtype("i1")}
+
+
+def check_dtype(dtype: str) -> str:
+    """Return dtype if it is a supported storage type, else raise ValueError."""
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype {dtype!r} (expected one of {', '.join(DTYPES)})")
+    return dtype
+
+
+def quantize(vectors, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert a matrix (or a single vector) to the storage dtype.
+
+    Returns:
+        (codes, scales): scales holds one float32 per row for int8, else None
+    """
+    check_dtype(dtype)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == FLOAT32:
+        return vectors, None
+    if dtype == FLOAT16:
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=-1) / 127.0
+    scales = np.where(scales == 0, 1.0, scales)
+    codes = np.clip(np.rint(vectors / scales[..., None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """float32 values of quantize() output."""
+    values = np.asarray(codes).astype(np.float32)
+    if scales is not None:
+        values *= np.asarray(scales, dtype=np.float32)[..., None]
+    return values
+
+
+def pack(vector: Sequence[float], dtype: str = FLOAT32) -> bytes:
+    """Encode one vector as <tag>[<float32 scale>]<values>."""
+    codes, scale = quantize(vector, dtype)
+    header = _TAGS[dtype] + (struct.pack("<f", float(scale)) if scale is not None else b"")
+    return header + codes.astype(_NUMPY[dtype], copy=False).tobytes()
+
+
+def unpack(blob) -> Optional[np.ndarray]:
+    """Decode pack() output or a legacy JSON list into a float32 vector."""
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return np.asarray(json.loads(blob), dtype=np.float32)
+    blob = bytes(blob)
+    if blob[:1] == b"[":
+        return np.asarray(json.loads(blob), dtype=np.float32)
+    dtype = packed_dtype(blob)
+    if dtype is None:
+        raise ValueError("Unknown embedding encoding")
+    if dtype == INT8:
+        (scale,) = struct.unpack_from("<f", blob, 1)
+        return np.frombuffer(blob, dtype=_NUMPY[INT8], offset=5).astype(np.float32) * scale
+    return np.frombuffer(blob, dtype=_NUMPY[dtype], offset=1).astype(np.float32)
+
+
+def packed_dtype(blob) -> Optional[str]:
+    """Storage dtype of a packed vector, or None for JSON and unknown data."""
+    if not blob or isinstance(blob, str):
+        return None
+    return _DTYPE_BY_TAG.get(bytes(blob[:1])[0])
+
+
+def rerank(query: Sequence[float], candidates, k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Order candidate vectors by float32 cosine similarity to the query.
+
+    Only as precise as the candidates passed in: pass full-precision
+    vectors to undo quantization error.
+
+    Args:
+        query: Query vector
+        candidates: Candidate vectors (any dtype), one per row
+        k: Keep only the best k
+
+    Returns:
+        (indices into candidates best-first, their similarities)
+    """
+    matrix = np.asarray(candidates, dtype=np.float32)
+    if matrix.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    q = np.asarray(query, dtype=np.float32)
+    q = q / (np.linalg.norm(q) or 1.0)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    scores = (matrix @ q) / norms
+    order = np.argsort(-scores, kind="stable")[:k]
+    return order, scores[order]
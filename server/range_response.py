@@ -0,0 +1,217 @@
+"""
+Range File Responses
+
+HTTP Range support (RFC 9110) for serving large originals and videos:
+- Single ranges answer 206 with Content-Range; multiple ranges answer
+  206 multipart/byteranges
+- If-Range is honoured against the strong ETag and Last-Modified date
+- Unsatisfiable ranges answer 416; malformed Range headers are ignored
+- Byte ranges are sent with the ASGI zero-copy extension when the server
+  offers it, and read in configurable chunks otherwise
+"""
+
+import os
+import uuid
+from email.utils import formatdate
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# Beyond this many ranges the whole file is cheaper to send than the multipart overhead
+MAX_RANGES = 16
+
+ByteRange = Tuple[int, int]  # inclusive (first, last)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(value: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    Byte ranges requested by a Range header, coalesced and in order.
+
+    Returns None when the header is absent, malformed, or asks for too
+    many ranges (the full file should be sent). Raises RangeNotSatisfiable
+    when none of the ranges overlap the file.
+    """
+    if not value:
+        return None
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges: List[ByteRange] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first_s, sep, last_s = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if not first_s.strip():
+                # Suffix range: the final N bytes
+                length = int(last_s)
+                if length <= 0:
+                    continue
+                first, last = max(0, size - length), size - 1
+            else:
+                first = int(first_s)
+                last = int(last_s) if last_s.strip() else size - 1
+        except ValueError:
+            return None
+        if first >= size:
+            continue
+        if first < 0 or last < first:
+            return None
+        ranges.append((first, min(last, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for first, last in ranges[1:]:
+        prev_first, prev_last = merged[-1]
+        if first <= prev_last + 1:
+            merged[-1] = (prev_first, max(prev_last, last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """Strong validator for a file; changes whenever its content or mtime does."""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+class RangeFileResponse(Response):
+    """
+    File response that answers Range requests with partial content.
+
+    Args:
+        path: File to serve
+        media_type: Content-Type of the file
+        headers: Extra response headers (CORS, security, caching)
+        filename: Sets an attachment Content-Disposition when given
+        chunk_size: Read size when zero-copy send is unavailable
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        media_type: Optional[str] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        filename: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.path = path
+        self.status_code = 200
+        self.media_type = media_type or "application/octet-stream"
+        self.chunk_size = max(1, chunk_size)
+        self.background = None
+        headers = dict(headers or {})
+        if filename is not None:
+            quoted = quote(filename)
+            if quoted != filename:
+                headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quoted}"
+            else:
+                headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        size = stat_result.st_size
+        etag = file_etag(stat_result)
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        request_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        head_only = scope.get("method") == "HEAD"
+
+        base: Dict[str, str] = {"accept-ranges": "bytes", "etag": etag, "last-modified": last_modified}
+
+        ranges: Optional[List[ByteRange]] = None
+        if_range = request_headers.get("if-range")
+        # A stale If-Range validator means the client's partial copy is outdated: send it all
+        if if_range is None or if_range in (etag, last_modified):
+            try:
+                ranges = parse_range_header(request_headers.get("range"), size)
+            except RangeNotSatisfiable:
+                await self._start(send, 416, {**base, "content-range": f"bytes */{size}", "content-length": "0"})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        trailer = b""
+        if ranges is None:
+            await self._start(send, 200, {**base, "content-type": self.media_type, "content-length": str(size)})
+            parts: List[Tuple[bytes, ByteRange]] = [(b"", (0, size - 1))] if size else []
+        elif len(ranges) == 1:
+            first, last = ranges[0]
+            await self._start(send, 206, {
+                **base,
+                "content-type": self.media_type,
+                "content-range": f"bytes {first}-{last}/{size}",
+                "content-length": str(last - first + 1),
+            })
+            parts = [(b"", ranges[0])]
+        else:
+            boundary = uuid.uuid4().hex
+            parts = [
+                (
+                    f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                    f"Content-Range: bytes {first}-{last}/{size}\r\n\r\n".encode("latin-1"),
+                    (first, last),
+                )
+                for first, last in ranges
+            ]
+            # Every part after the first is preceded by the CRLF that ends the previous one
+            parts = [(part if i == 0 else b"\r\n" + part, rng) for i, (part, rng) in enumerate(parts)]
+            trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            length = sum(len(prefix) + last - first + 1 for prefix, (first, last) in parts) + len(trailer)
+            await self._start(send, 206, {
+                **base,
+                "content-type": f"multipart/byteranges; boundary={boundary}",
+                "content-length": str(length),
+            })
+
+        if head_only:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        zero_copy = "http.response.zerocopysend" in scope.get("extensions", {})
+        async with await anyio.open_file(self.path, "rb") as f:
+            for prefix, (first, last) in parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                if zero_copy:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": f.wrapped.fileno(),
+                        "offset": first,
+                        "count": last - first + 1,
+                        "more_body": True,
+                    })
+                    continue
+                await f.seek(first)
+                remaining = last - first + 1
+                while remaining > 0:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": trailer, "more_body": False})
+
+    async def _start(self, send: Send, status: int, headers: Dict[str, str]) -> None:
+        # Per-request headers replace any caller-supplied values of the same name
+        keys = {k.encode("latin-1") for k in headers}
+        raw = [(k, v) for k, v in self.raw_headers if k not in keys and k != b"content-type"]
+        raw += [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+        await send({"type": "http.response.start", "status": status, "headers": raw})
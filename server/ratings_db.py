@@ -2,12 +2,19 @@
 Photo Rating System
 Provides 1-5 star rating functionality for photos with SQLite backend.
 """
+import logging
 import sqlite3
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
+from server.db_pool import connect
+from server.photo_registry import PhotoRegistry, migrate_path_keyed_table, registry_for_store
+from src.cache_manager import library_version
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class PhotoRating:
@@ -17,23 +24,51 @@ class PhotoRating:
     updated_at: str
 
 
+_PHOTO_RATINGS_SQL = """
+    CREATE TABLE IF NOT EXISTS photo_ratings (
+        photo_id INTEGER PRIMARY KEY,
+        rating INTEGER NOT NULL CHECK (rating >= 0 AND rating <= 5),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
 class RatingsDB:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, registry: Optional[PhotoRegistry] = None):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Photos are referenced by registry id; paths are resolved by joining it
+        self.registry = registry or registry_for_store(self.db_path)
+        self._change_listeners: List[Callable[[str, int, List[int]], None]] = []
         self._init_db()
+        self.registry.track_table(self.db_path, "photo_ratings")
+
+    def add_change_listener(self, listener: Callable[[str, int, List[int]], None]):
+        """
+        Register a callback for rating changes.
+
+        The listener receives ("rating", rating, photo_ids) after those photos
+        were given that rating; a rating of 0 means the rating was removed.
+        """
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, rating: int, photo_ids: List[int]):
+        """Bump the library version and invoke change listeners; a failing listener never fails the write."""
+        library_version.bump()
+        for listener in self._change_listeners:
+            try:
+                listener("rating", rating, photo_ids)
+            except Exception as e:
+                logger.error(f"Rating change listener failed: {e}")
 
     def _init_db(self):
         """Initialize the ratings database."""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS photo_ratings (
-                    photo_path TEXT PRIMARY KEY,
-                    rating INTEGER NOT NULL CHECK (rating >= 0 AND rating <= 5),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        with connect(str(self.db_path)) as conn:
+            conn.execute(_PHOTO_RATINGS_SQL)
+            migrate_path_keyed_table(
+                conn, self.registry, "photo_ratings", _PHOTO_RATINGS_SQL, ["rating", "created_at", "updated_at"]
+            )
 
             # Create indexes for performance
             conn.execute("CREATE INDEX IF NOT EXISTS idx_rating ON photo_ratings(rating)")
@@ -41,25 +76,15 @@ class RatingsDB:
 
     def set_rating(self, photo_path: str, rating: int) -> bool:
         """Set rating for a photo (0-5 stars, 0 = unrated)."""
-        if not (0 <= rating <= 5):
-            return False
-
-        with sqlite3.connect(str(self.db_path)) as conn:
-            if rating == 0:
-                # Remove rating if set to 0
-                conn.execute("DELETE FROM photo_ratings WHERE photo_path = ?", (photo_path,))
-            else:
-                # Insert or update rating
-                conn.execute("""
-                    INSERT OR REPLACE INTO photo_ratings (photo_path, rating, updated_at)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                """, (photo_path, rating))
-        return True
+        return self.bulk_set_ratings([(photo_path, rating)]) == 1
 
     def get_rating(self, photo_path: str) -> int:
         """Get rating for a photo (0 if unrated)."""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            result = conn.execute("SELECT rating FROM photo_ratings WHERE photo_path = ?", (photo_path,)).fetchone()
+        photo_id = self.registry.id_for(photo_path)
+        if photo_id is None:
+            return 0
+        with connect(str(self.db_path)) as conn:
+            result = conn.execute("SELECT rating FROM photo_ratings WHERE photo_id = ?", (photo_id,)).fetchone()
             return result[0] if result else 0
 
     def get_photos_by_rating(self, rating: int, limit: int = 100, offset: int = 0) -> List[str]:
@@ -67,22 +92,26 @@ class RatingsDB:
         if not (1 <= rating <= 5):
             return []
 
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
+            self.registry.attach(conn)
             results = conn.execute("""
-                SELECT photo_path FROM photo_ratings
-                WHERE rating = ?
-                ORDER BY updated_at DESC
+                SELECT p.path FROM photo_ratings r
+                JOIN registry.photos p ON p.id = r.photo_id
+                WHERE r.rating = ?
+                ORDER BY r.updated_at DESC
                 LIMIT ? OFFSET ?
             """, (rating, limit, offset)).fetchall()
             return [r[0] for r in results]
 
     def get_all_ratings(self, limit: int = 1000, offset: int = 0) -> List[PhotoRating]:
         """Get all photo ratings."""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            conn.row_factory = sqlite3.Row
+        with connect(str(self.db_path), row_factory=sqlite3.Row) as conn:
+            self.registry.attach(conn)
             results = conn.execute("""
-                SELECT * FROM photo_ratings
-                ORDER BY updated_at DESC
+                SELECT p.path AS photo_path, r.rating, r.created_at, r.updated_at
+                FROM photo_ratings r
+                JOIN registry.photos p ON p.id = r.photo_id
+                ORDER BY r.updated_at DESC
                 LIMIT ? OFFSET ?
             """, (limit, offset)).fetchall()
 
@@ -95,7 +124,7 @@ class RatingsDB:
 
     def get_rating_stats(self) -> Dict[int, int]:
         """Get count of photos for each rating."""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             results = conn.execute("""
                 SELECT rating, COUNT(*) as count
                 FROM photo_ratings
@@ -106,27 +135,52 @@ class RatingsDB:
 
     def remove_rating(self, photo_path: str) -> bool:
         """Remove rating for a photo."""
-        with sqlite3.connect(str(self.db_path)) as conn:
-            cursor = conn.execute("DELETE FROM photo_ratings WHERE photo_path = ?", (photo_path,))
-            return cursor.rowcount > 0
+        photo_id = self.registry.id_for(photo_path)
+        if photo_id is None:
+            return False
+        with connect(str(self.db_path)) as conn:
+            removed = conn.execute("DELETE FROM photo_ratings WHERE photo_id = ?", (photo_id,)).rowcount > 0
+        if removed:
+            self._notify_change(0, [photo_id])
+        return removed
+
+    def memberships(self) -> List[Tuple[int, int]]:
+        """(rating, photo_id) for every rated photo."""
+        with connect(str(self.db_path)) as conn:
+            return conn.execute("SELECT rating, photo_id FROM photo_ratings").fetchall()
 
     def bulk_set_ratings(self, ratings: List[tuple]) -> int:
         """Bulk set ratings. ratings = [(path, rating), ...]"""
-        count = 0
-        with sqlite3.connect(str(self.db_path)) as conn:
-            for photo_path, rating in ratings:
-                if 0 <= rating <= 5:
-                    if rating == 0:
-                        conn.execute("DELETE FROM photo_ratings WHERE photo_path = ?", (photo_path,))
-                    else:
-                        conn.execute("""
-                            INSERT OR REPLACE INTO photo_ratings (photo_path, rating, updated_at)
-                            VALUES (?, ?, CURRENT_TIMESTAMP)
-                        """, (photo_path, rating))
-                    count += 1
-        return count
+        valid = [(photo_path, rating) for photo_path, rating in ratings if 0 <= rating <= 5]
+        if not valid:
+            return 0
+        ids = self.registry.ensure_ids(photo_path for photo_path, rating in valid if rating)
+        ids.update(self.registry.ids_for(photo_path for photo_path, rating in valid if not rating))
+        with connect(str(self.db_path)) as conn:
+            # Rating 0 removes the rating
+            conn.executemany(
+                "DELETE FROM photo_ratings WHERE photo_id = ?",
+                [(ids[photo_path],) for photo_path, rating in valid if not rating and photo_path in ids],
+            )
+            conn.executemany("""
+                INSERT OR REPLACE INTO photo_ratings (photo_id, rating, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, [(ids[photo_path], rating) for photo_path, rating in valid if rating])
+        by_rating: Dict[int, List[int]] = {}
+        for photo_path, rating in valid:
+            if photo_path in ids:
+                by_rating.setdefault(rating, []).append(ids[photo_path])
+        for rating, photo_ids in by_rating.items():
+            self._notify_change(rating, photo_ids)
+        return len(valid)
+
+
+_ratings_dbs: Dict[str, RatingsDB] = {}
 
 
 def get_ratings_db(db_path: Path) -> RatingsDB:
-    """Get ratings database instance."""
-    return RatingsDB(db_path)
\ No newline at end of file
+    """Get the ratings database for a path (one shared instance per file)."""
+    key = str(Path(db_path).resolve())
+    if key not in _ratings_dbs:
+        _ratings_dbs[key] = RatingsDB(Path(db_path))
+    return _ratings_dbs[key]
\ No newline at end of file
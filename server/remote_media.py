@@ -0,0 +1,283 @@
+"""
+Remote Media
+
+Header-only indexing for cloud sources that are not mirrored to disk:
+- Objects are addressed by virtual ``cloud:<source_id>/<remote_id>`` paths
+- Only the leading bytes are fetched (HTTP Range) to read EXIF/GPS and
+  the embedded JPEG thumbnail
+- The saved preview stands in for the file when generating embeddings
+  and thumbnails
+- Full bytes are fetched on demand into a size-bounded LRU file cache
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple
+
+import requests  # type: ignore
+from PIL import Image
+
+from src.metadata_extractor import extract_embedded_thumbnail, extract_header_metadata
+
+REMOTE_PREFIX = "cloud:"
+DEFAULT_HEADER_BYTES = 256 * 1024
+
+
+class RangeClient(Protocol):
+    """What a cloud source client provides for remote indexing."""
+
+    def fetch_range(self, remote_id: str, start: int, end: int) -> bytes: ...
+
+    def download(self, remote_id: str, dest: Path) -> None: ...
+
+
+def range_header(start: int, end: int) -> Dict[str, str]:
+    return {"Range": f"bytes={start}-{end}"}
+
+
+def read_range(resp: requests.Response, start: int, end: int, service: str) -> bytes:
+    """Body of a ranged GET for bytes start..end (inclusive)."""
+    if resp.status_code not in (200, 206):
+        raise RuntimeError(f"{service} range read failed ({resp.status_code}): {resp.text[:200]}")
+    # A 200 means the server ignored the range; keep only what was asked for
+    return resp.content[: end - start + 1]
+
+
+def save_download(resp: requests.Response, dest: Path, service: str) -> None:
+    """Stream a GET body to dest via a .part file so readers never see partial data."""
+    if resp.status_code != 200:
+        raise RuntimeError(f"{service} download failed ({resp.status_code}): {resp.text[:200]}")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(dest.suffix + ".part")
+    with open(tmp, "wb") as out:
+        for chunk in resp.iter_content(chunk_size=1024 * 1024):
+            if chunk:
+                out.write(chunk)
+    tmp.replace(dest)
+
+
+def remote_path(source_id: str, remote_id: str) -> str:
+    """Virtual path recorded in the library for a cloud object."""
+    return f"{REMOTE_PREFIX}{source_id}/{remote_id}"
+
+
+def parse_remote_path(path: str) -> Optional[Tuple[str, str]]:
+    """(source_id, remote_id) for a virtual cloud path, else None."""
+    if not path or not path.startswith(REMOTE_PREFIX):
+        return None
+    source_id, _, remote_id = path[len(REMOTE_PREFIX):].partition("/")
+    if not source_id or not remote_id:
+        return None
+    return source_id, remote_id
+
+
+def is_remote_path(path: str) -> bool:
+    return parse_remote_path(path) is not None
+
+
+def _cache_name(remote_id: str, suffix: str = "") -> str:
+    return hashlib.sha1(remote_id.encode("utf-8")).hexdigest() + suffix
+
+
+class PreviewStore:
+    """Preview JPEGs for cloud objects, one per (source, remote id)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path_for(self, source_id: str, remote_id: str) -> Path:
+        return self.root / source_id / _cache_name(remote_id, ".jpg")
+
+    def get(self, path: str) -> Optional[Path]:
+        """Existing preview for a virtual cloud path."""
+        parsed = parse_remote_path(path)
+        if not parsed:
+            return None
+        preview = self.path_for(*parsed)
+        return preview if preview.exists() else None
+
+    def save(self, source_id: str, remote_id: str, image: Image.Image) -> Path:
+        dest = self.path_for(source_id, remote_id)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        tmp = dest.with_suffix(".part")
+        image.save(tmp, "JPEG", quality=85)
+        tmp.replace(dest)
+        return dest
+
+    def discard(self, path: str) -> None:
+        preview = self.get(path)
+        if preview:
+            preview.unlink(missing_ok=True)
+
+
+class RemoteFileCache:
+    """
+    Size-bounded LRU cache of full cloud objects on local disk.
+
+    Entries survive restarts; recency is seeded from file mtimes and
+    refreshed on every hit. Concurrent requests for the same object share
+    one download.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Path, threading.Lock] = {}
+        self._entries: "OrderedDict[Path, int]" = OrderedDict()
+        self._bytes = 0
+        if self.root.exists():
+            files = [p for p in self.root.rglob("*") if p.is_file() and not p.name.endswith(".part")]
+            for p in sorted(files, key=lambda f: f.stat().st_mtime):
+                size = p.stat().st_size
+                self._entries[p] = size
+                self._bytes += size
+
+    def path_for(self, source_id: str, remote_id: str, name: Optional[str] = None) -> Path:
+        # Keep the extension so MIME detection and extension checks still work
+        suffix = Path(name or remote_id).suffix.lower()
+        return self.root / source_id / _cache_name(remote_id, suffix)
+
+    def get(self, source_id: str, remote_id: str, fetch: Callable[[str, Path], None],
+            name: Optional[str] = None) -> Path:
+        """
+        Local copy of an object, downloading it with fetch(remote_id, dest) on a miss.
+        """
+        dest = self.path_for(source_id, remote_id, name)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(dest, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if dest in self._entries and dest.exists():
+                    self._entries.move_to_end(dest)
+                    os.utime(dest)
+                    return dest
+            fetch(remote_id, dest)
+            size = dest.stat().st_size
+            with self._lock:
+                self._bytes -= self._entries.pop(dest, 0)
+                self._entries[dest] = size
+                self._bytes += size
+                self._evict(keep=dest)
+        return dest
+
+    def discard(self, source_id: str, remote_id: str, name: Optional[str] = None) -> None:
+        dest = self.path_for(source_id, remote_id, name)
+        with self._lock:
+            self._bytes -= self._entries.pop(dest, 0)
+        dest.unlink(missing_ok=True)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _evict(self, keep: Path) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            victim, size = next(iter(self._entries.items()))
+            if victim == keep:
+                self._entries.move_to_end(victim)
+                continue
+            del self._entries[victim]
+            self._bytes -= size
+            victim.unlink(missing_ok=True)
+
+
+@dataclass
+class RemotePreview:
+    """Result of header-only indexing of one cloud object."""
+    path: str
+    metadata: Dict[str, Any]
+    etag: Optional[str]
+    preview_path: Optional[Path]
+
+
+def build_remote_preview(
+    client: RangeClient,
+    source_id: str,
+    remote_id: str,
+    previews: PreviewStore,
+    *,
+    name: Optional[str] = None,
+    size_bytes: Optional[int] = None,
+    modified: Optional[str] = None,
+    etag: Optional[str] = None,
+    header_bytes: int = DEFAULT_HEADER_BYTES,
+) -> RemotePreview:
+    """
+    Index a cloud object from a ranged read of its first header_bytes.
+
+    The preview is the embedded EXIF thumbnail, or the image itself when
+    the whole object fit in the read. Objects without either get no
+    preview and are fetched in full only when first needed.
+    """
+    path = remote_path(source_id, remote_id)
+    if size_bytes is not None:
+        header_bytes = min(header_bytes, size_bytes)
+    header = client.fetch_range(remote_id, 0, max(0, header_bytes - 1)) if header_bytes else b""
+
+    # Drive ids are opaque, so type detection goes by the display name
+    metadata = extract_header_metadata(path, header, size_bytes=size_bytes, modified=modified, name=name)
+    metadata["remote"] = {"source_id": source_id, "remote_id": remote_id, "etag": etag}
+
+    image = None
+    # Dimensions may be past the header read, so go by type rather than metadata["image"]
+    if (metadata["file"].get("mime_type") or "").startswith("image/"):
+        thumbnail = extract_embedded_thumbnail(header)
+        complete = size_bytes is not None and len(header) >= size_bytes
+        try:
+            if thumbnail:
+                image = Image.open(io.BytesIO(thumbnail))
+            elif complete:
+                image = Image.open(io.BytesIO(header))
+            if image is not None:
+                image.load()
+        except Exception:
+            image = None
+
+    preview_path = previews.save(source_id, remote_id, image) if image is not None else None
+    return RemotePreview(path=path, metadata=metadata, etag=etag, preview_path=preview_path)
+
+
+class GoogleDriveClient:
+    """Drive file reads over a pooled session, refreshing the token on 401."""
+
+    FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+    def __init__(self, token_provider: Callable[[], str]):
+        self.token_provider = token_provider
+        self.session = requests.Session()
+        self._token = token_provider()
+
+    def _get(self, file_id: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        url = f"{self.FILES_URL}/{file_id}"
+        for attempt in range(2):
+            resp = self.session.get(
+                url,
+                headers={"Authorization": f"Bearer {self._token}", **(headers or {})},
+                params={"alt": "media"},
+                **kwargs,
+            )
+            if resp.status_code != 401 or attempt:
+                return resp
+            resp.close()
+            self._token = self.token_provider()
+        return resp
+
+    def fetch_range(self, remote_id: str, start: int, end: int) -> bytes:
+        resp = self._get(remote_id, headers=range_header(start, end), timeout=30)
+        return read_range(resp, start, end, "Drive")
+
+    def download(self, remote_id: str, dest: Path) -> None:
+        with self._get(remote_id, stream=True, timeout=120) as resp:
+            save_download(resp, dest, "Drive")
+
+    def close(self) -> None:
+        self.session.close()
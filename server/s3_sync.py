@@ -0,0 +1,479 @@
+"""
+S3 Source Sync
+
+Mirrors an S3 (or S3-compatible) bucket prefix into the local media tree:
+- Requests are SigV4-signed and share one pooled requests.Session
+- The source manifest is read once and written in batches
+- ETag/size skip decisions are made in bulk against that manifest
+- Downloads run on a bounded thread pool, and finished files are handed
+  to the caller in small batches so indexing overlaps with transfers
+- In remote-metadata mode nothing is mirrored: each object is indexed
+  from a ranged read of its header (see server.remote_media)
+"""
+
+import hashlib
+import hmac
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+from urllib3.util.retry import Retry
+
+from server.remote_media import (
+    DEFAULT_HEADER_BYTES,
+    PreviewStore,
+    RemotePreview,
+    build_remote_preview,
+    range_header,
+    read_range,
+    remote_path,
+    save_download,
+)
+from server.source_items import SourceItem, SourceItemStore
+
+DEFAULT_MAX_WORKERS = 8
+MANIFEST_BATCH_SIZE = 500
+HANDOFF_BATCH_SIZE = 16
+
+
+def aws_sigv4_headers(
+    *,
+    method: str,
+    url: str,
+    region: str,
+    access_key_id: str,
+    secret_access_key: str,
+    service: str = "s3",
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """
+    Minimal AWS SigV4 signer for S3-compatible endpoints.
+    """
+    headers = dict(headers or {})
+    u = urlparse(url)
+    host = u.netloc
+    amz_date = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = amz_date[0:8]
+
+    # Canonical query string
+    q = parse_qsl(u.query, keep_blank_values=True)
+    q.sort(key=lambda kv: (kv[0], kv[1]))
+    canonical_qs = "&".join(
+        [
+            f"{requests.utils.quote(str(k), safe='~')}={requests.utils.quote(str(v), safe='~')}"
+            for k, v in q
+        ]
+    )
+
+    canonical_headers = f"host:{host}\n" + f"x-amz-date:{amz_date}\n"
+    signed_headers = "host;x-amz-date"
+    payload_hash = hashlib.sha256(b"").hexdigest()
+    canonical_request = "\n".join([
+        method,
+        u.path or "/",
+        canonical_qs,
+        canonical_headers,
+        signed_headers,
+        payload_hash,
+    ])
+
+    algorithm = "AWS4-HMAC-SHA256"
+    credential_scope = f"{date_stamp}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        algorithm,
+        amz_date,
+        credential_scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+
+    def _sign(key: bytes, msg: str) -> bytes:
+        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+    k_date = _sign(("AWS4" + secret_access_key).encode("utf-8"), date_stamp)
+    k_region = _sign(k_date, region)
+    k_service = _sign(k_region, service)
+    k_signing = _sign(k_service, "aws4_request")
+    signature = hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    authorization_header = (
+        f"{algorithm} Credential={access_key_id}/{credential_scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+    headers["Authorization"] = authorization_header
+    headers["x-amz-date"] = amz_date
+    headers["host"] = host
+    return headers
+
+
+def s3_url(endpoint_url: str, bucket: str, key: str = "", query: Optional[Dict[str, str]] = None,
+           path_style: bool = False) -> str:
+    """
+    Object or bucket URL for an endpoint.
+
+    Virtual-hosted style is used unless the endpoint already includes the
+    bucket or path_style is set (MinIO and other local stand-ins).
+    """
+    base = endpoint_url.rstrip("/")
+    parsed = urlparse(base)
+    if not parsed.scheme or not parsed.netloc:
+        raise ValueError("endpoint_url must include scheme, e.g. https://<host>")
+
+    host = parsed.netloc
+    base_path = parsed.path.rstrip("/")
+    key_path = "/" + key.lstrip("/") if key else "/"
+    if path_style:
+        netloc = host
+        path = f"{base_path}/{bucket}{key_path}"
+    else:
+        netloc = host if host.startswith(f"{bucket}.") else f"{bucket}.{host}"
+        path = base_path + key_path
+    qs = urlencode(query or {})
+    return f"{parsed.scheme}://{netloc}{path}" + (f"?{qs}" if qs else "")
+
+
+class S3Client:
+    """Signed S3 requests over a pooled, retrying requests.Session."""
+
+    def __init__(self, cfg: Dict[str, object], max_connections: int = DEFAULT_MAX_WORKERS):
+        self.endpoint_url = str(cfg.get("endpoint_url", "")).strip()
+        self.region = str(cfg.get("region", "")).strip()
+        self.bucket = str(cfg.get("bucket", "")).strip()
+        self.prefix = str(cfg.get("prefix", "") or "").strip()
+        self.access_key_id = str(cfg.get("access_key_id", "")).strip()
+        self.secret_access_key = str(cfg.get("secret_access_key", "")).strip()
+        self.path_style = bool(cfg.get("force_path_style", False))
+
+        # One keep-alive pool sized for the download workers; idempotent GETs
+        # are retried with backoff on throttling and transient server errors
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_connections), max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, key: str = "", query: Optional[Dict[str, str]] = None,
+             extra_headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        url = s3_url(self.endpoint_url, self.bucket, key, query=query, path_style=self.path_style)
+        signed = aws_sigv4_headers(
+            method="GET",
+            url=url,
+            region=self.region,
+            access_key_id=self.access_key_id,
+            secret_access_key=self.secret_access_key,
+            headers=extra_headers,
+        )
+        return self.session.get(url, headers=signed, **kwargs)
+
+    def test_connection(self) -> None:
+        if not self.endpoint_url or not self.region or not self.bucket or not self.access_key_id or not self.secret_access_key:
+            raise ValueError("Missing required S3 configuration fields")
+        query = {"list-type": "2", "max-keys": "1", **({"prefix": self.prefix} if self.prefix else {})}
+        resp = self._get(query=query, timeout=15)
+        if resp.status_code != 200:
+            raise RuntimeError(f"S3 connection failed ({resp.status_code}): {resp.text[:200]}")
+
+    def list_objects(self) -> List[Dict[str, object]]:
+        """All objects under the prefix as {'key', 'etag', 'last_modified', 'size'}."""
+        token: Optional[str] = None
+        out: List[Dict[str, object]] = []
+
+        while True:
+            query: Dict[str, str] = {"list-type": "2", "max-keys": "1000"}
+            if self.prefix:
+                query["prefix"] = self.prefix
+            if token:
+                query["continuation-token"] = token
+            resp = self._get(query=query, timeout=20)
+            if resp.status_code != 200:
+                raise RuntimeError(f"S3 list failed ({resp.status_code}): {resp.text[:200]}")
+
+            root = ET.fromstring(resp.text)
+            ns = ""
+            if root.tag.startswith("{"):
+                ns = root.tag.split("}")[0] + "}"
+
+            for c in root.findall(f"{ns}Contents"):
+                key = (c.findtext(f"{ns}Key") or "").strip()
+                etag = (c.findtext(f"{ns}ETag") or "").strip().strip('"')
+                last_modified = (c.findtext(f"{ns}LastModified") or "").strip()
+                size = c.findtext(f"{ns}Size")
+                size_int = int(size) if size and size.isdigit() else None
+                if key:
+                    out.append({"key": key, "etag": etag or None, "last_modified": last_modified or None, "size": size_int})
+
+            is_truncated = (root.findtext(f"{ns}IsTruncated") or "").strip().lower() == "true"
+            token = (root.findtext(f"{ns}NextContinuationToken") or "").strip() or None
+            if not is_truncated or not token:
+                break
+        return out
+
+    def fetch_range(self, key: str, start: int, end: int) -> bytes:
+        """Bytes start..end (inclusive) of an object."""
+        resp = self._get(key, extra_headers=range_header(start, end), timeout=30)
+        return read_range(resp, start, end, "S3")
+
+    def download(self, key: str, dest: Path) -> None:
+        """Stream an object to dest via a .part file so readers never see partial data."""
+        with self._get(key, stream=True, timeout=120) as resp:
+            save_download(resp, dest, "S3")
+
+    def close(self) -> None:
+        self.session.close()
+
+
+@dataclass
+class S3SyncResult:
+    listed: int = 0
+    downloaded: int = 0  # objects fetched, or header-indexed in remote mode
+    skipped: int = 0
+    reindexed: int = 0  # mirrored files handed back to indexing for lack of metadata
+    failed: Dict[str, str] = field(default_factory=dict)
+    removed: List[SourceItem] = field(default_factory=list)
+
+
+def needs_download(prev: Optional[SourceItem], etag: Optional[str], size: Optional[int], dest: Path) -> bool:
+    """Whether an object must be (re)fetched given its manifest entry."""
+    if not dest.exists():
+        return True
+    if prev is None:
+        return False
+    if prev.etag and etag and prev.etag != etag:
+        return True
+    if prev.size_bytes and size and prev.size_bytes != size:
+        return True
+    if prev.local_path and not Path(prev.local_path).exists():
+        return True
+    return False
+
+
+def needs_remote_index(prev: Optional[SourceItem], etag: Optional[str], size: Optional[int], path: str) -> bool:
+    """Whether an object must be (re)indexed from its header in remote-metadata mode."""
+    if prev is None or prev.local_path != path:
+        return True
+    if prev.etag and etag and prev.etag != etag:
+        return True
+    if prev.size_bytes and size and prev.size_bytes != size:
+        return True
+    return False
+
+
+class S3SyncEngine:
+    """
+    One sync pass of an S3 source into a local mirror directory.
+
+    Args:
+        client: S3Client for the source
+        item_store: Source manifest store
+        source_id: Source being synced
+        root: Local mirror root; object keys map to paths below it
+        is_media: Predicate on object names selecting which keys to mirror
+        max_workers: Concurrent downloads (and pooled connections)
+        on_downloaded: Called from the coordinating thread with batches of
+            finished local paths while further downloads are in flight
+        on_progress: Called with (completed, total) download counts
+        previews: Enables remote-metadata mode; objects are indexed from a
+            ranged header read instead of being mirrored under root, and
+            their manifest local_path is the virtual cloud path
+        on_indexed: Remote mode counterpart of on_downloaded, called with
+            batches of RemotePreview; returns the previews it indexed, and
+            only those get their manifest local_path (the rest are retried
+            by the next sync)
+        header_bytes: Leading bytes read per object in remote mode
+        unindexed: Given mirrored paths that need no download, returns those
+            with no metadata row; they go to on_downloaded again, so files
+            whose earlier indexing failed are retried
+    """
+
+    def __init__(
+        self,
+        client: S3Client,
+        item_store: SourceItemStore,
+        source_id: str,
+        root: Path,
+        *,
+        is_media: Callable[[str], bool] = lambda name: True,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        on_downloaded: Optional[Callable[[List[str]], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        handoff_batch_size: int = HANDOFF_BATCH_SIZE,
+        previews: Optional[PreviewStore] = None,
+        on_indexed: Optional[Callable[[List[RemotePreview]], List[RemotePreview]]] = None,
+        header_bytes: int = DEFAULT_HEADER_BYTES,
+        unindexed: Optional[Callable[[List[str]], List[str]]] = None,
+    ):
+        self.client = client
+        self.item_store = item_store
+        self.source_id = source_id
+        self.root = Path(root)
+        self.is_media = is_media
+        self.max_workers = max(1, max_workers)
+        self.on_downloaded = on_downloaded
+        self.on_progress = on_progress
+        self.handoff_batch_size = max(1, handoff_batch_size)
+        self.previews = previews
+        self.on_indexed = on_indexed
+        self.header_bytes = header_bytes
+        self.unindexed = unindexed
+
+    @property
+    def remote(self) -> bool:
+        return self.previews is not None
+
+    def plan(
+        self, objects: List[Dict[str, object]]
+    ) -> Tuple[List[Dict[str, object]], List[Tuple[str, Path]], List[Tuple[str, str]]]:
+        """
+        Record listed media objects in the manifest and pick what to download.
+
+        Mirrored files that are already up to date get their manifest
+        local_path recorded here, even when the manifest had no entry yet.
+
+        Returns:
+            (manifest entries written, [(key, destination)] to download,
+            [(key, local path)] already mirrored)
+        """
+        manifest = self.item_store.get_items(self.source_id)
+        entries: List[Dict[str, object]] = []
+        downloads: List[Tuple[str, Path]] = []
+        present: List[Tuple[str, str]] = []
+        adopted: List[Tuple[str, Optional[str]]] = []
+
+        for obj in objects:
+            key = str(obj.get("key", ""))
+            name = key.split("/")[-1]
+            if not key or not self.is_media(name):
+                continue
+            etag = str(obj["etag"]) if obj.get("etag") else None
+            size = obj.get("size") if isinstance(obj.get("size"), int) else None
+            entries.append({
+                "remote_id": key,
+                "remote_path": key,
+                "etag": etag,
+                "modified_at": str(obj["last_modified"]) if obj.get("last_modified") else None,
+                "size_bytes": size,
+                "mime_type": None,
+                "name": name,
+            })
+
+            prev = manifest.get(key)
+            # Respect app-level states: keep in manifest, but do not download/index
+            if prev and prev.status in ("trashed", "removed"):
+                continue
+            if self.remote:
+                if needs_remote_index(prev, etag, size, remote_path(self.source_id, key)):
+                    downloads.append((key, self.root / Path(key)))
+                continue
+            # Mirror path under root, preserving prefix structure
+            dest = self.root / Path(key)
+            if needs_download(prev, etag, size, dest):
+                downloads.append((key, dest))
+            else:
+                present.append((key, str(dest)))
+                if prev is None or prev.local_path != str(dest):
+                    adopted.append((key, str(dest)))
+
+        for start in range(0, len(entries), MANIFEST_BATCH_SIZE):
+            self.item_store.upsert_seen_many(self.source_id, entries[start:start + MANIFEST_BATCH_SIZE])
+        self.item_store.set_local_paths(self.source_id, adopted)
+        return entries, downloads, present
+
+    def run(self) -> S3SyncResult:
+        seen_marker = datetime.now(timezone.utc).isoformat()
+        entries, downloads, present = self.plan(self.client.list_objects())
+        result = S3SyncResult(listed=len(entries), skipped=len(entries) - len(downloads))
+
+        by_key = {str(entry["remote_id"]): entry for entry in entries}
+        finished: List[Tuple[str, str]] = []
+        indexed: List[RemotePreview] = []
+
+        def fetch(key: str, dest: Path) -> Tuple[str, Optional[RemotePreview]]:
+            if self.remote:
+                entry = by_key[key]
+                preview = build_remote_preview(
+                    self.client, self.source_id, key, self.previews,
+                    name=str(entry["name"]),
+                    size_bytes=entry["size_bytes"],
+                    modified=entry["modified_at"],
+                    etag=entry["etag"],
+                    header_bytes=self.header_bytes,
+                )
+                return preview.path, preview
+            self.client.download(key, dest)
+            return str(dest), None
+
+        def flush() -> None:
+            if not finished:
+                return
+            batch = list(finished)
+            previews = list(indexed)
+            finished.clear()
+            indexed.clear()
+            if self.remote:
+                # A virtual local_path marks the object as indexed, so it is
+                # only recorded once metadata and embeddings are stored
+                stored, error = set(), "not indexed"
+                if self.on_indexed and previews:
+                    try:
+                        stored = {preview.path for preview in self.on_indexed(previews) or []}
+                    except Exception as e:
+                        error = f"indexing failed: {e}"
+                marks: List[Tuple[str, Optional[str]]] = []
+                for key, path in batch:
+                    if path in stored:
+                        marks.append((key, path))
+                    else:
+                        # Clearing an earlier marker makes a changed object retry too
+                        marks.append((key, None))
+                        result.failed[key] = error
+                        result.downloaded -= 1
+                self.item_store.set_local_paths(self.source_id, marks)
+                return
+            # The manifest points at the files before they are indexed
+            self.item_store.set_local_paths(self.source_id, batch)
+            if self.on_downloaded:
+                self.on_downloaded([local_path for _, local_path in batch])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="s3-sync") as pool:
+            futures = {pool.submit(fetch, key, dest): key for key, dest in downloads}
+            for done, future in enumerate(as_completed(futures), start=1):
+                key = futures[future]
+                try:
+                    local_path, preview = future.result()
+                except Exception as e:
+                    result.failed[key] = str(e)
+                else:
+                    result.downloaded += 1
+                    finished.append((key, local_path))
+                    if preview:
+                        indexed.append(preview)
+                    if len(finished) >= self.handoff_batch_size:
+                        # Index this batch while the pool keeps downloading
+                        flush()
+                if self.on_progress:
+                    self.on_progress(done, len(downloads))
+        flush()
+        self._reindex(present, result)
+
+        result.removed = self.item_store.mark_missing_as_deleted(self.source_id, seen_marker)
+        return result
+
+    def _reindex(self, present: List[Tuple[str, str]], result: S3SyncResult) -> None:
+        """Hand mirrored files that never got a metadata row back to indexing."""
+        if not present or not self.unindexed or not self.on_downloaded:
+            return
+        paths = self.unindexed([path for _, path in present])
+        for start in range(0, len(paths), self.handoff_batch_size):
+            self.on_downloaded(paths[start:start + self.handoff_batch_size])
+        result.reindexed = len(paths)
@@ -15,6 +15,8 @@ from typing import Dict, Any, List
 import json
 from datetime import datetime
 
+from server.db_pool import connect
+
 
 class SchemaExtensions:
     """Manages database schema extensions for advanced features"""
@@ -25,7 +27,7 @@ class SchemaExtensions:
 
     def extend_schema(self) -> None:
         """Apply all schema extensions"""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Face Recognition Tables
             self._create_face_tables(conn)
 
@@ -409,7 +411,7 @@ class SchemaExtensions:
 
     def insert_default_data(self) -> None:
         """Insert default templates and initial data"""
-        with sqlite3.connect(str(self.db_path)) as conn:
+        with connect(str(self.db_path)) as conn:
             # Default smart album templates
             templates = [
                 {
@@ -2,12 +2,79 @@
 Smart Albums
 
 Auto-generated albums based on rules and metadata.
+
+Rules are compiled once into SQL predicates over the metadata table
+(``file_path`` / ``metadata_json`` columns); only rules without a SQL form
+fall back to per-photo Python evaluation. Membership is kept current
+incrementally through MetadataDatabase change notifications, and refreshes
+apply a diff instead of rewriting the whole album.
 """
 
 import os
-from typing import List, Dict, Any, Callable
+import json
+import logging
+import sqlite3
+import threading
+from typing import List, Dict, Any, Callable, Optional, Set, Tuple
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+# Expression for the JSON metadata column in compiled predicates
+_META = "metadata_json"
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    """Parse an ISO date string the way the Python rules do; None if invalid."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _path_extension(path: Any) -> str:
+    return os.path.splitext(path)[1].lower() if isinstance(path, str) else ''
+
+
+def _path_basename(path: Any) -> str:
+    return os.path.basename(path) if isinstance(path, str) else ''
+
+
+def _py_lower(value: Any) -> str:
+    # Python lower() rather than SQLite's ASCII-only lower()
+    return value.lower() if isinstance(value, str) else ''
+
+
+# Connections that already have the helper functions, by id. Holding the
+# connection keeps its id from being reused while it is listed.
+_registered: Dict[int, sqlite3.Connection] = {}
+_registered_lock = threading.Lock()
+
+
+def _is_closed(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.total_changes
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def register_sql_functions(conn: sqlite3.Connection):
+    """Register the helper SQL functions used by compiled rule predicates (once per connection)."""
+    with _registered_lock:
+        if _registered.get(id(conn)) is conn:
+            return
+        for key, known in list(_registered.items()):
+            if _is_closed(known):
+                del _registered[key]
+        conn.create_function("sa_timestamp", 1, _parse_timestamp, deterministic=True)
+        conn.create_function("sa_extension", 1, _path_extension, deterministic=True)
+        conn.create_function("sa_basename", 1, _path_basename, deterministic=True)
+        conn.create_function("sa_lower", 1, _py_lower, deterministic=True)
+        _registered[id(conn)] = conn
+
 
 class SmartAlbumRule:
     """Base class for smart album rules."""
@@ -19,6 +86,15 @@ class SmartAlbumRule:
         """Check if photo matches this rule."""
         raise NotImplementedError
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        """
+        Compile this rule to a SQL predicate over the metadata table.
+
+        Returns:
+            (predicate, params), or None if the rule must be evaluated in Python
+        """
+        return None
+
 
 class FilenameContainsRule(SmartAlbumRule):
     """Match photos where filename contains a string."""
@@ -33,6 +109,12 @@ class FilenameContainsRule(SmartAlbumRule):
             return value.lower() in filename.lower()
         return value in filename
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        value = self.config.get('value', '')
+        if self.config.get('case_sensitive', False):
+            return "instr(sa_basename(file_path), ?) > 0", [value]
+        return "instr(sa_lower(sa_basename(file_path)), ?) > 0", [value.lower()]
+
 
 class FileExtensionRule(SmartAlbumRule):
     """Match photos with specific extension."""
@@ -45,6 +127,15 @@ class FileExtensionRule(SmartAlbumRule):
         ext = os.path.splitext(photo_path)[1].lower()
         return ext in [e.lower() if e.startswith('.') else f'.{e.lower()}' for e in extensions]
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        extensions = self.config.get('extensions', [])
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        normalized = [e.lower() if e.startswith('.') else f'.{e.lower()}' for e in extensions]
+        if not normalized:
+            return "0", []
+        return f"sa_extension(file_path) IN ({','.join('?' * len(normalized))})", normalized
+
 
 class FileSizeRule(SmartAlbumRule):
     """Match photos by file size."""
@@ -69,6 +160,19 @@ class FileSizeRule(SmartAlbumRule):
 
         return False
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        operator = self.config.get('operator', '>')
+        size_bytes = self.config.get('size_bytes', 0)
+        if not isinstance(size_bytes, (int, float)):
+            return None
+        sql_operator = {'>': '>', '<': '<', '>=': '>=', '<=': '<=', '==': '='}.get(operator)
+        if sql_operator is None:
+            return "0", []
+        return (
+            f"COALESCE(json_extract({_META}, '$.filesystem.size_bytes'), 0) {sql_operator} ?",
+            [size_bytes]
+        )
+
 
 class DateRangeRule(SmartAlbumRule):
     """Match photos within a date range."""
@@ -100,6 +204,31 @@ class DateRangeRule(SmartAlbumRule):
         except:
             return False
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        from_date = self.config.get('from_date')
+        to_date = self.config.get('to_date')
+        from_ts = _parse_timestamp(from_date) if from_date else None
+        to_ts = _parse_timestamp(to_date) if to_date else None
+        if (from_date and from_ts is None) or (to_date and to_ts is None):
+            return "0", []
+
+        created = f"sa_timestamp(json_extract({_META}, '$.filesystem.created'))"
+        clauses = [f"{created} IS NOT NULL"]
+        params: List[Any] = []
+        if from_ts is not None:
+            clauses.append(f"{created} >= ?")
+            params.append(from_ts)
+        if to_ts is not None:
+            clauses.append(f"{created} <= ?")
+            params.append(to_ts)
+        return " AND ".join(clauses), params
+
+
+# Truthiness of the GPS pair, matching bool(lat and lng) in the Python rules
+_HAS_GPS_SQL = (
+    f"COALESCE(json_extract({_META}, '$.gps.latitude') AND json_extract({_META}, '$.gps.longitude'), 0)"
+)
+
 
 class NoGPSRule(SmartAlbumRule):
     """Match photos without GPS data."""
@@ -109,6 +238,9 @@ class NoGPSRule(SmartAlbumRule):
         has_gps = bool(gps.get('latitude') and gps.get('longitude'))
         return not has_gps
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        return f"NOT {_HAS_GPS_SQL}", []
+
 
 class HasGPSRule(SmartAlbumRule):
     """Match photos with GPS data."""
@@ -117,6 +249,9 @@ class HasGPSRule(SmartAlbumRule):
         gps = photo_metadata.get('gps', {})
         return bool(gps.get('latitude') and gps.get('longitude'))
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        return _HAS_GPS_SQL, []
+
 
 class CameraModelRule(SmartAlbumRule):
     """Match photos from specific camera."""
@@ -131,6 +266,16 @@ class CameraModelRule(SmartAlbumRule):
 
         return any(model.lower() in camera_model.lower() for model in models)
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        models = self.config.get('models', [])
+        if isinstance(models, str):
+            models = [models]
+        if not models:
+            return "0", []
+        camera_model = f"sa_lower(COALESCE(json_extract({_META}, '$.exif.image.Model'), ''))"
+        clauses = [f"instr({camera_model}, ?) > 0" for _ in models]
+        return "(" + " OR ".join(clauses) + ")", [m.lower() for m in models]
+
 
 class RecentPhotosRule(SmartAlbumRule):
     """Match photos from last N days."""
@@ -151,6 +296,16 @@ class RecentPhotosRule(SmartAlbumRule):
         except:
             return False
 
+    def to_sql(self) -> Optional[Tuple[str, List[Any]]]:
+        # A callable parameter is evaluated when the query runs, so cached
+        # compilations keep a moving cutoff
+        days = self.config.get('days', 30)
+
+        def cutoff() -> float:
+            return (datetime.now() - timedelta(days=days)).timestamp()
+
+        return f"sa_timestamp(json_extract({_META}, '$.filesystem.created')) >= ?", [cutoff]
+
 
 # Rule registry
 RULE_TYPES: Dict[str, type] = {
@@ -204,6 +359,89 @@ class SmartAlbumEngine:
         else:
             return any(rule.matches(photo_metadata, photo_path) for rule in rule_instances)
 
+    @staticmethod
+    def compile_rules(rules: List[Dict[str, Any]], match_all: bool = True) -> 'CompiledRules':
+        """Compile rule configurations once for repeated evaluation."""
+        return CompiledRules(rules, match_all)
+
+
+class CompiledRules:
+    """
+    A rule set split into one SQL predicate plus any Python-only rules.
+
+    With AND logic the SQL predicate narrows candidates before the Python
+    rules run; with OR logic Python rules only see rows the SQL part missed.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], match_all: bool = True):
+        self.match_all = match_all
+        self.python_rules: List[SmartAlbumRule] = []
+        clauses: List[str] = []
+        # Callables are resolved each time the query runs
+        self.params: List[Any] = []
+
+        for rule_config in rules:
+            rule = SmartAlbumEngine.create_rule(rule_config)
+            compiled = rule.to_sql()
+            if compiled is None:
+                self.python_rules.append(rule)
+            else:
+                clauses.append(f"({compiled[0]})")
+                self.params.extend(compiled[1])
+
+        if not rules:
+            self.predicate = "0"
+        elif not clauses:
+            # Everything is Python-only: neutral element of the combinator
+            self.predicate = "1" if match_all else "0"
+        else:
+            self.predicate = (" AND " if match_all else " OR ").join(clauses)
+
+    def _python_matches(self, metadata_json: Optional[str], photo_path: str) -> bool:
+        metadata = json.loads(metadata_json) if metadata_json else {}
+        try:
+            if self.match_all:
+                return all(rule.matches(metadata, photo_path) for rule in self.python_rules)
+            return any(rule.matches(metadata, photo_path) for rule in self.python_rules)
+        except Exception:
+            return False
+
+    def matching_paths(self, conn: sqlite3.Connection, photo_path: Optional[str] = None) -> Set[str]:
+        """
+        Return matching file paths from the metadata table.
+
+        Args:
+            conn: Connection to the metadata database
+            photo_path: Restrict evaluation to a single file (incremental updates)
+        """
+        register_sql_functions(conn)
+        params = [p() if callable(p) else p for p in self.params]
+        scope = "deleted_at IS NULL"
+        scope_params: List[Any] = []
+        if photo_path is not None:
+            scope += " AND file_path = ?"
+            scope_params.append(photo_path)
+
+        if not self.python_rules:
+            rows = conn.execute(
+                f"SELECT file_path FROM metadata WHERE {scope} AND ({self.predicate})",
+                scope_params + params
+            ).fetchall()
+            return {row[0] for row in rows}
+
+        if self.match_all:
+            rows = conn.execute(
+                f"SELECT file_path, metadata_json FROM metadata WHERE {scope} AND ({self.predicate})",
+                scope_params + params
+            ).fetchall()
+            return {row[0] for row in rows if self._python_matches(row[1], row[0])}
+
+        rows = conn.execute(
+            f"SELECT file_path, metadata_json, ({self.predicate}) FROM metadata WHERE {scope}",
+            params + scope_params
+        ).fetchall()
+        return {row[0] for row in rows if row[2] or self._python_matches(row[1], row[0])}
+
 
 # Predefined smart albums
 PREDEFINED_SMART_ALBUMS = [
@@ -271,34 +509,81 @@ def initialize_predefined_smart_albums(albums_db):
             )
 
 
-def populate_smart_album(albums_db, album_id: str, all_photos_with_metadata: List[tuple]):
+def populate_smart_album(albums_db, album_id: str, metadata_db) -> Dict[str, int]:
     """
     Populate a smart album based on its rules.
 
     Args:
         albums_db: AlbumsDB instance
         album_id: Album ID to populate
-        all_photos_with_metadata: List of (photo_path, metadata_dict) tuples
+        metadata_db: MetadataDatabase holding the photo metadata
+
+    Returns:
+        Dict with counts of added and removed photos
     """
     album = albums_db.get_album(album_id)
 
     if not album or not album.is_smart or not album.smart_rules:
-        return
-
-    rules = album.smart_rules.get('rules', [])
-    match_all = album.smart_rules.get('match_all', True)
-
-    # Find matching photos
-    matching_paths = []
-    for photo_path, metadata in all_photos_with_metadata:
-        if SmartAlbumEngine.evaluate_rules(rules, metadata, photo_path, match_all):
-            matching_paths.append(photo_path)
-
-    # Clear existing photos (smart albums are fully recomputed)
-    existing_paths = albums_db.get_album_photos(album_id, limit=999999)
-    if existing_paths:
-        albums_db.remove_photos_from_album(album_id, existing_paths)
+        return {'added': 0, 'removed': 0}
+
+    compiled = SmartAlbumEngine.compile_rules(
+        album.smart_rules.get('rules', []),
+        album.smart_rules.get('match_all', True)
+    )
+    matching_paths = compiled.matching_paths(metadata_db.conn)
+
+    # Apply only the difference to the stored membership
+    added, removed = albums_db.sync_album_photos(album_id, matching_paths)
+    return {'added': added, 'removed': removed}
+
+
+class SmartAlbumMaintainer:
+    """Keep smart album membership current as metadata changes."""
+
+    def __init__(self, albums_db, metadata_db):
+        self.albums_db = albums_db
+        self.metadata_db = metadata_db
+        # smart_rules JSON -> CompiledRules, so rules compile once
+        self._compiled: Dict[str, CompiledRules] = {}
+
+    def _compiled_rules(self, smart_rules_json: str) -> Optional[CompiledRules]:
+        compiled = self._compiled.get(smart_rules_json)
+        if compiled is None:
+            try:
+                smart_rules = json.loads(smart_rules_json)
+                compiled = SmartAlbumEngine.compile_rules(
+                    smart_rules.get('rules', []),
+                    smart_rules.get('match_all', True)
+                )
+            except (ValueError, AttributeError) as e:
+                logger.warning(f"Skipping smart album with invalid rules: {e}")
+                return None
+            self._compiled[smart_rules_json] = compiled
+        return compiled
+
+    def handle_change(self, event: str, photo_path: str):
+        """
+        MetadataDatabase change listener.
 
-    # Add matching photos
-    if matching_paths:
-        albums_db.add_photos_to_album(album_id, matching_paths)
+        Args:
+            event: "upsert" when metadata was stored, "delete" when removed
+            photo_path: Affected file path
+        """
+        if event not in ("upsert", "delete"):
+            return
+        smart_albums = self.albums_db.get_smart_album_rules()
+        if not smart_albums:
+            return
+
+        matched: Set[str] = set()
+        if event != "delete":
+            for album_id, smart_rules_json in smart_albums.items():
+                compiled = self._compiled_rules(smart_rules_json)
+                if compiled and compiled.matching_paths(self.metadata_db.conn, photo_path=photo_path):
+                    matched.add(album_id)
+
+        self.albums_db.sync_photo_albums(photo_path, matched, list(smart_albums))
+
+    def refresh(self, album_id: str) -> Dict[str, int]:
+        """Recompute one smart album (e.g. for time-relative rules)."""
+        return populate_smart_album(self.albums_db, album_id, self.metadata_db)
@@ -12,6 +12,8 @@ from datetime import datetime
 import json
 import uuid
 
+from server.db_pool import connect
+
 
 class SmartCollection:
     """Represents a smart collection with auto-inclusion rules"""
@@ -41,7 +43,7 @@ class SmartCollectionsDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS smart_collections (
                     id TEXT PRIMARY KEY,
@@ -83,7 +85,7 @@ class SmartCollectionsDB:
         collection_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO smart_collections 
@@ -109,7 +111,7 @@ class SmartCollectionsDB:
             SmartCollection if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT * FROM smart_collections WHERE id = ?",
@@ -131,7 +133,7 @@ class SmartCollectionsDB:
             List of smart collections
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -170,7 +172,7 @@ class SmartCollectionsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 query = "UPDATE smart_collections SET last_updated = CURRENT_TIMESTAMP"
                 params = []
                 
@@ -217,7 +219,7 @@ class SmartCollectionsDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "DELETE FROM smart_collections WHERE id = ?",
                     (collection_id,)
@@ -237,7 +239,7 @@ class SmartCollectionsDB:
             List of photo paths that match the collection's rules
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 result = conn.execute(
                     "SELECT rule_definition FROM smart_collections WHERE id = ?",
@@ -268,7 +270,7 @@ class SmartCollectionsDB:
             List of collections that use the specified rule type
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 # Find collections where rule definition contains the specified type
                 cursor = conn.execute(
@@ -292,7 +294,7 @@ class SmartCollectionsDB:
             Dictionary with collection statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 result = conn.execute("SELECT COUNT(*) as total FROM smart_collections").fetchone()
                 total_collections = result['total'] if result else 0
 
@@ -2,7 +2,9 @@ import sqlite3
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, ContextManager
+
+from server.db_pool import connect
 
 
 def _utc_now_iso() -> str:
@@ -32,10 +34,8 @@ class SourceItemStore:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _conn(self) -> ContextManager[sqlite3.Connection]:
+        return connect(str(self.db_path), row_factory=sqlite3.Row)
 
     def _init_db(self) -> None:
         with self._conn() as conn:
@@ -134,6 +134,47 @@ class SourceItemStore:
                 )
         return self.get(source_id, remote_id)
 
+    def upsert_seen_many(self, source_id: str, entries: List[Dict[str, Any]]) -> None:
+        """
+        Batch form of upsert_seen in a single transaction.
+
+        Each entry holds remote_id, remote_path, etag, modified_at, size_bytes,
+        mime_type and name. Trashed/removed items keep their status.
+        """
+        if not entries:
+            return
+        now = _utc_now_iso()
+        with self._conn() as conn:
+            conn.executemany(
+                """
+                INSERT INTO source_items
+                (source_id, remote_id, remote_path, etag, modified_at, size_bytes, mime_type, name, local_path, status, last_seen_at, created_at, updated_at)
+                VALUES
+                (?, ?, ?, ?, ?, ?, ?, ?, NULL, 'active', ?, ?, ?)
+                ON CONFLICT(source_id, remote_id) DO UPDATE SET
+                  remote_path = excluded.remote_path, etag = excluded.etag, modified_at = excluded.modified_at,
+                  size_bytes = excluded.size_bytes, mime_type = excluded.mime_type, name = excluded.name,
+                  status = CASE WHEN source_items.status IN ('trashed', 'removed') THEN source_items.status ELSE 'active' END,
+                  last_seen_at = excluded.last_seen_at, updated_at = excluded.updated_at
+                """,
+                [
+                    (
+                        source_id,
+                        e["remote_id"],
+                        e["remote_path"],
+                        e.get("etag"),
+                        e.get("modified_at"),
+                        e.get("size_bytes"),
+                        e.get("mime_type"),
+                        e.get("name"),
+                        now,
+                        now,
+                        now,
+                    )
+                    for e in entries
+                ],
+            )
+
     def set_status(self, source_id: str, remote_id: str, status: str) -> None:
         now = _utc_now_iso()
         with self._conn() as conn:
@@ -146,7 +187,7 @@ class SourceItemStore:
                 (status, now, source_id, remote_id),
             )
 
-    def set_local_path(self, source_id: str, remote_id: str, local_path: str) -> None:
+    def set_local_path(self, source_id: str, remote_id: str, local_path: Optional[str]) -> None:
         now = _utc_now_iso()
         with self._conn() as conn:
             conn.execute(
@@ -158,6 +199,21 @@ class SourceItemStore:
                 (local_path, now, source_id, remote_id),
             )
 
+    def set_local_paths(self, source_id: str, local_paths: List[Tuple[str, Optional[str]]]) -> None:
+        """Batch form of set_local_path for (remote_id, local_path) pairs."""
+        if not local_paths:
+            return
+        now = _utc_now_iso()
+        with self._conn() as conn:
+            conn.executemany(
+                """
+                UPDATE source_items
+                SET local_path = ?, updated_at = ?
+                WHERE source_id = ? AND remote_id = ?
+                """,
+                [(local_path, now, source_id, remote_id) for remote_id, local_path in local_paths],
+            )
+
     def mark_missing_as_deleted(self, source_id: str, seen_at: str) -> List[SourceItem]:
         """
         Mark items not seen at `seen_at` as deleted.
@@ -189,6 +245,15 @@ class SourceItemStore:
             ).fetchall()
         return [self._row_to_item(r) for r in rows]
 
+    def get_items(self, source_id: str) -> Dict[str, SourceItem]:
+        """All manifest entries of a source keyed by remote_id."""
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT * FROM source_items WHERE source_id = ?",
+                (source_id,),
+            ).fetchall()
+        return {r["remote_id"]: self._row_to_item(r) for r in rows}
+
     def find_by_local_path(self, local_path: str) -> Optional[SourceItem]:
         with self._conn() as conn:
             row = conn.execute(
@@ -4,7 +4,9 @@ import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, ContextManager
+
+from server.db_pool import connect
 
 
 def _utc_now_iso() -> str:
@@ -50,10 +52,8 @@ class SourceStore:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _conn(self) -> ContextManager[sqlite3.Connection]:
+        return connect(str(self.db_path), row_factory=sqlite3.Row)
 
     def _init_db(self) -> None:
         with self._conn() as conn:
@@ -0,0 +1,239 @@
+"""
+Spatial Index Helpers
+
+Shared geospatial utilities for the location databases:
+- An SQLite R*Tree over photo_locations (kept in sync by triggers) for
+  bounding-box prefiltering of radius queries
+- Exact great-circle bounding boxes (pole and antimeridian aware)
+- Vectorized NumPy haversine distances
+- Grid-bucketed greedy clustering that avoids the O(n^2) pairwise scan
+"""
+
+import math
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+# Name of the R*Tree companion table for photo_locations
+RTREE_TABLE = "photo_locations_rtree"
+
+
+def haversine_m(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Distance in meters from one point to many points.
+
+    Args:
+        lat, lng: Reference point in degrees
+        lats, lngs: Arrays of point coordinates in degrees
+
+    Returns:
+        Array of distances in meters
+    """
+    lat1 = math.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_boxes(lat: float, lng: float, radius_m: float) -> List[Tuple[float, float, float, float]]:
+    """
+    Bounding boxes (min_lat, max_lat, min_lng, max_lng) covering a circle.
+
+    The box is exact for a great-circle radius. It is split in two when it
+    crosses the antimeridian and widened to all longitudes when it reaches
+    a pole.
+    """
+    angular = radius_m / EARTH_RADIUS_M
+    lat_rad = math.radians(lat)
+    min_lat = lat_rad - angular
+    max_lat = lat_rad + angular
+
+    if min_lat <= -math.pi / 2 or max_lat >= math.pi / 2:
+        return [(math.degrees(max(min_lat, -math.pi / 2)), math.degrees(min(max_lat, math.pi / 2)), -180.0, 180.0)]
+
+    delta_lng = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(lat_rad))))
+    min_lat_deg, max_lat_deg = math.degrees(min_lat), math.degrees(max_lat)
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+
+    if min_lng < -180.0:
+        return [(min_lat_deg, max_lat_deg, min_lng + 360.0, 180.0), (min_lat_deg, max_lat_deg, -180.0, max_lng)]
+    if max_lng > 180.0:
+        return [(min_lat_deg, max_lat_deg, min_lng, 180.0), (min_lat_deg, max_lat_deg, -180.0, max_lng - 360.0)]
+    return [(min_lat_deg, max_lat_deg, min_lng, max_lng)]
+
+
+def ensure_spatial_index(conn: sqlite3.Connection) -> bool:
+    """
+    Create the photo_locations R*Tree and its sync triggers if missing.
+
+    Entries are keyed by photo_locations.rowid. Existing rows are
+    backfilled the first time the index is created. Writers must upsert
+    with ON CONFLICT DO UPDATE: INSERT OR REPLACE deletes the old row
+    without firing the delete trigger. Entries left behind that way are
+    pruned here.
+
+    Returns:
+        True if the R*Tree is available, False if SQLite lacks the module
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (RTREE_TABLE,)
+    ).fetchone()
+    if exists:
+        conn.execute(f"DELETE FROM {RTREE_TABLE} WHERE id NOT IN (SELECT rowid FROM photo_locations)")
+        return True
+
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE {RTREE_TABLE} USING rtree(id, min_lat, max_lat, min_lng, max_lng)")
+    except sqlite3.OperationalError:
+        return False
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photo_locations_rtree_ai AFTER INSERT ON photo_locations BEGIN
+            INSERT OR REPLACE INTO {RTREE_TABLE} (id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photo_locations_rtree_au AFTER UPDATE OF latitude, longitude ON photo_locations BEGIN
+            UPDATE {RTREE_TABLE}
+            SET min_lat = new.latitude, max_lat = new.latitude, min_lng = new.longitude, max_lng = new.longitude
+            WHERE id = new.rowid;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photo_locations_rtree_ad AFTER DELETE ON photo_locations BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = old.rowid;
+        END
+    """)
+    conn.execute(f"""
+        INSERT INTO {RTREE_TABLE} (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT rowid, latitude, latitude, longitude, longitude FROM photo_locations
+    """)
+    return True
+
+
+def query_radius(conn: sqlite3.Connection, lat: float, lng: float, radius_m: float,
+                 use_rtree: bool = True) -> List[Tuple[sqlite3.Row, float]]:
+    """
+    Rows of photo_locations within radius_m of a point, nearest first.
+
+    Candidates come from a bounding-box prefilter (R*Tree when available,
+    otherwise the latitude/longitude B-tree index) and are then filtered
+    by exact haversine distance.
+
+    Returns:
+        List of (row, distance_m) tuples; rows use the connection's row factory
+    """
+    clauses = []
+    params: List[float] = []
+    for min_lat, max_lat, min_lng, max_lng in bounding_boxes(lat, lng, radius_m):
+        if use_rtree:
+            # Overlap test: R*Tree bounds are float32, rounded outward
+            clauses.append("(r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?)")
+        else:
+            clauses.append("(latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?)")
+        params.extend([min_lat, max_lat, min_lng, max_lng])
+
+    if use_rtree:
+        sql = (
+            f"SELECT pl.* FROM {RTREE_TABLE} r JOIN photo_locations pl ON pl.rowid = r.id "
+            f"WHERE {' OR '.join(clauses)}"
+        )
+    else:
+        sql = f"SELECT * FROM photo_locations WHERE {' OR '.join(clauses)}"
+
+    rows = conn.execute(sql, params).fetchall()
+    if not rows:
+        return []
+
+    coords = np.array([(row["latitude"], row["longitude"]) for row in rows], dtype=np.float64)
+    distances = haversine_m(lat, lng, coords[:, 0], coords[:, 1])
+    order = np.argsort(distances, kind="stable")
+    return [(rows[i], float(distances[i])) for i in order if distances[i] <= radius_m]
+
+
+class _Grid:
+    """Uniform lat/lng grid of point indices used to find clustering candidates."""
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, cell_deg: float):
+        self.cell = cell_deg
+        self.buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.row_cols: Dict[int, Set[int]] = defaultdict(set)
+        rows = np.floor(lats / cell_deg).astype(np.int64)
+        cols = np.floor(lngs / cell_deg).astype(np.int64)
+        for i, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            self.buckets[key].append(i)
+            self.row_cols[key[0]].add(key[1])
+
+    def candidates(self, boxes: List[Tuple[float, float, float, float]]) -> List[int]:
+        """Indices of points in grid cells that overlap any of the boxes."""
+        found: List[int] = []
+        for min_lat, max_lat, min_lng, max_lng in boxes:
+            col_lo = math.floor(min_lng / self.cell)
+            col_hi = math.floor(max_lng / self.cell)
+            for row in range(math.floor(min_lat / self.cell), math.floor(max_lat / self.cell) + 1):
+                occupied = self.row_cols.get(row)
+                if not occupied:
+                    continue
+                if col_hi - col_lo + 1 > len(occupied):
+                    cols = [c for c in occupied if col_lo <= c <= col_hi]
+                else:
+                    cols = [c for c in range(col_lo, col_hi + 1) if c in occupied]
+                for col in cols:
+                    found.extend(self.buckets[(row, col)])
+        return found
+
+
+def grid_cluster(lats: np.ndarray, lngs: np.ndarray, max_distance_m: float,
+                 min_photos: int = 2) -> List[np.ndarray]:
+    """
+    Greedy radius clustering accelerated by a grid index.
+
+    Points are visited in input order. Each unassigned point seeds a group
+    of all unassigned points within max_distance_m of it; the group becomes
+    a cluster when it has at least min_photos members, and its points are
+    consumed either way.
+
+    Returns:
+        List of index arrays, one per cluster, in creation order
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if len(lats) == 0:
+        return []
+
+    # Cells about one radius wide keep each lookup to a few cells; the
+    # exact bounding box decides which cells are scanned
+    cell_deg = max(math.degrees(max_distance_m / EARTH_RADIUS_M), 1e-7)
+    grid = _Grid(lats, lngs, cell_deg)
+    processed = np.zeros(len(lats), dtype=bool)
+    clusters: List[np.ndarray] = []
+
+    for seed in range(len(lats)):
+        if processed[seed]:
+            continue
+        lat, lng = float(lats[seed]), float(lngs[seed])
+        found = grid.candidates(bounding_boxes(lat, lng, max_distance_m))
+        if len(found) == 1:
+            # Isolated point: skip the array work
+            processed[seed] = True
+            if min_photos <= 1:
+                clusters.append(np.array([seed], dtype=np.int64))
+            continue
+        candidates = np.array(found, dtype=np.int64)
+        candidates = candidates[~processed[candidates]]
+        distances = haversine_m(lat, lng, lats[candidates], lngs[candidates])
+        members = np.unique(candidates[distances <= max_distance_m])
+        processed[members] = True
+        processed[seed] = True
+        if len(members) >= min_photos:
+            clusters.append(members)
+
+    return clusters
+
@@ -1,8 +1,15 @@
+import logging
 import sqlite3
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, ContextManager, Tuple
+
+from src.cache_manager import library_version
+from server.db_pool import connect
+from server.photo_registry import PhotoRegistry, migrate_path_keyed_table, registry_for_store
+
+logger = logging.getLogger(__name__)
 
 
 def _utc_now_iso() -> str:
@@ -17,16 +24,47 @@ class TagSummary:
     updated_at: str
 
 
+_TAG_PHOTOS_SQL = """
+    CREATE TABLE IF NOT EXISTS tag_photos (
+      tag_name TEXT NOT NULL,
+      photo_id INTEGER NOT NULL,
+      created_at TEXT NOT NULL,
+      PRIMARY KEY (tag_name, photo_id),
+      FOREIGN KEY (tag_name) REFERENCES tags(name) ON DELETE CASCADE
+    )
+"""
+
+
 class TagsDB:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, registry: Optional[PhotoRegistry] = None):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Photos are referenced by registry id; paths are resolved by joining it
+        self.registry = registry or registry_for_store(self.db_path)
+        self._change_listeners: List[Callable[[str, str, List[int]], None]] = []
         self._init_db()
+        self.registry.track_table(self.db_path, "tag_photos")
+
+    def add_change_listener(self, listener: Callable[[str, str, List[int]], None]) -> None:
+        """
+        Register a callback for tag membership changes.
+
+        The listener receives ("add", tag, photo_ids) and ("remove", tag,
+        photo_ids) after photos are tagged or untagged, and ("delete", tag, [])
+        after a tag is deleted.
+        """
+        self._change_listeners.append(listener)
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _notify_change(self, event: str, tag_name: str, photo_ids: List[int]) -> None:
+        # A failing listener never fails the write
+        for listener in self._change_listeners:
+            try:
+                listener(event, tag_name, photo_ids)
+            except Exception as e:
+                logger.error(f"Tag change listener failed for {tag_name}: {e}")
+
+    def _conn(self) -> ContextManager[sqlite3.Connection]:
+        return connect(str(self.db_path), row_factory=sqlite3.Row)
 
     def _init_db(self) -> None:
         with self._conn() as conn:
@@ -39,19 +77,10 @@ class TagsDB:
                 )
                 """
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS tag_photos (
-                  tag_name TEXT NOT NULL,
-                  photo_path TEXT NOT NULL,
-                  created_at TEXT NOT NULL,
-                  PRIMARY KEY (tag_name, photo_path),
-                  FOREIGN KEY (tag_name) REFERENCES tags(name) ON DELETE CASCADE
-                )
-                """
-            )
+            conn.execute(_TAG_PHOTOS_SQL)
+            migrate_path_keyed_table(conn, self.registry, "tag_photos", _TAG_PHOTOS_SQL, ["tag_name", "created_at"])
             conn.execute("CREATE INDEX IF NOT EXISTS idx_tag_photos_tag ON tag_photos(tag_name)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_tag_photos_path ON tag_photos(photo_path)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tag_photos_photo ON tag_photos(photo_id)")
 
     def _ensure_tag(self, name: str) -> None:
         now = _utc_now_iso()
@@ -101,68 +130,84 @@ class TagsDB:
     def delete_tag(self, name: str) -> bool:
         with self._conn() as conn:
             cur = conn.execute("DELETE FROM tags WHERE name = ?", (name,))
-            return cur.rowcount > 0
+            deleted = cur.rowcount > 0
+        if deleted:
+            library_version.bump()
+            self._notify_change("delete", name, [])
+        return deleted
 
     def add_photos(self, tag_name: str, photo_paths: List[str]) -> int:
         self._ensure_tag(tag_name)
         now = _utc_now_iso()
+        ids = self.registry.ensure_ids(photo_paths)
         with self._conn() as conn:
-            added = 0
-            for p in photo_paths:
-                try:
-                    cur = conn.execute(
-                        """
-                        INSERT OR IGNORE INTO tag_photos (tag_name, photo_path, created_at)
-                        VALUES (?, ?, ?)
-                        """,
-                        (tag_name, p, now),
-                    )
-                    try:
-                        if cur.rowcount and cur.rowcount > 0:
-                            added += 1
-                    except Exception:
-                        pass
-                except Exception:
-                    continue
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO tag_photos (tag_name, photo_id, created_at)
+                VALUES (?, ?, ?)
+                """,
+                [(tag_name, photo_id, now) for photo_id in ids.values()],
+            )
+            added = conn.total_changes - before
             conn.execute("UPDATE tags SET updated_at = ? WHERE name = ?", (now, tag_name))
+        if added:
+            library_version.bump()
+            self._notify_change("add", tag_name, list(ids.values()))
         return added
 
     def remove_photos(self, tag_name: str, photo_paths: List[str]) -> int:
+        ids = self.registry.ids_for(photo_paths)
         with self._conn() as conn:
-            removed = 0
-            for p in photo_paths:
-                cur = conn.execute(
-                    "DELETE FROM tag_photos WHERE tag_name = ? AND photo_path = ?",
-                    (tag_name, p),
-                )
-                removed += int(cur.rowcount or 0)
+            before = conn.total_changes
+            conn.executemany(
+                "DELETE FROM tag_photos WHERE tag_name = ? AND photo_id = ?",
+                [(tag_name, photo_id) for photo_id in ids.values()],
+            )
+            removed = conn.total_changes - before
             conn.execute("UPDATE tags SET updated_at = ? WHERE name = ?", (_utc_now_iso(), tag_name))
+        if removed:
+            library_version.bump()
+            self._notify_change("remove", tag_name, list(ids.values()))
         return removed
 
     def get_tag_paths(self, tag_name: str) -> List[str]:
         with self._conn() as conn:
+            self.registry.attach(conn)
             rows = conn.execute(
                 """
-                SELECT photo_path FROM tag_photos
-                WHERE tag_name = ?
-                ORDER BY created_at DESC
+                SELECT p.path FROM tag_photos tp
+                JOIN registry.photos p ON p.id = tp.photo_id
+                WHERE tp.tag_name = ?
+                ORDER BY tp.created_at DESC
                 """,
                 (tag_name,),
             ).fetchall()
-        return [r["photo_path"] for r in rows]
+        return [r["path"] for r in rows]
 
     def get_photo_tags(self, photo_path: str) -> List[str]:
+        photo_id = self.registry.id_for(photo_path)
+        if photo_id is None:
+            return []
         with self._conn() as conn:
             rows = conn.execute(
                 """
                 SELECT tag_name FROM tag_photos
-                WHERE photo_path = ?
+                WHERE photo_id = ?
                 ORDER BY created_at DESC
                 """,
-                (photo_path,),
+                (photo_id,),
             ).fetchall()
         return [r["tag_name"] for r in rows]
 
+    def memberships(self) -> List[Tuple[str, int]]:
+        """(tag, photo_id) for every tagged photo."""
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT tp.tag_name, tp.photo_id FROM tag_photos tp JOIN tags t ON t.name = tp.tag_name"
+            ).fetchall()
+        return [(r["tag_name"], r["photo_id"]) for r in rows]
+
     def has_tag(self, tag_name: str) -> bool:
         with self._conn() as conn:
             row = conn.execute("SELECT 1 FROM tags WHERE name = ? LIMIT 1", (tag_name,)).fetchone()
@@ -13,6 +13,8 @@ import json
 import uuid
 from dataclasses import dataclass
 
+from server.db_pool import connect
+
 
 @dataclass
 class TimelineEntry:
@@ -56,7 +58,7 @@ class TimelineDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Initialize tables
-        with sqlite3.connect(self.db_path) as conn:
+        with connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS stories (
                     id TEXT PRIMARY KEY,
@@ -124,7 +126,7 @@ class TimelineDB:
         metadata_json = json.dumps(metadata) if metadata else '{}'
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT INTO stories 
@@ -148,7 +150,7 @@ class TimelineDB:
             StoryNarrative if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 story_row = conn.execute(
                     "SELECT * FROM stories WHERE id = ?",
@@ -219,7 +221,7 @@ class TimelineDB:
         entry_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Get the next narrative order position for this story
                 next_order = conn.execute(
                     "SELECT COALESCE(MAX(narrative_order), 0) + 1 FROM timeline_entries WHERE story_id = ?",
@@ -250,7 +252,7 @@ class TimelineDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     """
                     UPDATE timeline_entries 
@@ -274,7 +276,7 @@ class TimelineDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "DELETE FROM timeline_entries WHERE id = ?",
                     (entry_id,)
@@ -301,7 +303,7 @@ class TimelineDB:
             List of stories for the owner
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 where_clause = "WHERE owner_id = ?"
                 params = [owner_id]
@@ -342,7 +344,7 @@ class TimelineDB:
             List of stories with photos in the date range
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -373,7 +375,7 @@ class TimelineDB:
             List of timeline entries ordered by narrative_order
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -403,7 +405,7 @@ class TimelineDB:
         tag_id = str(uuid.uuid4())
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.execute(
                     """
                     INSERT OR IGNORE INTO story_tags 
@@ -427,7 +429,7 @@ class TimelineDB:
             List of tags associated with the story
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     "SELECT tag FROM story_tags WHERE story_id = ?",
                     (story_id,)
@@ -454,7 +456,7 @@ class TimelineDB:
             List of stories with the specified tag
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute(
                     """
@@ -484,7 +486,7 @@ class TimelineDB:
             True if successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.execute(
                     """
                     UPDATE stories 
@@ -508,7 +510,7 @@ class TimelineDB:
             Dictionary with story statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 # Total stories
                 total_stories = conn.execute(
                     "SELECT COUNT(*) FROM stories WHERE owner_id = ?",
@@ -12,7 +12,9 @@ import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import ContextManager, Dict, Iterable, List, Optional
+
+from server.db_pool import connect
 
 
 def _utc_now_iso() -> str:
@@ -39,10 +41,8 @@ class TrashDB:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _conn(self) -> ContextManager[sqlite3.Connection]:
+        return connect(str(self.db_path), row_factory=sqlite3.Row)
 
     def _init_db(self) -> None:
         with self._conn() as conn:
@@ -88,6 +88,29 @@ class TrashDB:
             )
         return self.get(item_id)
 
+    def create_many(self, items: Iterable[Dict[str, Optional[str]]]) -> int:
+        """
+        Insert several trashed items in one transaction.
+
+        Each item carries id, original_path, trashed_path, source_id and remote_id.
+        """
+        now = _utc_now_iso()
+        rows = [
+            (it["id"], it["original_path"], it["trashed_path"], it.get("source_id"), it.get("remote_id"), now, now)
+            for it in items
+        ]
+        with self._conn() as conn:
+            conn.executemany(
+                """
+                INSERT INTO trash_items
+                (id, original_path, trashed_path, status, source_id, remote_id, created_at, updated_at, restored_at, deleted_at)
+                VALUES
+                (?, ?, ?, 'trashed', ?, ?, ?, ?, NULL, NULL)
+                """,
+                rows,
+            )
+        return len(rows)
+
     def get(self, item_id: str) -> TrashItem:
         with self._conn() as conn:
             row = conn.execute("SELECT * FROM trash_items WHERE id = ?", (item_id,)).fetchone()
@@ -1,5 +1,9 @@
 import numpy as np
+import json
+import os
 import pickle
+import re
+import uuid
 import logging
 from typing import List, Dict, Any, Optional
 from pathlib import Path
@@ -7,72 +11,128 @@ from pathlib import Path
 # Configure logging
 logger = logging.getLogger(__name__)
 
+_FORMAT_VERSION = 1
+
+
 class VectorStore:
     """
     Simple in-memory vector store with persistence to disk.
     Uses numpy for efficient cosine similarity calculations.
+
+    - Vectors live in a float32 buffer whose capacity doubles when full,
+      so adding n vectors copies O(n) floats
+    - Search takes the top k with argpartition instead of sorting every score
+    - save() writes the vectors as a .npy file plus a JSON sidecar holding
+      ids and metadata; load() memory-maps the .npy, so a large store opens
+      instantly and pages in on demand. Legacy pickle files still load.
+
+    Args:
+        initial_capacity: Rows allocated for the first vector
     """
-    
-    def __init__(self):
+
+    def __init__(self, initial_capacity: int = 1024):
         """Initialize empty vector store."""
         self.ids: List[str] = []
-        self.embeddings: Optional[np.ndarray] = None
         self.metadata: List[Dict[str, Any]] = []
-        
+        self.initial_capacity = max(1, initial_capacity)
+        self._buffer: Optional[np.ndarray] = None
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """Normalized vectors, one row per id (a view of the buffer)."""
+        if self._buffer is None:
+            return None
+        return self._buffer[:self._count]
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._buffer is None else len(self._buffer)
+
+    def _reserve(self, rows: int, dimension: int) -> None:
+        """Make room for rows vectors; a memory-mapped buffer is copied into RAM first."""
+        if self._buffer is None:
+            self._buffer = np.empty((max(self.initial_capacity, rows), dimension), dtype=np.float32)
+            return
+        if self._buffer.shape[1] != dimension:
+            raise ValueError(f"Expected {self._buffer.shape[1]}-d vectors, got {dimension}-d")
+        if rows <= len(self._buffer) and self._buffer.flags.writeable:
+            return
+        capacity = max(rows, 2 * len(self._buffer)) if rows > len(self._buffer) else len(self._buffer)
+        grown = np.empty((capacity, dimension), dtype=np.float32)
+        grown[:self._count] = self._buffer[:self._count]
+        self._buffer = grown
+
     def add(self, id: str, embedding: List[float], metadata: Dict[str, Any] = None):
         """
         Add a vector to the store.
-        
+
         Args:
             id: Unique identifier for the item (e.g., file path)
             embedding: Vector embedding (list of floats)
             metadata: Associated metadata dictionary
         """
-        if metadata is None:
-            metadata = {}
-            
-        self.ids.append(id)
-        self.metadata.append(metadata)
-        
-        # Convert to numpy array and normalize immediately for faster search later
-        # (Normalization makes cosine similarity equivalent to dot product)
-        vector = np.array(embedding, dtype=np.float32)
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = vector / norm
-            
-        if self.embeddings is None:
-            self.embeddings = np.array([vector], dtype=np.float32)
-        else:
-            self.embeddings = np.vstack([self.embeddings, vector])
-            
+        self.add_batch([id], [embedding], [metadata or {}])
+
+    def add_batch(self, ids: List[str], embeddings, metadata_list: List[Dict[str, Any]] = None):
+        """
+        Add many vectors with one copy into the buffer.
+
+        Args:
+            ids: Unique identifiers, one per vector
+            embeddings: Sequence of vectors or a 2-D array
+            metadata_list: Metadata dictionaries, one per vector
+        """
+        if metadata_list is None:
+            metadata_list = [{} for _ in ids]
+        if len(ids) != len(metadata_list):
+            raise ValueError("ids and metadata_list must have the same length")
+        if not ids:
+            return
+
+        # Normalize on the way in so cosine similarity is a dot product at search time
+        vectors = np.array(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+        self._reserve(self._count + len(ids), vectors.shape[1])
+        self._buffer[self._count:self._count + len(ids)] = vectors
+        self._count += len(ids)
+        self.ids.extend(ids)
+        self.metadata.extend(metadata_list)
+
     def search(self, query_embedding: List[float], limit: int = 10) -> List[Dict[str, Any]]:
         """
         Search for similar vectors.
-        
+
         Args:
             query_embedding: Query vector
             limit: Maximum number of results
-            
+
         Returns:
             List of results with keys: id, score, metadata
         """
-        if self.embeddings is None or len(self.embeddings) == 0:
+        embeddings = self.embeddings
+        if embeddings is None or self._count == 0 or limit <= 0:
             return []
-            
+
         # Prepare query vector
         query = np.array(query_embedding, dtype=np.float32)
         norm = np.linalg.norm(query)
         if norm > 0:
             query = query / norm
-            
+
         # Compute cosine similarity (dot product of normalized vectors)
-        scores = np.dot(self.embeddings, query)
-        
-        # Get top k indices
-        # argsort returns lowest to highest, so we take last 'limit' and reverse
-        top_k_indices = np.argsort(scores)[-limit:][::-1]
-        
+        scores = embeddings @ query
+
+        # Partition out the top k, then order only those
+        k = min(limit, self._count)
+        top_k_indices = np.argpartition(-scores, k - 1)[:k]
+        top_k_indices = top_k_indices[np.argsort(-scores[top_k_indices], kind="stable")]
+
         results = []
         for idx in top_k_indices:
             results.append({
@@ -80,39 +140,102 @@ class VectorStore:
                 'score': float(scores[idx]),
                 'metadata': self.metadata[idx]
             })
-            
+
         return results
-        
+
+    @staticmethod
+    def _sidecar_path(path) -> Path:
+        return Path(path).with_suffix(".json")
+
     def save(self, path: str):
-        """Save index to disk."""
-        data = {
-            'ids': self.ids,
-            'embeddings': self.embeddings,
-            'metadata': self.metadata
-        }
+        """
+        Save index to disk.
+
+        Writes <stem>.<generation>.npy with the vectors, then atomically
+        replaces <stem>.json (ids, metadata and the vectors file name).
+        The sidecar is the commit point: a crash mid-save leaves the
+        previous snapshot intact. Metadata must be JSON-serializable.
+        """
+        sidecar = self._sidecar_path(path)
+        embeddings = self.embeddings
+        if embeddings is None:
+            embeddings = np.empty((0, 0), dtype=np.float32)
+        vectors_path = sidecar.with_name(f"{sidecar.stem}.{uuid.uuid4().hex[:12]}.npy")
+        tmp = sidecar.with_name(sidecar.name + ".tmp")
         try:
-            with open(path, 'wb') as f:
-                pickle.dump(data, f)
-            logger.info(f"Vector store saved to {path} ({len(self.ids)} items)")
+            with open(vectors_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(embeddings))
+            with open(tmp, "w") as f:
+                json.dump({
+                    "version": _FORMAT_VERSION,
+                    "vectors": vectors_path.name,
+                    "count": self._count,
+                    "ids": self.ids,
+                    "metadata": self.metadata,
+                }, f)
+            os.replace(tmp, sidecar)
         except Exception as e:
             logger.error(f"Failed to save vector store: {e}")
+            for leftover in (vectors_path, tmp):
+                leftover.unlink(missing_ok=True)
             raise
-            
-    def load(self, path: str):
-        """Load index from disk."""
-        path_obj = Path(path)
-        if not path_obj.exists():
+
+        # Drop vectors files of earlier snapshots and interrupted saves.
+        # An open memory map keeps its pages after the unlink.
+        pattern = re.compile(re.escape(sidecar.stem) + r"\.[0-9a-f]{12}\.npy")
+        for old in sidecar.parent.glob(f"{sidecar.stem}.*.npy"):
+            if old != vectors_path and pattern.fullmatch(old.name):
+                old.unlink(missing_ok=True)
+        logger.info(f"Vector store saved to {sidecar} ({self._count} items)")
+
+    def load(self, path: str, mmap: bool = True):
+        """
+        Load index from disk.
+
+        Args:
+            path: Path given to save(); a legacy pickle at this path also loads
+            mmap: Memory-map the vectors instead of reading them into RAM.
+                The first add() after loading copies them into a writable buffer.
+        """
+        sidecar = self._sidecar_path(path)
+        if not sidecar.exists():
+            self._load_pickle(Path(path))
+            return
+
+        try:
+            with open(sidecar) as f:
+                data = json.load(f)
+            if data.get("version") != _FORMAT_VERSION:
+                raise ValueError(f"Unsupported vector store version {data.get('version')}")
+            vectors = np.load(sidecar.with_name(data["vectors"]), mmap_mode="r" if mmap else None)
+            if len(vectors) != data["count"] or len(data["ids"]) != data["count"]:
+                raise ValueError(f"{sidecar} lists {len(data['ids'])} ids for {len(vectors)} vectors")
+        except Exception as e:
+            logger.error(f"Failed to load vector store: {e}")
+            raise
+
+        self.ids = data["ids"]
+        self.metadata = data["metadata"]
+        self._buffer = vectors if len(vectors) else None
+        self._count = len(vectors)
+        logger.info(f"Vector store loaded from {sidecar} ({self._count} items)")
+
+    def _load_pickle(self, path: Path):
+        """Load the pickle format written before the .npy snapshots."""
+        if not path.exists():
             logger.warning(f"Vector store not found at {path}, starting empty.")
             return
 
         try:
             with open(path, 'rb') as f:
                 data = pickle.load(f)
-            
-            self.ids = data['ids']
-            self.embeddings = data['embeddings']
-            self.metadata = data['metadata']
-            logger.info(f"Vector store loaded from {path} ({len(self.ids)} items)")
         except Exception as e:
             logger.error(f"Failed to load vector store: {e}")
             raise
+
+        embeddings = data['embeddings']
+        self.ids = data['ids']
+        self.metadata = data['metadata']
+        self._buffer = None if embeddings is None else np.asarray(embeddings, dtype=np.float32)
+        self._count = 0 if embeddings is None else len(embeddings)
+        logger.info(f"Vector store loaded from {path} ({len(self.ids)} items)")
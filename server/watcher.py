@@ -4,8 +4,14 @@ from typing import Any, Callable, Optional
 
 logger = logging.getLogger(__name__)
 
-def start_watcher(path: str, callback: Callable[[str], None]) -> Optional[Any]:
-    """Start monitoring a directory for new files in a background thread."""
+def start_watcher(path: str, callback: Callable[[str], None],
+                  on_move: Optional[Callable[[str, str, bool], None]] = None) -> Optional[Any]:
+    """
+    Start monitoring a directory for new files in a background thread.
+
+    on_move(src, dest, is_directory) runs for renames and moves before the
+    moved file is passed to callback.
+    """
     try:
         from watchdog.observers import Observer
         from watchdog.events import FileSystemEventHandler
@@ -16,8 +22,9 @@ def start_watcher(path: str, callback: Callable[[str], None]) -> Optional[Any]:
     class PhotoEventHandler(FileSystemEventHandler):
         """Handle file system events for photos."""
 
-        def __init__(self, cb: Callable[[str], None]):
+        def __init__(self, cb: Callable[[str], None], move_cb: Optional[Callable[[str, str, bool], None]]):
             self.callback = cb
+            self.move_callback = move_cb
 
         def on_created(self, event):
             if not event.is_directory:
@@ -27,12 +34,17 @@ def start_watcher(path: str, callback: Callable[[str], None]) -> Optional[Any]:
                 self.callback(event.src_path)
 
         def on_moved(self, event):
+            if self.move_callback:
+                try:
+                    self.move_callback(event.src_path, event.dest_path, event.is_directory)
+                except Exception as e:
+                    logger.error(f"Watcher: move handling failed for {event.src_path}: {e}")
             if not event.is_directory:
                 logger.info(f"Watcher: File moved: {event.src_path} -> {event.dest_path}")
                 self.callback(event.dest_path)
 
     try:
-        event_handler = PhotoEventHandler(callback)
+        event_handler = PhotoEventHandler(callback, on_move)
         observer = Observer()
         observer.schedule(event_handler, path, recursive=True)
         observer.start()
@@ -9,69 +9,214 @@ import asyncio
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import hashlib
+import heapq
+import itertools
 import json
+import pickle
 from collections import OrderedDict
+import sys
 import time
 import threading
+import zlib
+
+# Defaults for CacheManager's per-namespace memory budgets (bytes)
+DEFAULT_MEMORY_BUDGETS = {
+    'thumbnail': 64 * 1024 * 1024,
+    'search': 32 * 1024 * 1024,
+    'metadata': 16 * 1024 * 1024,
+    'embeddings': 32 * 1024 * 1024,
+}
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory footprint of a cached value in bytes.
+    
+    Byte strings and arrays count their payload; containers are walked
+    recursively so a 1,000-item result list weighs what it actually holds.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    nbytes = getattr(value, 'nbytes', None)  # numpy arrays
+    if isinstance(nbytes, int):
+        return nbytes
+    
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at', 'compressed')
+    
+    def __init__(self, value: Any, size: int, expires_at: float, compressed: bool):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.compressed = compressed
+
 
 class LRUCache:
-    """Simple LRU Cache implementation with thread safety"""
+    """
+    Thread-safe LRU cache bounded by entry count and by bytes.
+    
+    Expiry is lazy: a min-heap of deadlines is popped on access, so inserts
+    stay O(log n) instead of sweeping every key.
+    """
     
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    def __init__(self, max_size: int = 1000, ttl: int = 3600,
+                 max_bytes: Optional[int] = None, compress_threshold: Optional[int] = None):
         """
         Initialize LRU cache with max size and TTL.
         
         Args:
             max_size: Maximum number of items to store
             ttl: Time-to-live in seconds
+            max_bytes: Memory budget in bytes (None for no byte limit)
+            compress_threshold: Values at least this large (estimated bytes)
+                are stored zlib-compressed when that saves space (None disables)
         """
         self.max_size = max_size
         self.ttl = ttl
-        self.cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self.max_bytes = max_bytes
+        self.compress_threshold = compress_threshold
+        self.cache: OrderedDict[str, _CacheEntry] = OrderedDict()
         self.lock = threading.RLock()
+        
+        # (expires_at, seq, key); stale items are skipped when popped
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+        self.bytes_saved = 0
     
-    def _is_expired(self, timestamp: float) -> bool:
+    def _is_expired(self, entry: _CacheEntry, now: Optional[float] = None) -> bool:
         """Check if a cached item has expired."""
-        return time.time() - timestamp > self.ttl
+        return (now or time.time()) >= entry.expires_at
+    
+    def _remove(self, key: str) -> None:
+        entry = self.cache.pop(key)
+        self.current_bytes -= entry.size
+    
+    def purge_expired(self) -> int:
+        """Drop entries whose TTL has passed. Returns number removed."""
+        with self.lock:
+            now = time.time()
+            removed = 0
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                expires_at, _, key = heapq.heappop(heap)
+                entry = self.cache.get(key)
+                # Skip heap items left behind by overwrites or deletes
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove(key)
+                    removed += 1
+            self.expirations += removed
+            
+            # Rebuild when stale items dominate so the heap stays O(entries)
+            if len(heap) > 2 * len(self.cache) + 64:
+                self._expiry_heap = [(e.expires_at, next(self._seq), k) for k, e in self.cache.items()]
+                heapq.heapify(self._expiry_heap)
+            return removed
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if it exists and hasn't expired."""
         with self.lock:
-            if key not in self.cache:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
                 return None
                 
-            item = self.cache[key]
-            if self._is_expired(item['timestamp']):
-                del self.cache[key]
+            if self._is_expired(entry):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
                 return None
                 
             # Move to end (most recently used)
             self.cache.move_to_end(key)
-            return item['value']
+            self.hits += 1
+            value = entry.value
+            compressed = entry.compressed
+        
+        if compressed:
+            return pickle.loads(zlib.decompress(value))
+        return value
     
-    def set(self, key: str, value: Any) -> None:
-        """Set value in cache, evicting LRU item if needed."""
+    def _maybe_compress(self, value: Any, size: int) -> Tuple[Any, int, bool]:
+        if self.compress_threshold is None or size < self.compress_threshold:
+            return value, size, False
+        try:
+            packed = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        except Exception:
+            return value, size, False
+        if len(packed) >= size * 0.9:
+            return value, size, False
+        return packed, len(packed), True
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """
+        Set value in cache, evicting LRU items while over count or byte budget.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Per-entry TTL in seconds (defaults to the cache TTL)
+        """
+        raw_size = estimate_size(value)
+        stored, size, compressed = self._maybe_compress(value, raw_size)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        
         with self.lock:
-            # Clean up expired items periodically
-            if len(self.cache) > self.max_size * 0.9:  # Clean when 90% full
-                for k in list(self.cache.keys()):
-                    if self._is_expired(self.cache[k]['timestamp']):
-                        del self.cache[k]
+            self.purge_expired()
             
-            # Evict LRU if at max size
-            if len(self.cache) >= self.max_size:
-                self.cache.popitem(last=False)
-                
-            self.cache[key] = {
-                'value': value,
-                'timestamp': time.time()
-            }
+            if key in self.cache:
+                self._remove(key)
+            
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Never let one oversized value flush the whole cache
+                self.rejections += 1
+                return
+            
+            # Evict LRU until the new entry fits
+            while self.cache and (
+                len(self.cache) >= self.max_size
+                or (self.max_bytes is not None and self.current_bytes + size > self.max_bytes)
+            ):
+                _, evicted = self.cache.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+            
+            self.cache[key] = _CacheEntry(stored, size, expires_at, compressed)
+            self.current_bytes += size
+            if compressed:
+                self.bytes_saved += raw_size - size
+            heapq.heappush(self._expiry_heap, (expires_at, next(self._seq), key))
     
     def delete(self, key: str) -> bool:
         """Delete a key from cache."""
         with self.lock:
             if key in self.cache:
-                del self.cache[key]
+                self._remove(key)
                 return True
             return False
     
@@ -79,23 +224,79 @@ class LRUCache:
         """Clear all items from cache."""
         with self.lock:
             self.cache.clear()
+            self._expiry_heap = []
+            self.current_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return size, budget and hit/miss/eviction counters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.cache),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejections': self.rejections,
+                'compressed_entries': sum(1 for e in self.cache.values() if e.compressed),
+                'bytes_saved_by_compression': self.bytes_saved,
+            }
+
+
+class LibraryVersion:
+    """
+    Monotonic counter bumped whenever searchable library state changes.
+    
+    Cached search rankings are keyed on the version they were computed at,
+    so a bump (metadata write, tag change, favorite toggle, vector insert)
+    invalidates them without scanning the cache.
+    """
+    
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def value(self) -> int:
+        return self._value
+    
+    def bump(self) -> int:
+        """Advance the version and return the new value."""
+        with self._lock:
+            self._value += 1
+            return self._value
 
 
 class CacheManager:
     """Manages multiple caching strategies for performance optimization."""
     
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    def __init__(self, max_size: int = 1000, ttl: int = 3600,
+                 memory_budgets: Optional[Dict[str, int]] = None,
+                 compress_threshold: int = 64 * 1024):
         """
         Initialize the cache manager.
         
         Args:
             max_size: Maximum size per cache (for each type of data)
             ttl: Default TTL for cached items (in seconds)
+            memory_budgets: Byte budget per namespace ('thumbnail', 'search',
+                'metadata', 'embeddings'); missing keys use DEFAULT_MEMORY_BUDGETS
+            compress_threshold: Compress search/metadata values at least this
+                many bytes (thumbnails are already-compressed images)
         """
-        self.thumbnail_cache = LRUCache(max_size=max_size, ttl=ttl)
-        self.search_results_cache = LRUCache(max_size=max_size, ttl=ttl)
-        self.metadata_cache = LRUCache(max_size=max_size, ttl=ttl)
-        self.embeddings_cache = LRUCache(max_size=max_size, ttl=ttl*24)  # Keep embeddings longer
+        budgets = {**DEFAULT_MEMORY_BUDGETS, **(memory_budgets or {})}
+        self.thumbnail_cache = LRUCache(max_size=max_size, ttl=ttl, max_bytes=budgets['thumbnail'])
+        self.search_results_cache = LRUCache(max_size=max_size, ttl=ttl, max_bytes=budgets['search'],
+                                             compress_threshold=compress_threshold)
+        self.metadata_cache = LRUCache(max_size=max_size, ttl=ttl, max_bytes=budgets['metadata'],
+                                       compress_threshold=compress_threshold)
+        self.embeddings_cache = LRUCache(max_size=max_size, ttl=ttl*24,  # Keep embeddings longer
+                                         max_bytes=budgets['embeddings'])
         
         # Background cleanup will clean expired items periodically
         self._cleanup_interval = 300  # 5 minutes
@@ -124,11 +325,18 @@ class CacheManager:
             time.sleep(self._cleanup_interval)
             self._cleanup_expired()
     
-    def _cleanup_expired(self):
+    def _caches(self) -> Dict[str, LRUCache]:
+        return {
+            'thumbnail_cache': self.thumbnail_cache,
+            'search_results_cache': self.search_results_cache,
+            'metadata_cache': self.metadata_cache,
+            'embeddings_cache': self.embeddings_cache,
+        }
+    
+    def _cleanup_expired(self) -> int:
         """Clean expired items from all caches."""
-        # This would clean expired items, but we already do it in get/set
-        # This function exists as a periodic cleanup for additional safety
-        pass
+        # Access paths purge lazily; this reclaims memory in idle caches
+        return sum(cache.purge_expired() for cache in self._caches().values())
     
     def generate_key(self, prefix: str, *args) -> str:
         """
@@ -172,7 +380,7 @@ class CacheManager:
         return self.thumbnail_cache.get(key)
     
     # Search results caching
-    def cache_search_results(self, query: str, filters: Dict[str, Any], results: List[Dict[str, Any]], ttl: int = 600) -> None:
+    def cache_search_results(self, query: str, filters: Dict[str, Any], results: Any, ttl: int = 600) -> None:
         """
         Cache search results.
         
@@ -182,16 +390,10 @@ class CacheManager:
             results: Search results to cache
             ttl: Time-to-live for the cached results
         """
-        # Use a custom TTL for search results cache
-        original_ttl = self.search_results_cache.ttl
-        try:
-            self.search_results_cache.ttl = ttl
-            key = self.generate_key('search', query, json.dumps(filters, sort_keys=True))
-            self.search_results_cache.set(key, results)
-        finally:
-            self.search_results_cache.ttl = original_ttl
+        key = self.generate_key('search', query, json.dumps(filters, sort_keys=True))
+        self.search_results_cache.set(key, results, ttl=ttl)
     
-    def get_cached_search_results(self, query: str, filters: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    def get_cached_search_results(self, query: str, filters: Dict[str, Any]) -> Optional[Any]:
         """
         Get cached search results.
         
@@ -256,35 +458,34 @@ class CacheManager:
         return self.embeddings_cache.get(key)
     
     # Cache stats
-    def get_stats(self) -> Dict[str, Dict[str, int]]:
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
         """
         Get statistics about all caches.
         
         Returns:
-            Dictionary with stats for each cache type
+            Dictionary with stats (entries, bytes, budget, hits, misses,
+            evictions) for each cache type
         """
-        return {
-            'thumbnail_cache': {
-                'size': len(self.thumbnail_cache.cache),
-                'max_size': self.thumbnail_cache.max_size,
-                'ttl': self.thumbnail_cache.ttl
-            },
-            'search_results_cache': {
-                'size': len(self.search_results_cache.cache),
-                'max_size': self.search_results_cache.max_size,
-                'ttl': self.search_results_cache.ttl
-            },
-            'metadata_cache': {
-                'size': len(self.metadata_cache.cache),
-                'max_size': self.metadata_cache.max_size,
-                'ttl': self.metadata_cache.ttl
-            },
-            'embeddings_cache': {
-                'size': len(self.embeddings_cache.cache),
-                'max_size': self.embeddings_cache.max_size,
-                'ttl': self.embeddings_cache.ttl
-            }
+        return {name: cache.stats() for name, cache in self._caches().items()}
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-cache stats plus totals across all caches."""
+        per_cache = self.get_stats()
+        totals = {
+            key: sum(s[key] for s in per_cache.values())
+            for key in ('size', 'bytes', 'hits', 'misses', 'evictions', 'expirations')
         }
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / lookups, 4) if lookups else 0.0
+        return {'caches': per_cache, 'totals': totals}
+    
+    def clear(self) -> None:
+        """Clear all caches."""
+        self.clear_cache()
+    
+    def cleanup(self) -> int:
+        """Remove expired entries from all caches. Returns number removed."""
+        return self._cleanup_expired()
     
     def clear_cache(self, cache_type: Optional[str] = None) -> None:
         """
@@ -303,6 +504,9 @@ class CacheManager:
             self.embeddings_cache.clear()
 
 
+# Global library version used to invalidate cached search rankings
+library_version = LibraryVersion()
+
 # Global cache manager instance
 cache_manager = CacheManager(max_size=2000, ttl=1800)  # 2000 items, 30 min default TTL
 
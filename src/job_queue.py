@@ -12,8 +12,12 @@ This module provides a robust job queue system with:
 Features:
 - SQLite-backed persistent job storage
 - Thread-based background execution
+- Event-driven dispatch: workers wake on add_job instead of polling
+- Atomic job claiming (no job runs on two workers)
+- Per-job-type execution lanes (thread or process pools) so CPU-bound
+  handlers run on separate cores instead of contending for the GIL
 - Job prioritization (high, medium, low)
-- Automatic retry for failed jobs
+- Automatic retry for failed jobs with scheduled (non-blocking) backoff
 - Progress tracking and status updates
 - Result caching and retrieval
 
@@ -33,6 +37,10 @@ Usage:
     # Start processing queue
     job_queue.start_workers()
     
+    # Run CPU-bound job types in their own process pool
+    job_queue.register_lane("cpu", kind="process", max_workers=2)
+    job_queue.register_handler("dedupe", dedupe_handler, lane="cpu")
+    
     # Stop processing
     job_queue.stop_workers()
 """
@@ -43,6 +51,9 @@ import threading
 import queue
 import time
 import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, List, Optional, Any, Callable
 from enum import Enum
 from datetime import datetime, timedelta
@@ -61,6 +72,47 @@ class JobPriority(Enum):
     MEDIUM = "medium"
     LOW = "low"
 
+class LaneKind(Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+DEFAULT_LANE = "default"
+
+class ExecutionLane:
+    """A named pool of workers that runs the job types assigned to it."""
+    
+    def __init__(self, name: str, kind: LaneKind = LaneKind.THREAD, max_workers: int = 1):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+# Progress queue of the current process-lane child (set by the pool initializer)
+_lane_progress_queue: Any = None
+
+def _init_lane_process(progress_queue):
+    """Process-pool initializer: remember where to send progress updates."""
+    global _lane_progress_queue
+    _lane_progress_queue = progress_queue
+
+def _run_handler_in_process(handler: Callable[..., Any], job: "Job"):
+    """
+    Run a handler inside a process-lane child.
+    
+    update_callback calls are forwarded to the parent over the progress
+    queue; a final sentinel tells the parent that no more updates follow.
+    """
+    def update_callback(status=None, progress=None, message=None, result=None, error=None):
+        _lane_progress_queue.put((job.id, {
+            'status': status, 'progress': progress, 'message': message,
+            'result': result, 'error': error
+        }))
+    
+    try:
+        return handler(job, update_callback)
+    finally:
+        _lane_progress_queue.put((job.id, None))
+
 class Job:
     def __init__(
         self,
@@ -83,6 +135,7 @@ class Job:
         self.max_retries = max_retries
         self.retry_count = 0
         self.timeout = timeout
+        self.run_after: Optional[float] = None  # Epoch seconds before which the job is not claimed
         self.created_at = datetime.now().isoformat()
         self.updated_at = datetime.now().isoformat()
         self.started_at = None
@@ -103,6 +156,7 @@ class Job:
             'max_retries': self.max_retries,
             'retry_count': self.retry_count,
             'timeout': self.timeout,
+            'run_after': self.run_after,
             'created_at': self.created_at,
             'updated_at': self.updated_at,
             'started_at': self.started_at,
@@ -142,6 +196,7 @@ class Job:
         job.result = json.loads(data['result']) if data['result'] else None
         job.error = data['error']
         job.retry_count = data['retry_count']
+        job.run_after = data.get('run_after')
         job.created_at = data['created_at']
         job.updated_at = data['updated_at']
         job.started_at = data['started_at']
@@ -149,37 +204,100 @@ class Job:
         
         return job
 
+# Ordering shared by listing and claiming: priority first, then FIFO
+_PRIORITY_ORDER = """
+    CASE priority
+        WHEN 'high' THEN 1
+        WHEN 'medium' THEN 2
+        WHEN 'low' THEN 3
+        ELSE 4
+    END,
+    created_at ASC
+"""
+
+# UPDATE ... RETURNING needs SQLite 3.35+
+_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
 class JobQueue:
     """Persistent job queue with background processing."""
     
-    def __init__(self, db_path: str = "job_queue.db", num_workers: int = 2):
+    def __init__(self, db_path: str = "job_queue.db", num_workers: int = 2,
+                 idle_poll_interval: float = 5.0):
         """
         Initialize job queue.
         
         Args:
             db_path: Path to SQLite database
             num_workers: Number of background worker threads
+            idle_poll_interval: Upper bound on how long an idle worker sleeps
+                before re-checking the database (catches jobs inserted by
+                other processes); in-process add_job wakes workers immediately
         """
         self.db_path = db_path
         self.num_workers = num_workers
+        self.idle_poll_interval = idle_poll_interval
         self.conn: Optional[sqlite3.Connection] = None
         self.workers: List[threading.Thread] = []
         self.running = False
         self.job_handlers: Dict[str, Callable[..., Any]] = {}
+        
+        # Execution lanes; job types not assigned to a lane run on the
+        # default lane's num_workers threads
+        self.lanes: Dict[str, ExecutionLane] = {
+            DEFAULT_LANE: ExecutionLane(DEFAULT_LANE, LaneKind.THREAD, num_workers)
+        }
+        self.job_lanes: Dict[str, str] = {}
+        self._progress_queue: Any = None
+        self._progress_thread: Optional[threading.Thread] = None
+        self._progress_done: Dict[str, threading.Event] = {}
+        self._progress_lock = threading.Lock()
+        
+        # One SQLite connection per thread; all are closed in close()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # Signalled whenever a job becomes claimable; the generation counter
+        # prevents lost wake-ups between a failed claim and the wait
+        self._work_available = threading.Condition()
+        self._work_generation = 0
+        
         self._initialize_database()
 
     def _get_conn(self) -> sqlite3.Connection:
-        """Return a non-Optional SQLite connection, initializing if needed."""
-        if self.conn is None:
-            self._initialize_database()
-        if self.conn is None:
-            raise RuntimeError("JobQueue database connection could not be initialized")
-        return self.conn
+        """Return this thread's SQLite connection, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+        return conn
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open and register a connection configured for concurrent access.
+        
+        Each connection is only used by the thread that opened it;
+        check_same_thread is relaxed so close() can release them all.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+    
+    def _notify_workers(self):
+        """Wake idle workers because a job may have become claimable."""
+        with self._work_available:
+            self._work_generation += 1
+            self._work_available.notify_all()
     
     def _initialize_database(self):
         """Initialize database and create tables."""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
+        conn = self._get_conn()
+        self.conn = conn
         
         # Create jobs table
         conn.execute("""
@@ -203,23 +321,50 @@ class JobQueue:
             )
         """)
         
+        # Lightweight migration: delayed-retry schedule column
+        cols = [row[1] for row in conn.execute("PRAGMA table_info(jobs)").fetchall()]
+        if "run_after" not in cols:
+            conn.execute("ALTER TABLE jobs ADD COLUMN run_after REAL")
+        
         # Create job index for faster lookups
         conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_priority ON jobs(priority)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_type ON jobs(type)")
-
-        conn.commit()
-        self.conn = conn
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs(status, run_after)")
+    
+    def register_lane(self, name: str, kind: str = "thread", max_workers: int = 1):
+        """
+        Register an execution lane with its own concurrency limit.
+        
+        Thread lanes suit I/O-bound handlers. Process lanes run handlers in a
+        spawn-based process pool, so CPU-bound work (hashing, face detection,
+        OCR, embeddings) runs in parallel; their handlers must be picklable
+        module-level functions and return JSON-serializable results.
+        
+        Args:
+            name: Lane name
+            kind: "thread" or "process"
+            max_workers: Maximum number of jobs the lane runs concurrently
+        """
+        if self.running:
+            raise RuntimeError("Lanes must be registered before start_workers()")
+        lane_kind = LaneKind(kind.lower()) if isinstance(kind, str) else kind
+        self.lanes[name] = ExecutionLane(name, lane_kind, max_workers)
     
-    def register_handler(self, job_type: str, handler: Callable[..., Any]):
+    def register_handler(self, job_type: str, handler: Callable[..., Any], lane: Optional[str] = None):
         """
         Register a handler function for a specific job type.
         
         Args:
             job_type: Type of job
             handler: Function that takes (job, update_callback) and returns result
+            lane: Execution lane for this job type (defaults to the default lane)
         """
+        lane = lane or DEFAULT_LANE
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown execution lane: {lane}")
         self.job_handlers[job_type] = handler
+        self.job_lanes[job_type] = lane
     
     def add_job(
         self,
@@ -280,9 +425,9 @@ class JobQueue:
             job.timeout
         ))
         
-        conn.commit()
         
-        # If workers are running, the job will be picked up automatically
+        # Wake an idle worker; the job is claimed without waiting for a poll
+        self._notify_workers()
         return job_id
     
     def get_job(self, job_id: str) -> Optional[Job]:
@@ -348,16 +493,7 @@ class JobQueue:
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
         
-        query += (
-            " ORDER BY "
-            "CASE priority "
-            "WHEN 'high' THEN 1 "
-            "WHEN 'medium' THEN 2 "
-            "WHEN 'low' THEN 3 "
-            "ELSE 4 "
-            "END, "
-            "created_at ASC"
-        )
+        query += " ORDER BY " + _PRIORITY_ORDER
         
         query += " LIMIT ? OFFSET ?"
         params.extend([limit, offset])
@@ -374,7 +510,9 @@ class JobQueue:
         progress: Optional[int] = None,
         message: Optional[str] = None,
         result: Optional[Dict[str, Any]] = None,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        retry_count: Optional[int] = None,
+        run_after: Optional[float] = None
     ) -> bool:
         """
         Update job status and progress.
@@ -386,6 +524,8 @@ class JobQueue:
             message: Status message
             result: Job result data
             error: Error message
+            retry_count: Updated retry count
+            run_after: Epoch seconds before which the job may not be claimed
             
         Returns:
             True if updated, False if job not found
@@ -422,6 +562,12 @@ class JobQueue:
         if error:
             job_data['error'] = error
         
+        if retry_count is not None:
+            job_data['retry_count'] = retry_count
+        
+        if run_after is not None:
+            job_data['run_after'] = run_after
+        
         job_data['updated_at'] = datetime.now().isoformat()
         
         # Update in database
@@ -432,6 +578,8 @@ class JobQueue:
                 message = ?,
                 result = ?,
                 error = ?,
+                retry_count = ?,
+                run_after = ?,
                 updated_at = ?,
                 started_at = ?,
                 completed_at = ?
@@ -442,15 +590,100 @@ class JobQueue:
             job_data['message'],
             job_data['result'],
             job_data['error'],
+            job_data['retry_count'],
+            job_data['run_after'],
             job_data['updated_at'],
             job_data['started_at'],
             job_data['completed_at'],
             job_id
         ))
         
-        conn.commit()
         return True
     
+    def _lane_type_filter(self, lane: str):
+        """Return the SQL clause and params restricting claims to a lane's job types."""
+        if lane == DEFAULT_LANE:
+            # Everything not routed elsewhere, including unregistered types
+            types = [t for t, l in self.job_lanes.items() if l != DEFAULT_LANE]
+            if not types:
+                return "", []
+            return f" AND type NOT IN ({','.join('?' * len(types))})", types
+        
+        types = [t for t, l in self.job_lanes.items() if l == lane]
+        if not types:
+            return " AND 0", []
+        return f" AND type IN ({','.join('?' * len(types))})", types
+    
+    def _claim_next_job(self, lane: str = DEFAULT_LANE) -> Optional[Job]:
+        """
+        Atomically claim the highest-priority runnable job.
+        
+        Pending jobs and retries whose backoff has elapsed are eligible. The
+        select-and-mark happens in one write transaction, so concurrent
+        workers (threads or processes) can never claim the same job.
+        
+        Args:
+            lane: Only claim job types assigned to this execution lane
+        
+        Returns:
+            The claimed job (already marked processing) or None
+        """
+        conn = self._get_conn()
+        now = time.time()
+        now_iso = datetime.now().isoformat()
+        type_clause, type_params = self._lane_type_filter(lane)
+        runnable = """
+            SELECT id FROM jobs
+            WHERE status IN ('pending', 'retrying')
+              AND (run_after IS NULL OR run_after <= ?)""" + type_clause + """
+            ORDER BY """ + _PRIORITY_ORDER + """
+            LIMIT 1
+        """
+        claim = """
+            UPDATE jobs SET
+                status = 'processing',
+                progress = 0,
+                message = 'Job picked up by worker',
+                started_at = ?,
+                updated_at = ?
+            WHERE id = ({runnable}) AND status IN ('pending', 'retrying')
+        """.format(runnable=runnable)
+        
+        if _SUPPORTS_RETURNING:
+            row = conn.execute(claim + " RETURNING *", (now_iso, now_iso, now, *type_params)).fetchone()
+            return Job.from_dict(dict(row)) if row else None
+        
+        # Guarded transaction: BEGIN IMMEDIATE takes the write lock up front
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(runnable, (now, *type_params)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', progress = 0, message = 'Job picked up by worker', "
+                "started_at = ?, updated_at = ? WHERE id = ?",
+                (now_iso, now_iso, row['id'])
+            )
+            claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return Job.from_dict(dict(claimed))
+    
+    def _seconds_until_next_retry(self, lane: str = DEFAULT_LANE) -> Optional[float]:
+        """Return seconds until the lane's earliest scheduled retry, if any."""
+        type_clause, type_params = self._lane_type_filter(lane)
+        row = self._get_conn().execute(
+            "SELECT MIN(run_after) AS next_run FROM jobs "
+            "WHERE status IN ('pending', 'retrying') AND run_after > ?" + type_clause,
+            (time.time(), *type_params)
+        ).fetchone()
+        if row is None or row['next_run'] is None:
+            return None
+        return max(0.0, row['next_run'] - time.time())
+    
     def _process_job(self, job: Job):
         """
         Process a single job.
@@ -469,16 +702,20 @@ class JobQueue:
             self.update_job_status(job.id, status, progress, message, result, error)
         
         try:
-            # Update status to processing
-            update_callback(status=JobStatus.PROCESSING.value, progress=0, message="Starting job")
+            # Claiming already marked the job as processing
+            update_callback(message="Starting job")
             
             # Get handler for this job type
             handler = self.job_handlers.get(job.type)
             if not handler:
                 raise ValueError(f"No handler registered for job type: {job.type}")
             
-            # Execute handler
-            result = handler(job, update_callback)
+            # Execute handler on its lane
+            lane = self.lanes[self.job_lanes.get(job.type, DEFAULT_LANE)]
+            if lane.kind == LaneKind.PROCESS:
+                result = self._run_in_process(lane, handler, job)
+            else:
+                result = handler(job, update_callback)
             
             # Update status to completed
             update_callback(
@@ -495,15 +732,19 @@ class JobQueue:
             # Check if we should retry
             if job.retry_count < job.max_retries:
                 job.retry_count += 1
-                update_callback(
+                
+                # Schedule the retry instead of sleeping, so this worker can
+                # take other jobs during the backoff window
+                delay = 2 ** job.retry_count  # Exponential backoff
+                self.update_job_status(
+                    job.id,
                     status=JobStatus.RETRYING.value,
-                    message=f"Job failed, retrying ({job.retry_count}/{job.max_retries}): {error_msg}",
-                    error=error_msg
+                    message=f"Job failed, retrying ({job.retry_count}/{job.max_retries}) in {delay}s: {error_msg}",
+                    error=error_msg,
+                    retry_count=job.retry_count,
+                    run_after=time.time() + delay
                 )
-                
-                # Re-add job to queue with delay
-                time.sleep(2 ** job.retry_count)  # Exponential backoff
-                self.update_job_status(job.id, status=JobStatus.PENDING.value)
+                self._notify_workers()
             else:
                 update_callback(
                     status=JobStatus.FAILED.value,
@@ -511,48 +752,109 @@ class JobQueue:
                     error=error_msg
                 )
     
-    def _worker_thread(self):
-        """Background worker thread that processes jobs."""
+    def _run_in_process(self, lane: ExecutionLane, handler: Callable[..., Any], job: Job) -> Any:
+        """
+        Run a handler in the lane's process pool and wait for its result.
+        
+        Progress updates sent by the child are applied by the progress thread;
+        this waits for the child's sentinel so no late update can overwrite
+        the final job status.
+        """
+        done = threading.Event()
+        with self._progress_lock:
+            self._progress_done[job.id] = done
+        
+        child_started = False
+        try:
+            executor = lane.executor
+            if executor is None:
+                raise RuntimeError(f"Execution lane '{lane.name}' is not running")
+            future = executor.submit(_run_handler_in_process, handler, job)
+            child_started = True
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                # A child died (e.g. a crash in a native library) and will
+                # send no sentinel; replace the pool and let the job retry
+                child_started = False
+                self._restart_lane_executor(lane, executor)
+                raise
+        finally:
+            if child_started:
+                done.wait(timeout=5)
+            with self._progress_lock:
+                self._progress_done.pop(job.id, None)
+    
+    def _create_lane_executor(self, lane: ExecutionLane) -> ProcessPoolExecutor:
+        """Create a spawn-based process pool for a lane."""
+        return ProcessPoolExecutor(
+            max_workers=lane.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_lane_process,
+            initargs=(self._progress_queue,)
+        )
+    
+    def _restart_lane_executor(self, lane: ExecutionLane, broken: ProcessPoolExecutor):
+        """Replace a broken lane pool (only once if several workers notice)."""
+        with self._progress_lock:
+            if lane.executor is broken and self.running:
+                broken.shutdown(wait=False)
+                lane.executor = self._create_lane_executor(lane)
+    
+    def _progress_thread_main(self):
+        """Apply progress updates forwarded from process-lane children."""
+        while True:
+            try:
+                item = self._progress_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not self.running:
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            
+            if item is None:
+                return
+            
+            job_id, update = item
+            if update is None:
+                with self._progress_lock:
+                    done = self._progress_done.get(job_id)
+                if done is not None:
+                    done.set()
+                continue
+            
+            try:
+                self.update_job_status(job_id, **update)
+            except Exception as e:
+                print(f"Progress update error for job {job_id}: {e}")
+    
+    def _worker_thread(self, lane: str = DEFAULT_LANE):
+        """Background worker thread that processes jobs for one lane."""
         while self.running:
             try:
-                # Get next job to process
-                conn = self._get_conn()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM jobs 
-                    WHERE status = 'pending' 
-                    ORDER BY 
-                        CASE priority 
-                            WHEN 'high' THEN 1
-                            WHEN 'medium' THEN 2
-                            WHEN 'low' THEN 3
-                            ELSE 4
-                        END,
-                        created_at ASC
-                    LIMIT 1
-                """)
-                row = cursor.fetchone()
+                with self._work_available:
+                    generation = self._work_generation
                 
-                if row:
-                    job = Job.from_dict(dict(row))
-                    
-                    # Mark as processing
-                    self.update_job_status(
-                        job.id,
-                        status=JobStatus.PROCESSING.value,
-                        progress=0,
-                        message="Job picked up by worker"
-                    )
-                    
-                    # Process the job
+                job = self._claim_next_job(lane)
+                if job:
                     self._process_job(job)
-                else:
-                    # No jobs available, wait a bit
-                    time.sleep(1)
+                    continue
+                
+                # Nothing runnable: sleep until notified, the next scheduled
+                # retry is due, or the idle poll interval elapses
+                timeout = self.idle_poll_interval
+                next_retry = self._seconds_until_next_retry(lane)
+                if next_retry is not None:
+                    timeout = min(timeout, next_retry)
+                
+                with self._work_available:
+                    if self.running and self._work_generation == generation:
+                        self._work_available.wait(timeout)
                     
             except Exception as e:
                 print(f"Worker error: {e}")
-                time.sleep(5)
+                time.sleep(1)
     
     def start_workers(self):
         """Start background worker threads."""
@@ -561,24 +863,55 @@ class JobQueue:
         
         self.running = True
         
-        for i in range(self.num_workers):
-            worker = threading.Thread(
-                target=self._worker_thread,
-                name=f"JobWorker-{i+1}",
+        process_lanes = [l for l in self.lanes.values() if l.kind == LaneKind.PROCESS]
+        if process_lanes:
+            self._progress_queue = multiprocessing.get_context("spawn").Queue()
+            self._progress_thread = threading.Thread(
+                target=self._progress_thread_main,
+                name="JobProgress",
                 daemon=True
             )
-            worker.start()
-            self.workers.append(worker)
+            self._progress_thread.start()
+            for lane in process_lanes:
+                lane.executor = self._create_lane_executor(lane)
+        
+        # One dispatcher thread per concurrent slot; process-lane dispatchers
+        # block on their child while it runs, capping the lane at max_workers
+        for lane in self.lanes.values():
+            count = self.num_workers if lane.name == DEFAULT_LANE else lane.max_workers
+            for i in range(count):
+                name = f"JobWorker-{i+1}" if lane.name == DEFAULT_LANE else f"JobWorker-{lane.name}-{i+1}"
+                worker = threading.Thread(
+                    target=self._worker_thread,
+                    args=(lane.name,),
+                    name=name,
+                    daemon=True
+                )
+                worker.start()
+                self.workers.append(worker)
         
-        print(f"Started {self.num_workers} job workers")
+        print(f"Started {len(self.workers)} job workers across {len(self.lanes)} lanes")
     
     def stop_workers(self):
         """Stop background worker threads."""
         self.running = False
+        self._notify_workers()
         
         for worker in self.workers:
             worker.join(timeout=5)
         
+        for lane in self.lanes.values():
+            if lane.executor is not None:
+                lane.executor.shutdown(wait=True)
+                lane.executor = None
+        
+        if self._progress_thread is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join(timeout=5)
+            self._progress_queue.close()
+            self._progress_thread = None
+            self._progress_queue = None
+        
         self.workers = []
         print("Stopped job workers")
     
@@ -645,6 +978,14 @@ class JobQueue:
             'recent_jobs': recent_jobs,
             'failed_jobs': failed_jobs,
             'workers_running': len(self.workers) if self.running else 0,
+            'lanes': {
+                name: {
+                    'kind': lane.kind.value,
+                    'max_workers': self.num_workers if name == DEFAULT_LANE else lane.max_workers,
+                    'job_types': sorted(t for t, l in self.job_lanes.items() if l == name)
+                }
+                for name, lane in self.lanes.items()
+            },
             'last_updated': datetime.now().isoformat()
         }
     
@@ -671,16 +1012,17 @@ class JobQueue:
         """, (cutoff_date,))
         
         deleted_count = cursor.rowcount
-        conn.commit()
         
         return deleted_count
     
     def close(self):
-        """Close database connection."""
+        """Close all database connections."""
         self.stop_workers()
-        conn = self.conn
-        if conn is not None:
-            conn.close()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
         self.conn = None
     
     def __enter__(self):
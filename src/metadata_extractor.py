@@ -34,8 +34,10 @@ import logging
 import mimetypes
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 import base64
+import io
+from contextlib import contextmanager
 
 # Image processing
 from PIL import Image
@@ -236,19 +238,30 @@ def _dms_to_decimal(dms: Sequence[float | int], ref: str) -> Optional[float]:
         return None
 
 
-def extract_exif_metadata(filepath: str) -> Optional[Dict[str, Dict[str, str]]]:
+@contextmanager
+def _open_binary(source: Union[str, BinaryIO]) -> Iterator[BinaryIO]:
+    """Open a path for reading, or rewind an already open binary stream."""
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+
+def extract_exif_metadata(filepath: Union[str, BinaryIO]) -> Optional[Dict[str, Dict[str, str]]]:
     """
     Extract ALL EXIF metadata including MakerNote.
     
     Args:
-        filepath: Path to image file
+        filepath: Path to image file (or an open binary stream)
         
     Returns:
         Dictionary with all EXIF data
     """
     try:
         # Use exifread for comprehensive EXIF extraction
-        with open(filepath, 'rb') as f:
+        with _open_binary(filepath) as f:
             tags = exifread.process_file(f, details=True)
         
         if not tags:
@@ -293,18 +306,18 @@ def extract_exif_metadata(filepath: str) -> Optional[Dict[str, Dict[str, str]]]:
         return None
 
 
-def extract_gps_metadata(filepath: str) -> Optional[Dict[str, Any]]:
+def extract_gps_metadata(filepath: Union[str, BinaryIO]) -> Optional[Dict[str, Any]]:
     """
     Extract GPS metadata from EXIF.
     
     Args:
-        filepath: Path to image file
+        filepath: Path to image file (or an open binary stream)
         
     Returns:
         Dictionary with GPS data
     """
     try:
-        with open(filepath, 'rb') as f:
+        with _open_binary(filepath) as f:
             tags = exifread.process_file(f, details=False)
         
         gps_data: Dict[str, Any] = {}
@@ -356,18 +369,18 @@ def extract_gps_metadata(filepath: str) -> Optional[Dict[str, Any]]:
         return None
 
 
-def extract_image_properties(filepath: str) -> Optional[Dict[str, Any]]:
+def extract_image_properties(filepath: Union[str, BinaryIO]) -> Optional[Dict[str, Any]]:
     """
     Extract image properties using Pillow.
     
     Args:
-        filepath: Path to image file
+        filepath: Path to image file (or an open binary stream)
         
     Returns:
         Dictionary with image properties
     """
     try:
-        with Image.open(filepath) as img:
+        with _open_binary(filepath) as f, Image.open(f) as img:
             return {
                 "width": img.width,
                 "height": img.height,
@@ -844,6 +857,93 @@ def extract_all_metadata(filepath: str) -> Dict[str, Any]:
     return metadata
 
 
+def extract_embedded_thumbnail(header: bytes) -> Optional[bytes]:
+    """
+    Embedded EXIF JPEG thumbnail from the leading bytes of an image.
+    
+    Args:
+        header: Leading bytes of the file (the EXIF block is near the start)
+        
+    Returns:
+        JPEG bytes of the thumbnail, or None if there is none
+    """
+    try:
+        tags = exifread.process_file(io.BytesIO(header), details=True)
+        thumbnail = tags.get('JPEGThumbnail')
+        return bytes(thumbnail) if thumbnail else None
+    except Exception as e:
+        logger.warning(f"Could not read embedded thumbnail: {e}")
+        return None
+
+
+def extract_header_metadata(path: str, header: bytes, size_bytes: Optional[int] = None,
+                            modified: Optional[str] = None, name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract metadata from the leading bytes of a file that is not on disk.
+    
+    EXIF, GPS and image dimensions live in the header of JPEG/TIFF/PNG
+    files, so a ranged read of a remote object is enough. Filesystem
+    fields come from the remote listing instead of stat().
+    
+    Args:
+        path: Path recorded for the file (e.g. a cloud source path)
+        header: Leading bytes of the file
+        size_bytes: Full size of the remote object
+        modified: Remote modification time (ISO 8601)
+        name: Display name, when path does not end in it (e.g. opaque file ids)
+        
+    Returns:
+        Metadata dictionary with the same layout as extract_all_metadata
+    """
+    current_time = datetime.now()
+    name = name or Path(path).name
+    mime_type = mimetypes.guess_type(name)[0]
+    
+    filesystem: Dict[str, Any] = {}
+    if size_bytes is not None:
+        filesystem["size_bytes"] = size_bytes
+        filesystem["size_human"] = _human_readable_size(size_bytes)
+    if modified:
+        try:
+            # Local naive time, matching extract_filesystem_metadata
+            dt = datetime.fromisoformat(modified.replace("Z", "+00:00"))
+            if dt.tzinfo is not None:
+                dt = dt.astimezone().replace(tzinfo=None)
+            filesystem["created"] = filesystem["modified"] = dt.isoformat()
+        except ValueError:
+            pass
+    
+    metadata: Dict[str, Any] = {
+        "file": {
+            "path": path,
+            "name": name,
+            "extension": Path(name).suffix,
+            "mime_type": mime_type
+        },
+        "filesystem": filesystem,
+        "extended_attributes": {},
+        "image": None,
+        "exif": None,
+        "gps": None,
+        "video": None,
+        "audio": None,
+        "pdf": None,
+        "svg": None,
+        "hashes": {},
+        "thumbnail": None,
+        "calculated": {}
+    }
+    
+    if mime_type and mime_type.startswith('image') and mime_type != 'image/svg+xml':
+        stream = io.BytesIO(header)
+        metadata['image'] = extract_image_properties(stream)
+        metadata['exif'] = extract_exif_metadata(stream)
+        metadata['gps'] = extract_gps_metadata(stream)
+    
+    metadata['calculated'] = calculate_inferred_metadata(metadata, current_time)
+    return metadata
+
+
 def save_metadata_json(metadata: Dict[str, Any], output_file: str):
     """
     Save metadata to JSON file.
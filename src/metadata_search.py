@@ -34,9 +34,11 @@ import json
 import sqlite3
 import hashlib
 import logging
+import threading
+import weakref
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple, Callable
 from tqdm import tqdm  # type: ignore[import-untyped]
 
 # Import from previous tasks
@@ -51,6 +53,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class _ThreadConnection:
+    """One thread's MetadataDatabase connection; closed once the thread-local is released."""
+
+    def __init__(self, conn: sqlite3.Connection, registry: Dict[int, sqlite3.Connection], lock):
+        self.conn = conn
+        with lock:
+            registry[id(conn)] = conn
+        weakref.finalize(self, _close_thread_connection, conn, registry, lock)
+
+
+def _close_thread_connection(conn: sqlite3.Connection, registry: Dict[int, sqlite3.Connection],
+                             lock) -> None:
+    with lock:
+        registry.pop(id(conn), None)
+    conn.close()
+
+
 class MetadataDatabase:
     """Manage metadata storage with SQLite and version tracking."""
     
@@ -62,25 +81,40 @@ class MetadataDatabase:
             db_path: Path to SQLite database file
         """
         self.db_path = db_path
-        # Establish the connection up-front so `conn` is never Optional for callers.
-        # (This avoids pervasive `None` checks throughout the codebase and matches
-        # the actual runtime behavior, since initialization always opens a DB.)
-        self.conn: sqlite3.Connection = sqlite3.connect(
+        # Each thread gets its own connection (see `conn`): the server reads
+        # from many executor threads while writers hold BEGIN IMMEDIATE
+        self._local = threading.local()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._connections_lock = threading.RLock()
+        # Called as listener(event, filepath) with event "upsert" or "delete"
+        self._change_listeners: List[Callable[[str, str], None]] = []
+        self._init_database()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use and closed when the thread exits."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _ThreadConnection(self._open(), self._connections, self._connections_lock)
+        return holder.conn
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
             self.db_path,
-            check_same_thread=False,
+            check_same_thread=False,  # close() may run on another thread
             timeout=30.0,  # 30 second timeout for database locks
             isolation_level=None  # Autocommit mode for better concurrency
         )
-        self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        self._init_database()
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=10000")
+        conn.execute("PRAGMA temp_store=memory")
+        return conn
     
     def _init_database(self):
         """Create database tables if they don't exist."""
         # Enable WAL mode for better concurrent access
         self.conn.execute("PRAGMA journal_mode=WAL")
-        self.conn.execute("PRAGMA synchronous=NORMAL")
-        self.conn.execute("PRAGMA cache_size=10000")
-        self.conn.execute("PRAGMA temp_store=memory")
         
         cursor = self.conn.cursor()
         
@@ -151,6 +185,25 @@ class MetadataDatabase:
         self.conn.commit()
         logger.info(f"Database initialized: {self.db_path}")
     
+    def add_change_listener(self, listener: Callable[[str, str], None]):
+        """
+        Register a callback for metadata changes.
+        
+        The listener receives ("upsert", filepath) after metadata is stored or
+        changed, ("delete", filepath) after a file is marked as deleted and
+        ("favorite", filepath) after a file is added to or removed from
+        favorites.
+        """
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, event: str, filepath: str):
+        """Invoke change listeners; a failing listener never fails the write."""
+        for listener in self._change_listeners:
+            try:
+                listener(event, filepath)
+            except Exception as e:
+                logger.error(f"Metadata change listener failed for {filepath}: {e}")
+    
     def calculate_file_hash(self, filepath: str) -> str:
         """Calculate SHA256 hash of file."""
         try:
@@ -189,19 +242,22 @@ class MetadataDatabase:
         
         return False
     
-    def store_metadata(self, filepath: str, metadata: Dict[str, Any]) -> bool:
+    def store_metadata(self, filepath: str, metadata: Dict[str, Any], file_hash: Optional[str] = None) -> bool:
         """
         Store metadata with version tracking.
         
         Args:
             filepath: File path
             metadata: Metadata dictionary
+            file_hash: Content hash to record (e.g. a remote ETag) instead of
+                hashing the file on disk
             
         Returns:
             Success status
         """
         try:
-            file_hash = self.calculate_file_hash(filepath)
+            if file_hash is None:
+                file_hash = self.calculate_file_hash(filepath)
             metadata_json = json.dumps(metadata, default=str)
             
             cursor = self.conn.cursor()
@@ -242,6 +298,7 @@ class MetadataDatabase:
                 logger.info(f"Stored new metadata for {filepath}")
             
             self.conn.commit()
+            self._notify_change("upsert", filepath)
             return True
             
         except Exception as e:
@@ -265,10 +322,81 @@ class MetadataDatabase:
             
             self.conn.commit()
             logger.info(f"Marked {filepath} as deleted")
+            self._notify_change("delete", filepath)
             
         except Exception as e:
             logger.error(f"Error marking {filepath} as deleted: {e}")
-    
+
+    def mark_many_as_deleted(self, filepaths: List[str], reason: str = "file_not_found",
+                             notify: bool = True) -> int:
+        """
+        mark_as_deleted for many files in one transaction.
+
+        Bulk callers that update the derived indexes themselves pass
+        notify=False to skip the per-file change events.
+
+        Returns:
+            Number of metadata rows removed
+        """
+        unique = list(dict.fromkeys(filepaths))
+        removed = 0
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    INSERT INTO deleted_metadata (file_path, file_hash, metadata_json, deletion_reason)
+                    SELECT file_path, file_hash, metadata_json, ?
+                    FROM metadata WHERE file_path IN ({placeholders})
+                """, [reason] + chunk)
+                cursor.execute(f"DELETE FROM metadata WHERE file_path IN ({placeholders})", chunk)
+                removed += cursor.rowcount
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        if notify:
+            for filepath in unique:
+                self._notify_change("delete", filepath)
+        return removed
+
+    def set_favorites(self, filepaths: List[str], favorite: bool, notify: bool = True) -> List[str]:
+        """
+        Add or remove many favorites in one transaction.
+
+        Returns:
+            The paths whose favorite state changed
+        """
+        unique = list(dict.fromkeys(filepaths))
+        changed: List[str] = []
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"SELECT file_path FROM favorites WHERE file_path IN ({placeholders})", chunk)
+                existing = {row['file_path'] for row in cursor.fetchall()}
+                if favorite:
+                    new = [p for p in chunk if p not in existing]
+                    cursor.executemany("INSERT INTO favorites (file_path) VALUES (?)", [(p,) for p in new])
+                    changed += new
+                elif existing:
+                    gone = [p for p in chunk if p in existing]
+                    marks = ','.join('?' * len(gone))
+                    cursor.execute(f"DELETE FROM favorites WHERE file_path IN ({marks})", gone)
+                    changed += gone
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        if notify:
+            for filepath in changed:
+                self._notify_change("favorite", filepath)
+        return changed
+
     def get_metadata(self, filepath: str) -> Optional[Dict[str, Any]]:
         """Get current metadata for file."""
         cursor = self.conn.cursor()
@@ -279,6 +407,36 @@ class MetadataDatabase:
             return json.loads(row['metadata_json'])
         return None
     
+    def get_metadata_many(self, filepaths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Current metadata for several files in batched queries, keyed by path."""
+        unique = list(dict.fromkeys(filepaths))
+        found: Dict[str, Dict[str, Any]] = {}
+        cursor = self.conn.cursor()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(
+                f"SELECT file_path, metadata_json FROM metadata WHERE file_path IN ({placeholders})", chunk
+            )
+            for row in cursor.fetchall():
+                found[row['file_path']] = json.loads(row['metadata_json']) if row['metadata_json'] else {}
+        return found
+    
+    def paths_without_metadata(self, filepaths: List[str]) -> List[str]:
+        """The given paths that have no live metadata row, in input order."""
+        unique = list(dict.fromkeys(filepaths))
+        known: Set[str] = set()
+        cursor = self.conn.cursor()
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(
+                f"SELECT file_path FROM metadata WHERE file_path IN ({placeholders}) AND deleted_at IS NULL", chunk
+            )
+            known.update(row[0] for row in cursor.fetchall())
+        return [path for path in unique if path not in known]
+    
     def get_history(self, filepath: str) -> List[Dict[str, Any]]:
         """Get metadata version history for file."""
         cursor = self.conn.cursor()
@@ -319,9 +477,13 @@ class MetadataDatabase:
         }
     
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
+        """Close every thread's database connection."""
+        with self._connections_lock:
+            conns = list(self._connections.values())
+            self._connections.clear()
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
     
     def get_metadata_by_path(self, filepath: str) -> Optional[Dict[str, Any]]:
         """Get current metadata for file by path (alias for get_metadata)."""
@@ -375,13 +537,6 @@ class BatchExtractor:
             logger.error(f"Failed to load catalog: {catalog_path}")
             return {}
         
-        stats = {
-            'processed': 0,
-            'updated': 0,
-            'errors': 0,
-            'skipped': 0
-        }
-        
         # Get all files from catalog
         # Catalog structure is {'catalog': {dir: [files]}, 'metadata': ...}
         # We need to flatten this to a list of full paths
@@ -402,8 +557,28 @@ class BatchExtractor:
             all_files = catalog.get('files', [])
         
         logger.info(f"Extracting metadata for {len(all_files)} files...")
+        return self.extract_files(all_files, force=force, progress=True)
+    
+    def extract_files(self, filepaths: List[str], force: bool = False, progress: bool = False) -> Dict[str, int]:
+        """
+        Extract and store metadata for specific files.
         
-        for filepath in tqdm(all_files, desc="Extracting metadata"):
+        Args:
+            filepaths: Full paths to process
+            force: Force re-extraction even if unchanged
+            progress: Show a progress bar
+            
+        Returns:
+            Statistics (processed, updated, errors, skipped)
+        """
+        stats = {
+            'processed': 0,
+            'updated': 0,
+            'errors': 0,
+            'skipped': 0
+        }
+        
+        for filepath in tqdm(filepaths, desc="Extracting metadata", disable=not progress):
             try:
                 # Check if file needs update
                 if not force and not self.db.file_needs_update(filepath):
@@ -603,6 +778,18 @@ class QueryEngine:
             db: MetadataDatabase instance
         """
         self.db = db
+        # Fields answered by an external text index: name -> (text -> matching paths)
+        self._text_fields: Dict[str, Callable[[str], Set[str]]] = {}
+    
+    def register_text_field(self, name: str, matcher: Callable[[str], Set[str]]):
+        """
+        Answer conditions on `name` from an external text index.
+        
+        `name:words`, `name CONTAINS words`, `name LIKE words` and `name=words`
+        keep the files whose path is in matcher(words); `name!=words` keeps
+        the others. Matching files are known before any metadata is decoded.
+        """
+        self._text_fields[name] = matcher
     
     def _parse_value(self, value: str) -> Any:
         """Parse query value to appropriate type."""
@@ -685,6 +872,9 @@ class QueryEngine:
             camera:Canon -> exif.image.Make LIKE Canon
             format:jpg -> image.format=JPEG
             type:video -> file.mime_type LIKE video
+        
+        Registered text fields (see register_text_field):
+            notes:sunset beach -> notes CONTAINS sunset beach
         """
         # Size conversion helper
         def parse_size(size_str: str) -> int:
@@ -707,6 +897,10 @@ class QueryEngine:
             'ext:': ('file.path', 'LIKE'),
         }
         
+        for name in self._text_fields:
+            if query_part.lower().startswith(f"{name}:"):
+                return f"{name} CONTAINS {query_part[len(name) + 1:].strip()}"
+        
         # Check for simple shortcuts (no operator in shortcut)
         for shortcut, (field, default_op) in shortcuts.items():
             if query_part.lower().startswith(shortcut):
@@ -801,7 +995,8 @@ class QueryEngine:
         
         return conditions
     
-    def search(self, query: str, limit: int = 100, sort_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    def search(self, query: str, limit: int = 100, sort_by: Optional[str] = None,
+               offset: int = 0) -> List[Dict[str, Any]]:
         """
         Search metadata using query string.
         
@@ -816,6 +1011,7 @@ class QueryEngine:
             query: Search query string
             limit: Maximum results
             sort_by: Field to sort by
+            offset: Matches to skip (in table order) before collecting results
             
         Returns:
             List of matching files with metadata
@@ -827,13 +1023,30 @@ class QueryEngine:
             logger.warning(f"No valid conditions in query: {query}")
             return []
         
+        # Text-index fields narrow the candidate paths up front
+        include: Optional[Set[str]] = None
+        exclude: Set[str] = set()
+        for field, operator, expected in conditions:
+            if field in self._text_fields:
+                paths = self._text_fields[field](str(expected))
+                if operator == '!=':
+                    exclude |= paths
+                else:
+                    include = paths if include is None else include & paths
+        conditions = [c for c in conditions if c[0] not in self._text_fields]
+        if include is not None and not include:
+            return []
+        
         # Get all metadata from database
         cursor = self.db.conn.cursor()
-        cursor.execute("SELECT file_path, metadata_json FROM metadata")
+        cursor.execute("SELECT file_path, metadata_json FROM metadata ORDER BY id")
         
         results = []
-        for row in cursor.fetchall():
+        skipped = 0
+        for row in cursor:
             file_path = row['file_path']
+            if (include is not None and file_path not in include) or file_path in exclude:
+                continue
             metadata = json.loads(row['metadata_json'])
             
             # Check all conditions
@@ -845,6 +1058,9 @@ class QueryEngine:
                     break
             
             if match:
+                if skipped < offset:
+                    skipped += 1
+                    continue
                 results.append({
                     'file_path': file_path,
                     'metadata': metadata
@@ -983,6 +1199,7 @@ class QueryEngine:
                 VALUES (?, CURRENT_TIMESTAMP, ?)
             """, (file_path, notes))
             self.db.conn.commit()
+            self.db._notify_change("favorite", file_path)
             logger.info(f"Added {file_path} to favorites")
             return True
         except Exception as e:
@@ -1003,6 +1220,7 @@ class QueryEngine:
             cursor = self.db.conn.cursor()
             cursor.execute("DELETE FROM favorites WHERE file_path = ?", (file_path,))
             self.db.conn.commit()
+            self.db._notify_change("favorite", file_path)
             logger.info(f"Removed {file_path} from favorites")
             return True
         except Exception as e:
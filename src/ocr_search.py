@@ -54,6 +54,54 @@ except ImportError:
     print("pip install pytesseract opencv-python pillow numpy")
     print("And install Tesseract OCR on your system")
 
+def build_fts_query(query: str, prefix: bool = True) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    
+    Each word becomes a quoted term (so FTS5 operators and punctuation in
+    user input cannot break the query) and terms are ANDed together. With
+    ``prefix`` the last term also matches as a prefix, for search-as-you-type.
+    
+    Args:
+        query: Raw user query
+        prefix: Treat the last word as a prefix
+        
+    Returns:
+        FTS5 query string, or '' if the query has no searchable words
+    """
+    words = [w.replace('"', '""') for w in query.split() if w.strip('"')]
+    if not words:
+        return ''
+    terms = [f'"{w}"' for w in words]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def fuse_ranked(*ranked: List[Dict[str, Any]], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Reciprocal-rank fusion of result lists ranked by separate indexes.
+    
+    bm25 scores depend on each index's corpus statistics, so scores from
+    different FTS tables are not comparable; only the rank within each list
+    is used. Every hit gets ``fused_score`` = 1 / (k + rank) and keeps its
+    own ``score``. Equal fused scores keep the order of the input lists.
+    
+    Args:
+        ranked: Result lists, each best first
+        k: RRF damping constant
+        
+    Returns:
+        All hits, best fused score first
+    """
+    fused = []
+    for hits in ranked:
+        for rank, hit in enumerate(hits, start=1):
+            hit["fused_score"] = round(1.0 / (k + rank), 6)
+            fused.append(hit)
+    return sorted(fused, key=lambda hit: hit["fused_score"], reverse=True)
+
+
 class OCRSearch:
     """OCR text extraction and search system."""
     
@@ -291,9 +339,10 @@ class OCRSearch:
                         result['confidence']
                     ))
                     
-                    # Update search index
+                    # Update search index (FTS5 has no unique keys, so replace by hand)
+                    cursor.execute("DELETE FROM ocr_search_index WHERE image_path = ?", (image_path,))
                     cursor.execute("""
-                        INSERT OR REPLACE INTO ocr_search_index 
+                        INSERT INTO ocr_search_index 
                         (image_path, text_content, language)
                         VALUES (?, ?, ?)
                     """, (
@@ -373,38 +422,42 @@ class OCRSearch:
         cursor = self._conn().cursor()
         
         try:
-            # Build FTS5 query
-            fts_query = f'"{query}"'
-            
-            params: List[Any] = []
-            where_clauses: List[str] = []
+            fts_query = build_fts_query(query)
+            if not fts_query:
+                return {
+                    'status': 'success',
+                    'query': query,
+                    'total': 0,
+                    'limit': limit,
+                    'offset': offset,
+                    'results': []
+                }
             
+            params: List[Any] = [fts_query]
+            language_clause = ""
             if language:
-                where_clauses.append("language = ?")
+                language_clause = "AND ocr_search_index.language = ?"
                 params.append(language)
             
-            where_clause = " AND ".join(where_clauses)
-            if where_clause:
-                where_clause = " WHERE " + where_clause
-            
-            # Execute FTS5 search
+            # bm25() is lower-is-better; results are ordered best first and the
+            # score is negated so callers can treat higher as better
             search_query = f"""
                 SELECT 
-                    image_path,
-                    text_content,
-                    language,
-                    confidence,
-                    extracted_at
+                    ocr_search_index.image_path,
+                    ocr_search_index.text_content,
+                    ocr_search_index.language,
+                    ot.confidence,
+                    ot.extracted_at,
+                    bm25(ocr_search_index) AS rank_score,
+                    snippet(ocr_search_index, 1, '<mark>', '</mark>', '…', 12) AS snippet
                 FROM ocr_search_index
-                {where_clause}
-                WHERE ocr_search_index MATCH ?
-                ORDER BY rank
+                LEFT JOIN ocr_text ot ON ot.image_path = ocr_search_index.image_path
+                WHERE ocr_search_index MATCH ? {language_clause}
+                ORDER BY rank_score
                 LIMIT ? OFFSET ?
             """
             
-            search_params = params + [fts_query, limit, offset]
-            
-            cursor.execute(search_query, search_params)
+            cursor.execute(search_query, params + [limit, offset])
             rows = cursor.fetchall()
             
             results = []
@@ -414,19 +467,19 @@ class OCRSearch:
                     'text_content': row['text_content'],
                     'language': row['language'],
                     'confidence': row['confidence'],
-                    'extracted_at': row['extracted_at']
+                    'extracted_at': row['extracted_at'],
+                    'score': -row['rank_score'],
+                    'snippet': row['snippet']
                 })
             
             # Get total count
             count_query = f"""
                 SELECT COUNT(*) as count 
                 FROM ocr_search_index
-                {where_clause}
-                WHERE ocr_search_index MATCH ?
+                WHERE ocr_search_index MATCH ? {language_clause}
             """
             
-            count_params = params + [fts_query]
-            cursor.execute(count_query, count_params)
+            cursor.execute(count_query, params)
             total = cursor.fetchone()['count']
             
             return {
@@ -30,6 +30,7 @@ Usage:
 
 import sqlite3
 import json
+import threading
 import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any, Tuple
@@ -65,15 +66,20 @@ class PersistentJobStore:
         """
         self.db_path = db_path
         self.conn: Optional[sqlite3.Connection] = None
+        # Jobs are updated from worker threads; sqlite3 connections are bound to their thread
+        self._local = threading.local()
         self._initialize_database()
 
     def _get_conn(self) -> sqlite3.Connection:
-        """Return a live DB connection (initializing if needed)."""
+        """Return a live DB connection for the calling thread (initializing if needed)."""
         if self.conn is None:
             self._initialize_database()
-        # mypy/pylance: self.conn is ensured above
-        assert self.conn is not None
-        return self.conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
     
     def _initialize_database(self):
         """Initialize database and create tables."""
@@ -136,6 +142,7 @@ class PersistentJobStore:
 
         conn.commit()
         self.conn = conn
+        self._local.conn = conn
     
     def create_job(
         self,
@@ -707,6 +714,7 @@ class PersistentJobStore:
         if self.conn:
             self.conn.close()
             self.conn = None
+        self._local = threading.local()
     
     def __enter__(self):
         """Context manager entry."""
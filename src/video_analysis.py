@@ -18,9 +18,13 @@ import sys
 import json
 import sqlite3
 import hashlib
+import shutil
 import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple, Union
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable
 from datetime import datetime, timezone
 import logging
 
@@ -46,6 +50,8 @@ except ImportError:
     PIL_AVAILABLE = False
     print("PIL not available - image processing will be limited")
 
+from src.ocr_search import build_fts_query
+
 # Import existing modules for integration
 try:
     from src.ocr_search import OCRSearch
@@ -56,6 +62,71 @@ except ImportError:
     print("OCR modules not available - text detection will be disabled")
 
 
+def _gray_thumbnail(frame: "np.ndarray") -> "np.ndarray":
+    """8x8 grayscale copy of a BGR frame, the input of the average hash."""
+    # Shrink first so colour conversion only touches 64 pixels
+    return cv2.cvtColor(cv2.resize(frame, (8, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+
+def _ahash_from_gray_bytes(raw: bytes) -> List[str]:
+    """
+    Vectorised 8x8 average hash over concatenated grayscale thumbnails.
+    
+    ``raw`` holds N * 64 bytes (one 8x8 gray frame after another); returns N
+    64-character bit strings in the same format as ``_calculate_image_hash``.
+    """
+    count = len(raw) // 64
+    if count == 0:
+        return []
+        
+    if not CV2_AVAILABLE:
+        hashes = []
+        for i in range(count):
+            block = raw[i * 64:(i + 1) * 64]
+            avg = sum(block) / 64
+            hashes.append(''.join('1' if pixel > avg else '0' for pixel in block))
+        return hashes
+        
+    pixels = np.frombuffer(raw[:count * 64], dtype=np.uint8).reshape(count, 64)
+    bits = pixels > pixels.mean(axis=1, keepdims=True)
+    chars = (bits.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+    return [chars[i * 64:(i + 1) * 64] for i in range(count)]
+
+
+# Analyzer attributes copied into batch worker processes
+_BATCH_WORKER_SETTINGS = (
+    "keyframe_interval", "scene_threshold", "max_frames_per_video",
+    "keyframe_backend", "keyframe_iframes_only", "keyframe_seek_min_frames",
+)
+
+_batch_worker_analyzer: Optional["VideoAnalyzer"] = None
+
+
+def _init_batch_worker(db_path: str, cache_dir: str, settings: Dict[str, Any]):
+    """Process pool initializer: build one analyzer per worker process."""
+    global _batch_worker_analyzer
+    _batch_worker_analyzer = VideoAnalyzer(db_path=db_path, cache_dir=cache_dir)
+    for name, value in settings.items():
+        setattr(_batch_worker_analyzer, name, value)
+    # The parent enforces the cache budget once per batch
+    _batch_worker_analyzer.cache_budget_bytes = None
+
+
+def _analyze_in_batch_worker(video_path: str, force_reprocess: bool) -> Dict[str, Any]:
+    """Analyze one video in a batch worker and return a picklable summary."""
+    assert _batch_worker_analyzer is not None
+    result = _batch_worker_analyzer.analyze_video(video_path, force_reprocess=force_reprocess)
+    summary = {
+        key: result[key]
+        for key in ("video_path", "status", "error", "keyframes_count", "scenes_count",
+                    "ocr_detections", "keyframe_stats")
+        if key in result
+    }
+    # analyze_video returns the stored analysis (no status) for unchanged videos
+    summary.setdefault("status", "skipped")
+    return summary
+
+
 class VideoAnalyzer:
     """
     Main video analysis class that orchestrates all video processing tasks.
@@ -86,6 +157,11 @@ class VideoAnalyzer:
         self.keyframe_interval = 30  # Extract keyframe every 30 seconds
         self.scene_threshold = 0.3   # Scene change detection threshold
         self.max_frames_per_video = 100  # Limit frames to prevent excessive processing
+        self.keyframe_backend = "auto"   # "auto" (OpenCV, ffmpeg fallback) or "ffmpeg"
+        self.keyframe_iframes_only = False  # ffmpeg: decode I-frames only (fast, coarser timestamps)
+        self.keyframe_seek_min_frames = 250  # OpenCV: seek instead of grab() beyond this interval
+        self.last_keyframe_stats: Dict[str, Any] = {}
+        self.cache_budget_bytes: Optional[int] = 2 * 1024 ** 3  # Keyframe cache cap; None disables eviction
         
     def _init_database(self):
         """Initialize the video analysis database schema."""
@@ -157,23 +233,69 @@ class VideoAnalyzer:
             )
         """)
         
+        # Full-text index over OCR'd frames (external content, kept in sync by triggers)
+        fts_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'video_ocr_fts'"
+        ).fetchone()
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS video_ocr_fts USING fts5(
+                detected_text,
+                content='video_ocr',
+                content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS video_ocr_fts_insert AFTER INSERT ON video_ocr BEGIN
+                INSERT INTO video_ocr_fts(rowid, detected_text) VALUES (new.id, new.detected_text);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS video_ocr_fts_delete AFTER DELETE ON video_ocr BEGIN
+                INSERT INTO video_ocr_fts(video_ocr_fts, rowid, detected_text)
+                VALUES ('delete', old.id, old.detected_text);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS video_ocr_fts_update AFTER UPDATE OF detected_text ON video_ocr BEGIN
+                INSERT INTO video_ocr_fts(video_ocr_fts, rowid, detected_text)
+                VALUES ('delete', old.id, old.detected_text);
+                INSERT INTO video_ocr_fts(rowid, detected_text) VALUES (new.id, new.detected_text);
+            END
+        """)
+        if not fts_exists:
+            # Index OCR rows stored before the FTS table existed
+            conn.execute("INSERT INTO video_ocr_fts(video_ocr_fts) VALUES ('rebuild')")
+        
+        # Lightweight migration: fingerprint columns used to skip unchanged videos
+        cols = [row[1] for row in conn.execute("PRAGMA table_info(video_metadata)").fetchall()]
+        # ocr_done: rows written before it existed were always OCR'd
+        for column, column_type in (("source_mtime", "REAL"), ("source_size", "INTEGER"), ("cache_key", "TEXT"),
+                                    ("ocr_done", "INTEGER DEFAULT 1")):
+            if column not in cols:
+                conn.execute(f"ALTER TABLE video_metadata ADD COLUMN {column} {column_type}")
+        
         # Create indexes for performance
         conn.execute("CREATE INDEX IF NOT EXISTS idx_video_keyframes_path ON video_keyframes (video_path)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_video_keyframes_timestamp ON video_keyframes (timestamp_seconds)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_video_ocr_path ON video_ocr (video_path)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_video_ocr_text ON video_ocr (detected_text)")
+        # LIKE '%q%' never used this index; text search goes through video_ocr_fts
+        conn.execute("DROP INDEX IF EXISTS idx_video_ocr_text")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_video_scenes_path ON video_scenes (video_path)")
         
         conn.commit()
         conn.close()
         
-    def analyze_video(self, video_path: str, force_reprocess: bool = False) -> Dict[str, Any]:
+    def analyze_video(self, video_path: str, force_reprocess: bool = False, ocr: bool = True) -> Dict[str, Any]:
         """
         Perform comprehensive analysis of a video file.
         
         Args:
             video_path: Path to the video file
             force_reprocess: If True, reprocess even if already analyzed
+            ocr: Run OCR on the keyframes. Without it only metadata, keyframes
+                and scenes are stored; a later call with ocr=True OCRs the
+                stored keyframes instead of re-analyzing the video
             
         Returns:
             Dictionary containing analysis results
@@ -186,6 +308,8 @@ class VideoAnalyzer:
         # Check if already processed
         if not force_reprocess and self._is_video_processed(video_path):
             self.logger.info(f"Video already processed: {video_path}")
+            if ocr and not self._has_ocr(video_path):
+                self._ocr_stored_keyframes(video_path)
             return self.get_video_analysis(video_path)
             
         self.logger.info(f"Starting video analysis: {video_path}")
@@ -201,10 +325,13 @@ class VideoAnalyzer:
             scenes = self._detect_scenes(video_path, keyframes)
             
             # Step 4: Perform OCR on keyframes
-            ocr_results = self._perform_video_ocr(video_path, keyframes)
+            ocr_results = self._perform_video_ocr(video_path, keyframes) if ocr else []
             
             # Step 5: Store results in database
-            self._store_analysis_results(video_path, metadata, keyframes, scenes, ocr_results)
+            self._store_analysis_results(video_path, metadata, keyframes, scenes, ocr_results, ocr_done=ocr)
+            
+            if self.cache_budget_bytes is not None:
+                self._enforce_cache_budget()
             
             analysis_result = {
                 "video_path": video_path,
@@ -212,6 +339,7 @@ class VideoAnalyzer:
                 "keyframes_count": len(keyframes),
                 "scenes_count": len(scenes),
                 "ocr_detections": len(ocr_results),
+                "keyframe_stats": dict(self.last_keyframe_stats),
                 "status": "completed",
                 "processed_at": datetime.now(timezone.utc).isoformat()
             }
@@ -228,6 +356,59 @@ class VideoAnalyzer:
                 "processed_at": datetime.now(timezone.utc).isoformat()
             }
     
+    def _video_fingerprint(self, video_path: str) -> Tuple[float, int, str]:
+        """
+        Return (mtime, size, cache_key) for a video file.
+        
+        The cache key addresses the keyframe directory, so identically named
+        videos in different folders - or a file replaced in place - never share
+        cached frames.
+        """
+        stat = os.stat(video_path)
+        digest = hashlib.sha1(f"{video_path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8"))
+        return stat.st_mtime, stat.st_size, digest.hexdigest()[:20]
+    
+    def _keyframe_dir(self, video_path: str) -> Path:
+        """Return (and create) the content-addressed keyframe directory for a video."""
+        cache_key = self._video_fingerprint(video_path)[2]
+        frame_dir = self.cache_dir / cache_key[:2] / cache_key
+        frame_dir.mkdir(parents=True, exist_ok=True)
+        return frame_dir
+    
+    def _enforce_cache_budget(self) -> int:
+        """
+        Evict least recently written keyframe directories until the cache fits
+        ``cache_budget_bytes``. Evicted videos are re-analyzed on next request.
+        
+        Returns:
+            Number of bytes freed
+        """
+        if self.cache_budget_bytes is None or not self.cache_dir.exists():
+            return 0
+            
+        entries = []
+        total = 0
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.is_dir():
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                total += size
+                
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.cache_budget_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            freed += size
+            
+        if freed:
+            self.logger.info(f"Evicted {freed / (1024 * 1024):.1f} MB of cached keyframes")
+        return freed
+    
     def _extract_video_metadata(self, video_path: str) -> Dict[str, Any]:
         """Extract basic video metadata using ffprobe."""
         if not FFMPEG_AVAILABLE:
@@ -258,8 +439,12 @@ class VideoAnalyzer:
     
     def _extract_keyframes(self, video_path: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Extract keyframes from video at regular intervals."""
-        if not CV2_AVAILABLE:
-            self.logger.warning("OpenCV not available - using ffmpeg for frame extraction")
+        use_ffmpeg = self.keyframe_backend == "ffmpeg" or not CV2_AVAILABLE
+        if use_ffmpeg and not FFMPEG_AVAILABLE and CV2_AVAILABLE:
+            use_ffmpeg = False
+        if use_ffmpeg:
+            if not CV2_AVAILABLE:
+                self.logger.warning("OpenCV not available - using ffmpeg for frame extraction")
             return self._extract_keyframes_ffmpeg(video_path, metadata)
             
         keyframes = []
@@ -268,111 +453,183 @@ class VideoAnalyzer:
         if not cap.isOpened():
             raise RuntimeError(f"Could not open video file: {video_path}")
             
+        frame_dir = self._keyframe_dir(video_path)
+        started = time.perf_counter()
+        decoded = 0
         try:
-            fps = metadata.get('fps', 30)
-            duration = metadata.get('duration', 0)
-            frame_interval = int(fps * self.keyframe_interval)  # Frames between keyframes
+            fps = metadata.get('fps') or cap.get(cv2.CAP_PROP_FPS) or 30
+            frame_interval = max(1, int(round(fps * self.keyframe_interval)))  # Frames between keyframes
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            
+            # Long intervals are cheaper to reach by seeking (decode at most one GOP
+            # per sample); short ones by grab(), which demuxes without the
+            # colour conversion / copy that read() pays for every frame.
+            use_seek = total_frames > 0 and frame_interval >= self.keyframe_seek_min_frames
             
+            # Each frame is written out as soon as it is read; only its 8x8
+            # grayscale thumbnail is kept for hashing, so a 4K video holds
+            # one full frame in memory rather than max_frames_per_video
+            thumbnails = []
             frame_number = 0
-            extracted_count = 0
             
-            while cap.isOpened() and extracted_count < self.max_frames_per_video:
+            while len(keyframes) < self.max_frames_per_video:
+                if total_frames and frame_number >= total_frames:
+                    break
+                    
+                if use_seek:
+                    if frame_number and not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number):
+                        break
+                else:
+                    skipped_ok = True
+                    while decoded < frame_number:
+                        if not cap.grab():
+                            skipped_ok = False
+                            break
+                        decoded += 1
+                    if not skipped_ok:
+                        break
+                        
                 ret, frame = cap.read()
                 if not ret:
                     break
-                    
-                # Extract keyframe at intervals
-                if frame_number % frame_interval == 0:
-                    timestamp = frame_number / fps
-                    
-                    # Save frame to cache
-                    frame_filename = f"{Path(video_path).stem}_frame_{frame_number:06d}.jpg"
-                    frame_path = self.cache_dir / frame_filename
-                    
-                    cv2.imwrite(str(frame_path), frame)
-                    
-                    # Calculate visual hash for similarity detection
-                    visual_hash = self._calculate_frame_hash(frame)
-                    
-                    keyframes.append({
-                        "frame_number": frame_number,
-                        "timestamp": timestamp,
-                        "frame_path": str(frame_path),
-                        "visual_hash": visual_hash
-                    })
-                    
-                    extracted_count += 1
-                    
-                frame_number += 1
+                decoded += 1
+                
+                # Save frame to cache
+                frame_path = frame_dir / f"frame_{frame_number:06d}.jpg"
+                cv2.imwrite(str(frame_path), frame)
+                thumbnails.append(_gray_thumbnail(frame))
+                keyframes.append({
+                    "frame_number": frame_number,
+                    "timestamp": frame_number / fps,
+                    "frame_path": str(frame_path),
+                })
+                frame_number += frame_interval
+                
+            # Hash all sampled frames in one vectorised pass
+            if thumbnails:
+                hashes = _ahash_from_gray_bytes(np.stack(thumbnails).tobytes())
+                for keyframe, visual_hash in zip(keyframes, hashes):
+                    keyframe["visual_hash"] = visual_hash
                 
         finally:
             cap.release()
             
-        self.logger.info(f"Extracted {len(keyframes)} keyframes from {video_path}")
+        self._record_keyframe_stats(
+            video_path, metadata, keyframes,
+            backend="opencv-seek" if use_seek else "opencv-grab",
+            elapsed=time.perf_counter() - started,
+        )
         return keyframes
     
     def _extract_keyframes_ffmpeg(self, video_path: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Fallback keyframe extraction using ffmpeg."""
+        """
+        Keyframe extraction using a single ffmpeg invocation.
+        
+        The ``fps`` filter samples one frame per ``keyframe_interval`` and the
+        stream is split in two: full-size JPEGs written to the cache and 8x8
+        grayscale thumbnails piped back as raw bytes for hashing. With
+        ``keyframe_iframes_only`` the decoder skips everything but I-frames.
+        """
         keyframes: List[Dict[str, Any]] = []
         duration = metadata.get('duration', 0)
         
         if duration == 0:
             return keyframes
             
-        # Calculate timestamps for keyframe extraction
-        timestamps: List[float] = []
-        current_time = 0
-        while current_time < duration and len(timestamps) < self.max_frames_per_video:
-            timestamps.append(current_time)
-            current_time += self.keyframe_interval
+        if not FFMPEG_AVAILABLE:
+            raise RuntimeError("ffmpeg-python not available for frame extraction")
+            
+        fps = metadata.get('fps') or 30
+        max_frames = min(
+            self.max_frames_per_video,
+            int(duration // self.keyframe_interval) + 1
+        )
+        frame_dir = self._keyframe_dir(video_path)
+        pattern = frame_dir / "kf_%06d.jpg"
+        
+        input_kwargs = {'skip_frame': 'nokey'} if self.keyframe_iframes_only else {}
+        
+        started = time.perf_counter()
+        try:
+            sampled = (
+                ffmpeg
+                .input(video_path, **input_kwargs)
+                .filter('fps', fps=f"1/{self.keyframe_interval}")
+                .filter_multi_output('split')
+            )
+            frames_out = sampled[0].output(
+                str(pattern), vframes=max_frames, start_number=0, format='image2', vcodec='mjpeg'
+            )
+            hashes_out = (
+                sampled[1]
+                .filter('scale', 8, 8, flags='area')
+                .output('pipe:', vframes=max_frames, format='rawvideo', pix_fmt='gray')
+            )
+            raw, _ = (
+                ffmpeg
+                .merge_outputs(frames_out, hashes_out)
+                .overwrite_output()
+                .run(capture_stdout=True, quiet=True)
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to extract frames with ffmpeg: {str(e)}")
+            return keyframes
             
-        # Extract frames at specified timestamps
-        for i, timestamp in enumerate(timestamps):
-            try:
-                frame_filename = f"{Path(video_path).stem}_frame_{i:06d}.jpg"
-                frame_path = self.cache_dir / frame_filename
-                
-                # Use ffmpeg to extract frame at specific timestamp
-                (
-                    ffmpeg
-                    .input(video_path, ss=timestamp)
-                    .output(str(frame_path), vframes=1, format='image2', vcodec='mjpeg')
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-                
-                if frame_path.exists():
-                    keyframes.append({
-                        "frame_number": i * int(metadata.get('fps', 30) * self.keyframe_interval),
-                        "timestamp": timestamp,
-                        "frame_path": str(frame_path),
-                        "visual_hash": self._calculate_image_hash(str(frame_path))
-                    })
-                    
-            except Exception as e:
-                self.logger.warning(f"Failed to extract frame at {timestamp}s: {str(e)}")
-                continue
+        hashes = _ahash_from_gray_bytes(raw)
+        
+        for i in range(max_frames):
+            temp_path = frame_dir / f"kf_{i:06d}.jpg"
+            if not temp_path.exists():
+                break
                 
+            timestamp = i * self.keyframe_interval
+            frame_number = int(round(timestamp * fps))
+            frame_path = frame_dir / f"frame_{frame_number:06d}.jpg"
+            os.replace(temp_path, frame_path)
+            
+            keyframes.append({
+                "frame_number": frame_number,
+                "timestamp": float(timestamp),
+                "frame_path": str(frame_path),
+                "visual_hash": hashes[i] if i < len(hashes) else self._calculate_image_hash(str(frame_path))
+            })
+            
+        self._record_keyframe_stats(
+            video_path, metadata, keyframes,
+            backend="ffmpeg-iframes" if self.keyframe_iframes_only else "ffmpeg",
+            elapsed=time.perf_counter() - started,
+        )
         return keyframes
     
+    def _record_keyframe_stats(self, video_path: str, metadata: Dict[str, Any],
+                               keyframes: List[Dict[str, Any]], backend: str, elapsed: float):
+        """Log and keep keyframe extraction throughput for the last analyzed video."""
+        duration = float(metadata.get('duration') or 0)
+        elapsed = max(elapsed, 1e-9)
+        self.last_keyframe_stats = {
+            "backend": backend,
+            "keyframes": len(keyframes),
+            "elapsed_seconds": round(elapsed, 4),
+            "keyframes_per_second": round(len(keyframes) / elapsed, 2),
+            "realtime_factor": round(duration / elapsed, 2),
+        }
+        self.logger.info(
+            f"Extracted {len(keyframes)} keyframes from {video_path} via {backend} "
+            f"in {elapsed:.2f}s ({self.last_keyframe_stats['realtime_factor']}x realtime)"
+        )
+    
     def _calculate_frame_hash(self, frame: np.ndarray) -> str:
         """Calculate perceptual hash of a video frame."""
-        if not CV2_AVAILABLE:
-            return ""
-            
-        # Resize to small size for hashing
-        small_frame = cv2.resize(frame, (8, 8))
-        gray_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
-        
-        # Calculate average pixel value
-        avg = gray_frame.mean()
-        
-        # Create binary hash
-        hash_bits = []
-        for pixel in gray_frame.flatten():
-            hash_bits.append('1' if pixel > avg else '0')
+        hashes = self._calculate_frame_hashes([frame])
+        return hashes[0] if hashes else ""
+    
+    def _calculate_frame_hashes(self, frames: List["np.ndarray"]) -> List[str]:
+        """Calculate 8x8 average hashes for a batch of BGR frames."""
+        if not CV2_AVAILABLE or not frames:
+            return [""] * len(frames)
             
-        return ''.join(hash_bits)
+        small = np.stack([_gray_thumbnail(frame) for frame in frames])
+        return _ahash_from_gray_bytes(small.tobytes())
     
     def _calculate_image_hash(self, image_path: str) -> str:
         """Calculate perceptual hash of an image file."""
@@ -482,16 +739,17 @@ class VideoAnalyzer:
                 continue
                 
             try:
-                # Use existing OCR system to extract text
-                text_results = self.ocr_search.extract_text_from_images([frame_path])
+                # Use existing OCR system to extract text (without indexing the
+                # frame as a standalone image)
+                text_result = self.ocr_search.extract_text_from_image(frame_path)
                 
-                if frame_path in text_results and text_results[frame_path]['text']:
+                if text_result.get('status') == 'success' and text_result.get('text'):
                     ocr_results.append({
                         "frame_number": keyframe['frame_number'],
                         "timestamp": keyframe['timestamp'],
-                        "detected_text": text_results[frame_path]['text'],
-                        "confidence": text_results[frame_path].get('confidence', 0.0),
-                        "language": text_results[frame_path].get('language', 'unknown')
+                        "detected_text": text_result['text'],
+                        "confidence": text_result.get('confidence', 0.0),
+                        "language": text_result.get('language', 'unknown')
                     })
                     
             except Exception as e:
@@ -503,16 +761,25 @@ class VideoAnalyzer:
     
     def _store_analysis_results(self, video_path: str, metadata: Dict[str, Any], 
                               keyframes: List[Dict[str, Any]], scenes: List[Dict[str, Any]], 
-                              ocr_results: List[Dict[str, Any]]):
+                              ocr_results: List[Dict[str, Any]], ocr_done: bool = True):
         """Store all analysis results in the database."""
-        conn = sqlite3.connect(self.db_path)
+        source_mtime, source_size, cache_key = self._video_fingerprint(video_path)
+        conn = sqlite3.connect(self.db_path, timeout=30)
         
         try:
+            # Drop frames cached for a previous version of this file
+            previous = conn.execute(
+                "SELECT cache_key FROM video_metadata WHERE video_path = ?", (video_path,)
+            ).fetchone()
+            if previous and previous[0] and previous[0] != cache_key:
+                shutil.rmtree(self.cache_dir / previous[0][:2] / previous[0], ignore_errors=True)
+                
             # Store video metadata
             conn.execute("""
                 INSERT OR REPLACE INTO video_metadata 
-                (video_path, duration_seconds, fps, width, height, codec, bitrate, file_size, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                (video_path, duration_seconds, fps, width, height, codec, bitrate, file_size,
+                 source_mtime, source_size, cache_key, ocr_done, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
             """, (
                 video_path,
                 metadata.get('duration', 0),
@@ -521,7 +788,11 @@ class VideoAnalyzer:
                 metadata.get('height', 0),
                 metadata.get('codec', ''),
                 metadata.get('bitrate', 0),
-                metadata.get('file_size', 0)
+                metadata.get('file_size', 0),
+                source_mtime,
+                source_size,
+                cache_key,
+                int(ocr_done)
             ))
             
             # Clear existing keyframes for this video
@@ -561,45 +832,160 @@ class VideoAnalyzer:
                     scene['keyframe_count']
                 ))
             
-            # Clear existing OCR results for this video
-            conn.execute("DELETE FROM video_ocr WHERE video_path = ?", (video_path,))
-            
-            # Store OCR results
-            for ocr_result in ocr_results:
-                conn.execute("""
-                    INSERT INTO video_ocr 
-                    (video_path, frame_number, timestamp_seconds, detected_text, confidence, language)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    video_path,
-                    ocr_result['frame_number'],
-                    ocr_result['timestamp'],
-                    ocr_result['detected_text'],
-                    ocr_result['confidence'],
-                    ocr_result['language']
-                ))
+            self._write_video_ocr(conn, video_path, ocr_results)
             
             conn.commit()
             
         finally:
             conn.close()
     
+    @staticmethod
+    def _write_video_ocr(conn: sqlite3.Connection, video_path: str, ocr_results: List[Dict[str, Any]]):
+        """Replace the stored OCR results of a video (caller commits)."""
+        conn.execute("DELETE FROM video_ocr WHERE video_path = ?", (video_path,))
+        for ocr_result in ocr_results:
+            conn.execute("""
+                INSERT INTO video_ocr 
+                (video_path, frame_number, timestamp_seconds, detected_text, confidence, language)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                video_path,
+                ocr_result['frame_number'],
+                ocr_result['timestamp'],
+                ocr_result['detected_text'],
+                ocr_result['confidence'],
+                ocr_result['language']
+            ))
+    
+    def _has_ocr(self, video_path: str) -> bool:
+        """Whether the stored analysis of a video includes OCR."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(
+                "SELECT ocr_done FROM video_metadata WHERE video_path = ?", (video_path,)
+            ).fetchone()
+            return bool(row and row[0])
+        finally:
+            conn.close()
+    
+    def _ocr_stored_keyframes(self, video_path: str):
+        """OCR the cached keyframes of a video analyzed without OCR."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            keyframes = [
+                {"frame_number": row['frame_number'], "timestamp": row['timestamp_seconds'],
+                 "frame_path": row['frame_path']}
+                for row in conn.execute(
+                    "SELECT frame_number, timestamp_seconds, frame_path FROM video_keyframes "
+                    "WHERE video_path = ? ORDER BY timestamp_seconds",
+                    (video_path,)
+                )
+            ]
+            ocr_results = self._perform_video_ocr(video_path, keyframes)
+            self._write_video_ocr(conn, video_path, ocr_results)
+            conn.execute("UPDATE video_metadata SET ocr_done = 1 WHERE video_path = ?", (video_path,))
+            conn.commit()
+        finally:
+            conn.close()
+    
     def _is_video_processed(self, video_path: str) -> bool:
-        """Check if video has already been processed."""
+        """
+        Check if video has already been processed and is unchanged since.
+        
+        A video counts as processed when its stored (mtime, size) still match
+        the file on disk and its cached keyframes have not been evicted.
+        """
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         
         try:
-            cursor = conn.execute(
-                "SELECT COUNT(*) as count FROM video_metadata WHERE video_path = ?",
+            row = conn.execute(
+                "SELECT source_mtime, source_size, cache_key FROM video_metadata WHERE video_path = ?",
                 (video_path,)
-            )
-            result = cursor.fetchone()
-            return result['count'] > 0
+            ).fetchone()
+            if not row:
+                return False
+                
+            try:
+                mtime, size, cache_key = self._video_fingerprint(video_path)
+            except OSError:
+                return False
+                
+            if row['source_mtime'] != mtime or row['source_size'] != size or row['cache_key'] != cache_key:
+                return False
+                
+            has_keyframes = conn.execute(
+                "SELECT 1 FROM video_keyframes WHERE video_path = ? LIMIT 1", (video_path,)
+            ).fetchone()
+            return not has_keyframes or (self.cache_dir / cache_key[:2] / cache_key).exists()
             
         finally:
             conn.close()
     
+    def analyze_batch(self, video_paths: List[str], max_workers: Optional[int] = None,
+                      force_reprocess: bool = False,
+                      progress_callback: Optional[Callable[[str, Dict[str, Any], int, int], None]] = None
+                      ) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze several videos on a bounded process pool.
+        
+        Unchanged videos are skipped up front without starting a worker. Each
+        worker process keeps one VideoAnalyzer for its lifetime; the keyframe
+        cache budget is enforced once after the batch.
+        
+        Args:
+            video_paths: Videos to analyze
+            max_workers: Process pool size (defaults to half the CPU count)
+            force_reprocess: Re-analyze even unchanged videos
+            progress_callback: Called as (video_path, result, done, total) after each video
+            
+        Returns:
+            Mapping of input path to a per-video status summary
+        """
+        total = len(video_paths)
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        def record(video_path: str, entry: Dict[str, Any]):
+            results[video_path] = entry
+            if progress_callback:
+                progress_callback(video_path, entry, len(results), total)
+        
+        pending = []
+        for video_path in video_paths:
+            resolved = str(Path(video_path).resolve())
+            if not force_reprocess and self._is_video_processed(resolved):
+                record(video_path, {"video_path": resolved, "status": "skipped"})
+            else:
+                pending.append(video_path)
+                
+        if pending:
+            workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+            workers = max(1, min(workers, len(pending)))
+            settings = {name: getattr(self, name) for name in _BATCH_WORKER_SETTINGS}
+            
+            # spawn: the server process is multi-threaded, so forking is unsafe
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_batch_worker,
+                initargs=(self.db_path, str(self.cache_dir), settings),
+            ) as executor:
+                futures = {
+                    executor.submit(_analyze_in_batch_worker, video_path, force_reprocess): video_path
+                    for video_path in pending
+                }
+                for future in as_completed(futures):
+                    video_path = futures[future]
+                    try:
+                        record(video_path, future.result())
+                    except Exception as e:
+                        self.logger.error(f"Batch analysis failed for {video_path}: {str(e)}")
+                        record(video_path, {"video_path": video_path, "status": "failed", "error": str(e)})
+                        
+        self._enforce_cache_budget()
+        return results
+    
     def get_video_analysis(self, video_path: str) -> Dict[str, Any]:
         """Retrieve complete analysis results for a video."""
         conn = sqlite3.connect(self.db_path)
@@ -654,35 +1040,81 @@ class VideoAnalyzer:
         finally:
             conn.close()
     
-    def search_video_content(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+    def get_scene_keyframes(self, video_path: str, max_scenes: int = 16) -> List[Dict[str, Any]]:
+        """
+        Pick one representative keyframe per detected scene.
+        
+        The middle keyframe of each scene is used; videos with more scenes
+        than ``max_scenes`` are subsampled evenly so per-video embedding cost
+        stays bounded.
+        
+        Args:
+            video_path: Path to an analyzed video
+            max_scenes: Maximum number of keyframes to return
+            
+        Returns:
+            Keyframe rows (with ``timestamp``) ordered by time
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        
+        try:
+            cursor = conn.execute(
+                """
+                SELECT frame_number, timestamp_seconds, frame_path, scene_id
+                FROM video_keyframes WHERE video_path = ?
+                ORDER BY timestamp_seconds
+                """,
+                (str(Path(video_path).resolve()),)
+            )
+            scenes: Dict[int, List[Dict[str, Any]]] = {}
+            for row in cursor.fetchall():
+                keyframe = dict(row)
+                keyframe['timestamp'] = keyframe.pop('timestamp_seconds')
+                scenes.setdefault(keyframe['scene_id'] or 0, []).append(keyframe)
+        finally:
+            conn.close()
+            
+        representatives = [frames[len(frames) // 2] for _, frames in sorted(scenes.items())]
+        if max_scenes > 0 and len(representatives) > max_scenes:
+            step = len(representatives) / max_scenes
+            representatives = [representatives[int(i * step)] for i in range(max_scenes)]
+        return representatives
+    
+    def search_video_content(self, query: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """
         Search video content using text query.
         
-        Searches through:
-        - OCR detected text in video frames
-        - Video file names and paths
-        - Scene descriptions (if available)
+        Searches OCR detected text in video frames through the FTS5 index,
+        ranked by bm25 (``score`` is the negated bm25, higher is better) with
+        a highlighted ``snippet`` of the matching text.
         """
+        fts_query = build_fts_query(query)
+        if not fts_query:
+            return []
+            
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         
         try:
-            # Search OCR text
             cursor = conn.execute("""
-                SELECT DISTINCT 
+                SELECT
                     vo.video_path,
                     vo.timestamp_seconds,
                     vo.detected_text,
                     vo.confidence,
                     vm.duration_seconds,
                     vm.width,
-                    vm.height
-                FROM video_ocr vo
+                    vm.height,
+                    bm25(video_ocr_fts) AS rank_score,
+                    snippet(video_ocr_fts, 0, '<mark>', '</mark>', '…', 12) AS snippet
+                FROM video_ocr_fts
+                JOIN video_ocr vo ON vo.id = video_ocr_fts.rowid
                 JOIN video_metadata vm ON vo.video_path = vm.video_path
-                WHERE vo.detected_text LIKE ?
-                ORDER BY vo.confidence DESC, vo.timestamp_seconds ASC
-                LIMIT ?
-            """, (f"%{query}%", limit))
+                WHERE video_ocr_fts MATCH ?
+                ORDER BY rank_score, vo.timestamp_seconds ASC
+                LIMIT ? OFFSET ?
+            """, (fts_query, limit, offset))
             
             results = []
             for row in cursor.fetchall():
@@ -690,6 +1122,8 @@ class VideoAnalyzer:
                     "video_path": row['video_path'],
                     "timestamp": row['timestamp_seconds'],
                     "matched_text": row['detected_text'],
+                    "snippet": row['snippet'],
+                    "score": -row['rank_score'],
                     "confidence": row['confidence'],
                     "duration": row['duration_seconds'],
                     "resolution": f"{row['width']}x{row['height']}",
@@ -701,6 +1135,26 @@ class VideoAnalyzer:
         finally:
             conn.close()
     
+    def count_video_content_matches(self, query: str) -> int:
+        """Count OCR'd video frames matching a text query."""
+        fts_query = build_fts_query(query)
+        if not fts_query:
+            return 0
+            
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # Same joins as search_video_content, so frames of videos without
+            # metadata are not counted
+            return conn.execute("""
+                SELECT COUNT(*)
+                FROM video_ocr_fts
+                JOIN video_ocr vo ON vo.id = video_ocr_fts.rowid
+                JOIN video_metadata vm ON vo.video_path = vm.video_path
+                WHERE video_ocr_fts MATCH ?
+            """, (fts_query,)).fetchone()[0]
+        finally:
+            conn.close()
+    
     def get_video_statistics(self) -> Dict[str, Any]:
         """Get statistics about processed videos."""
         conn = sqlite3.connect(self.db_path)
@@ -752,6 +1206,10 @@ def main():
     parser.add_argument("--stats", action="store_true", help="Show video analysis statistics")
     parser.add_argument("--db", default="video_analysis.db", help="Database path")
     parser.add_argument("--cache", default="cache/video", help="Cache directory")
+    parser.add_argument("--keyframe-backend", choices=["auto", "ffmpeg"], default="auto",
+                        help="Keyframe extraction backend")
+    parser.add_argument("--iframes-only", action="store_true",
+                        help="With the ffmpeg backend, sample I-frames only")
     
     args = parser.parse_args()
     
@@ -759,6 +1217,8 @@ def main():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     
     analyzer = VideoAnalyzer(db_path=args.db, cache_dir=args.cache)
+    analyzer.keyframe_backend = args.keyframe_backend
+    analyzer.keyframe_iframes_only = args.iframes_only
     
     if args.stats:
         stats = analyzer.get_video_statistics()
@@ -791,6 +1251,10 @@ def main():
         print(f"   Keyframes extracted: {result['keyframes_count']}")
         print(f"   Scenes detected: {result['scenes_count']}")
         print(f"   Text detections: {result['ocr_detections']}")
+        stats = result.get('keyframe_stats') or {}
+        if stats:
+            print(f"   Keyframe extraction: {stats['backend']}, {stats['elapsed_seconds']}s, "
+                  f"{stats['keyframes_per_second']} frames/s, {stats['realtime_factor']}x realtime")
     else:
         print(f"❌ Analysis failed: {result.get('error', 'Unknown error')}")
 
@@ -101,6 +101,153 @@ def test_video_analysis_imports():
         print(f"❌ Import test failed: {str(e)}")
         return False
 
+def test_keyframe_extraction_samples_intervals():
+    """Seek/grab keyframe extraction samples one frame per interval with valid hashes."""
+    import pytest
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+    from src.video_analysis import VideoAnalyzer, _ahash_from_gray_bytes
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "clip.avi")
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+        if not writer.isOpened():
+            pytest.skip("No video encoder available")
+        for i in range(100):
+            frame = np.full((48, 64, 3), (i * 2) % 256, dtype=np.uint8)
+            frame[:, : (i % 64)] = 255
+            writer.write(frame)
+        writer.release()
+        
+        analyzer = VideoAnalyzer(db_path=os.path.join(tmp, "video.db"), cache_dir=os.path.join(tmp, "cache"))
+        analyzer.keyframe_interval = 2  # 20 frames at 10 fps
+        metadata = {"fps": 10, "duration": 10}
+        
+        for seek_min in (10_000, 1):  # grab() path, then seek path
+            analyzer.keyframe_seek_min_frames = seek_min
+            keyframes = analyzer._extract_keyframes(video_path, metadata)
+            assert [k["frame_number"] for k in keyframes] == [0, 20, 40, 60, 80]
+            assert [k["timestamp"] for k in keyframes] == [0.0, 2.0, 4.0, 6.0, 8.0]
+            assert all(len(k["visual_hash"]) == 64 for k in keyframes)
+            assert all(os.path.exists(k["frame_path"]) for k in keyframes)
+            assert analyzer.last_keyframe_stats["keyframes"] == 5
+    
+    # Vectorised hash matches the scalar definition
+    gray = bytes(range(64)) + bytes([7] * 64)
+    assert _ahash_from_gray_bytes(gray) == ["0" * 32 + "1" * 32, "0" * 64]
+
+def test_batch_analysis_skips_unchanged_and_isolates_cache():
+    """Unchanged videos are skipped; same-named videos get distinct keyframe dirs."""
+    from src.video_analysis import VideoAnalyzer
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = VideoAnalyzer(db_path=os.path.join(tmp, "video.db"), cache_dir=os.path.join(tmp, "cache"))
+        
+        paths = []
+        for folder in ("a", "b"):
+            os.makedirs(os.path.join(tmp, folder))
+            path = os.path.join(tmp, folder, "clip.mp4")
+            with open(path, "wb") as f:
+                f.write(folder.encode() * 100)
+            paths.append(str(Path(path).resolve()))
+        
+        assert analyzer._keyframe_dir(paths[0]) != analyzer._keyframe_dir(paths[1])
+        
+        for path in paths:
+            analyzer._store_analysis_results(path, {"duration": 1.0}, [], [], [])
+            assert analyzer._is_video_processed(path)
+        
+        progress = []
+        results = analyzer.analyze_batch(paths, progress_callback=lambda p, e, d, t: progress.append((d, t)))
+        assert {r["status"] for r in results.values()} == {"skipped"}
+        assert progress == [(1, 2), (2, 2)]
+        
+        # Touching the file invalidates the stored fingerprint
+        stat = os.stat(paths[0])
+        os.utime(paths[0], (stat.st_atime, stat.st_mtime + 10))
+        assert not analyzer._is_video_processed(paths[0])
+        
+        # Failures in worker processes are reported per video
+        missing = os.path.join(tmp, "missing.mp4")
+        results = analyzer.analyze_batch([missing], max_workers=1)
+        assert results[missing]["status"] == "failed"
+
+def test_keyframe_cache_budget_evicts_oldest():
+    """Cache eviction removes least recently written keyframe directories first."""
+    from src.video_analysis import VideoAnalyzer
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = VideoAnalyzer(db_path=os.path.join(tmp, "video.db"), cache_dir=os.path.join(tmp, "cache"))
+        dirs = []
+        for i in range(3):
+            frame_dir = Path(tmp) / "cache" / f"0{i}" / f"0{i}key"
+            frame_dir.mkdir(parents=True)
+            (frame_dir / "frame_000000.jpg").write_bytes(b"x" * 1000)
+            os.utime(frame_dir, (1000 + i, 1000 + i))
+            dirs.append(frame_dir)
+        
+        analyzer.cache_budget_bytes = 2000
+        assert analyzer._enforce_cache_budget() == 1000
+        assert [d.exists() for d in dirs] == [False, True, True]
+
+def test_scene_keyframes_one_per_scene_and_capped():
+    """Scene representatives are the middle keyframe of each scene, capped evenly."""
+    from src.video_analysis import VideoAnalyzer
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = VideoAnalyzer(db_path=os.path.join(tmp, "video.db"), cache_dir=os.path.join(tmp, "cache"))
+        video_path = os.path.join(tmp, "clip.mp4")
+        with open(video_path, "wb") as f:
+            f.write(b"0" * 10)
+        video_path = str(Path(video_path).resolve())
+        
+        keyframes = [
+            {"frame_number": i, "timestamp": float(i), "frame_path": f"f{i}.jpg", "scene_id": i // 3}
+            for i in range(12)
+        ]
+        analyzer._store_analysis_results(video_path, {"duration": 12.0}, keyframes, [], [])
+        
+        scenes = analyzer.get_scene_keyframes(video_path, max_scenes=16)
+        assert [k["timestamp"] for k in scenes] == [1.0, 4.0, 7.0, 10.0]
+        
+        capped = analyzer.get_scene_keyframes(video_path, max_scenes=2)
+        assert [k["scene_id"] for k in capped] == [0, 2]
+
+def test_video_ocr_fts_search_ranks_and_snippets():
+    """Video OCR text is searchable through FTS5 with bm25 ranking and snippets."""
+    from src.video_analysis import VideoAnalyzer
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = VideoAnalyzer(db_path=os.path.join(tmp, "video.db"), cache_dir=os.path.join(tmp, "cache"))
+        video_path = os.path.join(tmp, "talk.mp4")
+        with open(video_path, "wb") as f:
+            f.write(b"0" * 10)
+        video_path = str(Path(video_path).resolve())
+        
+        ocr = [
+            {"frame_number": 0, "timestamp": 0.0, "detected_text": "Welcome to the keynote",
+             "confidence": 0.8, "language": "eng"},
+            {"frame_number": 30, "timestamp": 30.0, "detected_text": "Quarterly revenue revenue growth",
+             "confidence": 0.8, "language": "eng"},
+            {"frame_number": 60, "timestamp": 60.0, "detected_text": "Revenue by region and other notes",
+             "confidence": 0.8, "language": "eng"},
+        ]
+        analyzer._store_analysis_results(video_path, {"duration": 90.0}, [], [], ocr)
+        
+        results = analyzer.search_video_content("revenue")
+        assert [r["timestamp"] for r in results] == [30.0, 60.0]
+        assert "<mark>" in results[0]["snippet"]
+        assert results[0]["score"] >= results[1]["score"]
+        assert analyzer.count_video_content_matches("revenue") == 2
+        
+        # Prefix matching on the last word, and FTS syntax in user input is inert
+        assert [r["timestamp"] for r in analyzer.search_video_content("keyn")] == [0.0]
+        assert analyzer.search_video_content('revenue" OR "x') == []
+        
+        # Re-analysis replaces rows; the trigger-maintained index follows
+        analyzer._store_analysis_results(video_path, {"duration": 90.0}, [], [], ocr[:1])
+        assert analyzer.search_video_content("revenue") == []
+
 def test_api_endpoints():
     """Test that video analysis API endpoints are properly defined."""
     print("🌐 Testing API Endpoints...")
@@ -0,0 +1,97 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+
+class FakeS3(ThreadingHTTPServer):
+    """
+    Path-style ListObjectsV2/GetObject stand-in for one bucket.
+
+    GETs honour ``Range: bytes=start-end`` and are recorded in ``gets``
+    (keys) and ``ranges`` ((key, Range header or None)). Use as a context
+    manager to serve from a background thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.objects = {}
+        self.gets = []
+        self.ranges = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def put(self, key, body, etag=None):
+        self.objects[key] = (body, etag or f"etag-{len(body)}-{body[:4].hex()}")
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/octet-stream", etag=None, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", f'"{etag}"')
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        s3 = self.server
+        assert self.headers["Authorization"].startswith("AWS4-HMAC-SHA256")
+        s3.connections.add(self.client_address)
+        url = urlparse(self.path)
+        _, bucket, *rest = url.path.split("/", 2)
+        assert bucket == "photos"
+        key = rest[0] if rest else ""
+
+        if not key:
+            prefix = parse_qs(url.query).get("prefix", [""])[0]
+            contents = "".join(
+                f"<Contents><Key>{escape(k)}</Key><ETag>&quot;{etag}&quot;</ETag>"
+                f"<Size>{len(body)}</Size><LastModified>2024-01-01T00:00:00Z</LastModified></Contents>"
+                for k, (body, etag) in sorted(s3.objects.items()) if k.startswith(prefix)
+            )
+            xml = (
+                '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f"{contents}<IsTruncated>false</IsTruncated></ListBucketResult>"
+            )
+            return self._send(200, xml.encode(), "application/xml")
+
+        if key not in s3.objects:
+            return self._send(404, b"NoSuchKey")
+        rng = self.headers.get("Range")
+        with s3.lock:
+            s3.gets.append(key)
+            s3.ranges.append((key, rng))
+            s3.in_flight += 1
+            s3.max_in_flight = max(s3.max_in_flight, s3.in_flight)
+        time.sleep(0.05)
+        with s3.lock:
+            s3.in_flight -= 1
+        body, etag = s3.objects[key]
+        if rng:
+            start, end = (int(x) for x in rng.split("=", 1)[1].split("-"))
+            part = body[start:end + 1]
+            content_range = f"bytes {start}-{start + len(part) - 1}/{len(body)}"
+            return self._send(206, part, etag=etag, headers={"Content-Range": content_range})
+        self._send(200, body, etag=etag)
@@ -0,0 +1,104 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from server.albums_db import AlbumsDB
+
+
+@pytest.fixture
+def albums(tmp_path):
+    db = AlbumsDB(str(tmp_path / "albums.db"))
+    yield db
+    db.close()
+
+
+def test_counts_and_covers_come_from_one_row_per_album(albums):
+    albums.create_album("trip", "Trip")
+    albums.create_album("empty", "Empty")
+    albums.add_photos_to_album("trip", ["/lib/b.jpg", "/lib/a.jpg", "/lib/a.jpg"])
+    albums.remove_photos_from_album("trip", ["/lib/b.jpg", "/lib/missing.jpg"])
+    albums.add_photos_to_album("trip", ["/lib/c.jpg"])
+
+    listed = {album.id: album for album in albums.list_albums()}
+    assert listed["trip"].photo_count == 2
+    assert listed["empty"].photo_count == 0 and listed["empty"].cover_photo_path is None
+    assert listed["trip"].cover_photo_path in {"/lib/a.jpg", "/lib/c.jpg"}
+
+    albums.update_album("trip", cover_photo_path="/lib/c.jpg")
+    assert albums.get_album("trip").cover_photo_path == "/lib/c.jpg"
+    assert [a.id for a in albums.get_photo_albums("/lib/a.jpg")] == ["trip"]
+
+    albums.delete_album("trip")
+    assert albums.memberships() == []
+
+
+def test_sync_only_touches_the_difference(albums):
+    events = []
+    albums.add_change_listener(lambda event, album_id, paths: events.append((event, sorted(paths))))
+    albums.create_album("smart", "Smart", is_smart=True)
+    assert albums.sync_album_photos("smart", ["/a.jpg", "/b.jpg"]) == (2, 0)
+    stamp = albums.conn.execute(
+        "SELECT added_at FROM album_photos WHERE photo_path = '/a.jpg'"
+    ).fetchone()[0]
+
+    assert albums.sync_album_photos("smart", ["/a.jpg", "/c.jpg", "/c.jpg"]) == (1, 1)
+    assert albums.sync_album_photos("smart", ["/a.jpg", "/c.jpg"]) == (0, 0)
+    assert events == [("add", ["/a.jpg", "/b.jpg"]), ("add", ["/c.jpg"]), ("remove", ["/b.jpg"])]
+    assert albums.get_album("smart").photo_count == 2
+    # Unchanged members keep their rows
+    assert albums.conn.execute(
+        "SELECT added_at FROM album_photos WHERE photo_path = '/a.jpg'"
+    ).fetchone()[0] == stamp
+
+
+def test_cursor_pages_walk_the_album_in_order(albums):
+    albums.create_album("big", "Big")
+    paths = [f"/lib/{i:03d}.jpg" for i in range(25)]
+    albums.add_photos_to_album("big", paths)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = albums.get_album_photos_page("big", limit=10, cursor=cursor)
+        seen += page
+        if cursor is None:
+            break
+    assert seen == albums.get_album_photos("big") == paths
+    with pytest.raises(ValueError):
+        albums.get_album_photos_page("big", cursor="not-a-cursor")
+
+
+def test_counts_are_backfilled_on_old_databases(tmp_path):
+    with sqlite3.connect(tmp_path / "albums.db") as conn:
+        conn.execute("CREATE TABLE albums (id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT, "
+                     "cover_photo_path TEXT, created_at TIMESTAMP, updated_at TIMESTAMP, "
+                     "is_smart BOOLEAN DEFAULT FALSE, smart_rules TEXT)")
+        conn.execute("CREATE TABLE album_photos (album_id TEXT NOT NULL, photo_path TEXT NOT NULL, "
+                     "added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, sort_order INTEGER DEFAULT 0, "
+                     "PRIMARY KEY (album_id, photo_path))")
+        conn.execute("INSERT INTO albums (id, name) VALUES ('old', 'Old')")
+        conn.executemany("INSERT INTO album_photos (album_id, photo_path) VALUES (?, ?)",
+                         [("old", "/x.jpg"), ("old", "/y.jpg"), ("gone", "/z.jpg")])
+
+    albums = AlbumsDB(str(tmp_path / "albums.db"))
+    assert albums.get_album("old").photo_count == 2
+    assert len(albums.memberships()) == 2
+    albums.add_photos_to_album("old", ["/z.jpg"])
+    assert albums.get_album("old").photo_count == 3
+    albums.close()
+
+
+def test_concurrent_syncs_keep_their_own_staged_sets(albums):
+    album_ids = [f"smart{i}" for i in range(8)]
+    for album_id in album_ids:
+        albums.create_album(album_id, album_id, is_smart=True)
+
+    def sync(album_id):
+        for round_ in range(20):
+            albums.sync_album_photos(album_id, [f"/{album_id}/{round_}/{n}.jpg" for n in range(50)])
+
+    with ThreadPoolExecutor(max_workers=len(album_ids)) as pool:
+        list(pool.map(sync, album_ids))
+
+    for album_id in album_ids:
+        assert sorted(albums.get_album_photos(album_id)) == sorted(f"/{album_id}/19/{n}.jpg" for n in range(50))
@@ -0,0 +1,166 @@
+import sqlite3
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server.albums_db import AlbumsDB
+from server.bulk_actions_db import BulkActionsDB
+from server.bulk_ops import DELETE, TRASH, BulkOpsEngine, StorePurger, sqlite_purger
+from server.config import settings
+from server.notes_db import NotesDB
+from server.ratings_db import RatingsDB
+from server.tags_db import TagsDB
+from server.trash_db import TrashDB
+from src.metadata_search import MetadataDatabase
+
+
+class RecordingJobs:
+    def __init__(self):
+        self.updates = []
+
+    def update_job(self, job_id, **fields):
+        self.updates.append(fields)
+
+
+@pytest.fixture
+def library(tmp_path):
+    files = []
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        path = tmp_path / name
+        path.write_bytes(b"jpeg")
+        files.append(str(path))
+    metadata = MetadataDatabase(str(tmp_path / "metadata.db"))
+    for path in files:
+        metadata.store_metadata(path, {"file": {"path": path}})
+    tags = TagsDB(tmp_path / "tags.db")
+    ratings = RatingsDB(tmp_path / "ratings.db")
+    notes = NotesDB(tmp_path / "notes.db")
+    albums = AlbumsDB(str(tmp_path / "albums.db"))
+    tags.add_photos("trip", files)
+    ratings.set_rating(files[0], 5)
+    notes.set_note(files[0], "keep me")
+    albums.create_album("trip", "Trip")
+    albums.add_photos_to_album("trip", files)
+    with sqlite3.connect(tmp_path / "faces.db") as conn:
+        conn.execute("CREATE TABLE face_detections (photo_path TEXT)")
+        conn.executemany("INSERT INTO face_detections VALUES (?)", [(p,) for p in files])
+
+    jobs = RecordingJobs()
+    engine = BulkOpsEngine(tags.registry, BulkActionsDB(tmp_path / "bulk_actions.db"), jobs=jobs, batch_size=2)
+    engine.add_purger(StorePurger(
+        "metadata", lambda op, paths, ids: metadata.mark_many_as_deleted(paths, op, notify=False), (DELETE, TRASH),
+    ))
+    engine.add_purger(StorePurger(
+        "albums", lambda op, paths, ids: albums.purge_photos(paths, smart_only=op == TRASH), (DELETE, TRASH),
+    ))
+    for name, columns in [("tags.db", [("tag_photos", "photo_id")]), ("ratings.db", [("photo_ratings", "photo_id")]),
+                          ("notes.db", [("photo_notes", "photo_id")])]:
+        engine.add_purger(sqlite_purger(name, tmp_path / name, columns, by_id=True))
+    engine.add_purger(sqlite_purger("faces", tmp_path / "faces.db", [("face_detections", "photo_path")]))
+    engine.add_purger(sqlite_purger("never opened", tmp_path / "missing.db", [("t", "photo_path")]))
+    engine.set_favorite_store(lambda paths, favorite: metadata.set_favorites(paths, favorite, notify=False))
+
+    yield SimpleNamespace(files=files, engine=engine, jobs=jobs, metadata=metadata, tags=tags, ratings=ratings,
+                          notes=notes, albums=albums, tmp_path=tmp_path)
+    albums.close()
+    metadata.close()
+
+
+def test_delete_removes_files_and_every_store_row(library):
+    engine, files = library.engine, library.files
+    targets = engine.resolve(paths=files[:2])
+
+    def delete_file(path):
+        if path == files[1]:
+            raise PermissionError("read-only")
+        library.tmp_path.joinpath(path).unlink()
+
+    result = engine.run(DELETE, targets, file_op=delete_file, job_id="job-1")
+    assert result.processed == [files[0]]
+    assert result.errors == [f"{files[1]}: read-only"]
+
+    assert library.metadata.get_metadata(files[0]) is None
+    assert library.tags.get_photo_tags(files[0]) == []
+    assert library.ratings.get_rating(files[0]) == 0
+    assert library.notes.get_note(files[0]) is None
+    assert sorted(library.albums.get_album_photos("trip")) == files[1:]
+    with sqlite3.connect(library.tmp_path / "faces.db") as conn:
+        assert sorted(r[0] for r in conn.execute("SELECT photo_path FROM face_detections")) == files[1:]
+    assert engine.registry.id_for(files[0]) is None
+    assert not (library.tmp_path / "missing.db").exists()
+
+    # The file that could not be deleted keeps all of its data
+    assert library.tags.get_photo_tags(files[1]) == ["trip"]
+    assert library.jobs.updates[-1]["status"] == "completed"
+    action = engine.bulk_actions_db.get_action(result.action_id)
+    assert (action.action_type, action.affected_paths) == ("delete", [files[0]])
+
+
+def test_trash_keeps_feature_rows_for_restore(library):
+    engine, files = library.engine, library.files
+    result = engine.run(TRASH, engine.resolve(paths=files), undo_data=lambda r: {"kept": True})
+    assert result.processed == files
+    assert library.metadata.get_metadata_many(files) == {}
+    assert library.tags.get_photo_tags(files[2]) == ["trip"]
+    assert library.albums.get_album("trip").photo_count == 3
+    assert engine.bulk_actions_db.get_action(result.action_id).operation_data == {"kept": True}
+
+
+def test_trash_is_reverted_when_its_rows_cannot_be_written(library, monkeypatch):
+    monkeypatch.setattr(settings, "BASE_DIR", library.tmp_path)
+    trash_db = TrashDB(library.tmp_path / "trash.db")
+    monkeypatch.setattr(main, "trash_db", trash_db)
+
+    def create_many(items):
+        raise sqlite3.OperationalError("disk full")
+
+    monkeypatch.setattr(trash_db, "create_many", create_many)
+    engine, files = library.engine, library.files
+    roots = main._trash_allowed_roots()
+
+    result = engine.run(
+        TRASH, engine.resolve(paths=files[:2]),
+        file_op=lambda path: main._move_to_trash(path, roots),
+        after_files=lambda moved: trash_db.create_many(moved.values()),
+        undo_file=main._undo_move_to_trash,
+    )
+    assert result.processed == [] and result.action_id is None
+    assert all("disk full" in error and "reverted" in error for error in result.errors)
+    # Files are back and still indexed
+    assert all(Path(f).exists() for f in files)
+    assert sorted(library.metadata.get_metadata_many(files)) == files
+
+
+def test_favorites_record_only_changes(library):
+    engine, files = library.engine, library.files
+    library.metadata.set_favorites([files[0]], True)
+    result = engine.set_favorites(engine.resolve(paths=files), True)
+    assert sorted(result.processed) == files[1:]
+    assert engine.bulk_actions_db.get_action(result.action_id).operation_data == {"favorite": True}
+    assert library.metadata.set_favorites(files, False) == files
+
+
+def test_trash_endpoint_moves_in_one_job_and_undoes(library, monkeypatch):
+    monkeypatch.setattr(settings, "BASE_DIR", library.tmp_path)
+    monkeypatch.setattr(main, "trash_db", TrashDB(library.tmp_path / "trash.db"))
+    monkeypatch.setattr(main, "_bulk_ops_engine", library.engine)
+    monkeypatch.setattr(main, "_reindex_one_file", lambda path: None)
+    client = TestClient(main.app)
+    files = library.files
+    photo_id = library.engine.registry.ensure_id(files[0])
+
+    body = client.post("/trash/move", json={"photo_ids": [photo_id], "file_paths": [files[1], "/etc/hosts"]}).json()
+    assert sorted(item["original_path"] for item in body["moved"]) == files[:2]
+    assert body["errors"] == ["/etc/hosts: Path is outside connected sources"]
+    assert len(main.trash_db.list()) == 2
+    assert not any(library.tmp_path.joinpath(f).exists() for f in files[:2])
+
+    undo = client.post(f"/bulk/undo/{body['action_id']}").json()
+    assert undo == {"success": True, "action_id": body["action_id"], "errors": []}
+    assert all(library.tmp_path.joinpath(f).exists() for f in files)
+    assert main.trash_db.list() == []
+
+    assert client.post("/bulk/delete", json={"file_paths": files}).status_code == 400
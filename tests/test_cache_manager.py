@@ -0,0 +1,82 @@
+import time
+
+from src.cache_manager import CacheManager, LRUCache, estimate_size
+
+
+def test_byte_budget_evicts_lru_entries():
+    cache = LRUCache(max_size=100, ttl=60, max_bytes=1000)
+    cache.set("a", b"x" * 400)
+    cache.set("b", b"x" * 400)
+    cache.get("a")  # "b" becomes least recently used
+    cache.set("c", b"x" * 400)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["bytes"] == 800
+    assert stats["evictions"] == 1
+
+
+def test_oversized_value_is_rejected_without_flushing():
+    cache = LRUCache(max_size=100, ttl=60, max_bytes=1000)
+    cache.set("small", b"x" * 100)
+    cache.set("huge", b"x" * 5000)
+    assert cache.get("huge") is None
+    assert cache.get("small") == b"x" * 100
+    assert cache.stats()["rejections"] == 1
+
+
+def test_overwrite_updates_byte_accounting():
+    cache = LRUCache(max_size=10, ttl=60, max_bytes=10_000)
+    cache.set("k", b"x" * 500)
+    cache.set("k", b"x" * 200)
+    assert cache.stats()["bytes"] == 200
+    cache.delete("k")
+    assert cache.stats()["bytes"] == 0
+
+
+def test_lazy_expiry_with_per_entry_ttl():
+    cache = LRUCache(max_size=10, ttl=60)
+    cache.set("short", "v", ttl=0.05)
+    cache.set("long", "v")
+    time.sleep(0.1)
+    assert cache.purge_expired() == 1
+    assert cache.get("long") == "v"
+    assert cache.stats()["expirations"] == 1
+
+    # Overwriting leaves a stale heap item that must not expire the new value
+    cache.set("k", "old", ttl=0.05)
+    cache.set("k", "new", ttl=60)
+    time.sleep(0.1)
+    cache.purge_expired()
+    assert cache.get("k") == "new"
+
+
+def test_large_values_are_compressed_transparently():
+    cache = LRUCache(max_size=10, ttl=60, compress_threshold=1024)
+    results = [{"path": f"/photos/{i}.jpg", "score": 0.5} for i in range(1000)]
+    cache.set("results", results)
+    stats = cache.stats()
+    assert stats["compressed_entries"] == 1
+    assert stats["bytes"] < estimate_size(results) / 2
+    assert cache.get("results") == results
+
+
+def test_manager_stats_report_hits_misses_and_totals():
+    manager = CacheManager(max_size=10, ttl=60, memory_budgets={"thumbnail": 2048})
+    manager.cache_thumbnail("/a.jpg", (64, 64), b"x" * 1500)
+    manager.cache_thumbnail("/b.jpg", (64, 64), b"x" * 1500)
+    assert manager.get_cached_thumbnail("/a.jpg", (64, 64)) is None
+    assert manager.get_cached_thumbnail("/b.jpg", (64, 64)) == b"x" * 1500
+
+    manager.cache_search_results("cats", {"limit": 10}, [{"path": "/c.jpg"}], ttl=60)
+    assert manager.get_cached_search_results("cats", {"limit": 10}) == [{"path": "/c.jpg"}]
+
+    stats = manager.stats()
+    thumbs = stats["caches"]["thumbnail_cache"]
+    assert thumbs["max_bytes"] == 2048
+    assert (thumbs["hits"], thumbs["misses"], thumbs["evictions"]) == (1, 1, 1)
+    assert stats["totals"]["hits"] == 2
+    manager.clear()
+    assert manager.cleanup() == 0
+    assert stats["totals"]["size"] == 2 and manager.stats()["totals"]["size"] == 0
@@ -0,0 +1,102 @@
+import asyncio
+import gc
+import sqlite3
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server import db_pool
+from server.executors import ExecutionPools
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "store.db"
+    with db_pool.connect(path) as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+    return path
+
+
+def test_thread_reuses_one_tuned_connection(db):
+    with db_pool.connect(db) as first:
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA busy_timeout").fetchone()[0] == db_pool.SQLiteProfile().busy_timeout_ms
+    with db_pool.connect(str(db), row_factory=sqlite3.Row) as second:
+        assert second is first
+        assert isinstance(second.execute("SELECT 1 AS one").fetchone(), sqlite3.Row)
+    # The row factory only lasts for its checkout
+    with db_pool.connect(db) as third:
+        assert third.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_transactions_keep_their_boundaries(db):
+    with pytest.raises(RuntimeError):
+        with db_pool.connect(db) as conn:
+            conn.execute("INSERT INTO items VALUES ('rolled back')")
+            raise RuntimeError()
+
+    with db_pool.connect(db) as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        # Nested use gets its own connection, like a second sqlite3.connect()
+        with db_pool.connect(db) as inner:
+            assert inner is not outer
+            assert inner.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+    with db_pool.connect(db) as conn:
+        assert [r[0] for r in conn.execute("SELECT name FROM items")] == ["outer"]
+
+
+def test_replaced_file_is_reopened(db):
+    with db_pool.connect(db) as conn:
+        conn.execute("INSERT INTO items VALUES ('old')")
+    db.unlink()
+    for suffix in ("-wal", "-shm"):
+        db.with_name(db.name + suffix).unlink(missing_ok=True)
+    with db_pool.connect(db) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master").fetchall() == []
+
+
+def test_connections_close_when_their_thread_exits(db):
+    before = db_pool.stats()["connections_open"]
+
+    def work():
+        with db_pool.connect(db) as conn:
+            conn.execute("SELECT COUNT(*) FROM items").fetchone()
+
+    threads = [threading.Thread(target=work) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert db_pool.stats()["connections_open"] == before
+
+
+def test_queries_are_attributed_across_the_io_pool(db):
+    pools = ExecutionPools(io_threads=1)
+
+    def count_items():
+        with db_pool.connect(db) as conn:
+            return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    async def request():
+        with db_pool.track_endpoint(lambda: "GET /items"):
+            await pools.run_io(count_items)
+            await pools.run_io(count_items)
+
+    db_pool.reset_stats()
+    asyncio.run(request())
+    pools.shutdown()
+    stats = db_pool.stats()["endpoints"]["GET /items"]
+    assert stats["requests"] == 1 and stats["queries"] == 2
+
+
+def test_db_stats_endpoint_reports_routes():
+    client = TestClient(main.app)
+    db_pool.reset_stats()
+    assert client.get("/sources").status_code == 200
+    stats = client.get("/db/stats").json()
+    assert stats["profile"]["journal_mode"] == "WAL"
+    assert stats["endpoints"]["GET /sources"]["queries"] >= 1
@@ -0,0 +1,89 @@
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from server.executors import EndpointLimiter, ExecutionPools
+from server.image_loader import render_thumbnail
+
+
+def test_blocking_io_does_not_stall_the_loop():
+    pools = ExecutionPools(io_threads=2)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        result = await pools.run_io(lambda: (time.sleep(0.3), "done")[1])
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    pools.shutdown()
+    assert result == "done"
+    assert ticks >= 10
+
+
+def test_limiter_queues_then_sheds():
+    limiter = EndpointLimiter("thumbnail", max_concurrent=1, max_waiting=1)
+
+    async def scenario():
+        release = asyncio.Event()
+        order = []
+
+        async def hold(name):
+            async with limiter.slot():
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(hold("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold("second"))
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        with pytest.raises(HTTPException) as exc:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(first, second)
+        return order, exc.value
+
+    order, error = asyncio.run(scenario())
+    assert order == ["first", "second"]
+    assert error.status_code == 503 and error.headers["Retry-After"] == "1"
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_thumbnails_render_in_worker_process(tmp_path):
+    path = tmp_path / "big.png"
+    Image.new("RGBA", (1200, 800), (10, 20, 30, 255)).save(path)
+    pools = ExecutionPools(cpu_workers=1)
+    try:
+        data = asyncio.run(pools.run_cpu(render_thumbnail, str(path), 300, "JPEG"))
+    finally:
+        pools.shutdown()
+    with Image.open(io.BytesIO(data)) as thumb:
+        assert thumb.format == "JPEG" and thumb.size == (300, 200)
+
+
+def test_heic_thumbnails_render_in_worker_process(tmp_path):
+    pillow_heif = pytest.importorskip("pillow_heif")
+    path = tmp_path / "photo.heic"
+    pillow_heif.from_pillow(Image.new("RGB", (640, 480), (200, 40, 40))).save(path)
+    pools = ExecutionPools(cpu_workers=1)
+    try:
+        # The spawned worker only imports server.image_loader, which must register the HEIF opener
+        data = asyncio.run(pools.run_cpu(render_thumbnail, str(path), 160, "JPEG"))
+    finally:
+        pools.shutdown()
+    with Image.open(io.BytesIO(data)) as thumb:
+        assert thumb.format == "JPEG" and thumb.size == (160, 120)
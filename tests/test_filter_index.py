@@ -0,0 +1,175 @@
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server.albums_db import AlbumsDB
+from server.config import settings
+from server.filter_index import FilterIndex, IntBitmap
+from server.hybrid_search import HybridSearchEngine
+from server.lancedb_store import LanceDBStore
+from server.ratings_db import RatingsDB
+from server.tags_db import TagsDB
+
+
+@pytest.fixture
+def library(tmp_path):
+    metadata_db = tmp_path / "metadata.db"
+    with sqlite3.connect(metadata_db) as conn:
+        conn.execute("CREATE TABLE metadata (file_path TEXT, metadata_json TEXT)")
+        conn.execute("CREATE TABLE favorites (file_path TEXT)")
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", [
+            ("/lib/a.jpg", json.dumps({"filesystem": {"created": "2024-05-01T10:00:00"}})),
+            ("/lib/b.mp4", json.dumps({"filesystem": {"created": "2024-06-02T10:00:00"}})),
+            ("/lib/c.jpg", "not json"),
+        ])
+        conn.execute("INSERT INTO favorites VALUES ('/lib/c.jpg')")
+    tags = TagsDB(tmp_path / "tags.db")
+    ratings = RatingsDB(tmp_path / "ratings.db")
+    albums = AlbumsDB(str(tmp_path / "albums.db"))
+    tags.add_photos("beach", ["/lib/a.jpg", "/lib/b.mp4"])
+    ratings.set_rating("/lib/c.jpg", 5)
+    albums.create_album("trip", "Trip")
+    albums.add_photos_to_album("trip", ["/lib/a.jpg"])
+
+    def open_index():
+        index = FilterIndex(
+            tags.registry, is_video=lambda path: path.endswith(".mp4"), metadata_db=metadata_db,
+            tags_db=tags, ratings_db=ratings, albums_db=albums, snapshot_path=tmp_path / "filter_index.bin",
+        )
+        tags.add_change_listener(index.on_tags_change)
+        ratings.add_change_listener(index.on_rating_change)
+        albums.add_change_listener(index.on_album_change)
+        return index
+
+    yield SimpleNamespace(metadata_db=metadata_db, tags=tags, ratings=ratings, albums=albums, open_index=open_index)
+    albums.close()
+
+
+def paths(index, expr):
+    return sorted(index.matching_paths(index.evaluate(expr)))
+
+
+def test_int_bitmap_algebra_and_serialization():
+    evens, small = IntBitmap(range(0, 200, 2)), IntBitmap(range(10))
+    assert list(evens & small) == [0, 2, 4, 6, 8]
+    assert len(evens | small) == 105
+    assert 198 in evens and 199 not in evens
+    difference = small - evens
+    difference.discard(9)
+    assert list(difference) == [1, 3, 5, 7]
+    assert IntBitmap.deserialize(evens.serialize()) == evens
+
+
+def test_boolean_filters_over_every_dimension(library):
+    index = library.open_index()
+    index.rebuild()
+    assert paths(index, {"and": ["tag:beach", {"not": "media:video"}]}) == ["/lib/a.jpg"]
+    assert paths(index, {"or": ["favorite", "album:trip"]}) == ["/lib/a.jpg", "/lib/c.jpg"]
+    assert paths(index, {"and": ["rating:5", "favorite"]}) == ["/lib/c.jpg"]
+    assert paths(index, "month:2024-06") == ["/lib/b.mp4"]
+    assert paths(index, {"not": {"or": []}}) == ["/lib/a.jpg", "/lib/b.mp4", "/lib/c.jpg"]
+    with pytest.raises(ValueError):
+        index.evaluate({"xor": ["tag:beach"]})
+
+
+def test_writes_update_the_bitmaps_in_place(library):
+    index = library.open_index()
+    index.rebuild()
+    library.tags.add_photos("beach", ["/lib/c.jpg"])
+    library.tags.remove_photos("beach", ["/lib/a.jpg"])
+    library.ratings.set_rating("/lib/c.jpg", 3)
+    library.albums.sync_album_photos("trip", ["/lib/b.mp4"])
+    assert paths(index, "tag:beach") == ["/lib/b.mp4", "/lib/c.jpg"]
+    assert paths(index, "rating:5") == [] and paths(index, "rating:3") == ["/lib/c.jpg"]
+    assert paths(index, "album:trip") == ["/lib/b.mp4"]
+
+    with sqlite3.connect(library.metadata_db) as conn:
+        conn.execute("DELETE FROM favorites")
+        conn.execute("INSERT INTO metadata VALUES ('/lib/d.jpg', ?)",
+                     (json.dumps({"filesystem": {"created": "2023-01-09T08:00:00"}}),))
+    index.on_metadata_change("favorite", "/lib/c.jpg")
+    index.on_metadata_change("upsert", "/lib/d.jpg")
+    index.on_metadata_change("delete", "/lib/a.jpg")
+    assert paths(index, "favorite") == []
+    assert paths(index, {"and": ["month:2023-01", "media:photo"]}) == ["/lib/d.jpg"]
+    assert paths(index, "all") == ["/lib/b.mp4", "/lib/c.jpg", "/lib/d.jpg"]
+
+    library.tags.delete_tag("beach")
+    assert index.keys("tag:") == []
+
+
+def test_snapshot_is_reused_until_a_store_changes(library):
+    index = library.open_index()
+    assert index.load_or_rebuild() == "rebuild"
+    assert index.save()
+
+    reopened = library.open_index()
+    assert reopened.load_or_rebuild() == "snapshot"
+    assert paths(reopened, "tag:beach") == ["/lib/a.jpg", "/lib/b.mp4"]
+
+    library.ratings.set_rating("/lib/a.jpg", 4)
+    assert library.open_index().load_or_rebuild() == "rebuild"
+
+
+def test_vector_search_is_restricted_before_ranking(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", tmp_path / "vectors")
+    store = LanceDBStore("photos")
+    store.add_batch(
+        ["/lib/near.jpg", "/lib/far's.jpg", "/lib/mid.jpg"],
+        [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]],
+        [{"path": "/lib/near.jpg"}, {"path": "/lib/far's.jpg"}, {"path": "/lib/mid.jpg"}],
+    )
+    hits = store.search([1.0, 0.0], limit=1, within={"/lib/far's.jpg", "/lib/mid.jpg"})
+    assert [h["id"] for h in hits] == ["/lib/mid.jpg"]
+    assert store.search([1.0, 0.0], limit=5, within=[]) == []
+
+
+def _search_endpoint(library, monkeypatch):
+    index = library.open_index()
+    index.rebuild()
+    main.cache_manager.search_results_cache.clear()
+    monkeypatch.setattr(main, "filter_index", index)
+    monkeypatch.setattr(main, "photo_search_engine", SimpleNamespace(
+        db=SimpleNamespace(get_metadata_by_path=lambda path: {}),
+        is_favorite=lambda path: pytest.fail("favorites come from the filter index"),
+    ))
+    ranked = [{"path": p, "score": 0.9 - i * 0.1} for i, p in enumerate(["/lib/a.jpg", "/lib/b.mp4", "/lib/c.jpg"])]
+    monkeypatch.setattr(main, "hybrid_search_engine", HybridSearchEngine(
+        lambda query, offset, limit: ranked[offset:offset + limit],
+        lambda query, offset, limit: [],
+        lambda query: {"primary_intent": "generic", "secondary_intents": [], "confidence": 0.0,
+                       "suggestions": [], "badges": []},
+    ))
+    client = TestClient(main.app)
+
+    def search(**params):
+        params = {"query": "lib", "mode": "hybrid", "log_history": False, **params}
+        response = client.get("/search", params=params)
+        assert response.status_code == 200, response.text
+        return [r["path"] for r in response.json()["results"]]
+
+    return client, search
+
+
+def test_search_endpoint_filters_through_the_index(library, monkeypatch):
+    client, search = _search_endpoint(library, monkeypatch)
+    assert search(tags="beach", type_filter="photos") == ["/lib/a.jpg"]
+    assert search(favorites_filter="favorites_only") == ["/lib/c.jpg"]
+    assert search(filter_expr=json.dumps({"or": ["album:trip", "rating:5"]})) == ["/lib/a.jpg", "/lib/c.jpg"]
+    bad = client.get("/search", params={"query": "lib", "mode": "hybrid", "filter_expr": '{"nand": []}'})
+    assert bad.status_code == 400
+
+
+def test_rating_and_album_writes_invalidate_cached_searches(library, monkeypatch):
+    _, search = _search_endpoint(library, monkeypatch)
+    assert search(filter_expr=json.dumps("rating:5")) == ["/lib/c.jpg"]
+    assert search(filter_expr=json.dumps("album:trip")) == ["/lib/a.jpg"]
+
+    library.ratings.set_rating("/lib/a.jpg", 5)
+    library.albums.add_photos_to_album("trip", ["/lib/b.mp4"])
+    assert search(filter_expr=json.dumps("rating:5")) == ["/lib/a.jpg", "/lib/c.jpg"]
+    assert search(filter_expr=json.dumps("album:trip")) == ["/lib/a.jpg", "/lib/b.mp4"]
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server.hybrid_search import HybridSearchEngine, fuse_rrf, fuse_weighted
+
+GENERIC = {"primary_intent": "generic", "secondary_intents": [], "confidence": 0.0, "suggestions": [], "badges": []}
+
+
+def ranked(prefix, count, top=0.9):
+    return [{"path": f"/lib/{prefix}{i}.jpg", "score": round(top - i * 0.01, 3)} for i in range(count)]
+
+
+def recording_source(hits, calls):
+    def source(query, offset, limit):
+        calls.append((offset, limit))
+        return hits[offset:offset + limit]
+    return source
+
+
+def test_weighted_fusion_joins_by_path():
+    metadata = [{"path": "/a.jpg", "score": 0}, {"path": "/b.jpg", "score": 0}]
+    semantic = [{"path": "/b.jpg", "score": 0.5}, {"path": "/c.jpg", "score": 0.3, "timestamp": 4.0}]
+    fused = {r["path"]: r for r in fuse_weighted(metadata, semantic, (0.6, 0.4))}
+    assert fused["/b.jpg"] == {"path": "/b.jpg", "score": 1.0, "source": "both", "intent": "metadata"}
+    assert fused["/a.jpg"]["score"] == 0.48 and fused["/a.jpg"]["source"] == "metadata"
+    assert fused["/c.jpg"]["score"] == 0.0 and fused["/c.jpg"]["timestamp"] == 4.0
+
+
+def test_rrf_rewards_agreement_between_sides():
+    metadata = [{"path": "/a.jpg"}, {"path": "/b.jpg"}]
+    semantic = [{"path": "/c.jpg", "score": 0.9}, {"path": "/b.jpg", "score": 0.8}]
+    fused = fuse_rrf(metadata, semantic, (0.5, 0.5), k=60)
+    assert [r["path"] for r in fused] == ["/b.jpg", "/a.jpg", "/c.jpg"]
+    assert fused[0]["source"] == "both"
+    assert fused[0]["score"] == round(0.5 / 62 + 0.5 / 62, 6)
+
+
+def test_deeper_pages_fetch_only_the_missing_tail():
+    metadata_calls, semantic_calls, intents = [], [], []
+    engine = HybridSearchEngine(
+        recording_source(ranked("m", 150), metadata_calls),
+        recording_source(ranked("s", 1000), semantic_calls),
+        lambda query: intents.append(query) or GENERIC,
+    )
+
+    results, exhausted, extra = engine.search("beach", 100, version=1)
+    assert len(results) == 200 and not exhausted
+    assert extra["weights"] == (0.6, 0.4)
+
+    engine.search("beach", 200, version=1)
+    assert metadata_calls == [(0, 100), (100, 100)]
+    assert semantic_calls == [(0, 100), (100, 100)]
+    assert intents == ["beach"]
+
+    # The metadata side ran dry; only the semantic side is extended
+    engine.search("beach", 300, version=1)
+    assert metadata_calls == [(0, 100), (100, 100)]
+    assert semantic_calls[-1] == (200, 100)
+
+    # A library change starts the candidates over
+    engine.search("beach", 100, version=2)
+    assert metadata_calls[-1] == (0, 100)
+
+
+def test_hybrid_endpoint_uses_bounded_candidates(monkeypatch):
+    main.cache_manager.search_results_cache.clear()
+    monkeypatch.setattr(main, "photo_search_engine", SimpleNamespace(
+        db=SimpleNamespace(get_metadata_by_path=lambda path: {}),
+        is_favorite=lambda path: False,
+    ))
+    monkeypatch.setattr(main.settings, "SEARCH_CACHE_DEPTH_STEP", 50)
+    metadata_calls, semantic_calls = [], []
+    monkeypatch.setattr(main, "hybrid_search_engine", HybridSearchEngine(
+        recording_source(ranked("m", 500), metadata_calls),
+        recording_source(ranked("s", 500), semantic_calls),
+        lambda query: GENERIC,
+    ))
+
+    page = TestClient(main.app).get(
+        "/search", params={"query": "beach", "mode": "hybrid", "limit": 10, "log_history": False}
+    ).json()
+    assert metadata_calls == [(0, 50)] and semantic_calls == [(0, 50)]
+    assert page["intent"]["fusion"] == "weighted"
+    assert page["results"][0]["path"] == "/lib/m0.jpg"
+    assert page["results"][0]["filename"] == "m0.jpg"
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+from src.job_queue import JobQueue, JobStatus
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _cpu_handler(job, update):
+    # Module-level so it can be pickled into a process-lane child
+    update(progress=50, message=f"pid {os.getpid()}")
+    deadline = time.time() + job.payload["seconds"]
+    while time.time() < deadline:
+        pass
+    return {"pid": os.getpid(), "parent": os.getppid()}
+
+
+def test_claim_is_atomic_across_threads(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), num_workers=0)
+    job_ids = {queue.add_job("noop", {"n": i}) for i in range(50)}
+
+    claimed = []
+    lock = threading.Lock()
+
+    def claim_all():
+        while True:
+            job = queue._claim_next_job()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job.id)
+
+    threads = [threading.Thread(target=claim_all) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+    assert queue.get_job(claimed[0]).status == JobStatus.PROCESSING
+    queue.close()
+
+
+def test_claim_respects_priority(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), num_workers=0)
+    low = queue.add_job("noop", {}, priority="low")
+    high = queue.add_job("noop", {}, priority="high")
+    assert queue._claim_next_job().id == high
+    assert queue._claim_next_job().id == low
+    assert queue._claim_next_job() is None
+    queue.close()
+
+
+def test_add_job_wakes_idle_worker(tmp_path):
+    # With a long idle poll, only the add_job notification can explain a fast pickup
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), num_workers=1, idle_poll_interval=30)
+    started = {}
+    queue.register_handler("noop", lambda job, update: started.setdefault(job.id, time.time()))
+    queue.start_workers()
+    time.sleep(0.1)  # Let the worker go idle
+
+    enqueued = time.time()
+    job_id = queue.add_job("noop", {})
+    assert _wait_for(lambda: queue.get_job(job_id).status == JobStatus.COMPLETED)
+    assert started[job_id] - enqueued < 0.5
+    queue.close()
+
+
+def test_failed_job_is_rescheduled_without_blocking_worker(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), num_workers=1, idle_poll_interval=30)
+    attempts = []
+
+    def flaky(job, update):
+        attempts.append(time.time())
+        if len(attempts) == 1:
+            raise RuntimeError("transient")
+        return {"ok": True}
+
+    queue.register_handler("flaky", flaky)
+    queue.register_handler("noop", lambda job, update: None)
+    queue.start_workers()
+
+    flaky_id = queue.add_job("flaky", {}, max_retries=1)
+    assert _wait_for(lambda: queue.get_job(flaky_id).status == JobStatus.RETRYING)
+    job = queue.get_job(flaky_id)
+    assert job.retry_count == 1
+    assert job.run_after is not None
+
+    # The single worker stays free during the backoff window
+    other_id = queue.add_job("noop", {})
+    assert _wait_for(lambda: queue.get_job(other_id).status == JobStatus.COMPLETED, timeout=1.0)
+    assert queue.get_job(flaky_id).status == JobStatus.RETRYING
+
+    assert _wait_for(lambda: queue.get_job(flaky_id).status == JobStatus.COMPLETED)
+    assert attempts[1] - attempts[0] >= 1.9
+    queue.close()
+
+
+def test_lane_routing_limits_claims_to_assigned_types(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), num_workers=0)
+    queue.register_lane("cpu", kind="process", max_workers=2)
+    queue.register_handler("dedupe", _cpu_handler, lane="cpu")
+    dedupe_id = queue.add_job("dedupe", {"seconds": 0}, priority="high")
+    other_id = queue.add_job("thumbnail", {})
+
+    assert queue._claim_next_job().id == other_id
+    assert queue._claim_next_job() is None
+    assert queue._claim_next_job("cpu").id == dedupe_id
+    queue.close()
+
+
+def test_process_lane_runs_jobs_on_separate_processes(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), num_workers=1)
+    queue.register_lane("cpu", kind="process", max_workers=2)
+    queue.register_handler("embed", _cpu_handler, lane="cpu")
+    queue.register_handler("dedupe", _cpu_handler, lane="cpu")
+    queue.start_workers()
+
+    job_ids = [queue.add_job("embed", {"seconds": 0.5}), queue.add_job("dedupe", {"seconds": 0.5})]
+    assert _wait_for(
+        lambda: all(queue.get_job(j).status == JobStatus.COMPLETED for j in job_ids), timeout=60
+    )
+    jobs = [queue.get_job(j) for j in job_ids]
+    pids = {job.result["pid"] for job in jobs}
+    assert len(pids) == 2
+    assert os.getpid() not in pids
+    assert all(job.result["parent"] == os.getpid() for job in jobs)
+    # Child progress was marshalled back before completion was recorded
+    assert all(job.progress == 100 and job.message == "Job completed successfully" for job in jobs)
+
+    stats = queue.get_queue_stats()
+    assert stats["lanes"]["cpu"] == {"kind": "process", "max_workers": 2, "job_types": ["dedupe", "embed"]}
+    queue.close()
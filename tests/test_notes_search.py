@@ -0,0 +1,106 @@
+import sqlite3
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server.notes_db import NotesDB, match_expression
+from src.metadata_search import MetadataDatabase, QueryEngine
+
+
+def test_match_expression_quotes_every_word():
+    assert match_expression('sun* OR "beach') == '"sun"* "OR"* "beach"*'
+    assert match_expression("  -- ") is None
+
+
+def test_notes_are_ranked_and_kept_in_sync(tmp_path):
+    notes = NotesDB(tmp_path / "notes.db")
+    notes.set_note("/lib/a.jpg", "Sunset over the beach, sunset again")
+    notes.set_note("/lib/b.jpg", "Beach volleyball at noon with a long description of the players")
+    notes.set_note("/lib/c.jpg", "Mountain lake")
+
+    hits = notes.search_notes("sun beach")
+    assert [h["photo_path"] for h in hits] == ["/lib/a.jpg"]
+    assert "<mark>Sunset</mark>" in hits[0]["snippet"]
+    assert [h["photo_path"] for h in notes.search_notes("beach")] == ["/lib/a.jpg", "/lib/b.jpg"]
+
+    # Updates and deletes reach the index through the triggers
+    notes.set_note("/lib/c.jpg", "Beach hut")
+    notes.delete_note("/lib/a.jpg")
+    assert notes.matching_paths("beach") == {"/lib/b.jpg", "/lib/c.jpg"}
+    assert notes.search_notes("mountain") == []
+
+
+def test_existing_notes_are_indexed_on_open(tmp_path):
+    NotesDB(tmp_path / "notes.db").set_note("/lib/a.jpg", "old harbour")
+    with sqlite3.connect(tmp_path / "notes.db") as conn:
+        conn.execute("DROP TABLE photo_notes_fts")
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER photo_notes_fts_{trigger}")
+    assert NotesDB(tmp_path / "notes.db").matching_paths("harb") == {"/lib/a.jpg"}
+
+
+def test_notes_field_in_metadata_queries(tmp_path):
+    db = MetadataDatabase(str(tmp_path / "metadata.db"))
+    for name, make in [("a.jpg", "Canon"), ("b.jpg", "Nikon"), ("c.jpg", "Canon")]:
+        db.store_metadata(f"/lib/{name}", {"exif": {"image": {"Make": make}}})
+    notes = NotesDB(tmp_path / "notes.db")
+    notes.set_note("/lib/a.jpg", "birthday party")
+    notes.set_note("/lib/b.jpg", "birthday cake")
+    engine = QueryEngine(db)
+    engine.register_text_field("notes", notes.matching_paths)
+
+    paths = lambda query: [r["file_path"] for r in engine.search(query)]
+    assert paths("notes:birthday") == ["/lib/a.jpg", "/lib/b.jpg"]
+    assert paths("notes:birth AND camera:Canon") == ["/lib/a.jpg"]
+    assert paths("notes!=cake") == ["/lib/a.jpg", "/lib/c.jpg"]
+    assert paths("notes:wedding") == []
+    db.close()
+
+
+def test_notes_search_endpoint_batches_metadata(tmp_path, monkeypatch):
+    notes = NotesDB(tmp_path / "notes.db")
+    notes.set_note("/lib/a.jpg", "harbour at dawn")
+    notes.set_note("/lib/b.jpg", "harbour at dusk")
+    notes.set_note("/lib/gone.jpg", "harbour")
+    lookups = []
+
+    def get_metadata_many(paths):
+        lookups.append(sorted(paths))
+        return {p: {"file": {"path": p}} for p in paths if p != "/lib/gone.jpg"}
+
+    monkeypatch.setattr(main, "get_notes_db", lambda path: notes)
+    monkeypatch.setattr(main, "photo_search_engine", SimpleNamespace(
+        db=SimpleNamespace(get_metadata_many=get_metadata_many),
+    ))
+    body = TestClient(main.app).get("/api/notes/search", params={"query": "harbour"}).json()
+    assert lookups == [["/lib/a.jpg", "/lib/b.jpg", "/lib/gone.jpg"]]
+    assert body["total"] == 2
+    assert {p["path"] for p in body["photos"]} == {"/lib/a.jpg", "/lib/b.jpg"}
+    assert body["photos"][0]["snippet"].startswith("<mark>harbour</mark>")
+
+
+def test_note_writes_invalidate_cached_notes_queries(tmp_path, monkeypatch):
+    db = MetadataDatabase(str(tmp_path / "metadata.db"))
+    for name in ("a.jpg", "b.jpg"):
+        db.store_metadata(f"/lib/{name}", {"file": {"name": name}})
+    notes = NotesDB(tmp_path / "notes.db")
+    notes.set_note("/lib/a.jpg", "birthday party")
+    engine = QueryEngine(db)
+    engine.register_text_field("notes", notes.matching_paths)
+    main.cache_manager.search_results_cache.clear()
+    monkeypatch.setattr(main, "filter_index", None)
+    monkeypatch.setattr(main, "photo_search_engine", SimpleNamespace(db=db, query_engine=engine))
+    client = TestClient(main.app)
+
+    def search():
+        response = client.get("/search", params={"query": "notes:birthday", "mode": "metadata", "log_history": False})
+        assert response.status_code == 200, response.text
+        return sorted(r["path"] for r in response.json()["results"])
+
+    assert search() == ["/lib/a.jpg"]
+    notes.set_note("/lib/b.jpg", "birthday cake")
+    assert search() == ["/lib/a.jpg", "/lib/b.jpg"]
+    notes.delete_note("/lib/a.jpg")
+    assert search() == ["/lib/b.jpg"]
+    db.close()
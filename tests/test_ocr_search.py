@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from src.ocr_search import OCRSearch, build_fts_query, fuse_ranked
+from src.video_analysis import VideoAnalyzer
+
+
+def _index(ocr, image_path, text, language="eng"):
+    conn = ocr._conn()
+    conn.execute(
+        "INSERT INTO ocr_text (image_path, text_content, language, confidence) VALUES (?, ?, ?, 0.8)",
+        (image_path, text, language),
+    )
+    conn.execute(
+        "INSERT INTO ocr_search_index (image_path, text_content, language) VALUES (?, ?, ?)",
+        (image_path, text, language),
+    )
+    conn.commit()
+
+
+def test_build_fts_query_quotes_terms():
+    assert build_fts_query("hello world") == '"hello" "world"*'
+    assert build_fts_query('say "hi"', prefix=False) == '"say" """hi"""'
+    assert build_fts_query("   ") == ""
+
+
+def test_search_text_ranks_with_bm25_and_snippets(tmp_path):
+    ocr = OCRSearch(db_path=str(tmp_path / "ocr.db"))
+    _index(ocr, "/photos/receipt.jpg", "total total amount due")
+    _index(ocr, "/photos/sign.jpg", "parking total prohibited")
+    _index(ocr, "/photos/menu.jpg", "soup of the day", language="fra")
+
+    results = ocr.search_text("total")
+    assert results["status"] == "success"
+    assert results["total"] == 2
+    assert [r["image_path"] for r in results["results"]] == ["/photos/receipt.jpg", "/photos/sign.jpg"]
+    assert results["results"][0]["confidence"] == 0.8
+    assert "<mark>total</mark>" in results["results"][0]["snippet"]
+
+    assert ocr.search_text("soup", language="fra")["total"] == 1
+    assert ocr.search_text("soup", language="eng")["total"] == 0
+    ocr.close()
+
+
+def test_fuse_ranked_uses_ranks_not_raw_scores():
+    images = [{"image_path": "/a.jpg", "score": 12.0}, {"image_path": "/b.jpg", "score": 11.5}]
+    # A small corpus gives much lower bm25 magnitudes for equally good matches
+    videos = [{"video_path": "/v.mp4", "score": 0.4}]
+    fused = fuse_ranked(images, videos, k=60)
+    assert [hit.get("image_path") or hit["video_path"] for hit in fused] == ["/a.jpg", "/v.mp4", "/b.jpg"]
+    assert fused[0]["fused_score"] == fused[1]["fused_score"] == round(1 / 61, 6)
+    assert fused[1]["score"] == 0.4
+
+
+def test_video_match_count_agrees_with_results(tmp_path):
+    analyzer = VideoAnalyzer(db_path=str(tmp_path / "video.db"), cache_dir=str(tmp_path / "cache"))
+    with sqlite3.connect(analyzer.db_path) as conn:
+        conn.execute("INSERT INTO video_metadata (video_path, duration_seconds, width, height) VALUES ('/v/a.mp4', 10, 640, 480)")
+        conn.executemany(
+            "INSERT INTO video_ocr (video_path, timestamp_seconds, detected_text, confidence) VALUES (?, ?, ?, 0.9)",
+            [("/v/a.mp4", 1.0, "exit sign"), ("/v/gone.mp4", 2.0, "exit only")],
+        )
+    # The frame of a video with no metadata row is neither returned nor counted
+    assert [hit["video_path"] for hit in analyzer.search_video_content("exit")] == ["/v/a.mp4"]
+    assert analyzer.count_video_content_matches("exit") == 1
+
+
+def test_embedding_only_analysis_skips_ocr_until_asked(tmp_path, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    video = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(video), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(30):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+
+    analyzer = VideoAnalyzer(db_path=str(tmp_path / "video.db"), cache_dir=str(tmp_path / "cache"))
+    ocr_calls = []
+
+    def fake_ocr(video_path, keyframes):
+        ocr_calls.append(len(keyframes))
+        return [{"frame_number": 0, "timestamp": 0.0, "detected_text": "exit", "confidence": 0.9, "language": "eng"}]
+
+    monkeypatch.setattr(analyzer, "_perform_video_ocr", fake_ocr)
+    # ffprobe may be missing here; the keyframes come from OpenCV
+    monkeypatch.setattr(analyzer, "_extract_video_metadata", lambda path: {"duration": 3.0, "fps": 10.0})
+    analyzer.keyframe_interval = 1
+    assert analyzer.analyze_video(str(video), ocr=False)["status"] == "completed"
+    assert ocr_calls == [] and analyzer.get_scene_keyframes(str(video.resolve()))
+
+    # A later full analysis OCRs the stored keyframes without re-analyzing
+    monkeypatch.setattr(analyzer, "_extract_keyframes", lambda *args: pytest.fail("re-analyzed"))
+    analyzer.analyze_video(str(video))
+    assert len(ocr_calls) == 1 and ocr_calls[0] > 0
+    assert analyzer.count_video_content_matches("exit") == 1
+    analyzer.analyze_video(str(video))
+    assert len(ocr_calls) == 1
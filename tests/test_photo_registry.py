@@ -0,0 +1,131 @@
+import json
+import sqlite3
+
+from server.notes_db import NotesDB
+from server.photo_registry import registry_for_store
+from server.ratings_db import RatingsDB
+from server.tags_db import TagsDB
+
+
+def test_feature_rows_follow_a_move(tmp_path):
+    tags = TagsDB(tmp_path / "tags.db")
+    ratings = RatingsDB(tmp_path / "ratings.db")
+    notes = NotesDB(tmp_path / "notes.db")
+    registry = tags.registry
+    assert ratings.registry is registry and notes.registry is registry
+
+    tags.add_photos("trip", ["/lib/a.jpg", "/lib/b.jpg"])
+    ratings.set_rating("/lib/a.jpg", 4)
+    notes.set_note("/lib/a.jpg", "sunset")
+    photo_id = registry.id_for("/lib/a.jpg")
+
+    assert registry.move("/lib/a.jpg", "/lib/2024/a.jpg") == photo_id
+    assert set(tags.get_tag_paths("trip")) == {"/lib/2024/a.jpg", "/lib/b.jpg"}
+    assert ratings.get_photos_by_rating(4) == ["/lib/2024/a.jpg"]
+    assert notes.get_note("/lib/2024/a.jpg") == "sunset"
+    assert tags.get_photo_tags("/lib/a.jpg") == []
+
+    assert registry.move_directory("/lib/2024", "/archive/2024") == 1
+    assert registry.path_for(photo_id) == "/archive/2024/a.jpg"
+    assert ratings.get_all_ratings()[0].photo_path == "/archive/2024/a.jpg"
+
+
+def test_path_keyed_tables_are_migrated(tmp_path):
+    with sqlite3.connect(tmp_path / "tags.db") as conn:
+        conn.execute("CREATE TABLE tags (name TEXT PRIMARY KEY, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)")
+        conn.execute(
+            "CREATE TABLE tag_photos (tag_name TEXT NOT NULL, photo_path TEXT NOT NULL, created_at TEXT NOT NULL, "
+            "PRIMARY KEY (tag_name, photo_path))"
+        )
+        conn.execute("INSERT INTO tags VALUES ('pets', 't', 't')")
+        conn.executemany("INSERT INTO tag_photos VALUES ('pets', ?, 't')", [("/p/cat.jpg",), ("/p/dog.jpg",)])
+    with sqlite3.connect(tmp_path / "ratings.db") as conn:
+        conn.execute(
+            "CREATE TABLE photo_ratings (photo_path TEXT PRIMARY KEY, rating INTEGER NOT NULL, "
+            "created_at TIMESTAMP, updated_at TIMESTAMP)"
+        )
+        conn.execute("INSERT INTO photo_ratings VALUES ('/p/cat.jpg', 5, 'c', 'u')")
+
+    tags = TagsDB(tmp_path / "tags.db")
+    ratings = RatingsDB(tmp_path / "ratings.db")
+    assert sorted(tags.get_tag_paths("pets")) == ["/p/cat.jpg", "/p/dog.jpg"]
+    assert ratings.get_rating("/p/cat.jpg") == 5
+    with sqlite3.connect(tmp_path / "tags.db") as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(tag_photos)")]
+    assert columns == ["tag_name", "photo_id", "created_at"]
+
+
+def test_cross_feature_filter_is_one_query(tmp_path):
+    tags = TagsDB(tmp_path / "tags.db")
+    ratings = RatingsDB(tmp_path / "ratings.db")
+    tags.add_photos("beach", ["/a.jpg", "/b.jpg", "/c.jpg"])
+    tags.add_photos("family", ["/b.jpg", "/c.jpg", "/d.jpg"])
+    ratings.bulk_set_ratings([("/b.jpg", 5), ("/c.jpg", 2), ("/d.jpg", 4)])
+
+    metadata_db = tmp_path / "metadata.db"
+    with sqlite3.connect(metadata_db) as conn:
+        conn.execute("CREATE TABLE metadata (file_path TEXT, metadata_json TEXT)")
+        conn.execute("CREATE TABLE favorites (file_path TEXT)")
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", [
+            (p, json.dumps({"filesystem": {"created": created}}))
+            for p, created in [("/b.jpg", "2024-05-01T10:00:00"), ("/c.jpg", "2023-01-01T10:00:00")]
+        ])
+        conn.executemany("INSERT INTO favorites VALUES (?)", [("/b.jpg",), ("/c.jpg",)])
+
+    registry = registry_for_store(tmp_path / "tags.db")
+    common = {"tags_db": tags.db_path, "ratings_db": ratings.db_path, "metadata_db": metadata_db}
+    assert registry.filter_paths(tags=["beach", "family"], tag_logic="OR", **common) == [
+        "/a.jpg", "/b.jpg", "/c.jpg", "/d.jpg",
+    ]
+    assert registry.filter_paths(tags=["beach", "family"], tag_logic="AND", **common) == ["/b.jpg", "/c.jpg"]
+    assert registry.filter_paths(tags=["family"], min_rating=4, **common) == ["/b.jpg", "/d.jpg"]
+    assert registry.filter_paths(
+        tags=["beach"], favorites_only=True, date_from="2024-01-01", **common
+    ) == ["/b.jpg"]
+
+
+def test_relink_adopts_the_id_of_a_moved_file(tmp_path):
+    notes = NotesDB(tmp_path / "notes.db")
+    old = tmp_path / "old.jpg"
+    old.write_bytes(b"jpeg")
+    notes.set_note(str(old), "kept")
+    new = tmp_path / "renamed.jpg"
+    old.rename(new)
+
+    assert notes.registry.relink(str(new)) is not None
+    assert notes.get_note(str(new)) == "kept"
+    # Already-registered paths are left alone
+    assert notes.registry.relink(str(new)) is None
+
+
+def test_reused_inode_does_not_inherit_a_deleted_photo(tmp_path):
+    tags = TagsDB(tmp_path / "tags.db")
+    old = tmp_path / "a.jpg"
+    old.write_bytes(b"private photo")
+    tags.add_photos("private", [str(old)])
+    ino = old.stat().st_ino
+    old.unlink()
+    new = tmp_path / "b.jpg"
+    new.write_bytes(b"unrelated")
+    if new.stat().st_ino != ino:
+        # Simulate the filesystem handing the freed inode to the new file
+        with sqlite3.connect(tmp_path / "photos.db") as conn:
+            conn.execute("UPDATE photos SET inode = ? WHERE path = ?", (new.stat().st_ino, str(old)))
+
+    assert tags.registry.relink(str(new)) is None
+    assert tags.get_photo_tags(str(new)) == []
+
+
+def test_move_over_a_registered_file_drops_its_rows(tmp_path):
+    tags = TagsDB(tmp_path / "tags.db")
+    ratings = RatingsDB(tmp_path / "ratings.db")
+    tags.add_photos("keep", ["/lib/a.jpg"])
+    ratings.set_rating("/lib/b.jpg", 2)
+    replaced = tags.registry.id_for("/lib/b.jpg")
+
+    kept = tags.registry.move("/lib/a.jpg", "/lib/b.jpg")
+    assert tags.get_photo_tags("/lib/b.jpg") == ["keep"]
+    assert ratings.get_rating("/lib/b.jpg") == 0
+    with sqlite3.connect(tmp_path / "ratings.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM photo_ratings WHERE photo_id = ?", (replaced,)).fetchone()[0] == 0
+    assert kept != replaced
@@ -0,0 +1,92 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from server.config import settings
+from server.face_clustering_db import FaceClusteringDB
+from server.lancedb_store import LanceDBStore
+from server.quantization import FLOAT16, FLOAT32, INT8, pack, packed_dtype, quantize, rerank, unpack
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def test_packed_vectors_round_trip_in_a_fraction_of_the_space():
+    vector = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+    sizes = {}
+    for dtype, tolerance in [(FLOAT32, 0), (FLOAT16, 1e-2), (INT8, 2e-2)]:
+        blob = pack(vector, dtype)
+        sizes[dtype] = len(blob)
+        assert packed_dtype(blob) == dtype
+        assert np.abs(unpack(blob) - vector).max() <= tolerance * np.abs(vector).max()
+    assert sizes == {FLOAT32: 2049, FLOAT16: 1025, INT8: 517}
+    # Rows written as JSON by earlier versions
+    assert unpack(json.dumps([1.0, 2.0])).tolist() == [1.0, 2.0]
+    assert unpack(b"[0.5]").tolist() == [0.5]
+    assert packed_dtype("[0.5]") is None
+
+    codes, scales = quantize(np.zeros((2, 4)), INT8)
+    assert codes.dtype == np.int8 and scales.tolist() == [1.0, 1.0]
+    order, scores = rerank([1.0, 0.0], [[0.0, 1.0], [2.0, 0.1], [1.0, 1.0]], k=2)
+    assert order.tolist() == [1, 2] and scores[0] > 0.99
+
+
+def test_float16_table_reranks_and_converts(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", tmp_path / "vectors")
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((300, 64)).astype(np.float32)
+    ids = [f"/lib/{i}.jpg" for i in range(300)]
+
+    exact = np.argsort(-(vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ _unit(vectors[7]))[:5]
+    half = LanceDBStore("half", dtype=FLOAT16)
+    half.add_batch(ids, vectors.tolist())
+    half.add("/lib/extra.jpg", vectors[0].tolist())
+    assert half.vector_dtype == FLOAT16
+    assert half.has_full_vectors
+    hits = half.search(vectors[7].tolist(), limit=3, offset=2)
+    assert [h["id"] for h in hits] == [ids[i] for i in exact[2:5]]
+    assert "vector" not in hits[0]["metadata"] and "vector_full" not in hits[0]["metadata"]
+    # Scores come from the float32 copies, not the float16 column
+    expected = np.dot(_unit(vectors[exact[2]]), _unit(vectors[7]))
+    assert abs(hits[0]["score"] - expected) < 1e-6
+
+    full = LanceDBStore("full")
+    full.add_batch(ids, vectors.tolist())
+    assert full.vector_dtype == FLOAT32
+    assert full.convert_vectors(FLOAT16) == 300 and full.convert_vectors(FLOAT16) == 0
+    reopened = LanceDBStore("full")
+    assert reopened.vector_dtype == FLOAT16 and reopened.get_count() == 300
+    assert reopened.search(vectors[7].tolist(), limit=1)[0]["id"] == ids[7]
+    # Converting back restores the exact float32 vectors
+    assert reopened.convert_vectors(FLOAT32) == 300 and not reopened.has_full_vectors
+    restored = np.array(reopened.table.to_arrow()["vector"].to_pylist(), dtype=np.float32)
+    order = np.argsort(reopened.table.to_arrow()["id"].to_pylist())
+    assert np.array_equal(restored[order], vectors[np.argsort(ids)])
+
+    with pytest.raises(ValueError):
+        LanceDBStore("bytes", dtype=INT8)
+
+
+def test_face_embeddings_are_packed_and_legacy_rows_convert(tmp_path):
+    db = FaceClusteringDB(tmp_path / "faces.db", embedding_dtype=INT8)
+    ref = db.add_face_detection("/lib/a.jpg", {"x": 0, "y": 0, "width": 1, "height": 1}, _unit([1, 0, 0, 0.1]))
+    db.add_face_detection("/lib/b.jpg", {"x": 0, "y": 0, "width": 1, "height": 1}, _unit([1, 0.05, 0, 0.1]))
+    with sqlite3.connect(tmp_path / "faces.db") as conn:
+        conn.execute("INSERT INTO face_detections (detection_id, photo_path, bounding_box, embedding) "
+                     "VALUES ('legacy', '/lib/c.jpg', '{}', ?)", (json.dumps(_unit([0.9, 0, 0.1, 0.1])),))
+        conn.execute("INSERT INTO face_detections (detection_id, photo_path, bounding_box, embedding) "
+                     "VALUES ('other', '/lib/d.jpg', '{}', ?)", (json.dumps(_unit([0, 1, 0, 0])),))
+
+    similar = db.find_similar_faces(ref, threshold=0.9)
+    assert [s["photo_path"] for s in similar] == ["/lib/b.jpg", "/lib/c.jpg"]
+
+    assert db.convert_embeddings(batch_size=1) == 2
+    assert db.convert_embeddings() == 0
+    with sqlite3.connect(tmp_path / "faces.db") as conn:
+        blobs = [row[0] for row in conn.execute("SELECT embedding FROM face_detections")]
+    assert {packed_dtype(b) for b in blobs} == {INT8}
+    assert [s["photo_path"] for s in db.find_similar_faces(ref, threshold=0.9)] == ["/lib/b.jpg", "/lib/c.jpg"]
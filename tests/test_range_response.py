@@ -0,0 +1,100 @@
+import anyio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server.range_response import RangeFileResponse, RangeNotSatisfiable, parse_range_header
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/f")
+    async def serve():
+        return RangeFileResponse(str(path), media_type="video/mp4", chunk_size=1000)
+
+    return TestClient(app)
+
+
+def test_parse_range_header():
+    assert parse_range_header(None, 100) is None
+    assert parse_range_header("bytes=0-9", 100) == [(0, 9)]
+    assert parse_range_header("bytes=90-", 100) == [(90, 99)]
+    assert parse_range_header("bytes=-10", 100) == [(90, 99)]
+    assert parse_range_header("bytes=50-200", 100) == [(50, 99)]
+    # Overlapping and adjacent ranges are coalesced
+    assert parse_range_header("bytes=20-29, 0-9,10-14, 25-40", 100) == [(0, 14), (20, 40)]
+    assert parse_range_header("bytes=9-1", 100) is None
+    assert parse_range_header("items=0-1", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=100-", 100)
+
+
+def test_full_and_single_range(client):
+    full = client.get("/f")
+    assert full.status_code == 200 and full.content == DATA
+    assert full.headers["accept-ranges"] == "bytes"
+
+    part = client.get("/f", headers={"Range": "bytes=5000-7499"})
+    assert part.status_code == 206
+    assert part.content == DATA[5000:7500]
+    assert part.headers["content-range"] == "bytes 5000-7499/10240"
+    assert part.headers["content-length"] == "2500"
+    assert part.headers["content-type"] == "video/mp4"
+
+    assert client.get("/f", headers={"Range": "bytes=20000-"}).status_code == 416
+
+
+def test_multi_range_is_multipart(client):
+    resp = client.get("/f", headers={"Range": "bytes=0-9, 100-119"})
+    assert resp.status_code == 206
+    ctype = resp.headers["content-type"]
+    assert ctype.startswith("multipart/byteranges; boundary=")
+    boundary = ctype.split("boundary=")[1].encode()
+    assert int(resp.headers["content-length"]) == len(resp.content)
+    parts = resp.content.split(b"--" + boundary)
+    assert parts[-1] == b"--\r\n"
+    assert parts[1].endswith(b"\r\n\r\n" + DATA[0:10] + b"\r\n")
+    assert b"Content-Range: bytes 100-119/10240" in parts[2]
+    assert parts[2].endswith(DATA[100:120] + b"\r\n")
+
+
+def test_if_range_mismatch_sends_whole_file(client):
+    etag = client.get("/f").headers["etag"]
+    assert client.get("/f", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    stale = client.get("/f", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == DATA
+
+
+def test_video_endpoint_serves_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.settings, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(main.settings, "MEDIA_DIR", tmp_path / "media")
+    path = tmp_path / "movie.mp4"
+    path.write_bytes(DATA)
+    resp = TestClient(main.app).get("/video", params={"path": str(path)}, headers={"Range": "bytes=-100"})
+    assert resp.status_code == 206
+    assert resp.content == DATA[-100:]
+
+
+def test_zero_copy_send_when_server_supports_it(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(DATA)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "headers": [(b"range", b"bytes=10-19")],
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    anyio.run(RangeFileResponse(str(path)), scope, None, send)
+    assert sent[0]["status"] == 206
+    assert [(m["offset"], m["count"]) for m in sent if m["type"] == "http.response.zerocopysend"] == [(10, 10)]
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
@@ -0,0 +1,183 @@
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from fake_s3 import FakeS3
+from server.remote_media import PreviewStore, RemoteFileCache, parse_remote_path, remote_path
+from server.s3_sync import S3Client, S3SyncEngine
+from server.source_items import SourceItemStore
+from src.metadata_extractor import extract_embedded_thumbnail, extract_header_metadata
+
+
+def _jpeg(size, color):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def _rational(deg, minutes, seconds):
+    return struct.pack("<6I", deg, 1, minutes, 1, seconds, 1)
+
+
+def exif_jpeg(thumbnail, padding=0):
+    """JPEG with an EXIF block holding a camera model, GPS and an IFD1 thumbnail."""
+    make = b"Canon\0"
+    ifd0_at, gps_at = 8, 8 + 2 + 2 * 12 + 4
+    gps_data_at = gps_at + 2 + 4 * 12 + 4
+    make_at = gps_data_at + 48
+    ifd1_at = make_at + len(make)
+    thumb_at = ifd1_at + 2 + 3 * 12 + 4
+
+    tiff = b"II*\0" + struct.pack("<I", ifd0_at)
+    tiff += struct.pack("<H", 2)
+    tiff += struct.pack("<HHII", 0x010F, 2, len(make), make_at)
+    tiff += struct.pack("<HHII", 0x8825, 4, 1, gps_at)
+    tiff += struct.pack("<I", ifd1_at)
+    tiff += struct.pack("<H", 4)
+    tiff += struct.pack("<HHI4s", 1, 2, 2, b"N\0\0\0")
+    tiff += struct.pack("<HHII", 2, 5, 3, gps_data_at)
+    tiff += struct.pack("<HHI4s", 3, 2, 2, b"E\0\0\0")
+    tiff += struct.pack("<HHII", 4, 5, 3, gps_data_at + 24)
+    tiff += struct.pack("<I", 0)
+    tiff += _rational(48, 51, 0) + _rational(2, 21, 0)
+    tiff += make
+    tiff += struct.pack("<H", 3)
+    tiff += struct.pack("<HHIHH", 0x0103, 3, 1, 6, 0)
+    tiff += struct.pack("<HHII", 0x0201, 4, 1, thumb_at)
+    tiff += struct.pack("<HHII", 0x0202, 4, 1, len(thumbnail))
+    tiff += struct.pack("<I", 0)
+    tiff += thumbnail
+
+    app1 = b"Exif\0\0" + tiff
+    main = _jpeg((640, 480), "navy")
+    # Comment segment stands in for the bulk of a real photo's bytes
+    com = b"\xff\xfe" + struct.pack(">H", padding + 2) + b"\0" * padding if padding else b""
+    return b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + com + main[2:]
+
+
+def test_header_metadata_and_thumbnail_from_leading_bytes():
+    thumb = _jpeg((160, 120), "red")
+    data = exif_jpeg(thumb, padding=60000)
+    header = data[:16 * 1024]
+
+    assert extract_embedded_thumbnail(header) == thumb
+    meta = extract_header_metadata("cloud:s1/abc", header, size_bytes=len(data),
+                                   modified="2024-03-01T10:00:00Z", name="IMG_1.jpg")
+    assert meta["file"]["name"] == "IMG_1.jpg" and meta["file"]["mime_type"] == "image/jpeg"
+    assert meta["filesystem"]["size_bytes"] == len(data)
+    assert meta["filesystem"]["created"].startswith("2024-03-01")
+    assert meta["exif"]["image"]["Make"] == "Canon"
+    assert meta["gps"]["latitude"] == pytest.approx(48.85)
+    assert meta["gps"]["longitude"] == pytest.approx(2.35)
+
+
+def test_remote_paths_round_trip():
+    path = remote_path("src1", "2024/a b.jpg")
+    assert parse_remote_path(path) == ("src1", "2024/a b.jpg")
+    assert parse_remote_path("/media/photo.jpg") is None
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path):
+    cache = RemoteFileCache(tmp_path / "cache", max_bytes=250)
+    fetched = []
+
+    def fetch(remote_id, dest):
+        fetched.append(remote_id)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(b"x" * 100)
+
+    a = cache.get("s", "a.jpg", fetch)
+    cache.get("s", "b.jpg", fetch)
+    assert cache.get("s", "a.jpg", fetch) == a
+    cache.get("s", "c.jpg", fetch)
+    assert fetched == ["a.jpg", "b.jpg", "c.jpg"]
+    # b was least recently used
+    assert a.exists() and not cache.path_for("s", "b.jpg").exists()
+    assert cache.size_bytes == 200
+
+    # Recency and size survive a restart
+    reopened = RemoteFileCache(tmp_path / "cache", max_bytes=250)
+    assert reopened.size_bytes == 200
+    reopened.get("s", "a.jpg", fetch)
+    assert fetched == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+@pytest.fixture
+def s3():
+    with FakeS3() as server:
+        yield server
+
+
+def test_remote_mode_sync_reads_only_headers(s3, tmp_path):
+    thumb = _jpeg((160, 120), "red")
+    s3.put("2024/big.jpg", exif_jpeg(thumb, padding=60000))
+    s3.put("2024/small.png", (lambda b: (Image.new("RGB", (40, 30), "green").save(b, "PNG"), b.getvalue())[1])(io.BytesIO()))
+    s3.put("2024/clip.mov", b"\0" * 5000)
+
+    store = SourceItemStore(tmp_path / "items.db")
+    previews = PreviewStore(tmp_path / "previews")
+    cfg = {
+        "endpoint_url": f"http://127.0.0.1:{s3.server_address[1]}",
+        "region": "us-east-1", "bucket": "photos",
+        "access_key_id": "AKIA", "secret_access_key": "secret", "force_path_style": True,
+    }
+    indexed = []
+    rejected = set()
+
+    def on_indexed(batch):
+        indexed.extend(batch)
+        return [p for p in batch if p.path not in rejected]
+
+    def engine():
+        return S3SyncEngine(
+            S3Client(cfg, max_connections=2), store, "src1", tmp_path / "mirror",
+            max_workers=2, previews=previews, on_indexed=on_indexed, header_bytes=4096,
+        )
+
+    result = engine().run()
+    assert result.downloaded == 3 and not result.failed
+    # Every read was ranged and capped at the header size
+    assert all(rng and int(rng.split("-")[1]) < 4096 for _, rng in s3.ranges)
+    assert not (tmp_path / "mirror").exists()
+
+    by_path = {p.path: p for p in indexed}
+    big = by_path["cloud:src1/2024/big.jpg"]
+    assert big.metadata["exif"]["image"]["Make"] == "Canon"
+    assert big.metadata["remote"]["etag"] == s3.objects["2024/big.jpg"][1]
+    assert Image.open(big.preview_path).size == (160, 120)
+    # Small enough to fit in the header read: the image is its own preview
+    assert Image.open(by_path["cloud:src1/2024/small.png"].preview_path).size == (40, 30)
+    assert by_path["cloud:src1/2024/clip.mov"].preview_path is None
+    assert store.get("src1", "2024/big.jpg").local_path == "cloud:src1/2024/big.jpg"
+
+    # Unchanged objects are not read again
+    s3.gets.clear()
+    indexed.clear()
+    result = engine().run()
+    assert result.downloaded == 0 and result.skipped == 3 and s3.gets == []
+
+    # A changed object that fails to index loses its local_path marker, so
+    # the next sync retries it
+    s3.put("2024/clip.mov", b"\1" * 6000)
+    rejected.add("cloud:src1/2024/clip.mov")
+    result = engine().run()
+    assert result.downloaded == 0 and list(result.failed) == ["2024/clip.mov"]
+    assert store.get("src1", "2024/clip.mov").local_path is None
+    rejected.clear()
+    indexed.clear()
+    result = engine().run()
+    assert result.downloaded == 1 and [p.path for p in indexed] == ["cloud:src1/2024/clip.mov"]
+
+
+def test_file_endpoint_only_fetches_manifest_items():
+    from fastapi.testclient import TestClient
+
+    import server.main as main
+
+    # Unknown keys are refused before any client is built or object fetched
+    with pytest.raises(FileNotFoundError):
+        main._remote_local_file("cloud:no-such-source/private/key.jpg")
+    response = TestClient(main.app).get("/file", params={"path": "cloud:no-such-source/private/key.jpg"})
+    assert response.status_code == 404
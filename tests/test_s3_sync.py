@@ -0,0 +1,119 @@
+import pytest
+
+from fake_s3 import FakeS3
+from server.s3_sync import S3Client, S3SyncEngine, s3_url
+from server.source_items import SourceItemStore
+
+
+@pytest.fixture
+def s3():
+    with FakeS3() as server:
+        yield server
+
+
+def _engine(s3, tmp_path, store, handoffs, **kwargs):
+    cfg = {
+        "endpoint_url": f"http://127.0.0.1:{s3.server_address[1]}",
+        "region": "us-east-1",
+        "bucket": "photos",
+        "access_key_id": "AKIA",
+        "secret_access_key": "secret",
+        "force_path_style": True,
+    }
+    client = S3Client(cfg, max_connections=4)
+    return S3SyncEngine(
+        client, store, "src1", tmp_path / "mirror",
+        is_media=lambda name: name.endswith(".jpg"),
+        max_workers=4,
+        on_downloaded=handoffs.append,
+        handoff_batch_size=3,
+        **kwargs,
+    )
+
+
+def test_s3_url_styles():
+    assert s3_url("https://s3.example.com", "b", "a/x.jpg") == "https://b.s3.example.com/a/x.jpg"
+    assert s3_url("http://localhost:9000/", "b", "a/x.jpg", path_style=True) == "http://localhost:9000/b/a/x.jpg"
+    assert s3_url("http://localhost:9000", "b", query={"list-type": "2"}, path_style=True) == "http://localhost:9000/b/?list-type=2"
+
+
+def test_concurrent_sync_streams_downloads_and_skips_unchanged(s3, tmp_path):
+    for i in range(10):
+        s3.put(f"2024/img_{i}.jpg", f"image {i}".encode())
+    s3.put("2024/notes.txt", b"not media")
+    store = SourceItemStore(tmp_path / "items.db")
+    handoffs = []
+
+    result = _engine(s3, tmp_path, store, handoffs).run()
+    assert result.downloaded == 10 and result.skipped == 0 and not result.failed
+    assert sorted(s3.gets) == sorted(f"2024/img_{i}.jpg" for i in range(10))
+    # Downloads overlapped on a small pool of reused connections
+    assert 1 < s3.max_in_flight <= 4
+    assert len(s3.connections) <= 5
+    # Finished files were handed off in batches, already recorded in the manifest
+    assert max(len(batch) for batch in handoffs) == 3
+    handed = [p for batch in handoffs for p in batch]
+    assert sorted(handed) == sorted(str(tmp_path / "mirror" / "2024" / f"img_{i}.jpg") for i in range(10))
+    items = store.get_items("src1")
+    assert set(items) == {f"2024/img_{i}.jpg" for i in range(10)}
+    assert all(item.local_path and item.status == "active" for item in items.values())
+    assert (tmp_path / "mirror" / "2024" / "img_3.jpg").read_bytes() == b"image 3"
+
+    # Second pass: only the changed object is fetched, the deleted one is reported
+    s3.gets.clear()
+    s3.put("2024/img_1.jpg", b"edited image 1")
+    del s3.objects["2024/img_2.jpg"]
+    store.set_status("src1", "2024/img_3.jpg", "trashed")
+    (tmp_path / "mirror" / "2024" / "img_3.jpg").unlink()
+    handoffs.clear()
+
+    result = _engine(s3, tmp_path, store, handoffs).run()
+    assert s3.gets == ["2024/img_1.jpg"]
+    assert result.downloaded == 1 and result.skipped == 8
+    assert [m.remote_id for m in result.removed] == ["2024/img_2.jpg"]
+    assert handoffs == [[str(tmp_path / "mirror" / "2024" / "img_1.jpg")]]
+    assert store.get("src1", "2024/img_3.jpg").status == "trashed"
+
+
+def test_failed_download_does_not_abort_sync(s3, tmp_path, monkeypatch):
+    for i in range(4):
+        s3.put(f"img_{i}.jpg", b"x" * (i + 1))
+    store = SourceItemStore(tmp_path / "items.db")
+    engine = _engine(s3, tmp_path, store, [])
+    original = engine.client.download
+
+    def flaky(key, dest):
+        if key == "img_2.jpg":
+            raise RuntimeError("connection reset")
+        original(key, dest)
+
+    monkeypatch.setattr(engine.client, "download", flaky)
+    result = engine.run()
+    assert result.downloaded == 3
+    assert result.failed == {"img_2.jpg": "connection reset"}
+    assert store.get("src1", "img_2.jpg").local_path is None
+
+
+def test_mirrored_files_are_recorded_and_unindexed_ones_retried(s3, tmp_path):
+    (tmp_path / "mirror").mkdir()
+    for i in range(3):
+        s3.put(f"img_{i}.jpg", f"image {i}".encode())
+        (tmp_path / "mirror" / f"img_{i}.jpg").write_bytes(f"image {i}".encode())
+    store = SourceItemStore(tmp_path / "items.db")
+    handoffs = []
+    indexed = {str(tmp_path / "mirror" / "img_0.jpg")}
+
+    result = _engine(
+        s3, tmp_path, store, handoffs,
+        unindexed=lambda paths: [p for p in paths if p not in indexed],
+    ).run()
+    assert s3.gets == [] and result.downloaded == 0 and result.skipped == 3
+    # The manifest points at the existing files even though it had no entries
+    assert {k: i.local_path for k, i in store.get_items("src1").items()} == {
+        f"img_{i}.jpg": str(tmp_path / "mirror" / f"img_{i}.jpg") for i in range(3)
+    }
+    # Files with no metadata row are indexed again
+    assert result.reindexed == 2
+    assert sorted(p for batch in handoffs for p in batch) == [
+        str(tmp_path / "mirror" / "img_1.jpg"), str(tmp_path / "mirror" / "img_2.jpg"),
+    ]
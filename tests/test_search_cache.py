@@ -0,0 +1,157 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server.main as main
+from server.tags_db import TagsDB
+from src.cache_manager import library_version
+
+client = TestClient(main.app)
+
+METADATA = {
+    f"/lib/img_{i}.jpg": {"filesystem": {"created": f"2024-01-0{i + 1}T00:00:00"}}
+    for i in range(5)
+}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    main.cache_manager.search_results_cache.clear()
+    fake = SimpleNamespace(
+        db=SimpleNamespace(get_metadata_by_path=METADATA.get),
+        is_favorite=lambda path: path.endswith("_1.jpg"),
+    )
+    monkeypatch.setattr(main, "photo_search_engine", fake)
+    return fake
+
+
+def test_metadata_pages_share_one_ranking(engine, monkeypatch):
+    calls = []
+
+    def fake_results(query, within=None):
+        calls.append(query)
+        return [
+            {"path": p, "filename": p.rsplit("/", 1)[1], "score": 0, "metadata": m}
+            for p, m in METADATA.items()
+        ]
+
+    monkeypatch.setattr(main, "_metadata_search_results", fake_results)
+
+    first = client.get("/search", params={"query": "img", "limit": 2}).json()
+    second = client.get("/search", params={"query": "  img ", "limit": 2, "offset": 2}).json()
+    assert calls == ["img"]
+    assert first["count"] == second["count"] == 5
+    # Newest first, and each page is enriched with metadata and explanations
+    assert [r["path"] for r in first["results"] + second["results"]] == [
+        "/lib/img_4.jpg", "/lib/img_3.jpg", "/lib/img_2.jpg", "/lib/img_1.jpg",
+    ]
+    assert second["results"][0]["metadata"] == METADATA["/lib/img_2.jpg"]
+    assert "matchExplanation" in second["results"][0]
+
+    # Different filters are a different ranking
+    favorites = client.get("/search", params={"query": "img", "favorites_filter": "favorites_only"}).json()
+    assert [r["path"] for r in favorites["results"]] == ["/lib/img_1.jpg"]
+    assert len(calls) == 2
+
+    library_version.bump()
+    client.get("/search", params={"query": "img", "limit": 2})
+    assert len(calls) == 3
+
+
+def test_semantic_ranking_is_reused_until_deeper_page(engine, monkeypatch):
+    depths = []
+
+    def fake_hits(query, depth):
+        depths.append(depth)
+        return [{"path": f"/lib/v{i}.jpg", "filename": f"v{i}.jpg", "score": 0.9 - i * 0.001} for i in range(depth)]
+
+    monkeypatch.setattr(main, "embedding_generator", object())
+    monkeypatch.setattr(main, "_semantic_hits", fake_hits)
+    monkeypatch.setattr(main.settings, "SEARCH_CACHE_DEPTH_STEP", 100)
+
+    for offset in (0, 50, 90):
+        page = client.get("/search/semantic", params={"query": "beach", "limit": 10, "offset": offset}).json()
+        assert page["results"][0]["path"] == f"/lib/v{offset}.jpg"
+    assert depths == [100]
+
+    client.get("/search/semantic", params={"query": "beach", "limit": 10, "offset": 95})
+    assert depths == [100, 200]
+
+
+def test_semantic_min_score_applies_before_paging(engine, monkeypatch):
+    monkeypatch.setattr(main, "embedding_generator", object())
+    monkeypatch.setattr(main, "_semantic_hits", lambda query, depth: [
+        {"path": f"/lib/s{i}.jpg", "filename": f"s{i}.jpg", "score": score}
+        for i, score in enumerate([0.5, 0.4, 0.1, 0.05])
+    ])
+    page = client.get("/search/semantic", params={"query": "dog", "limit": 5, "min_score": 0.3}).json()
+    assert [r["path"] for r in page["results"]] == ["/lib/s0.jpg", "/lib/s1.jpg"]
+    assert page["results"][0]["metadata"] == {}
+
+
+def _off_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return True
+    return False
+
+
+def test_clip_loads_once_off_the_event_loop(engine, monkeypatch):
+    loads = []
+
+    class SlowGenerator:
+        def __init__(self):
+            loads.append(_off_loop())
+            time.sleep(0.2)
+
+        def generate_text_embedding(self, query):
+            return [1.0, 0.0]
+
+    monkeypatch.setattr(main, "embedding_generator", None)
+    monkeypatch.setattr(main, "EmbeddingGenerator", SlowGenerator)
+    monkeypatch.setattr(main, "vector_store", SimpleNamespace(search=lambda *args, **kwargs: []))
+    monkeypatch.setattr(main, "video_frame_store", SimpleNamespace(get_count=lambda: 0))
+
+    def search(query):
+        return client.get("/search/semantic", params={"query": query}).status_code
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert list(pool.map(search, ["cat", "dog"])) == [200, 200]
+    assert loads == [True]
+
+
+def test_empty_semantic_query_lists_off_the_loop_in_one_batch(engine, monkeypatch):
+    batches = []
+
+    def get_metadata_many(paths):
+        batches.append((list(paths), _off_loop()))
+        return {p: METADATA[p] for p in paths if p in METADATA}
+
+    engine.db.get_metadata_many = get_metadata_many
+    engine.db.get_metadata_by_path = lambda path: pytest.fail("metadata is loaded in one batch")
+    records = [{"path": p} for p in list(METADATA)[:3]]
+    monkeypatch.setattr(main, "vector_store", SimpleNamespace(
+        get_all_records=lambda limit, offset: records[offset:offset + limit],
+    ))
+    page = client.get("/search/semantic", params={"query": " ", "limit": 2, "offset": 1}).json()
+    assert [r["path"] for r in page["results"]] == ["/lib/img_1.jpg", "/lib/img_2.jpg"]
+    assert page["results"][1]["metadata"] == METADATA["/lib/img_2.jpg"]
+    assert batches == [(["/lib/img_1.jpg", "/lib/img_2.jpg"], True)]
+
+
+def test_tag_writes_bump_library_version(tmp_path):
+    tags = TagsDB(tmp_path / "tags.db")
+    before = library_version.value
+    assert tags.add_photos("trip", ["/a.jpg"]) == 1
+    assert library_version.value == before + 1
+    # No-op writes leave cached rankings valid
+    assert tags.add_photos("trip", ["/a.jpg"]) == 0
+    assert tags.remove_photos("trip", ["/missing.jpg"]) == 0
+    assert library_version.value == before + 1
+    assert tags.delete_tag("trip")
+    assert library_version.value == before + 2
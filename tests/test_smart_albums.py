@@ -0,0 +1,160 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from server.albums_db import AlbumsDB
+from server.smart_albums import (
+    RULE_TYPES,
+    SmartAlbumEngine,
+    SmartAlbumMaintainer,
+    SmartAlbumRule,
+    populate_smart_album,
+    register_sql_functions,
+)
+from src.metadata_search import MetadataDatabase
+
+RECENT = (datetime.now() - timedelta(days=3)).isoformat()
+OLD = "2020-06-15T12:00:00"
+
+PHOTOS = {
+    "/lib/Screenshot 2024.png": {"filesystem": {"size_bytes": 500, "created": RECENT}, "gps": {}},
+    "/lib/trip/IMG_1.JPG": {
+        "filesystem": {"size_bytes": 5_000_000, "created": OLD},
+        "gps": {"latitude": 48.85, "longitude": 2.35},
+        "exif": {"image": {"Model": "Canon EOS R5"}},
+    },
+    "/lib/trip/IMG_2.jpg": {
+        "filesystem": {"size_bytes": 2_000, "created": "not a date"},
+        "gps": {"latitude": 0, "longitude": 2.35},
+        "exif": {"image": {"Model": "iPhone 15"}},
+    },
+    "/lib/screenshots/clip.MOV": {"filesystem": {"size_bytes": 200 * 1024 * 1024}, "gps": {"latitude": 1.0}},
+}
+
+RULE_SETS = [
+    [{"type": "filename_contains", "value": "SCREENSHOT"}],
+    [{"type": "filename_contains", "value": "IMG", "case_sensitive": True}],
+    [{"type": "file_extension", "extensions": ["jpg", ".mov"]}],
+    [{"type": "file_size", "operator": ">=", "size_bytes": 2_000}],
+    [{"type": "file_size", "operator": "??", "size_bytes": 0}],
+    [{"type": "date_range", "from_date": "2020-01-01", "to_date": "2020-12-31"}],
+    [{"type": "no_gps"}],
+    [{"type": "has_gps"}],
+    [{"type": "camera_model", "models": ["canon", "nikon"]}],
+    [{"type": "recent_photos", "days": 30}],
+    [{"type": "file_extension", "extensions": [".jpg"]}, {"type": "has_gps"}],
+]
+
+
+@pytest.fixture
+def dbs(tmp_path):
+    metadata_db = MetadataDatabase(str(tmp_path / "metadata.db"))
+    albums_db = AlbumsDB(str(tmp_path / "albums.db"))
+    for path, metadata in PHOTOS.items():
+        metadata_db.store_metadata(path, metadata)
+    yield metadata_db, albums_db
+    metadata_db.close()
+    albums_db.close()
+
+
+@pytest.mark.parametrize("rules", RULE_SETS)
+@pytest.mark.parametrize("match_all", [True, False])
+def test_compiled_sql_matches_python_evaluation(dbs, rules, match_all):
+    metadata_db, _ = dbs
+    expected = {
+        path for path, metadata in PHOTOS.items()
+        if SmartAlbumEngine.evaluate_rules(rules, metadata, path, match_all)
+    }
+    compiled = SmartAlbumEngine.compile_rules(rules, match_all)
+    assert not compiled.python_rules
+    assert compiled.matching_paths(metadata_db.conn) == expected
+
+
+def test_uncompilable_rules_fall_back_to_python(dbs, monkeypatch):
+    class PixelCountRule(SmartAlbumRule):
+        def matches(self, photo_metadata, photo_path):
+            return photo_metadata.get("filesystem", {}).get("size_bytes", 0) % 2 == 0
+
+    monkeypatch.setitem(RULE_TYPES, "even_size", PixelCountRule)
+    metadata_db, _ = dbs
+    rules = [{"type": "even_size"}, {"type": "filename_contains", "value": "img"}]
+
+    compiled = SmartAlbumEngine.compile_rules(rules, match_all=True)
+    assert len(compiled.python_rules) == 1
+    assert compiled.matching_paths(metadata_db.conn) == {"/lib/trip/IMG_1.JPG", "/lib/trip/IMG_2.jpg"}
+
+    compiled_or = SmartAlbumEngine.compile_rules(rules, match_all=False)
+    assert compiled_or.matching_paths(metadata_db.conn) == set(PHOTOS)
+
+
+def test_cached_recent_rule_uses_the_current_time(dbs, monkeypatch):
+    metadata_db, _ = dbs
+    compiled = SmartAlbumEngine.compile_rules([{"type": "recent_photos", "days": 5}])
+    assert compiled.matching_paths(metadata_db.conn) == {"/lib/Screenshot 2024.png"}
+
+    later = datetime.now() + timedelta(days=3)
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return later
+
+    monkeypatch.setattr("server.smart_albums.datetime", Later)
+    assert compiled.matching_paths(metadata_db.conn) == set()
+
+
+def test_sql_functions_are_registered_once_per_connection(dbs, monkeypatch):
+    metadata_db, _ = dbs
+    conn = metadata_db.conn
+    register_sql_functions(conn)
+    calls = []
+    monkeypatch.setattr("server.smart_albums._parse_timestamp", lambda value: calls.append(value))
+    compiled = SmartAlbumEngine.compile_rules([{"type": "recent_photos"}])
+    compiled.matching_paths(conn)
+    compiled.matching_paths(conn)
+    # The functions registered first are still the ones SQLite calls
+    assert calls == []
+
+
+def test_populate_applies_diff(dbs):
+    metadata_db, albums_db = dbs
+    albums_db.create_album("jpgs", "JPGs", is_smart=True,
+                           smart_rules={"rules": [{"type": "file_extension", "extensions": [".jpg"]}]})
+
+    assert populate_smart_album(albums_db, "jpgs", metadata_db) == {"added": 2, "removed": 0}
+    assert populate_smart_album(albums_db, "jpgs", metadata_db) == {"added": 0, "removed": 0}
+
+    metadata_db.mark_as_deleted("/lib/trip/IMG_2.jpg")
+    assert populate_smart_album(albums_db, "jpgs", metadata_db) == {"added": 0, "removed": 1}
+    assert albums_db.get_album_photos("jpgs") == ["/lib/trip/IMG_1.JPG"]
+
+
+def test_membership_is_maintained_incrementally(dbs):
+    metadata_db, albums_db = dbs
+    albums_db.create_album("gps", "With GPS", is_smart=True, smart_rules={"rules": [{"type": "has_gps"}]})
+    albums_db.create_album("manual", "Manual")
+    albums_db.add_photos_to_album("manual", ["/lib/new.jpg"])
+    metadata_db.add_change_listener(SmartAlbumMaintainer(albums_db, metadata_db).handle_change)
+
+    metadata_db.store_metadata("/lib/new.jpg", {"gps": {"latitude": 1.0, "longitude": 2.0}})
+    assert albums_db.get_album_photos("gps") == ["/lib/new.jpg"]
+
+    metadata_db.store_metadata("/lib/new.jpg", {"gps": {}})
+    assert albums_db.get_album_photos("gps") == []
+
+    metadata_db.store_metadata("/lib/new.jpg", {"gps": {"latitude": 1.0, "longitude": 2.0}})
+    metadata_db.mark_as_deleted("/lib/new.jpg")
+    assert albums_db.get_album_photos("gps") == []
+    # Regular albums are left alone
+    assert albums_db.get_album_photos("manual") == ["/lib/new.jpg"]
+
+
+def test_invalid_smart_rules_do_not_break_metadata_writes(dbs):
+    metadata_db, albums_db = dbs
+    albums_db.create_album("bad", "Bad", is_smart=True, smart_rules={"rules": [{"type": "nope"}]})
+    metadata_db.add_change_listener(SmartAlbumMaintainer(albums_db, metadata_db).handle_change)
+    assert metadata_db.store_metadata("/lib/x.jpg", {"a": 1})
+    assert json.loads(metadata_db.conn.execute(
+        "SELECT metadata_json FROM metadata WHERE file_path = '/lib/x.jpg'"
+    ).fetchone()[0]) == {"a": 1}
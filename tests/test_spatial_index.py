@@ -0,0 +1,103 @@
+import math
+import sqlite3
+
+import numpy as np
+
+from server.location_clusters_db import LocationClustersDB
+from server.locations_db import LocationsDB
+from server.spatial_index import bounding_boxes, grid_cluster, haversine_m
+
+
+def _brute_force_cluster(lats, lngs, max_distance_m, min_photos):
+    processed = np.zeros(len(lats), dtype=bool)
+    clusters = []
+    for seed in range(len(lats)):
+        if processed[seed]:
+            continue
+        d = haversine_m(lats[seed], lngs[seed], lats, lngs)
+        members = np.flatnonzero((d <= max_distance_m) & ~processed)
+        processed[members] = True
+        if len(members) >= min_photos:
+            clusters.append(members)
+    return clusters
+
+
+def test_haversine_matches_known_distance():
+    # London -> Paris is roughly 343.5 km
+    d = haversine_m(51.5074, -0.1278, np.array([48.8566]), np.array([2.3522]))[0]
+    assert abs(d - 343_500) < 1_000
+
+
+def test_bounding_boxes_split_at_antimeridian_and_widen_at_poles():
+    boxes = bounding_boxes(0.0, 179.9999, 1_000)
+    assert len(boxes) == 2
+    assert boxes[0][3] == 180.0 and boxes[1][2] == -180.0
+    assert bounding_boxes(89.9999, 0.0, 1_000)[0][2:] == (-180.0, 180.0)
+
+
+def test_grid_cluster_matches_brute_force():
+    rng = np.random.default_rng(7)
+    centers = rng.uniform([-60, -180], [60, 180], size=(40, 2))
+    pts = np.repeat(centers, 25, axis=0) + rng.normal(scale=0.001, size=(1000, 2))
+    # Include points straddling the antimeridian
+    pts = np.vstack([pts, [[10.0, 179.9995], [10.0, -179.9995], [10.0, 179.9999]]])
+    lats, lngs = pts[:, 0], pts[:, 1]
+
+    fast = grid_cluster(lats, lngs, 150.0, min_photos=2)
+    slow = _brute_force_cluster(lats, lngs, 150.0, min_photos=2)
+    assert [c.tolist() for c in fast] == [c.tolist() for c in slow]
+    assert any(set(c.tolist()) == {1000, 1001, 1002} for c in fast)
+
+
+def test_cluster_locations_persists_clusters(tmp_path):
+    db = LocationClustersDB(tmp_path / "locations.db")
+    for i in range(3):
+        db.add_photo_location(f"/a/{i}.jpg", 40.0 + i * 1e-5, -74.0, corrected_place_name="Park")
+    db.add_photo_location("/b/far.jpg", 41.0, -74.0)
+
+    clusters = db.cluster_locations(min_photos=2, max_distance_meters=100)
+    assert len(clusters) == 1
+    assert clusters[0].name == "Park"
+    assert clusters[0].photo_count == 3
+
+    # Re-clustering replaces rather than duplicates
+    db.cluster_locations(min_photos=2, max_distance_meters=100)
+    stored = db.get_location_clusters()
+    assert len(stored) == 1
+    assert {p.photo_path for p in db.get_photos_in_cluster(stored[0].id)} == {"/a/0.jpg", "/a/1.jpg", "/a/2.jpg"}
+
+
+def test_nearby_queries_use_spatial_index(tmp_path):
+    db = LocationsDB(tmp_path / "locations.db")
+    assert db.has_spatial_index
+    db.add_photo_location("/p/near.jpg", 37.7749, -122.4194)
+    db.add_photo_location("/p/nearer.jpg", 37.7750, -122.4194)
+    db.add_photo_location("/p/far.jpg", 37.80, -122.4194)
+
+    results = db.get_nearby_locations(37.7750, -122.4194, radius_km=1.0)
+    assert [r["photo_path"] for r in results] == ["/p/nearer.jpg", "/p/near.jpg"]
+    assert math.isclose(results[1]["distance"], 0.0111, rel_tol=0.05)
+
+    # Moving a photo keeps the R*Tree in sync
+    db.add_photo_location("/p/far.jpg", 37.7751, -122.4194)
+    assert len(db.get_nearby_locations(37.7750, -122.4194, radius_km=1.0)) == 3
+
+    clusters_db = LocationClustersDB(tmp_path / "locations.db")
+    photos = clusters_db.get_photos_by_location(37.7750, -122.4194, radius_km=0.005)
+    assert [p.photo_path for p in photos] == ["/p/nearer.jpg"]
+
+    with sqlite3.connect(tmp_path / "locations.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM photo_locations_rtree").fetchone()[0] == 3
+
+
+def test_re_adding_a_photo_keeps_one_rtree_entry(tmp_path):
+    db = LocationClustersDB(tmp_path / "clusters.db")
+    for lat in (10.0, 10.5, 11.0):
+        db.add_photo_location("/p/moving.jpg", lat, 20.0)
+
+    with sqlite3.connect(tmp_path / "clusters.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM photo_locations").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM photo_locations_rtree").fetchone()[0] == 1
+    # The old positions are gone from bounding-box queries
+    assert db.get_photos_by_location(10.0, 20.0, radius_km=1.0) == []
+    assert [p.photo_path for p in db.get_photos_by_location(11.0, 20.0, radius_km=1.0)] == ["/p/moving.jpg"]
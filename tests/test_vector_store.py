@@ -1,8 +1,11 @@
 from server.vector_store import VectorStore
 import numpy as np
 import os
+import pickle
 
-def test_vector_store():
+import pytest
+
+def test_vector_store(tmp_path):
     print("\n" + "="*50)
     print("Testing Vector Store (Task 10.2)")
     print("="*50)
@@ -39,22 +42,73 @@ def test_vector_store():
         
     # 4. Persistence
     print("\n3. Testing Persistence...")
-    db_path = "test_vectors.pkl"
+    db_path = str(tmp_path / "test_vectors.pkl")
     store.save(db_path)
-    if os.path.exists(db_path):
+    if os.path.exists(tmp_path / "test_vectors.json"):
         print("   ✓ Saved to disk")
         
     new_store = VectorStore()
     new_store.load(db_path)
     print(f"   ✓ Loaded {len(new_store.ids)} items")
-    
-    # Clean up
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    assert new_store.search(query, limit=1)[0]['id'] == top_result
 
     print("\n" + "="*50)
     print("✓ Vector Store Verified")
     print("="*50)
 
-if __name__ == "__main__":
-    test_vector_store()
+
+def test_batches_grow_the_buffer_and_search_partitions():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 8)).astype(np.float32)
+    store = VectorStore(initial_capacity=16)
+    store.add_batch([f"v{i}" for i in range(2000)], vectors[:2000])
+    for i in range(2000, 3000):
+        store.add(f"v{i}", vectors[i].tolist(), {"n": i})
+    assert len(store) == 3000 and store.capacity == 4000
+
+    query = vectors[42]
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+    assert [r["id"] for r in store.search(query, limit=5)] == [f"v{i}" for i in expected]
+    assert len(store.search(query, limit=10_000)) == 3000
+    with pytest.raises(ValueError):
+        store.add("bad", [1.0, 2.0])
+
+
+def test_snapshot_is_memory_mapped_and_replaced_atomically(tmp_path):
+    store = VectorStore()
+    store.add_batch(["a", "b"], [[1.0, 0.0], [0.0, 2.0]], [{"x": 1}, {}])
+    path = tmp_path / "vectors"
+    store.save(path)
+    store.add("c", [1.0, 1.0])
+    store.save(path)
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert len(names) == 2 and names[1] == "vectors.json" and names[0].endswith(".npy")
+
+    loaded = VectorStore()
+    loaded.load(path)
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert loaded.ids == ["a", "b", "c"] and loaded.metadata[0] == {"x": 1}
+    assert loaded.search([0.0, 1.0], limit=1)[0]["id"] == "b"
+    # Appending copies the mapped vectors into a writable buffer
+    loaded.add("d", [-1.0, 0.0])
+    assert loaded.search([-1.0, 0.0], limit=1)[0]["id"] == "d"
+
+    # A save that died before the sidecar was replaced leaves the old snapshot readable
+    (tmp_path / "vectors.0123456789ab.npy").write_bytes(b"partial")
+    fresh = VectorStore()
+    fresh.load(path)
+    assert fresh.ids == ["a", "b", "c"]
+
+
+def test_legacy_pickle_still_loads(tmp_path):
+    path = tmp_path / "old.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"ids": ["a"], "embeddings": np.array([[1.0, 0.0]], dtype=np.float32),
+                     "metadata": [{}]}, f)
+    store = VectorStore()
+    store.load(path)
+    store.add("b", [0.0, 1.0])
+    assert [r["id"] for r in store.search([0.0, 1.0], limit=2)] == ["b", "a"]
+    store.save(path)
+    assert (tmp_path / "old.json").exists()
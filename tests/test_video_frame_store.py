@@ -0,0 +1,55 @@
+from server.config import settings
+from server.lancedb_store import VideoFrameStore
+
+
+def _unit(vec):
+    norm = sum(v * v for v in vec) ** 0.5
+    return [v / norm for v in vec]
+
+
+def test_search_videos_max_pools_scenes(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", tmp_path / "vectors")
+    store = VideoFrameStore()
+
+    store.add_video_frames("/videos/beach.mp4", [
+        {"embedding": _unit([0.1, 1.0, 0.0]), "timestamp": 0.0, "scene_number": 0},
+        {"embedding": _unit([1.0, 0.05, 0.0]), "timestamp": 42.0, "scene_number": 3},
+    ])
+    store.add_video_frames("/videos/city.mp4", [
+        {"embedding": _unit([0.6, 0.6, 0.0]), "timestamp": 5.0, "scene_number": 1},
+    ])
+
+    hits = store.search_videos(_unit([1.0, 0.0, 0.0]), limit=5)
+
+    # One hit per video, scored by its best scene
+    assert [h["id"] for h in hits] == ["/videos/beach.mp4", "/videos/city.mp4"]
+    assert hits[0]["timestamp"] == 42.0
+    assert hits[0]["scene_number"] == 3
+
+    # Re-indexing replaces a video's frames; deleting drops them
+    store.add_video_frames("/videos/beach.mp4", [
+        {"embedding": _unit([0.0, 1.0, 0.0]), "timestamp": 1.0, "scene_number": 0},
+    ])
+    assert store.get_count() == 2
+    store.delete_videos(["/videos/beach.mp4"])
+    assert [h["id"] for h in store.search_videos(_unit([1.0, 0.0, 0.0]))] == ["/videos/city.mp4"]
+
+
+def test_search_videos_fills_limit_when_videos_have_many_scenes(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", tmp_path / "vectors")
+    store = VideoFrameStore()
+    # Every scene of the first video outranks the second video
+    store.add_video_frames("/videos/long.mp4", [
+        {"embedding": _unit([1.0, 0.01 * i, 0.0]), "timestamp": float(i), "scene_number": i}
+        for i in range(16)
+    ])
+    store.add_video_frames("/videos/short.mp4", [
+        {"embedding": _unit([0.5, 1.0, 0.0]), "timestamp": 0.0, "scene_number": 0},
+    ])
+
+    assert store.max_frames_per_video() == 16
+    assert [h["id"] for h in store.search_videos(_unit([1.0, 0.0, 0.0]), limit=2)] == [
+        "/videos/long.mp4", "/videos/short.mp4",
+    ]
+    # A fresh store reads the count back from the table
+    assert VideoFrameStore().max_frames_per_video() == 16
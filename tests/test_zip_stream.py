@@ -0,0 +1,65 @@
+import io
+import zipfile
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import server.main as main
+from server.zip_stream import ZipEntry, stream_zip, unique_arcnames
+
+
+def test_stream_zip_stores_media_and_deflates_the_rest(tmp_path):
+    photo = tmp_path / "a" / "IMG_1.jpg"
+    photo.parent.mkdir()
+    photo.write_bytes(b"\xff\xd8" + bytes(range(256)) * 40)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("hello " * 1000)
+
+    def broken():
+        raise OSError("cannot decode")
+
+    chunks = list(stream_zip([
+        ZipEntry("IMG_1.jpg", path=str(photo)),
+        ZipEntry("notes.txt", path=str(notes)),
+        ZipEntry("meta.json", render=lambda: b'{"a": 1}'),
+        ZipEntry("fallback.jpg", path=str(photo), render=broken),
+        ZipEntry("dropped.json", render=lambda: None),
+        ZipEntry("missing.jpg", path=str(tmp_path / "nope.jpg")),
+    ], max_workers=2, chunk_size=4096))
+
+    # Output is flushed per member and in bounded chunks, not as one blob
+    assert len(chunks) >= 4
+    assert max(len(c) for c in chunks) <= 4096 + 1024
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["IMG_1.jpg", "notes.txt", "meta.json", "fallback.jpg"]
+        assert zf.getinfo("IMG_1.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("fallback.jpg") == photo.read_bytes()
+        assert zf.read("meta.json") == b'{"a": 1}'
+
+
+def test_unique_arcnames_prefixes_collisions():
+    assert unique_arcnames(["/x/a.jpg", "/y/a.jpg", "/y/b.jpg"]) == ["x_a.jpg", "y_a.jpg", "b.jpg"]
+
+
+def test_export_streams_resized_images(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.settings, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(main.settings, "MEDIA_DIR", tmp_path / "media")
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"p{i}.png"
+        Image.new("RGB", (800, 600), "blue").save(path)
+        paths.append(str(path))
+
+    client = TestClient(main.app)
+    resp = client.post("/export", json={
+        "paths": paths,
+        "options": {"include_metadata": False, "include_thumbnails": True, "max_resolution": 100},
+    })
+    assert resp.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert sorted(zf.namelist()) == sorted(
+            [f"p{i}.png" for i in range(3)] + [f"thumbs/p{i}_thumb.png" for i in range(3)]
+        )
+        assert Image.open(zf.open("p0.png")).size == (100, 75)